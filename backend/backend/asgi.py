@@ -8,6 +8,8 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
+from urllib.parse import parse_qs
 
 import django
 from asgiref.sync import sync_to_async
@@ -19,29 +21,37 @@ django.setup()
 import socketio  # noqa: E402
 from django.contrib.auth import get_user_model  # noqa: E402
 from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.exceptions import PermissionDenied  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
 from messaging.models import Message, Thread  # noqa: E402
+from messaging.outbox import start_outbox  # noqa: E402
+from messaging.participants import cached_participant_ids, participant_ids  # noqa: E402
+from messaging.presence import mark_offline, mark_online, update_typing  # noqa: E402
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError  # noqa: E402
 from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
 
+from backend.socketio_manager import create_manager  # noqa: E402
+
 django_asgi_app = get_asgi_application()
 
 print("🚀 [DJANGO] Starting Socket.IO server...")
 
-sio = socketio.AsyncServer(cors_allowed_origins="*", async_mode="asgi")
+# Emits reach the clients of every worker process when SOCKETIO_MANAGER is "sqlite" or "redis"
+sio = socketio.AsyncServer(cors_allowed_origins="*", async_mode="asgi", client_manager=create_manager())
+
+User = get_user_model()
 
-# Store connected users and their threads
-connected_users = {}
+# Messages a user may send per second in a thread, as enforced by the REST API
+MESSAGE_RATE_LIMIT = 5
 
 
 def authenticate_user(token):
     """Authenticate user from JWT token"""
     try:
         access_token = AccessToken(token)
-        user_id = access_token["user_id"]
-        User = get_user_model()
-        user = User.objects.get(id=user_id)
-        return user
-    except (InvalidToken, TokenError, User.DoesNotExist):
+        return User.objects.get(id=access_token["user_id"])
+    except (InvalidToken, TokenError, KeyError, User.DoesNotExist):
         return None
 
 
@@ -52,155 +62,251 @@ def authenticate_user_async(token):
     return authenticate_user(token)
 
 
+async def get_session_user(sid, data=None):
+    """
+    User of a connection, authenticated once per connection from the token given at connect
+    or, for older clients, from the token of their first event
+    """
+    session = await sio.get_session(sid)
+    user = session.get("user")
+    if user is None and isinstance(data, dict) and data.get("token"):
+        user = await authenticate_user_async(data["token"])
+        if user is not None:
+            async with sio.session(sid) as session:
+                session["user"] = user
+    if user is not None and session.get("online_at", 0) < time.monotonic() - settings.MESSAGING_ONLINE_TTL / 2:
+        await set_online(sid, user)
+    return user
+
+
+async def set_online(sid, user):
+    """Record or refresh the connection of a user in the presence store"""
+    await sync_to_async(mark_online, thread_sensitive=False)(user.id, sid)
+    async with sio.session(sid) as session:
+        session["online_at"] = time.monotonic()
+
+
+async def get_participant_ids(thread_id, refresh=False):
+    """Participant ids of a thread, None if it does not exist, from the cache when possible unless `refresh`"""
+    try:
+        thread_id = int(thread_id)
+    except (TypeError, ValueError):
+        return None
+    ids = None if refresh else cached_participant_ids(thread_id)
+    if ids is None:
+        ids = await sync_to_async(participant_ids)(thread_id, refresh=refresh)
+    return ids
+
+
+def message_data(message, user):
+    """Payload of a message broadcast to a thread room"""
+    return {
+        "id": message.id,
+        "sender_id": user.id,
+        "sender_name": user.name,
+        "body": message.body,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+@sync_to_async
+def create_message(thread_id, user, body):
+    """
+    Write a message unless the user is sending too quickly, and return its payload.
+    Raises PermissionDenied if the user no longer takes part in the thread, which the cached participants
+    may not show yet when another process removed them.
+    """
+    with transaction.atomic():
+        if not Thread.objects.filter(pk=thread_id, participants=user).exists():
+            raise PermissionDenied
+        recent = Message.objects.filter(
+            thread_id=thread_id, sender=user, created_at__gte=timezone.now() - timezone.timedelta(seconds=1)
+        )
+        if recent.count() >= MESSAGE_RATE_LIMIT:
+            return None
+        return message_data(Message.objects.create(thread_id=thread_id, sender=user, body=body), user)
+
+
+@sync_to_async
+def find_message(thread_id, user, body, message_id=None):
+    """Payload of a message already written through the REST API, None if not found"""
+    messages = Message.objects.filter(thread_id=thread_id, sender=user)
+    if message_id is not None:
+        message = messages.filter(id=message_id).first()
+    else:
+        message = messages.filter(body=body).order_by("-created_at").first()
+    return message_data(message, user) if message else None
+
+
 @sio.event
 async def connect(sid, environ, auth=None):
     print(f"🔗 [SOCKET.IO] Client connected: {sid}")
+    token = auth.get("token") if isinstance(auth, dict) else None
+    token = token or parse_qs(environ.get("QUERY_STRING", "")).get("token", [None])[0]
+    user = await authenticate_user_async(token) if token else None
+    await sio.save_session(sid, {"user": user, "thread_id": None})
+    if user is not None:
+        await set_online(sid, user)
     await sio.emit("connected", {"status": "connected"}, room=sid)
 
 
 @sio.event
 async def disconnect(sid):
     print(f"🔌 [SOCKET.IO] Client disconnected: {sid}")
-    # Remove from connected users
-    connected_users.pop(sid, None)
+    session = await sio.get_session(sid)
+    if session.get("user") is not None:
+        await sync_to_async(mark_offline, thread_sensitive=False)(session["user"].id, sid)
 
 
 @sio.event
 async def join_thread(sid, data):
     """Join a chat thread"""
-    token = data.get("token")
     thread_id = data.get("thread_id")
 
-    user = await authenticate_user_async(token)
+    user = await get_session_user(sid, data)
     if not user:
         await sio.emit("error", {"message": "Authentication failed"}, room=sid)
         return
 
-    try:
-        thread = await sync_to_async(Thread.objects.get)(id=thread_id)
-        is_participant = await sync_to_async(lambda: user in thread.participants.all())()
-        if not is_participant:
-            await sio.emit("error", {"message": "Not a participant in this thread"}, room=sid)
-            return
-
-        # Join the thread room
-        await sio.enter_room(sid, f"thread_{thread_id}")
-        connected_users[sid] = {"user": user, "thread_id": thread_id}
+    # Read again, another process may have removed the user since the participants were cached
+    participants = await get_participant_ids(thread_id, refresh=True)
+    if participants is None:
+        await sio.emit("error", {"message": "Thread not found"}, room=sid)
+        return
+    if user.id not in participants:
+        await sio.emit("error", {"message": "Not a participant in this thread"}, room=sid)
+        return
 
-        await sio.emit("joined_thread", {"thread_id": thread_id}, room=sid)
-        print(f"✅ [SOCKET.IO] User {user.id} joined thread {thread_id}")
+    # Join the thread room
+    await sio.enter_room(sid, f"thread_{thread_id}")
+    async with sio.session(sid) as session:
+        session["thread_id"] = thread_id
 
-    except Thread.DoesNotExist:
-        await sio.emit("error", {"message": "Thread not found"}, room=sid)
+    await sio.emit("joined_thread", {"thread_id": thread_id}, room=sid)
+    print(f"✅ [SOCKET.IO] User {user.id} joined thread {thread_id}")
 
 
 @sio.event
 async def leave_thread(sid, data):
     """Leave a chat thread"""
     thread_id = data.get("thread_id")
-    if sid in connected_users:
-        await sio.leave_room(sid, f"thread_{thread_id}")
-        del connected_users[sid]
-        print(f"👋 [SOCKET.IO] User left thread {thread_id}")
+    await sio.leave_room(sid, f"thread_{thread_id}")
+    async with sio.session(sid) as session:
+        if session.get("thread_id") == thread_id:
+            session["thread_id"] = None
+    print(f"👋 [SOCKET.IO] User left thread {thread_id}")
 
 
 @sio.event
 async def join_threads(sid, data):
-    token = data.get("token")
-
-    user = await authenticate_user_async(token)
+    user = await get_session_user(sid, data)
     if not user:
         await sio.emit("error", {"message": "Authentication failed"}, room=sid)
         return
 
     await sio.enter_room(sid, f"user_{user.id}_threads")
-    connected_users[sid] = {"user": user, "threads_room": True}
 
     await sio.emit("connected", {"message": "Joined threads notifications"}, room=sid)
     print(f"✅ [SOCKET.IO] User {user.id} joined threads notifications room")
 
 
+async def _authorize_message(sid, data):
+    """User allowed to send a message to the thread of an event, None after reporting the error"""
+    user = await get_session_user(sid, data)
+    if not user:
+        await sio.emit("error", {"message": "Authentication failed"}, room=sid)
+        return None
+
+    participants = await get_participant_ids(data.get("thread_id"))
+    if participants is None:
+        await sio.emit("error", {"message": "Thread not found"}, room=sid)
+        return None
+    if user.id not in participants:
+        await sio.emit("error", {"message": "Not a participant"}, room=sid)
+        return None
+    return user
+
+
 @sio.event
-async def send_message(sid, data):
-    """Send a message to a thread"""
-    if sid not in connected_users:
-        await sio.emit("error", {"message": "Not in a thread"}, room=sid)
+async def post_message(sid, data):
+    """Write a message to a thread and broadcast it, echoing the client id of the message back"""
+    thread_id = data.get("thread_id")
+    body = (data.get("body") or "").strip()
+    if not body:
+        await sio.emit("error", {"message": "Message body is required"}, room=sid)
         return
 
-    token = data.get("token")
+    user = await _authorize_message(sid, data)
+    if not user:
+        return
+
+    try:
+        message = await create_message(int(thread_id), user, body)
+    except PermissionDenied:
+        await sio.emit("error", {"message": "Not a participant"}, room=sid)
+        return
+    except Exception as e:
+        print(f"❌ [SOCKET.IO] Error posting message: {e}")
+        await sio.emit("error", {"message": "Failed to send message"}, room=sid)
+        return
+    if message is None:
+        await sio.emit("error", {"message": "You're sending messages too quickly. Please slow down."}, room=sid)
+        return
+
+    await sio.emit("new_message", message, room=f"thread_{thread_id}", skip_sid=sid)
+    await sio.emit("message_sent", {**message, "client_id": data.get("client_id")}, room=sid)
+    print(f"📤 [SOCKET.IO] Message posted in thread {thread_id} by user {user.id}")
+
+
+@sio.event
+async def send_message(sid, data):
+    """Broadcast to a thread a message already written through the REST API"""
     thread_id = data.get("thread_id")
-    body = data.get("body")
 
-    user = await authenticate_user_async(token)
+    user = await _authorize_message(sid, data)
     if not user:
-        await sio.emit("error", {"message": "Authentication failed"}, room=sid)
         return
 
     try:
-        thread = await sync_to_async(Thread.objects.get)(id=thread_id)
-        is_participant = await sync_to_async(lambda: user in thread.participants.all())()
-        if not is_participant:
-            await sio.emit("error", {"message": "Not a participant"}, room=sid)
-            return
-
-        message = await sync_to_async(
-            lambda: Message.objects.filter(thread=thread, sender=user, body=body).order_by("-created_at").first()
-        )()
-
-        if not message:
-            await sio.emit("error", {"message": "Message not found"}, room=sid)
-            return
-
-        thread.last_message_at = message.created_at
-        await sync_to_async(thread.save)()
-
-        message_data = {
-            "id": message.id,
-            "sender_id": user.id,
-            "sender_name": user.name,
-            "body": message.body,
-            "created_at": message.created_at.isoformat(),
-        }
-
-        await sio.emit("new_message", message_data, room=f"thread_{thread_id}", skip_sid=sid)
-        print(f"📤 [SOCKET.IO] Message broadcasted in thread {thread_id} by user {user.id}")
-
-    except Thread.DoesNotExist:
-        await sio.emit("error", {"message": "Thread not found"}, room=sid)
+        message = await find_message(int(thread_id), user, data.get("body"), data.get("message_id"))
     except Exception as e:
         print(f"❌ [SOCKET.IO] Error sending message: {e}")
         await sio.emit("error", {"message": "Failed to send message"}, room=sid)
+        return
+    if not message:
+        await sio.emit("error", {"message": "Message not found"}, room=sid)
+        return
 
+    await sio.emit("new_message", message, room=f"thread_{thread_id}", skip_sid=sid)
+    print(f"📤 [SOCKET.IO] Message broadcasted in thread {thread_id} by user {user.id}")
 
-@sio.event
-async def typing_start(sid, data):
-    """User started typing"""
-    if sid not in connected_users:
-        return
 
-    thread_id = connected_users[sid]["thread_id"]
-    user = connected_users[sid]["user"]
+async def _emit_typing(sid, is_typing):
+    """Record that the user of a connection started or stopped typing and tell the thread it joined"""
+    user = await get_session_user(sid)
+    thread_id = (await sio.get_session(sid)).get("thread_id")
+    if user is None or thread_id is None:
+        return
 
-    typing_data = {"user_id": user.id, "user_name": user.name, "is_typing": True}
+    await sync_to_async(update_typing, thread_sensitive=False)(int(thread_id), user, is_typing)
+    typing_data = {"user_id": user.id, "user_name": user.name, "is_typing": is_typing}
 
     await sio.emit("typing", typing_data, room=f"thread_{thread_id}", skip_sid=sid)
 
 
 @sio.event
-async def typing_stop(sid, data):
-    """User stopped typing"""
-    if sid not in connected_users:
-        return
-
-    thread_id = connected_users[sid]["thread_id"]
-    user = connected_users[sid]["user"]
+async def typing_start(sid, data):
+    """User started typing"""
+    await _emit_typing(sid, True)
 
-    typing_data = {"user_id": user.id, "user_name": user.name, "is_typing": False}
 
-    await sio.emit("typing", typing_data, room=f"thread_{thread_id}", skip_sid=sid)
+@sio.event
+async def typing_stop(sid, data):
+    """User stopped typing"""
+    await _emit_typing(sid, False)
 
 
-application = socketio.ASGIApp(sio, django_asgi_app)
+application = socketio.ASGIApp(sio, django_asgi_app, on_startup=start_outbox)
 
 print("✅ [DJANGO] Socket.IO server configured successfully")
 
@@ -0,0 +1,61 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks generate large synthetic datasets, so they always run against a throwaway test
+database created next to the configured one and destroyed afterwards.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def isolated_database():
+    """
+    Run the body against a freshly migrated test database instead of the configured one.
+
+    Run benchmarks with DISABLE_SIGNALS=True so the post_migrate hooks do not call the JEB API.
+    """
+    original_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(original_name, verbosity=0)
+
+
+def time_call(func, *args, **kwargs):
+    """
+    Call `func` and return (result, elapsed milliseconds).
+    """
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """
+    Summarize latency samples (in milliseconds) with nearest-rank percentiles and the mean.
+    """
+    if not samples:
+        return dict.fromkeys([f"p{point}" for point in points] + ["mean"], 0.0)
+
+    ordered = sorted(samples)
+    summary = {
+        f"p{point}": ordered[min(len(ordered) - 1, max(0, math.ceil(point / 100 * len(ordered)) - 1))]
+        for point in points
+    }
+    summary["mean"] = sum(ordered) / len(ordered)
+    return summary
+
+
+def format_summary(label, samples):
+    """
+    Render one line of a benchmark report.
+    """
+    summary = percentiles(samples)
+    rendered = "  ".join(f"{name}={value:8.2f}ms" for name, value in summary.items())
+    return f"{label:<32} n={len(samples):<5} {rendered}"
@@ -146,6 +146,26 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/api/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Store already compressed files (images, video, archives, PDF...) as is in drive folder downloads
+# instead of compressing them again
+DRIVE_ZIP_SKIP_COMPRESSED = os.environ.get("DRIVE_ZIP_SKIP_COMPRESSED", "True").lower() == "true"
+
+# Internal nginx location mapped to MEDIA_ROOT (e.g. "/protected-media/"): when set, drive downloads
+# are offloaded to nginx with X-Accel-Redirect instead of being sent by Django (see drive/http.py)
+DRIVE_ACCEL_REDIRECT_PREFIX = os.environ.get("DRIVE_ACCEL_REDIRECT_PREFIX", "")
+
+# Seconds a drive content left without any file is kept before its garbage collection (see drive/blobs.py)
+DRIVE_BLOB_GC_GRACE = int(os.environ.get("DRIVE_BLOB_GC_GRACE", "3600"))
+
+# Resumable drive uploads (see drive/uploads.py): size of the chunks in bytes, largest file in bytes,
+# and seconds an upload is kept without receiving a chunk
+DRIVE_UPLOAD_CHUNK_SIZE = int(os.environ.get("DRIVE_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+DRIVE_UPLOAD_MAX_SIZE = int(os.environ.get("DRIVE_UPLOAD_MAX_SIZE", str(5 * 1024 * 1024 * 1024)))
+DRIVE_UPLOAD_SESSION_TTL = int(os.environ.get("DRIVE_UPLOAD_SESSION_TTL", "86400"))
+
+# Bytes a startup can store in its drive, archived files included, 0 for no limit (see drive/usage.py)
+DRIVE_STORAGE_QUOTA = int(os.environ.get("DRIVE_STORAGE_QUOTA", "0"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -267,6 +287,74 @@ API_DATA_REFRESH_INTERVAL = 60
 # Whether to fetch data immediately on startup or wait for first scheduled interval
 API_DATA_FETCH_ON_STARTUP = False
 
+# Interval in minutes between two compactions of project engagement events into KPI rollups
+ENGAGEMENT_ROLLUP_INTERVAL = int(os.environ.get("ENGAGEMENT_ROLLUP_INTERVAL", "15"))
+
+# Per-process buffering of project view events (see exposed_api/view_buffer.py)
+VIEW_BUFFER_ENABLED = os.environ.get("VIEW_BUFFER_ENABLED", "True").lower() == "true"
+# Number of buffered views triggering a flush
+VIEW_BUFFER_MAX_SIZE = int(os.environ.get("VIEW_BUFFER_MAX_SIZE", "200"))
+# Age in seconds of the oldest buffered view triggering a flush
+VIEW_BUFFER_MAX_AGE = float(os.environ.get("VIEW_BUFFER_MAX_AGE", "5"))
+# Directory holding the spill files that make buffered views survive a crash
+VIEW_BUFFER_SPILL_DIR = os.environ.get("VIEW_BUFFER_SPILL_DIR", os.path.join(BASE_DIR, "spool", "view_events"))
+
+# Lifetime in seconds of the per-process investor feature matrix used by the matching engine
+# (see exposed_api/matching.py), so investor changes made by other processes are picked up
+INVESTOR_MATRIX_TTL = int(os.environ.get("INVESTOR_MATRIX_TTL", "300"))
+
+# AI compatibility scoring (see exposed_api/ai_scoring.py)
+# Backend answering the prompts: "groq" or "stub" for offline tests and load tests
+AI_SCORING_BACKEND = os.environ.get("AI_SCORING_BACKEND", "groq")
+# Groq model used by the "groq" backend
+AI_SCORING_MODEL = os.environ.get("AI_SCORING_MODEL", "llama3-8b-8192")
+# Maximum number of scoring requests in flight per process
+AI_SCORING_CONCURRENCY = int(os.environ.get("AI_SCORING_CONCURRENCY", "4"))
+# Retries of a rate limited or failed request, with a backoff doubling from AI_SCORING_BACKOFF seconds
+AI_SCORING_MAX_RETRIES = int(os.environ.get("AI_SCORING_MAX_RETRIES", "4"))
+AI_SCORING_BACKOFF = float(os.environ.get("AI_SCORING_BACKOFF", "0.5"))
+AI_SCORING_MAX_BACKOFF = float(os.environ.get("AI_SCORING_MAX_BACKOFF", "30"))
+# Simulated latency in seconds of the "stub" backend
+AI_SCORING_STUB_LATENCY = float(os.environ.get("AI_SCORING_STUB_LATENCY", "0"))
+# Share of the "stub" backend requests answered with a simulated rate limit error
+AI_SCORING_STUB_RATE_LIMIT = float(os.environ.get("AI_SCORING_STUB_RATE_LIMIT", "0"))
+
+# AI analysis jobs (see exposed_api/ai_jobs.py)
+# Worker threads run by each web process, 0 to rely only on the run_ai_analysis_workers command
+AI_ANALYSIS_LOCAL_WORKERS = int(os.environ.get("AI_ANALYSIS_LOCAL_WORKERS", "1"))
+# Seconds an idle worker waits before polling the job table again
+AI_ANALYSIS_POLL_INTERVAL = float(os.environ.get("AI_ANALYSIS_POLL_INTERVAL", "2"))
+# Seconds without heartbeat after which a processing job is considered abandoned and claimed again
+AI_ANALYSIS_STALE_AFTER = int(os.environ.get("AI_ANALYSIS_STALE_AFTER", "300"))
+# Seconds a finished job and its results are kept
+AI_ANALYSIS_JOB_TTL = int(os.environ.get("AI_ANALYSIS_JOB_TTL", "3600"))
+
+# Thread server-sent events (see messaging/broker.py)
+# Events kept per thread so reconnecting clients can resume from their Last-Event-ID
+MESSAGING_EVENT_BUFFER = int(os.environ.get("MESSAGING_EVENT_BUFFER", "200"))
+# Events queued for a slow client before its stream is closed (it resumes from the buffer on reconnect)
+MESSAGING_SUBSCRIBER_QUEUE = int(os.environ.get("MESSAGING_SUBSCRIBER_QUEUE", "100"))
+# Seconds without events after which a heartbeat comment is sent
+MESSAGING_SSE_KEEPALIVE = float(os.environ.get("MESSAGING_SSE_KEEPALIVE", "15"))
+
+# Typing and online status (see messaging/presence.py), kept in a Django cache that must be shared
+# (e.g. Redis) for every process to see the same presence
+MESSAGING_PRESENCE_CACHE = os.environ.get("MESSAGING_PRESENCE_CACHE", "default")
+# Seconds a user stays typing after their last typing update
+MESSAGING_TYPING_TTL = float(os.environ.get("MESSAGING_TYPING_TTL", "5"))
+# Seconds a Socket.IO connection stays online after its last event
+MESSAGING_ONLINE_TTL = float(os.environ.get("MESSAGING_ONLINE_TTL", "300"))
+
+# Socket.IO client manager (see backend/socketio_manager.py)
+# "memory" for a single process, "sqlite" to share emits between the processes of one host,
+# "redis" to share them between hosts
+SOCKETIO_MANAGER = os.environ.get("SOCKETIO_MANAGER", "memory")
+SOCKETIO_CHANNEL = os.environ.get("SOCKETIO_CHANNEL", "socketio")
+SOCKETIO_REDIS_URL = os.environ.get("SOCKETIO_REDIS_URL", "redis://localhost:6379/0")
+SOCKETIO_SQLITE_PATH = os.environ.get("SOCKETIO_SQLITE_PATH", os.path.join(BASE_DIR, "spool", "socketio.sqlite3"))
+# Seconds between two reads of the SQLite channel by an idle process
+SOCKETIO_SQLITE_POLL_INTERVAL = float(os.environ.get("SOCKETIO_SQLITE_POLL_INTERVAL", "0.05"))
+
 # Logging configuration
 LOGGING = {
     "version": 1,
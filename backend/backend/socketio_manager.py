@@ -0,0 +1,122 @@
+"""
+Client managers of the Socket.IO server.
+
+With the default in-memory manager, rooms and emits only reach the clients connected to the
+process doing the emit. When several uvicorn workers serve Socket.IO, a pub/sub manager
+forwards every emit to every process, and each one delivers it to its own clients.
+SOCKETIO_MANAGER selects the manager:
+
+- "memory": single process, the python-socketio default
+- "sqlite": processes of one host sharing a SQLite file used as a message log, for
+  development and tests without any service to run
+- "redis": processes of any number of hosts sharing a Redis channel
+
+The websocket transport keeps a client on the process it connected to. Long-polling clients
+need sticky sessions in front of several workers.
+"""
+
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import socketio
+from django.conf import settings
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+# Seconds published messages are kept in the SQLite log, long enough for every process to read them
+SQLITE_RETENTION = 60
+# Messages published between two prunings of the SQLite log
+SQLITE_PRUNE_EVERY = 500
+
+
+class SQLitePubSubManager(AsyncPubSubManager):
+    """
+    Pub/sub manager using a SQLite file as a message log shared by the processes of a host.
+
+    Published messages are appended to a table. Every process polls the rows added since its
+    last read and prunes the rows older than SQLITE_RETENTION seconds from time to time.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, channel="socketio", poll_interval=0.05, write_only=False, logger=None):
+        """Use the log stored at `path`, created if needed."""
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._connection = None
+        self._lock = threading.Lock()
+        self._published = 0
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS socketio_messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, payload BLOB NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _insert(self, payload):
+        self._execute(
+            "INSERT INTO socketio_messages (channel, payload, created_at) VALUES (?, ?, ?)",
+            (self.channel, payload, time.time()),
+        )
+        self._published += 1
+        if self._published % SQLITE_PRUNE_EVERY == 0:
+            self._execute("DELETE FROM socketio_messages WHERE created_at < ?", (time.time() - SQLITE_RETENTION,))
+
+    async def _publish(self, data):
+        await asyncio.to_thread(self._insert, pickle.dumps(data))
+
+    async def _listen(self):
+        rows = await asyncio.to_thread(self._execute, "SELECT COALESCE(MAX(id), 0) FROM socketio_messages")
+        last_id = rows[0][0]
+        while True:
+            rows = await asyncio.to_thread(
+                self._execute,
+                "SELECT id, payload FROM socketio_messages WHERE id > ? AND channel = ? ORDER BY id",
+                (last_id, self.channel),
+            )
+            for row_id, payload in rows:
+                last_id = row_id
+                yield payload
+            if not rows:
+                await asyncio.sleep(self.poll_interval)
+
+
+def create_manager(write_only=False):
+    """
+    Client manager configured by SOCKETIO_MANAGER.
+
+    Args:
+        write_only: Only emit, for processes that do not serve Socket.IO clients themselves
+            (e.g. management commands)
+    """
+    kind = settings.SOCKETIO_MANAGER
+    if kind == "memory":
+        return socketio.AsyncManager()
+    if kind == "sqlite":
+        return SQLitePubSubManager(
+            settings.SOCKETIO_SQLITE_PATH,
+            channel=settings.SOCKETIO_CHANNEL,
+            poll_interval=settings.SOCKETIO_SQLITE_POLL_INTERVAL,
+            write_only=write_only,
+        )
+    if kind == "redis":
+        return socketio.AsyncRedisManager(
+            settings.SOCKETIO_REDIS_URL, channel=settings.SOCKETIO_CHANNEL, write_only=write_only
+        )
+    msg = f"Unknown SOCKETIO_MANAGER {kind!r}, expected memory, sqlite or redis"
+    raise ValueError(msg)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import DriveActivity, DriveFile, DriveFolder, DriveShare
+from .models import DriveActivity, DriveBlob, DriveFile, DriveFolder, DriveShare, DriveUploadSession, DriveUsage
 
 
 @admin.register(DriveFolder)
@@ -12,6 +12,15 @@ class DriveFolderAdmin(admin.ModelAdmin):
     raw_id_fields = ("startup", "parent", "created_by")
 
 
+@admin.register(DriveBlob)
+class DriveBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "size", "ref_count", "created_at", "released_at")
+    list_filter = ("created_at", "released_at")
+    search_fields = ("sha256", "name")
+    # Reference counts are maintained by drive/blobs.py
+    readonly_fields = ("sha256", "name", "size", "ref_count", "created_at", "released_at")
+
+
 @admin.register(DriveFile)
 class DriveFileAdmin(admin.ModelAdmin):
     list_display = (
@@ -27,7 +36,7 @@ class DriveFileAdmin(admin.ModelAdmin):
     list_filter = ("startup", "uploaded_at", "file_type", "is_archived")
     search_fields = ("name", "startup__name", "description")
     date_hierarchy = "uploaded_at"
-    raw_id_fields = ("startup", "folder", "uploaded_by")
+    raw_id_fields = ("startup", "folder", "uploaded_by", "blob")
     actions = ["archive_files", "unarchive_files"]
 
     def size_display(self, obj):
@@ -120,3 +129,21 @@ class DriveActivityAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         """Disable changing activities"""
         return False
+
+
+@admin.register(DriveUploadSession)
+class DriveUploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("name", "startup", "folder", "size", "created_by", "created_at", "expires_at")
+    list_filter = ("created_at", "expires_at")
+    search_fields = ("name", "startup__name", "created_by__email")
+    raw_id_fields = ("startup", "folder", "created_by")
+    # Sessions are driven by the chunks received (see drive/uploads.py)
+    readonly_fields = ("id", "size", "chunk_size", "sha256", "created_at", "expires_at")
+
+
+@admin.register(DriveUsage)
+class DriveUsageAdmin(admin.ModelAdmin):
+    list_display = ("startup", "file_count", "total_size", "archived_count", "archived_size")
+    search_fields = ("startup__name",)
+    # Maintained by database triggers on the drive files (see drive/usage.py)
+    readonly_fields = ("startup", "file_count", "total_size", "archived_count", "archived_size")
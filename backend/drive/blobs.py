@@ -0,0 +1,212 @@
+"""
+Content-addressed storage of drive file contents.
+
+Every distinct content is stored once in the media storage, as a blob named after its SHA-256
+under drive_blobs/, and shared by every drive file with the same bytes: the same pitch deck
+uploaded by five startups takes the space of one. The hash is computed while the content is
+streamed to a temporary file, which is then moved in place unless the blob already exists.
+
+`DriveBlob.ref_count` counts the drive files using a blob. `save_content` takes a reference
+on the new content of a file and releases its previous content, and deleting a drive file
+releases its blob (see init/signals.py). Blobs left without references are only deleted by
+`collect_garbage` after DRIVE_BLOB_GC_GRACE seconds, so that a content uploaded again in the
+meantime is reused instead of racing with its deletion. The foreign key from the drive files
+protects a blob still in use should a count ever be wrong.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, ProtectedError
+from django.utils import timezone
+
+from .models import DriveBlob
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIRECTORY = "drive_blobs"
+CHUNK_SIZE = 64 * 1024
+# Longest file extension kept in blob names, which only helps the media server guess content types
+MAX_EXTENSION_LENGTH = 10
+
+
+def _temp_directory():
+    path = default_storage.path(f"{BLOB_DIRECTORY}/tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def blob_name(sha256, filename=""):
+    """
+    Storage name of the blob of a content, keeping the extension of `filename`.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if len(extension) > MAX_EXTENSION_LENGTH or not extension[1:].isalnum():
+        extension = ""
+    return f"{BLOB_DIRECTORY}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def read_chunks(file):
+    """
+    Chunks of an open binary file, from its current position.
+    """
+    return iter(lambda: file.read(CHUNK_SIZE), b"")
+
+
+def store_blob(chunks, filename=""):
+    """
+    Store a content and take a reference on its blob.
+
+    Args:
+        chunks: Byte chunks of the content, e.g. `UploadedFile.chunks()`
+        filename: Name the content is uploaded under, for the extension of a new blob
+
+    Returns:
+        tuple: (DriveBlob, whether its content was written rather than already stored)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    descriptor, temp_path = tempfile.mkstemp(dir=_temp_directory())
+    try:
+        with os.fdopen(descriptor, "wb") as temp:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                temp.write(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return _commit_blob(temp_path, digest.hexdigest(), size, filename)
+
+
+def store_blob_file(path, filename="", sha256=None):
+    """
+    Store the content of a file of the media storage and take a reference on its blob, without copying it:
+    the file becomes the blob, or is removed when the blob already exists.
+
+    Args:
+        path: Path of the file, on the file system of the media storage
+        filename: Name the content is uploaded under, for the extension of a new blob
+        sha256: SHA-256 of the file when the caller already computed it
+
+    Returns:
+        tuple: (DriveBlob, whether its content was written rather than already stored)
+    """
+    if sha256 is None:
+        with open(path, "rb") as file:
+            sha256 = hashlib.file_digest(file, "sha256").hexdigest()
+    return _commit_blob(path, sha256, os.path.getsize(path), filename)
+
+
+def _commit_blob(temp_path, sha256, size, filename):
+    """Take a reference on the blob of a content held in a temporary file, moved in place or removed."""
+    try:
+        with transaction.atomic():
+            blob, created = DriveBlob.objects.get_or_create(
+                sha256=sha256, defaults={"name": blob_name(sha256, filename), "size": size, "ref_count": 1}
+            )
+            if not created:
+                DriveBlob.objects.filter(pk=sha256).update(ref_count=F("ref_count") + 1, released_at=None)
+                blob.ref_count += 1
+                blob.released_at = None
+
+        path = default_storage.path(blob.name)
+        # A new row may follow a collected blob whose file is not deleted yet, which must not be kept
+        written = created or not os.path.exists(path)
+        if written:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            temp_path = None
+        return blob, written
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+
+def release_blob(sha256):
+    """
+    Release a reference on a blob, which becomes collectable when it has no more references.
+    """
+    DriveBlob.objects.filter(pk=sha256, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+    DriveBlob.objects.filter(pk=sha256, ref_count=0, released_at=None).update(released_at=timezone.now())
+
+
+def save_content(drive_file, chunks):
+    """
+    Store a content as the content of a drive file and save the file, creating it if needed.
+
+    The previous content of the file is released, or deleted for a file stored before deduplication.
+
+    Returns:
+        tuple: (DriveBlob, whether its content was written rather than already stored)
+    """
+    previous_name = drive_file.file.name if drive_file.pk and drive_file.blob_id is None else None
+    return _attach(drive_file, *store_blob(chunks, drive_file.name), previous_name)
+
+
+def save_content_file(drive_file, path, sha256=None):
+    """
+    Like `save_content`, with a content already written to a file of the media storage, which is moved
+    to the blob store or removed (see `store_blob_file`).
+    """
+    previous_name = drive_file.file.name if drive_file.pk and drive_file.blob_id is None else None
+    return _attach(drive_file, *store_blob_file(path, drive_file.name, sha256), previous_name)
+
+
+def _attach(drive_file, blob, written, previous_name):
+    previous_blob = drive_file.blob_id
+    try:
+        with transaction.atomic():
+            drive_file.blob = blob
+            drive_file.file.name = blob.name
+            drive_file.size = blob.size
+            drive_file.content_hash = blob.sha256
+            drive_file.save()
+            if previous_blob is not None:
+                release_blob(previous_blob)
+    except Exception:
+        release_blob(blob.sha256)
+        raise
+
+    if previous_name and previous_name != blob.name:
+        default_storage.delete(previous_name)
+    return blob, written
+
+
+def collect_garbage(grace=None):
+    """
+    Delete the blobs unreferenced for more than `grace` seconds (DRIVE_BLOB_GC_GRACE by default),
+    and the temporary files of uploads interrupted for as long.
+
+    Returns:
+        tuple: (number of deleted blobs, bytes reclaimed)
+    """
+    grace = settings.DRIVE_BLOB_GC_GRACE if grace is None else grace
+    deleted = reclaimed = 0
+    expired = DriveBlob.objects.filter(ref_count=0, released_at__lt=timezone.now() - timezone.timedelta(seconds=grace))
+    for blob in expired.iterator():
+        try:
+            # Only if it was not referenced again in the meantime. The file is deleted before the deletion of
+            # the row is committed, so that a content uploaded again right after is written anew.
+            with transaction.atomic():
+                count, _ = DriveBlob.objects.filter(pk=blob.pk, ref_count=0).delete()
+                if count:
+                    default_storage.delete(blob.name)
+        except ProtectedError:
+            logger.warning(f"Blob {blob.sha256} has no reference count but is used by drive files, skipped")
+            continue
+        if count:
+            deleted += 1
+            reclaimed += blob.size
+
+    temp_directory = _temp_directory()
+    for entry in os.scandir(temp_directory):
+        if entry.is_file() and entry.stat().st_mtime < time.time() - grace:
+            os.remove(entry.path)
+    return deleted, reclaimed
@@ -0,0 +1,212 @@
+"""
+Batch operations on drive files and folders.
+
+Reorganizing a drive touches hundreds of items at once: `apply` moves, archives, restores,
+deletes or shares lists of files and folders in one transaction, with one `bulk_update`,
+delete or `bulk_create` per model and a single `bulk_create` of the activities, instead of a
+request, a save and an activity insert per item. Items are all checked first, and those that
+cannot be changed (not found, name already taken in the target folder...) are reported in
+the results without failing the others.
+
+Moved folders are still saved one by one, as saving a folder refreshes the materialized paths
+of its whole subtree.
+"""
+
+import secrets
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DriveActivity, DriveFile, DriveFolder, DriveShare
+
+OPERATIONS = ("move", "archive", "restore", "delete", "share")
+# Most files plus folders in one request
+MAX_ITEMS = 500
+
+
+def _result(kind, item_id, error=None, **extra):
+    result = {"type": kind, "id": item_id, "success": error is None, **extra}
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+def apply(operation, user, files, folders, ip_address=None, **options):
+    """
+    Apply an operation to files and folders in one transaction.
+
+    Args:
+        operation: One of OPERATIONS
+        user: User applying the operation, recorded in the activities
+        files: (id, DriveFile) pairs of the requested files, with None for the files not found
+        folders: (id, DriveFolder) pairs of the requested folders, with None for the folders not found
+        ip_address: IP address of the user
+        **options: `target` folder (None for the root) of a move, `expires_at` date of shares
+
+    Returns:
+        list: One result per file then per folder, in the requested order, with the type and id of the
+            item, whether it succeeded and an error message if not, and the share created for `share`
+    """
+    results = {("file", item_id): _result("file", item_id, "Not found") for item_id, item in files if item is None}
+    results.update(
+        {("folder", item_id): _result("folder", item_id, "Not found") for item_id, item in folders if item is None}
+    )
+    order = [("file", item_id) for item_id, _ in files] + [("folder", item_id) for item_id, _ in folders]
+    files = [item for _, item in files if item is not None]
+    folders = [item for _, item in folders if item is not None]
+
+    activities = []
+
+    def log(item, action, details, attach=True):
+        """Record the activity of an item, attached to it unless it is deleted."""
+        is_file = isinstance(item, DriveFile)
+        activities.append(
+            DriveActivity(
+                startup_id=item.startup_id,
+                user=user,
+                file=item if attach and is_file else None,
+                folder=item if attach and not is_file else None,
+                action=action,
+                details=details,
+                ip_address=ip_address,
+            )
+        )
+
+    with transaction.atomic():
+        if operation == "move":
+            item_results = _move(files, folders, options.get("target"), log)
+        elif operation == "delete":
+            item_results = _delete(files, folders, log)
+        elif operation == "share":
+            item_results = _share(user, files, folders, options.get("expires_at"), log)
+        else:
+            item_results = _set_archived(files, folders, operation == "archive", log)
+        DriveActivity.objects.bulk_create(activities)
+
+    results.update(((result["type"], result["id"]), result) for result in item_results)
+    return [results[key] for key in order]
+
+
+def _move(files, folders, target, log):
+    """Move files and folders to a folder, or to the root of their drive when `target` is None."""
+    results = []
+    target_id = target.id if target else None
+    now = timezone.now()
+
+    # Names already taken in the target folder, per startup when moving to the roots
+    startups = {item.startup_id for item in [*files, *folders]}
+    taken_files = set(
+        DriveFile.objects.filter(startup_id__in=startups, folder_id=target_id)
+        .exclude(pk__in=[file_obj.pk for file_obj in files])
+        .values_list("startup_id", "name")
+    )
+    taken_folders = set(
+        DriveFolder.objects.filter(startup_id__in=startups, parent_id=target_id)
+        .exclude(pk__in=[folder.pk for folder in folders])
+        .values_list("startup_id", "name")
+    )
+
+    moved = []
+    for file_obj in files:
+        if target and file_obj.startup_id != target.startup_id:
+            results.append(_result("file", file_obj.id, "The target folder belongs to another startup"))
+            continue
+        if file_obj.folder_id != target_id:
+            if (file_obj.startup_id, file_obj.name) in taken_files:
+                error = f'A file with the name "{file_obj.name}" already exists in this folder'
+                results.append(_result("file", file_obj.id, error))
+                continue
+            log(file_obj, "move", {"old_folder": file_obj.folder_id, "new_folder": target_id})
+            file_obj.folder_id, file_obj.last_modified = target_id, now
+            moved.append(file_obj)
+        taken_files.add((file_obj.startup_id, file_obj.name))
+        results.append(_result("file", file_obj.id))
+    DriveFile.objects.bulk_update(moved, ["folder", "last_modified"])
+
+    refresh = False
+    for folder in folders:
+        if refresh:
+            # The paths of the subtree of a moved folder have changed
+            folder.refresh_from_db(fields=["tree_path", "full_path", "depth"])
+            if target:
+                target.refresh_from_db(fields=["tree_path", "full_path", "depth"])
+        if target and folder.startup_id != target.startup_id:
+            results.append(_result("folder", folder.id, "The target folder belongs to another startup"))
+            continue
+        if target and target.is_descendant_of(folder):
+            results.append(_result("folder", folder.id, "A folder cannot be moved into itself or its subfolders."))
+            continue
+        if folder.parent_id != target_id:
+            if (folder.startup_id, folder.name) in taken_folders:
+                error = f'A folder with the name "{folder.name}" already exists in this folder'
+                results.append(_result("folder", folder.id, error))
+                continue
+            log(folder, "move", {"old_parent": folder.parent_id, "new_parent": target_id})
+            folder.parent = target
+            folder.save()
+            refresh = True
+        taken_folders.add((folder.startup_id, folder.name))
+        results.append(_result("folder", folder.id))
+    return results
+
+
+def _set_archived(files, folders, archived, log):
+    """Archive or restore files, folders cannot be archived."""
+    results = [
+        _result("folder", folder.id, f"Folders cannot be {'archived' if archived else 'restored'}")
+        for folder in folders
+    ]
+    now = timezone.now()
+    for file_obj in files:
+        file_obj.is_archived, file_obj.last_modified = archived, now
+        if archived:
+            log(file_obj, "delete", {"archived": True})
+        else:
+            log(file_obj, "restore", None)
+        results.append(_result("file", file_obj.id))
+    DriveFile.objects.bulk_update(files, ["is_archived", "last_modified"])
+    return results
+
+
+def _delete(files, folders, log):
+    """Permanently delete files and folders, the files of deleted folders are moved to the root."""
+    results = []
+    for file_obj in files:
+        log(file_obj, "delete", {"file_name": file_obj.name, "file_id": file_obj.id, "permanent": True}, attach=False)
+        results.append(_result("file", file_obj.id))
+    for folder in folders:
+        log(folder, "delete", {"folder_name": folder.name, "folder_id": folder.id}, attach=False)
+        results.append(_result("folder", folder.id))
+
+    # Shared contents are released when the files are deleted (see init/signals.py)
+    legacy = [file_obj.file.name for file_obj in files if file_obj.blob_id is None]
+    DriveFile.objects.filter(pk__in=[file_obj.pk for file_obj in files]).delete()
+    DriveFolder.objects.filter(pk__in=[folder.pk for folder in folders]).delete()
+    transaction.on_commit(lambda: [default_storage.delete(name) for name in legacy])
+    return results
+
+
+def _share(user, files, folders, expires_at, log):
+    """Create a share of every file and folder."""
+    shares = [
+        DriveShare(file=file_obj, shared_by=user, access_token=secrets.token_urlsafe(32), expires_at=expires_at)
+        for file_obj in files
+    ]
+    shares += [
+        DriveShare(folder=folder, shared_by=user, access_token=secrets.token_urlsafe(32), expires_at=expires_at)
+        for folder in folders
+    ]
+    DriveShare.objects.bulk_create(shares)
+
+    results = []
+    for share in shares:
+        item, kind = (share.file, "file") if share.file else (share.folder, "folder")
+        details = {
+            "item_type": kind,
+            "item_id": item.id,
+            "expires_at": expires_at.isoformat() if expires_at else None,
+        }
+        log(item, "share", details)
+        results.append(_result(kind, item.id, share_id=share.id, access_token=share.access_token))
+    return results
@@ -0,0 +1,209 @@
+"""
+Conditional and partial HTTP responses for drive file downloads.
+
+Downloads carry a strong ETag made of the SHA-256 of the file content, stored on the file
+(and computed on first download for files stored before it existed), and a Last-Modified
+date. `If-None-Match` and `If-Modified-Since` answer 304, `If-Match` and
+`If-Unmodified-Since` 412, with the semantics of Django's conditional view processing.
+
+`Range` requests get a 206 with one range, or a multipart/byteranges body with several,
+unless an `If-Range` validator no longer matches, in which case the whole file is sent.
+Unsatisfiable ranges answer 416. Whole files are sent with a `FileResponse`, which WSGI
+servers hand over to `sendfile`.
+
+When DRIVE_ACCEL_REDIRECT_PREFIX is set, validated downloads are offloaded to nginx with an
+`X-Accel-Redirect` to the file under that internal location, which then serves the bytes
+and the ranges itself.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import secrets
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+# Range requests with more ranges are answered with the whole file
+MAX_RANGES = 16
+
+RANGE_SPEC_PATTERN = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def hash_chunks(chunks):
+    """
+    SHA-256 hex digest of a sequence of byte chunks.
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ensure_content_hash(drive_file):
+    """
+    Content hash of a drive file, computed and stored if it is missing.
+    """
+    if not drive_file.content_hash:
+        with open(drive_file.file.path, "rb") as file:
+            drive_file.content_hash = hash_chunks(iter(lambda: file.read(CHUNK_SIZE), b""))
+        type(drive_file).objects.filter(pk=drive_file.pk).update(content_hash=drive_file.content_hash)
+    return drive_file.content_hash
+
+
+def parse_ranges(header, size):
+    """
+    Byte ranges requested by a Range header, as sorted (first, last) inclusive offsets with
+    overlapping and adjacent ranges merged.
+
+    Returns:
+        list: The satisfiable ranges, empty when none is, or None when the header must be ignored
+            (other unit, invalid syntax or too many ranges)
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_SPEC_PATTERN.match(spec)
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if not first:
+            # Suffix range: the last bytes of the file
+            if int(last) > 0 and size > 0:
+                ranges.append((max(0, size - int(last)), size - 1))
+            continue
+        if last and int(last) < int(first):
+            return None
+        if int(first) < size:
+            ranges.append((int(first), min(int(last), size - 1) if last else size - 1))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _if_range_passes(request, etag, last_modified):
+    """Whether the ranges of a request apply, the If-Range validator matching the current file."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        # Only strong validators can be used for ranges
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_ranges(path, ranges, part_headers=None):
+    """Yield the bytes of some ranges of a file, each preceded by its multipart header if any."""
+    with open(path, "rb") as file:
+        for index, (first, last) in enumerate(ranges):
+            if part_headers:
+                yield part_headers[index]
+            file.seek(first)
+            remaining = last - first + 1
+            while remaining > 0:
+                chunk = file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+        if part_headers:
+            yield part_headers[-1]
+
+
+def _partial_response(path, ranges, size, content_type):
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        response = StreamingHttpResponse(_read_ranges(path, ranges), status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+        response["Content-Length"] = last - first + 1
+        return response
+
+    boundary = secrets.token_hex(16)
+    part_headers = []
+    for first, last in ranges:
+        # Every part but the first starts on a new line after the data of the previous one
+        separator = "\r\n" if part_headers else ""
+        part_headers.append(
+            f"{separator}--{boundary}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Range: bytes {first}-{last}/{size}\r\n\r\n".encode()
+        )
+    part_headers.append(f"\r\n--{boundary}--\r\n".encode())
+    response = StreamingHttpResponse(
+        _read_ranges(path, ranges, part_headers),
+        status=206,
+        content_type=f"multipart/byteranges; boundary={boundary}",
+    )
+    response["Content-Length"] = sum(map(len, part_headers)) + sum(last - first + 1 for first, last in ranges)
+    return response
+
+
+def is_new_download(response):
+    """
+    Whether a download response sends the file from its start, as opposed to revalidating it or resuming or
+    seeking in a download, so that a download is only logged once.
+    """
+    if response.status_code == 200:
+        return True
+    return response.status_code == 206 and response.ranges[0][0] == 0
+
+
+def serve_file(request, drive_file):
+    """
+    Response downloading a drive file as an attachment, honoring the conditional and Range
+    headers of the request.
+
+    The `ranges` attribute of the response holds the served byte ranges, None for the whole file.
+    """
+    path = drive_file.file.path
+    size = os.path.getsize(path)
+    content_type = mimetypes.guess_type(drive_file.name)[0] or "application/octet-stream"
+    etag = f'"{ensure_content_hash(drive_file)}"'
+    last_modified = int(drive_file.last_modified.timestamp())
+
+    validators = HttpResponse()
+    validators["ETag"] = etag
+    validators["Last-Modified"] = http_date(last_modified)
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified, response=validators)
+    if conditional is not validators:
+        conditional.ranges = None
+        return conditional
+
+    prefix = settings.DRIVE_ACCEL_REDIRECT_PREFIX
+    ranges = None
+    if prefix:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = f"{prefix.rstrip('/')}/{quote(drive_file.file.name)}"
+    else:
+        header = request.headers.get("Range")
+        if header and _if_range_passes(request, etag, last_modified):
+            ranges = parse_ranges(header, size)
+        if ranges == []:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+        elif ranges:
+            response = _partial_response(path, ranges, size, content_type)
+        else:
+            response = FileResponse(open(path, "rb"), content_type=content_type)  # noqa: SIM115
+            response.block_size = CHUNK_SIZE
+
+    response.ranges = ranges or None
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Content-Disposition"] = content_disposition_header(True, drive_file.name)
+    return response
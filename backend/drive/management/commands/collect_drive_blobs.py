@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from drive.blobs import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Delete the drive contents that no file has used for the grace period (DRIVE_BLOB_GC_GRACE by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace", type=int, default=None, help="Seconds a content must have been unused")
+
+    def handle(self, *args, **options):
+        deleted, reclaimed = collect_garbage(options["grace"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unused contents, reclaimed {reclaimed} bytes"))
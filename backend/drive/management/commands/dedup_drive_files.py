@@ -0,0 +1,64 @@
+import hashlib
+import os
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from drive.blobs import read_chunks, save_content
+from drive.models import DriveFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the drive files stored before deduplication to the content-addressed store, storing each distinct "
+        "content once, and report the space reclaimed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only hash the files and report the space that would be reclaimed"
+        )
+
+    def handle(self, *args, **options):
+        files = DriveFile.objects.filter(blob__isnull=True).order_by("pk")
+        if options["dry_run"]:
+            self.report_duplicates(files)
+            return
+
+        converted = missing = before = after = 0
+        for drive_file in files.iterator():
+            path = drive_file.file.path
+            if not os.path.exists(path):
+                missing += 1
+                self.stderr.write(f"Missing content for drive file {drive_file.pk} at {path}")
+                continue
+            before += os.path.getsize(path)
+            with open(path, "rb") as file:
+                blob, written = save_content(drive_file, read_chunks(file))
+            converted += 1
+            if written:
+                after += blob.size
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Converted {converted} files ({missing} missing): {before} bytes before, {after} bytes of new "
+                f"contents, {before - after} bytes reclaimed"
+            )
+        )
+
+    def report_duplicates(self, files):
+        sizes = defaultdict(list)
+        for drive_file in files.iterator():
+            path = drive_file.file.path
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as file:
+                digest = hashlib.file_digest(file, "sha256").hexdigest()
+            sizes[digest].append(os.path.getsize(path))
+
+        before = sum(sum(group) for group in sizes.values())
+        after = sum(group[0] for group in sizes.values())
+        self.stdout.write(
+            f"{sum(map(len, sizes.values()))} files, {len(sizes)} distinct contents: {before} bytes would become "
+            f"{after} bytes, {before - after} bytes reclaimable (not counting contents already deduplicated)"
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from drive.uploads import expire_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete the resumable drive uploads that received no chunk for DRIVE_UPLOAD_SESSION_TTL seconds"
+
+    def handle(self, *args, **options):
+        deleted = expire_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} abandoned uploads"))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+def fill_tree_paths(apps, schema_editor):
+    """Compute the materialized paths of the existing folders, parents first"""
+    DriveFolder = apps.get_model("drive", "DriveFolder")
+    folders = {folder.pk: folder for folder in DriveFolder.objects.all()}
+    children = {}
+    for folder in folders.values():
+        children.setdefault(folder.parent_id, []).append(folder)
+
+    pending = [(folder, None) for folder in children.get(None, [])]
+    while pending:
+        folder, parent = pending.pop()
+        folder.tree_path = f"{parent.tree_path}{folder.pk}/" if parent else f"/{folder.pk}/"
+        folder.full_path = f"{parent.full_path}/{folder.name}" if parent else folder.name
+        folder.depth = parent.depth + 1 if parent else 0
+        pending.extend((child, folder) for child in children.get(folder.pk, []))
+
+    DriveFolder.objects.bulk_update(folders.values(), ["tree_path", "full_path", "depth"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("drive", "0002_alter_driveactivity_action"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="drivefolder",
+            name="depth",
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Number of ancestors"),
+        ),
+        migrations.AddField(
+            model_name="drivefolder",
+            name="full_path",
+            field=models.TextField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="Names of the ancestors and of the folder joined by '/'",
+            ),
+        ),
+        migrations.AddField(
+            model_name="drivefolder",
+            name="tree_path",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="Ids of the ancestors and of the folder itself, like '/3/12/'",
+                max_length=1024,
+            ),
+        ),
+        migrations.RunPython(fill_tree_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("drive", "0003_folder_tree_paths"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="drivefile",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="SHA-256 of the content, empty until computed",
+                max_length=64,
+            ),
+        ),
+    ]
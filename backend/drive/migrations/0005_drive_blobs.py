@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("drive", "0004_drivefile_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriveBlob",
+            fields=[
+                (
+                    "sha256",
+                    models.CharField(
+                        help_text="SHA-256 of the content", max_length=64, primary_key=True, serialize=False
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Name of the content in the media storage", max_length=255, unique=True
+                    ),
+                ),
+                ("size", models.PositiveBigIntegerField(help_text="Size of the content in bytes")),
+                (
+                    "ref_count",
+                    models.PositiveIntegerField(default=0, help_text="Number of drive files using this content"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, help_text="When the content was first stored")),
+                (
+                    "released_at",
+                    models.DateTimeField(
+                        blank=True, help_text="When the last drive file using this content released it", null=True
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["ref_count", "released_at"], name="drive_blob_unreferenced_idx")],
+            },
+        ),
+        migrations.AddField(
+            model_name="drivefile",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Shared content of the file (null for files stored before deduplication)",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="files",
+                to="drive.driveblob",
+            ),
+        ),
+    ]
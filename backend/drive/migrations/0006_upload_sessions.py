@@ -0,0 +1,94 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:35
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin_panel", "0001_initial"),
+        ("drive", "0005_drive_blobs"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriveUploadSession",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("name", models.CharField(help_text="Name of the file with extension", max_length=255)),
+                ("description", models.TextField(blank=True, help_text="Optional description of the file", null=True)),
+                ("size", models.PositiveBigIntegerField(help_text="Size of the file in bytes")),
+                ("chunk_size", models.PositiveIntegerField(help_text="Size of every chunk but the last one in bytes")),
+                (
+                    "sha256",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="Expected SHA-256 of the file, checked on completion if set",
+                        max_length=64,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, help_text="When the upload was started")),
+                (
+                    "expires_at",
+                    models.DateTimeField(db_index=True, help_text="When the upload is abandoned without new chunks"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        help_text="User uploading the file",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="drive_uploads",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "folder",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Folder the file is uploaded to (null for root files)",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="uploads",
+                        to="drive.drivefolder",
+                    ),
+                ),
+                (
+                    "startup",
+                    models.ForeignKey(
+                        help_text="The startup the file is uploaded to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="drive_uploads",
+                        to="admin_panel.startupdetail",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DriveUploadChunk",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("index", models.PositiveIntegerField(help_text="Position of the chunk in the file, from 0")),
+                ("size", models.PositiveIntegerField(help_text="Size of the chunk in bytes")),
+                ("sha256", models.CharField(help_text="SHA-256 of the chunk", max_length=64)),
+                ("received_at", models.DateTimeField(auto_now=True, help_text="When the chunk was received")),
+                (
+                    "session",
+                    models.ForeignKey(
+                        help_text="The upload the chunk belongs to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="drive.driveuploadsession",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["index"],
+                "unique_together": {("session", "index")},
+            },
+        ),
+    ]
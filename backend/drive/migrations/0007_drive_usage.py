@@ -0,0 +1,85 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+USAGE_TABLE = "drive_driveusage"
+FILE_TABLE = "drive_drivefile"
+
+
+def change_usage(row, sign):
+    """Statement adding (sign "+") or removing (sign "-") a file row of a trigger to the usage of its startup."""
+    return (
+        f"UPDATE {USAGE_TABLE} SET file_count = file_count {sign} 1, total_size = total_size {sign} {row}.size, "
+        f"archived_count = archived_count {sign} {row}.is_archived, "
+        f"archived_size = archived_size {sign} {row}.is_archived * {row}.size "
+        f"WHERE startup_id = {row}.startup_id;"
+    )
+
+
+# The usage of a startup is created with its first file, files deleted with their startup leave it alone
+ENSURE_USAGE = (
+    f"INSERT OR IGNORE INTO {USAGE_TABLE}(startup_id, file_count, total_size, archived_count, archived_size) "
+    "VALUES (new.startup_id, 0, 0, 0, 0);"
+)
+
+CREATE_SQL = [
+    f"CREATE TRIGGER {USAGE_TABLE}_insert AFTER INSERT ON {FILE_TABLE} BEGIN "
+    f"{ENSURE_USAGE} {change_usage('new', '+')} END",
+    f"CREATE TRIGGER {USAGE_TABLE}_delete AFTER DELETE ON {FILE_TABLE} BEGIN {change_usage('old', '-')} END",
+    f"CREATE TRIGGER {USAGE_TABLE}_update AFTER UPDATE OF startup_id, size, is_archived ON {FILE_TABLE} "
+    "WHEN old.startup_id != new.startup_id OR old.size != new.size OR old.is_archived != new.is_archived BEGIN "
+    f"{change_usage('old', '-')} {ENSURE_USAGE} {change_usage('new', '+')} END",
+    # Count the existing files
+    f"INSERT INTO {USAGE_TABLE}(startup_id, file_count, total_size, archived_count, archived_size) "
+    "SELECT startup_id, COUNT(*), SUM(size), SUM(is_archived), SUM(is_archived * size) "
+    f"FROM {FILE_TABLE} GROUP BY startup_id",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {USAGE_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {USAGE_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {USAGE_TABLE}_insert",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("admin_panel", "0001_initial"),
+        ("drive", "0006_upload_sessions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriveUsage",
+            fields=[
+                (
+                    "startup",
+                    models.OneToOneField(
+                        help_text="The startup whose drive this is",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="drive_usage",
+                        serialize=False,
+                        to="admin_panel.startupdetail",
+                    ),
+                ),
+                (
+                    "file_count",
+                    models.PositiveIntegerField(default=0, help_text="Number of files, archived ones included"),
+                ),
+                (
+                    "total_size",
+                    models.PositiveBigIntegerField(
+                        default=0, help_text="Size of the files in bytes, archived ones included"
+                    ),
+                ),
+                ("archived_count", models.PositiveIntegerField(default=0, help_text="Number of archived files")),
+                (
+                    "archived_size",
+                    models.PositiveBigIntegerField(default=0, help_text="Size of the archived files in bytes"),
+                ),
+            ],
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
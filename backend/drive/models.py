@@ -1,5 +1,9 @@
+import uuid
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils import timezone
 
 from admin_panel.models import StartupDetail
@@ -34,6 +38,19 @@ class DriveFolder(models.Model):
         related_name="created_folders",
         help_text="User who created the folder",
     )
+    # Materialized tree, maintained by save() for the folder and its whole subtree
+    tree_path = models.CharField(
+        max_length=1024,
+        blank=True,
+        default="",
+        editable=False,
+        db_index=True,
+        help_text="Ids of the ancestors and of the folder itself, like '/3/12/'",
+    )
+    full_path = models.TextField(
+        blank=True, default="", editable=False, help_text="Names of the ancestors and of the folder joined by '/'"
+    )
+    depth = models.PositiveIntegerField(default=0, editable=False, help_text="Number of ancestors")
 
     class Meta:
         unique_together = ("startup", "parent", "name")  # Prevent duplicate folder names within the same parent
@@ -43,9 +60,53 @@ class DriveFolder(models.Model):
         """Return string representation of the folder"""
         return f"{self.name} ({self.startup.name})"
 
+    def save(self, *args, **kwargs):
+        """Save the folder and refresh the materialized paths of its subtree when it is created, moved or renamed"""
+        previous = None
+        if self.pk:
+            previous = DriveFolder.objects.filter(pk=self.pk).values("tree_path", "full_path", "depth").first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            parent = self.parent
+            tree_path = f"{parent.tree_path}{self.pk}/" if parent else f"/{self.pk}/"
+            full_path = f"{parent.full_path}/{self.name}" if parent else self.name
+            depth = parent.depth + 1 if parent else 0
+            if previous == {"tree_path": tree_path, "full_path": full_path, "depth": depth}:
+                return
+
+            if previous and previous["tree_path"]:
+                DriveFolder.objects.filter(tree_path__startswith=previous["tree_path"]).exclude(pk=self.pk).update(
+                    tree_path=Concat(
+                        Value(tree_path),
+                        Substr("tree_path", len(previous["tree_path"]) + 1),
+                        output_field=models.CharField(),
+                    ),
+                    full_path=Concat(
+                        Value(full_path),
+                        Substr("full_path", len(previous["full_path"]) + 1),
+                        output_field=models.TextField(),
+                    ),
+                    depth=F("depth") + (depth - previous["depth"]),
+                )
+            DriveFolder.objects.filter(pk=self.pk).update(tree_path=tree_path, full_path=full_path, depth=depth)
+            self.tree_path, self.full_path, self.depth = tree_path, full_path, depth
+
+    def get_descendants(self, include_self=True):
+        """Returns the folders of the subtree rooted at this folder in a single query"""
+        queryset = DriveFolder.objects.filter(tree_path__startswith=self.tree_path)
+        return queryset if include_self else queryset.exclude(pk=self.pk)
+
+    def is_descendant_of(self, folder):
+        """Returns whether this folder is the given folder or one of its subfolders"""
+        return self.tree_path.startswith(folder.tree_path)
+
     @property
     def path(self):
         """Returns the full path of the folder"""
+        if self.full_path:
+            return self.full_path
         if self.parent:
             return f"{self.parent.path}/{self.name}"
         return self.name
@@ -54,6 +115,28 @@ class DriveFolder(models.Model):
         return f"/drive/folder/{self.id}/"
 
 
+class DriveBlob(models.Model):
+    """
+    Content of drive files stored once per distinct content, named after its SHA-256 (see drive/blobs.py).
+    """
+
+    sha256 = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the content")
+    name = models.CharField(max_length=255, unique=True, help_text="Name of the content in the media storage")
+    size = models.PositiveBigIntegerField(help_text="Size of the content in bytes")
+    ref_count = models.PositiveIntegerField(default=0, help_text="Number of drive files using this content")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the content was first stored")
+    released_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the last drive file using this content released it"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["ref_count", "released_at"], name="drive_blob_unreferenced_idx")]
+
+    def __str__(self):
+        """Return string representation of the blob"""
+        return f"{self.sha256[:12]} ({self.ref_count} references)"
+
+
 class DriveFile(models.Model):
     """
     Represents a file stored in the startup's drive system.
@@ -77,6 +160,17 @@ class DriveFile(models.Model):
     file = models.FileField(upload_to="drive_files/%Y/%m/%d/", help_text="The actual file content")
     size = models.PositiveBigIntegerField(help_text="Size of the file in bytes")
     file_type = models.CharField(max_length=100, help_text="MIME type of the file")
+    content_hash = models.CharField(
+        max_length=64, blank=True, default="", editable=False, help_text="SHA-256 of the content, empty until computed"
+    )
+    blob = models.ForeignKey(
+        DriveBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="files",
+        help_text="Shared content of the file (null for files stored before deduplication)",
+    )
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -113,6 +207,30 @@ class DriveFile(models.Model):
         return f"/drive/file/{self.id}/"
 
 
+class DriveUsage(models.Model):
+    """
+    Storage used by the drive of a startup, maintained by database triggers on the drive files (see drive/usage.py).
+    """
+
+    startup = models.OneToOneField(
+        StartupDetail,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="drive_usage",
+        help_text="The startup whose drive this is",
+    )
+    file_count = models.PositiveIntegerField(default=0, help_text="Number of files, archived ones included")
+    total_size = models.PositiveBigIntegerField(
+        default=0, help_text="Size of the files in bytes, archived ones included"
+    )
+    archived_count = models.PositiveIntegerField(default=0, help_text="Number of archived files")
+    archived_size = models.PositiveBigIntegerField(default=0, help_text="Size of the archived files in bytes")
+
+    def __str__(self):
+        """Return string representation of the usage"""
+        return f"{self.total_size} bytes in {self.file_count} files ({self.startup_id})"
+
+
 class DriveShare(models.Model):
     """
     Represents a file or folder share with limited access.
@@ -237,3 +355,78 @@ class DriveActivity(models.Model):
     def __str__(self):
         """Return string representation of the activity"""
         return f"{self.get_action_display()} by {self.user} on {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+
+class DriveUploadSession(models.Model):
+    """
+    Resumable upload of a drive file sent in chunks (see drive/uploads.py).
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    startup = models.ForeignKey(
+        StartupDetail,
+        on_delete=models.CASCADE,
+        related_name="drive_uploads",
+        help_text="The startup the file is uploaded to",
+    )
+    folder = models.ForeignKey(
+        DriveFolder,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="uploads",
+        help_text="Folder the file is uploaded to (null for root files)",
+    )
+    name = models.CharField(max_length=255, help_text="Name of the file with extension")
+    description = models.TextField(null=True, blank=True, help_text="Optional description of the file")
+    size = models.PositiveBigIntegerField(help_text="Size of the file in bytes")
+    chunk_size = models.PositiveIntegerField(help_text="Size of every chunk but the last one in bytes")
+    sha256 = models.CharField(
+        max_length=64, blank=True, default="", help_text="Expected SHA-256 of the file, checked on completion if set"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="drive_uploads",
+        help_text="User uploading the file",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the upload was started")
+    expires_at = models.DateTimeField(db_index=True, help_text="When the upload is abandoned without new chunks")
+
+    def __str__(self):
+        """Return string representation of the upload"""
+        return f"Upload of {self.name} ({self.startup.name})"
+
+    @property
+    def chunk_count(self):
+        """Returns the number of chunks of the file"""
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        """Returns the size of a chunk in bytes"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class DriveUploadChunk(models.Model):
+    """
+    Chunk received for a resumable upload.
+    """
+
+    session = models.ForeignKey(
+        DriveUploadSession,
+        on_delete=models.CASCADE,
+        related_name="chunks",
+        help_text="The upload the chunk belongs to",
+    )
+    index = models.PositiveIntegerField(help_text="Position of the chunk in the file, from 0")
+    size = models.PositiveIntegerField(help_text="Size of the chunk in bytes")
+    sha256 = models.CharField(max_length=64, help_text="SHA-256 of the chunk")
+    received_at = models.DateTimeField(auto_now=True, help_text="When the chunk was received")
+
+    class Meta:
+        unique_together = ("session", "index")
+        ordering = ["index"]
+
+    def __str__(self):
+        """Return string representation of the chunk"""
+        return f"Chunk {self.index} of {self.session_id}"
@@ -1,6 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from .models import DriveActivity, DriveFile, DriveFolder, DriveShare
+from .bulk import MAX_ITEMS, OPERATIONS
+from .models import DriveActivity, DriveFile, DriveFolder, DriveShare, DriveUploadSession
 
 
 class DriveFolderSerializer(serializers.ModelSerializer):
@@ -26,13 +28,22 @@ class DriveFolderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["created_at", "path", "download_url"]
 
+    def validate(self, attrs):
+        """Prevent moving a folder into itself or one of its subfolders"""
+        parent = attrs.get("parent")
+        if self.instance is not None and parent is not None and parent.is_descendant_of(self.instance):
+            raise serializers.ValidationError({"parent": "A folder cannot be moved into itself or its subfolders."})
+        return attrs
+
     def get_subfolders_count(self, obj):
         """Get the number of subfolders"""
-        return obj.subfolders.count()
+        count = getattr(obj, "subfolder_total", None)
+        return obj.subfolders.count() if count is None else count
 
     def get_files_count(self, obj):
         """Get the number of files in this folder"""
-        return obj.files.count()
+        count = getattr(obj, "file_total", None)
+        return obj.files.count() if count is None else count
 
     def get_download_url(self, obj):
         """Get the download URL for the folder"""
@@ -263,3 +274,79 @@ class FileUploadSerializer(serializers.Serializer):
         if value.size > 50 * 1024 * 1024:
             raise serializers.ValidationError("File size cannot exceed 50MB")
         return value
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Serializer starting a resumable upload"""
+
+    name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    folder = serializers.PrimaryKeyRelatedField(queryset=DriveFolder.objects.all(), required=False, allow_null=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    sha256 = serializers.RegexField(r"^[0-9a-fA-F]{64}$", required=False, allow_blank=True)
+
+    def validate_name(self, value):
+        """Validate that the name is a file name"""
+        if "/" in value or "\\" in value or value in (".", ".."):
+            raise serializers.ValidationError("File name cannot contain path separators")
+        return value
+
+    def validate_size(self, value):
+        """Validate the file size"""
+        if value > settings.DRIVE_UPLOAD_MAX_SIZE:
+            msg = f"File size cannot exceed {settings.DRIVE_UPLOAD_MAX_SIZE} bytes"
+            raise serializers.ValidationError(msg)
+        return value
+
+
+class DriveUploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for resumable uploads, with the chunks received so far"""
+
+    chunk_count = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DriveUploadSession
+        fields = [
+            "id",
+            "startup",
+            "folder",
+            "name",
+            "description",
+            "size",
+            "sha256",
+            "chunk_size",
+            "chunk_count",
+            "received_chunks",
+            "created_at",
+            "expires_at",
+        ]
+        read_only_fields = fields
+
+    def get_received_chunks(self, obj):
+        """Get the indexes of the chunks received so far"""
+        return [chunk.index for chunk in obj.chunks.all()]
+
+
+class BulkOperationSerializer(serializers.Serializer):
+    """Serializer for operations on several files and folders at once"""
+
+    operation = serializers.ChoiceField(choices=OPERATIONS)
+    files = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    folders = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    target_folder = serializers.IntegerField(required=False, allow_null=True)
+    expires_at = serializers.DateTimeField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        """Validate the number of items and the target of moves, ignoring repeated ids"""
+        attrs["files"] = list(dict.fromkeys(attrs["files"]))
+        attrs["folders"] = list(dict.fromkeys(attrs["folders"]))
+        count = len(attrs["files"]) + len(attrs["folders"])
+        if not count:
+            raise serializers.ValidationError("At least one file or folder is required.")
+        if count > MAX_ITEMS:
+            msg = f"At most {MAX_ITEMS} files and folders can be changed at once."
+            raise serializers.ValidationError(msg)
+        if attrs["operation"] == "move" and "target_folder" not in attrs:
+            raise serializers.ValidationError({"target_folder": "The target folder is required, null for the root."})
+        return attrs
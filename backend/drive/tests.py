@@ -1,3 +1,745 @@
-from django.test import TestCase
+"""
+Tests for the drive module.
+"""
 
-# Create your tests here.
+import email
+import email.policy
+import fcntl
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from unittest import mock
+
+from authentication.models import CustomUser
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from admin_panel.models import Founder, StartupDetail
+
+from . import blobs, uploads, zip_stream
+from .models import DriveActivity, DriveBlob, DriveFile, DriveFolder, DriveShare, DriveUploadSession, DriveUsage
+from .zip_stream import stream_zip
+
+
+class FolderDownloadTests(TestCase):
+    """Test suite for the streamed zip download of drive folders."""
+
+    def setUp(self):
+        """Create a founder, their startup and a folder tree stored in a temporary media root."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com")
+        founder = Founder.objects.create(id=1, name="Ada", startup_id=1)
+        self.startup.founders.add(founder)
+        self.user = CustomUser.objects.create_user(
+            email="ada@example.com", password="password", name="Ada", role="founder", founder_id=1
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+        self.root = DriveFolder.objects.create(startup=self.startup, name="Docs", created_by=self.user)
+        self.child = DriveFolder.objects.create(
+            startup=self.startup, name="Pictures", parent=self.root, created_by=self.user
+        )
+        self.add_file(self.root, "notes.txt", "text/plain", b"hello " * 1000)
+        self.add_file(self.child, "photo.jpg", "image/jpeg", b"\xff\xd8" + b"a" * 5000)
+        self.add_file(self.child, "old.txt", "text/plain", b"archived", is_archived=True)
+
+    def add_file(self, folder, name, file_type, content, **kwargs):
+        """Store a drive file with the given content."""
+        drive_file = DriveFile(
+            startup=self.startup,
+            folder=folder,
+            name=name,
+            size=len(content),
+            file_type=file_type,
+            uploaded_by=self.user,
+            **kwargs,
+        )
+        drive_file.file.save(name, ContentFile(content), save=False)
+        drive_file.save()
+        return drive_file
+
+    def download(self, folder, **params):
+        """Download a folder and return the response and the opened archive."""
+        response = self.client.get(f"/api/drive/folders/{folder.id}/download/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+    def test_download_streams_folder_tree(self):
+        """The archive holds every non archived file of the tree, and compressed types are stored as is."""
+        response, archive = self.download(self.root)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertIsNone(archive.testzip())
+
+        entries = {info.filename: info for info in archive.infolist()}
+        self.assertEqual(set(entries), {"Docs/notes.txt", "Docs/Pictures/photo.jpg"})
+        self.assertEqual(archive.read("Docs/notes.txt"), b"hello " * 1000)
+        self.assertEqual(entries["Docs/notes.txt"].compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(entries["Docs/Pictures/photo.jpg"].compress_type, zipfile.ZIP_STORED)
+
+        _, archive = self.download(self.root, skip_compressed="false")
+        self.assertEqual(archive.getinfo("Docs/Pictures/photo.jpg").compress_type, zipfile.ZIP_DEFLATED)
+
+    def test_empty_folder_is_rejected(self):
+        """Folders without files cannot be downloaded."""
+        empty = DriveFolder.objects.create(startup=self.startup, name="Empty", created_by=self.user)
+        response = self.client.get(f"/api/drive/folders/{empty.id}/download/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_in_chunks_with_zip64(self):
+        """Large entries are written in bounded chunks with ZIP64 headers, and missing files are skipped."""
+        path = DriveFile.objects.get(name="notes.txt").file.path
+        with mock.patch.object(zip_stream, "ZIP64_THRESHOLD", 100):
+            chunks = list(stream_zip([("a.txt", path, True), ("missing.txt", "/nonexistent", True)], chunk_size=512))
+
+        self.assertTrue(all(len(chunk) < 4096 for chunk in chunks))
+        data = b"".join(chunks)
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        self.assertEqual(archive.namelist(), ["a.txt"])
+        self.assertEqual(archive.read("a.txt"), b"hello " * 1000)
+
+        # The local header carries the ZIP64 extra field (header id 0x0001) after the file name
+        (name_length,) = struct.unpack("<H", data[26:28])
+        self.assertEqual(data[30 + name_length : 32 + name_length], b"\x01\x00")
+
+
+class FileDownloadTests(TestCase):
+    """Test suite for the conditional and partial download of drive files."""
+
+    def setUp(self):
+        """Store a file of a founder's startup in a temporary media root."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, DRIVE_ACCEL_REDIRECT_PREFIX="")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com")
+        founder = Founder.objects.create(id=1, name="Ada", startup_id=1)
+        self.startup.founders.add(founder)
+        self.user = CustomUser.objects.create_user(
+            email="ada@example.com", password="password", name="Ada", role="founder", founder_id=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.content = bytes(range(256)) * 40
+        self.file = DriveFile(
+            startup=self.startup, name="clip.mp4", size=len(self.content), file_type="video/mp4", uploaded_by=self.user
+        )
+        self.file.file.save("clip.mp4", ContentFile(self.content), save=False)
+        self.file.save()
+        self.url = f"/api/drive/files/{self.file.id}/download/"
+
+    def test_conditional_requests(self):
+        """Downloads carry a strong ETag from the stored content hash and revalidate with a 304."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], str(len(self.content)))
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="clip.mp4"')
+        etag = response["ETag"]
+        self.assertEqual(etag, f'"{hashlib.sha256(self.content).hexdigest()}"')
+        self.assertEqual(DriveFile.objects.get().content_hash, etag.strip('"'))
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get(self.url, headers={"If-Modified-Since": response["Last-Modified"]})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.url, headers={"If-None-Match": '"stale"'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.file.activities.filter(action="download").count(), 2)
+
+    def test_range_requests(self):
+        """Single and multiple ranges are served partially, and only a download from the start is logged."""
+        response = self.client.get(self.url, headers={"Range": "bytes=100-199"})
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.content)}")
+        self.assertEqual(b"".join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, headers={"Range": "bytes=-10"})
+        self.assertEqual(b"".join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url, headers={"Range": "bytes=0-9, 5-19,100-"})
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        body = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Length"], str(len(body)))
+        message = email.message_from_bytes(
+            f"Content-Type: {response['Content-Type']}\r\n\r\n".encode() + body, policy=email.policy.HTTP
+        )
+        parts = [(part["Content-Range"], part.get_payload(decode=True)) for part in message.iter_parts()]
+        size = len(self.content)
+        self.assertEqual(
+            parts,
+            [(f"bytes 0-19/{size}", self.content[:20]), (f"bytes 100-{size - 1}/{size}", self.content[100:])],
+        )
+
+        response = self.client.get(self.url, headers={"Range": f"bytes={len(self.content)}-"})
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.content)}")
+        # A range whose validator no longer matches gets the whole file
+        response = self.client.get(self.url, headers={"Range": "bytes=100-199", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.file.activities.filter(action="download").count(), 2)
+
+    def test_shared_download_and_accel_redirect(self):
+        """Shared downloads support ranges, and can be offloaded to nginx once validated."""
+        share = DriveShare.objects.create(file=self.file, shared_by=self.user, access_token="token")
+        url = f"/api/drive/share/{share.access_token}/download/"
+        response = APIClient().get(url, headers={"Range": "bytes=0-3"})
+        self.assertEqual(b"".join(response.streaming_content), self.content[:4])
+
+        with override_settings(DRIVE_ACCEL_REDIRECT_PREFIX="/protected-media/"):
+            response = APIClient().get(url, headers={"Range": "bytes=0-3"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.file.file.name}")
+        self.assertEqual(response.content, b"")
+
+
+class BlobStoreTests(TestCase):
+    """Test suite for the content-addressed storage of drive files."""
+
+    def setUp(self):
+        """Create a founder of a startup, with a temporary media root."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com")
+        founder = Founder.objects.create(id=1, name="Ada", startup_id=1)
+        self.startup.founders.add(founder)
+        self.user = CustomUser.objects.create_user(
+            email="ada@example.com", password="password", name="Ada", role="founder", founder_id=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.folder = DriveFolder.objects.create(startup=self.startup, name="Decks", created_by=self.user)
+
+    def upload(self, name, content, folder=None):
+        """Upload a file to the startup drive."""
+        data = {"file": SimpleUploadedFile(name, content)}
+        if folder:
+            data["folder"] = folder.id
+        response = self.client.post("/api/drive/files/upload/?startup=1", data, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return DriveFile.objects.get(pk=response.data["id"])
+
+    def test_identical_contents_are_stored_once(self):
+        """Files with the same bytes share a blob, which is collected once no file uses it."""
+        first = self.upload("notes.txt", b"Pitch deck notes")
+        second = self.upload("notes.txt", b"Pitch deck notes", folder=self.folder)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.endswith(".txt"))
+        self.assertEqual(first.content_hash, hashlib.sha256(b"Pitch deck notes").hexdigest())
+        blob = DriveBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size), (2, 16))
+
+        response = self.client.put(
+            f"/api/drive/files/{second.id}/update_content/", {"content": "edited"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        second.refresh_from_db()
+        self.assertEqual(second.file.read(), b"edited")
+        self.assertEqual(second.size, 6)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+        self.assertEqual(self.client.delete(f"/api/drive/files/{first.id}/").status_code, 204)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertIsNotNone(blob.released_at)
+        path = default_storage.path(blob.name)
+        self.assertTrue(os.path.exists(path))
+
+        self.assertEqual(blobs.collect_garbage(), (0, 0))
+        self.assertEqual(blobs.collect_garbage(grace=0), (1, 16))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(list(DriveBlob.objects.values_list("ref_count", flat=True)), [1])
+
+    def test_content_uploaded_again_while_its_blob_is_collected(self):
+        """A content uploaded again between the deletion of its blob and of its file is written anew."""
+        drive_file = self.upload("notes.txt", b"Pitch deck notes")
+        path = drive_file.file.path
+        self.assertEqual(self.client.delete(f"/api/drive/files/{drive_file.id}/").status_code, 204)
+        # The garbage collector deleted the row, the file is about to be deleted
+        DriveBlob.objects.all().delete()
+        old_inode = os.stat(path).st_ino
+
+        drive_file = self.upload("notes.txt", b"Pitch deck notes")
+        self.assertEqual(drive_file.file.path, path)
+        self.assertNotEqual(os.stat(path).st_ino, old_inode)
+        self.assertEqual(DriveBlob.objects.get().ref_count, 1)
+
+    def test_dedup_existing_files(self):
+        """The migration command moves the files stored before deduplication and reports the space reclaimed."""
+        legacy = []
+        for index, content in enumerate([b"same", b"same", b"other"]):
+            drive_file = DriveFile(
+                startup=self.startup, name=f"file{index}.txt", size=len(content), file_type="text/plain"
+            )
+            drive_file.file.save(f"file{index}.txt", ContentFile(content), save=False)
+            drive_file.save()
+            legacy.append(drive_file)
+        old_paths = [drive_file.file.path for drive_file in legacy]
+
+        out = io.StringIO()
+        call_command("dedup_drive_files", "--dry-run", stdout=out)
+        self.assertIn("3 files, 2 distinct contents: 13 bytes would become 9 bytes", out.getvalue())
+        self.assertFalse(DriveBlob.objects.exists())
+
+        out = io.StringIO()
+        call_command("dedup_drive_files", stdout=out)
+        self.assertIn("13 bytes before, 9 bytes of new contents, 4 bytes reclaimed", out.getvalue())
+        self.assertEqual(sorted(DriveBlob.objects.values_list("size", "ref_count")), [(4, 2), (5, 1)])
+        self.assertFalse(any(os.path.exists(path) for path in old_paths))
+        self.assertEqual(DriveFile.objects.get(pk=legacy[1].pk).file.read(), b"same")
+
+
+class FolderTreeTests(TestCase):
+    """Test suite for the materialized folder tree."""
+
+    def setUp(self):
+        """Create a founder, their startup and a three levels deep folder tree."""
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com")
+        founder = Founder.objects.create(id=1, name="Ada", startup_id=1)
+        self.startup.founders.add(founder)
+        self.user = CustomUser.objects.create_user(
+            email="ada@example.com", password="password", name="Ada", role="founder", founder_id=1
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+        self.docs = DriveFolder.objects.create(startup=self.startup, name="Docs")
+        self.legal = DriveFolder.objects.create(startup=self.startup, name="Legal", parent=self.docs)
+        self.contracts = DriveFolder.objects.create(startup=self.startup, name="Contracts", parent=self.legal)
+        self.other = DriveFolder.objects.create(startup=self.startup, name="Other")
+        for folder, name in [(self.docs, "a.txt"), (self.contracts, "b.txt"), (self.contracts, "c.txt")]:
+            DriveFile.objects.create(
+                startup=self.startup,
+                folder=folder,
+                name=name,
+                file=f"drive_files/{name}",
+                size=1,
+                file_type="text/plain",
+            )
+
+    def test_paths_follow_moves_and_renames(self):
+        """Moving or renaming a folder updates the paths of its whole subtree."""
+        self.contracts.refresh_from_db()
+        self.assertEqual(
+            (self.contracts.path, self.contracts.depth, self.contracts.tree_path),
+            ("Docs/Legal/Contracts", 2, f"/{self.docs.id}/{self.legal.id}/{self.contracts.id}/"),
+        )
+
+        response = self.client.patch(
+            f"/api/drive/folders/{self.legal.id}/", {"parent": self.other.id, "name": "Law"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["path"], "Other/Law")
+
+        self.contracts.refresh_from_db()
+        self.assertEqual((self.contracts.path, self.contracts.depth), ("Other/Law/Contracts", 2))
+        self.assertEqual(DriveFile.objects.get(name="b.txt").path, "Other/Law/Contracts/b.txt")
+        self.assertEqual(list(self.other.get_descendants(include_self=False)), [self.contracts, self.legal])
+
+        self.legal.refresh_from_db()
+        self.legal.parent = None
+        self.legal.save()
+        self.contracts.refresh_from_db()
+        self.assertEqual((self.contracts.path, self.contracts.depth), ("Law/Contracts", 1))
+
+    def test_folder_cannot_move_into_its_subtree(self):
+        """Moving a folder below itself is rejected."""
+        response = self.client.patch(
+            f"/api/drive/folders/{self.docs.id}/", {"parent": self.contracts.id}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tree_and_counts_in_constant_queries(self):
+        """The subtree, its paths and its file counts do not need one query per folder."""
+        with self.assertNumQueries(5):
+            # User, folder, startup and founder permission lookups, then the subtree
+            response = self.client.get(f"/api/drive/folders/{self.docs.id}/tree/")
+        self.assertEqual(
+            [(node["path"], node["depth"], node["files_count"], node["total_files_count"]) for node in response.data],
+            [("Docs", 0, 1, 3), ("Docs/Legal", 1, 0, 2), ("Docs/Legal/Contracts", 2, 2, 2)],
+        )
+
+        response = self.client.get(f"/api/drive/folders/{self.legal.id}/")
+        self.assertEqual((response.data["subfolders_count"], response.data["files_count"]), (1, 0))
+
+
+@override_settings(DRIVE_UPLOAD_CHUNK_SIZE=4)
+class ResumableUploadTests(TestCase):
+    """Test suite for the resumable uploads of drive files."""
+
+    def setUp(self):
+        """Create a founder of a startup, with a temporary media root."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com")
+        founder = Founder.objects.create(id=1, name="Ada", startup_id=1)
+        self.startup.founders.add(founder)
+        self.user = CustomUser.objects.create_user(
+            email="ada@example.com", password="password", name="Ada", role="founder", founder_id=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, content, **extra):
+        """Start the upload of a file of the size of a content."""
+        response = self.client.post(
+            "/api/drive/uploads/?startup=1", {"name": "deck.pdf", "size": len(content), **extra}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def put_chunk(self, upload_id, index, data, sha256=None):
+        """Upload a chunk with its checksum."""
+        return self.client.generic(
+            "PUT",
+            f"/api/drive/uploads/{upload_id}/chunks/{index}/",
+            data,
+            content_type="application/octet-stream",
+            HTTP_X_CHUNK_SHA256=sha256 or hashlib.sha256(data).hexdigest(),
+        )
+
+    def test_chunks_in_any_order_are_resumed_and_completed(self):
+        """Chunks can be sent in any order, the received ones are listed, and completion creates the file."""
+        content = b"0123456789"
+        upload_id = self.start(content, sha256=hashlib.sha256(content).hexdigest())
+        path = uploads.upload_path(DriveUploadSession.objects.get())
+        self.assertEqual(os.path.getsize(path), 10)
+
+        self.assertEqual(self.put_chunk(upload_id, 2, b"89").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.put_chunk(upload_id, 0, b"0123").status_code, status.HTTP_200_OK)
+        response = self.client.get(f"/api/drive/uploads/{upload_id}/")
+        self.assertEqual((response.data["chunk_count"], response.data["received_chunks"]), (3, [0, 2]))
+
+        response = self.client.post(f"/api/drive/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "1 chunks of the file are missing")
+
+        self.assertEqual(self.put_chunk(upload_id, 1, b"4567").status_code, status.HTTP_200_OK)
+        response = self.client.post(f"/api/drive/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        drive_file = DriveFile.objects.get(pk=response.data["id"])
+        self.assertEqual((drive_file.name, drive_file.size, drive_file.file_type), ("deck.pdf", 10, "application/pdf"))
+        self.assertEqual(drive_file.file.read(), content)
+        self.assertEqual(drive_file.blob.ref_count, 1)
+        self.assertTrue(DriveActivity.objects.filter(file=drive_file, action="upload").exists())
+        self.assertFalse(DriveUploadSession.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_invalid_chunks_are_rejected(self):
+        """Chunks of the wrong size or not matching their checksum are not recorded."""
+        upload_id = self.start(b"0123456789")
+
+        response = self.put_chunk(upload_id, 0, b"012")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Chunk 0 must be 4 bytes")
+        self.assertEqual(self.put_chunk(upload_id, 3, b"").status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.put_chunk(upload_id, 0, b"0123").status_code, status.HTTP_200_OK)
+        # A corrupted retry overwrites the chunk, which must be sent again
+        response = self.put_chunk(upload_id, 0, b"0124", sha256=hashlib.sha256(b"0123").hexdigest())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Chunk 0 does not match its SHA-256")
+        self.assertEqual(self.client.get(f"/api/drive/uploads/{upload_id}/").data["received_chunks"], [])
+
+    def test_file_not_matching_its_checksum_is_not_completed(self):
+        """An assembled file not matching the expected checksum is kept to fix its chunks."""
+        upload_id = self.start(b"abcdef", sha256=hashlib.sha256(b"abcdeg").hexdigest())
+        self.put_chunk(upload_id, 0, b"abcd")
+        self.put_chunk(upload_id, 1, b"ef")
+
+        response = self.client.post(f"/api/drive/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "The file does not match its SHA-256")
+
+        self.put_chunk(upload_id, 1, b"eg")
+        response = self.client.post(f"/api/drive/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(DriveFile.objects.get().file.read(), b"abcdeg")
+
+    def test_chunks_being_written_never_change_the_completed_blob(self):
+        """Completion fails while a chunk is written, and chunks opened before the completion are rejected."""
+        upload_id = self.start(b"0123456789")
+        for index, data in enumerate([b"0123", b"4567", b"89"]):
+            self.put_chunk(upload_id, index, data)
+        session = DriveUploadSession.objects.get()
+        path = uploads.upload_path(session)
+
+        with open(path, "rb") as writer:
+            fcntl.flock(writer, fcntl.LOCK_SH)
+            response = self.client.post(f"/api/drive/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Chunks of the file are still being written")
+
+        with open(path, "r+b") as writer:
+            response = self.client.post(f"/api/drive/uploads/{upload_id}/complete/")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            # A chunk that opened the file before the completion
+            error = None
+            with mock.patch("drive.uploads.open", return_value=writer):
+                try:
+                    uploads.write_chunk(session, 0, io.BytesIO(b"XXXX"), hashlib.sha256(b"XXXX").hexdigest())
+                except uploads.UploadError as e:
+                    error = str(e)
+        self.assertEqual(error, "The upload is being completed")
+        drive_file = DriveFile.objects.get()
+        self.assertEqual(drive_file.file.read(), b"0123456789")
+        self.assertEqual(drive_file.content_hash, hashlib.sha256(b"0123456789").hexdigest())
+
+    def test_uploads_are_private_and_expire(self):
+        """Uploads are only visible to their uploader, and abandoned ones are deleted with their files."""
+        upload_id = self.start(b"0123456789")
+        session = DriveUploadSession.objects.get()
+        path = uploads.upload_path(session)
+
+        other = CustomUser.objects.create_user(
+            email="bob@example.com", password="password", name="Bob", role="founder", founder_id=1
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+        self.assertEqual(client.get(f"/api/drive/uploads/{upload_id}/").status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(uploads.expire_sessions(), 0)
+        DriveUploadSession.objects.update(expires_at=session.created_at)
+        self.assertEqual(self.client.get(f"/api/drive/uploads/{upload_id}/").status_code, status.HTTP_404_NOT_FOUND)
+
+        out = io.StringIO()
+        call_command("expire_drive_uploads", stdout=out)
+        self.assertIn("Deleted 1 abandoned uploads", out.getvalue())
+        self.assertFalse(os.path.exists(path))
+
+
+class BulkOperationTests(TestCase):
+    """Test suite for the operations on several files and folders at once."""
+
+    def setUp(self):
+        """Create a founder of a startup with files, with a temporary media root."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com")
+        founder = Founder.objects.create(id=1, name="Ada", startup_id=1)
+        self.startup.founders.add(founder)
+        self.user = CustomUser.objects.create_user(
+            email="ada@example.com", password="password", name="Ada", role="founder", founder_id=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.folder = DriveFolder.objects.create(startup=self.startup, name="Decks", created_by=self.user)
+        self.files = [self.create_file(f"file{index}.txt") for index in range(20)]
+
+    def create_file(self, name, folder=None, startup=None):
+        """Store a drive file."""
+        file_obj = DriveFile(startup=startup or self.startup, folder=folder, name=name, file_type="text/plain")
+        blobs.save_content(file_obj, [name.encode()])
+        return file_obj
+
+    def bulk(self, operation, **data):
+        """Apply an operation, returning the response data."""
+        response = self.client.post("/api/drive/bulk/", {"operation": operation, **data}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_move_files(self):
+        """Files are moved in a bounded number of queries, those whose name is taken are reported."""
+        self.create_file("file3.txt", folder=self.folder)
+        ids = [file_obj.id for file_obj in self.files]
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.bulk("move", files=[*ids, 999], target_folder=self.folder.id)
+        self.assertLess(len(queries), 15)
+
+        self.assertEqual((data["succeeded"], data["failed"]), (19, 2))
+        self.assertEqual([result["id"] for result in data["results"]], [*ids, 999])
+        self.assertEqual(data["results"][3]["error"], 'A file with the name "file3.txt" already exists in this folder')
+        self.assertEqual(data["results"][-1]["error"], "Not found")
+        self.assertEqual(self.folder.files.count(), 20)
+        self.assertEqual(DriveActivity.objects.filter(action="move").count(), 19)
+
+        data = self.bulk("move", files=ids[:2], target_folder=None)
+        self.assertEqual(data["succeeded"], 2)
+        self.assertEqual(DriveFile.objects.filter(folder=None).count(), 3)
+
+    def test_move_folders(self):
+        """Folders are moved with their subtree, but not into themselves."""
+        child = DriveFolder.objects.create(startup=self.startup, name="Q1", parent=self.folder)
+        target = DriveFolder.objects.create(startup=self.startup, name="Archive")
+
+        data = self.bulk("move", folders=[self.folder.id], target_folder=child.id)
+        self.assertEqual(data["results"][0]["error"], "A folder cannot be moved into itself or its subfolders.")
+
+        # The subfolder is moved after its parent was
+        data = self.bulk("move", folders=[self.folder.id, child.id], target_folder=target.id)
+        self.assertEqual(data["succeeded"], 2)
+        self.folder.refresh_from_db()
+        child.refresh_from_db()
+        self.assertEqual((self.folder.full_path, child.full_path), ("Archive/Decks", "Archive/Q1"))
+        self.assertEqual(child.tree_path, f"/{target.id}/{child.id}/")
+
+    def test_archive_restore_and_access(self):
+        """Files are archived and restored, files of other startups are not found."""
+        other = StartupDetail.objects.create(id=2, name="Wind", email="wind@example.com")
+        foreign = self.create_file("secret.txt", startup=other)
+
+        data = self.bulk("archive", files=[self.files[0].id, foreign.id], folders=[self.folder.id])
+        self.assertEqual([result["success"] for result in data["results"]], [True, False, False])
+        self.assertEqual(data["results"][1]["error"], "Not found")
+        self.assertEqual(data["results"][2]["error"], "Folders cannot be archived")
+        self.files[0].refresh_from_db()
+        self.assertTrue(self.files[0].is_archived)
+        foreign.refresh_from_db()
+        self.assertFalse(foreign.is_archived)
+
+        self.bulk("restore", files=[self.files[0].id])
+        self.files[0].refresh_from_db()
+        self.assertFalse(self.files[0].is_archived)
+        self.assertEqual(
+            list(DriveActivity.objects.order_by("timestamp").values_list("action", flat=True)), ["delete", "restore"]
+        )
+
+    def test_delete_and_share(self):
+        """Deleted files release their contents, shared items get a share each."""
+        data = self.bulk("share", files=[self.files[0].id], folders=[self.folder.id])
+        self.assertEqual(data["succeeded"], 2)
+        share = DriveShare.objects.get(folder=self.folder)
+        self.assertEqual(data["results"][1]["access_token"], share.access_token)
+        self.assertEqual(DriveShare.objects.filter(file=self.files[0]).count(), 1)
+
+        data = self.bulk("delete", files=[file_obj.id for file_obj in self.files[:5]], folders=[self.folder.id])
+        self.assertEqual(data["succeeded"], 6)
+        self.assertEqual(DriveFile.objects.count(), 15)
+        self.assertFalse(DriveFolder.objects.exists())
+        self.assertEqual(DriveBlob.objects.filter(ref_count=0).count(), 5)
+        self.assertEqual(DriveActivity.objects.filter(action="delete").count(), 6)
+
+    def test_invalid_requests(self):
+        """Moves need a target, and at least one item is required."""
+        response = self.client.post("/api/drive/bulk/", {"operation": "move", "files": [1]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post("/api/drive/bulk/", {"operation": "archive"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StorageUsageTests(TestCase):
+    """Test suite for the storage statistics and usage of startup drives."""
+
+    def setUp(self):
+        """Create a founder of a startup, with a temporary media root."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com")
+        founder = Founder.objects.create(id=1, name="Ada", startup_id=1)
+        self.startup.founders.add(founder)
+        self.user = CustomUser.objects.create_user(
+            email="ada@example.com", password="password", name="Ada", role="founder", founder_id=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content):
+        """Upload a file to the startup drive."""
+        return self.client.post(
+            "/api/drive/files/upload/?startup=1", {"file": SimpleUploadedFile(name, content)}, format="multipart"
+        )
+
+    def usage(self):
+        """Current usage counters of the startup."""
+        usage = DriveUsage.objects.get(startup=self.startup)
+        return usage.file_count, usage.total_size, usage.archived_count, usage.archived_size
+
+    def test_usage_follows_every_write(self):
+        """The usage is updated by uploads, edits, archives through any path and deletions."""
+        notes = self.upload("notes.txt", b"0123456789").data["id"]
+        self.upload("logo.png", b"png")
+        self.assertEqual(self.usage(), (2, 13, 0, 0))
+
+        self.client.put(f"/api/drive/files/{notes}/update_content/", {"content": "0123"}, format="json")
+        self.assertEqual(self.usage(), (2, 7, 0, 0))
+
+        self.client.post(f"/api/drive/files/{notes}/archive/")
+        self.assertEqual(self.usage(), (2, 7, 1, 4))
+        self.client.post("/api/drive/bulk/", {"operation": "restore", "files": [notes]}, format="json")
+        self.assertEqual(self.usage(), (2, 7, 0, 0))
+        DriveFile.objects.update(is_archived=True)
+        self.assertEqual(self.usage(), (2, 7, 2, 7))
+
+        self.client.delete(f"/api/drive/files/{notes}/?archived=true")
+        self.assertEqual(self.usage(), (1, 3, 1, 3))
+
+    def test_quota(self):
+        """Uploads beyond the storage quota of the startup are refused."""
+        with override_settings(DRIVE_STORAGE_QUOTA=12):
+            self.assertEqual(self.upload("notes.txt", b"0123456789").status_code, status.HTTP_201_CREATED)
+            response = self.upload("more.txt", b"0123")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data["error"], "The storage quota of this startup is exceeded")
+
+            response = self.client.post("/api/drive/uploads/?startup=1", {"name": "big.bin", "size": 3}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.upload("last.txt", b"01").status_code, status.HTTP_201_CREATED)
+
+    def test_stats_are_aggregated_in_sql(self):
+        """The statistics by file type are computed in a number of queries independent of the files."""
+        for index in range(10):
+            self.upload(f"notes{index}.txt", b"notes")
+        archived = self.upload("logo.png", b"png").data["id"]
+        self.client.post(f"/api/drive/files/{archived}/archive/")
+        DriveFile.objects.filter(pk=self.upload("raw", b"raw").data["id"]).update(file_type="unknown")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/drive/stats/1/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(queries), 10)
+
+        storage = response.data["storage"]
+        self.assertEqual(storage["total_size"], 56)
+        self.assertEqual(
+            storage["file_types"],
+            {
+                "text": {"count": 10, "size": 50, "archived_count": 0, "archived_size": 0},
+                "image": {"count": 1, "size": 3, "archived_count": 1, "archived_size": 3},
+                "unknown": {"count": 1, "size": 3, "archived_count": 0, "archived_size": 0},
+            },
+        )
+        self.assertEqual(
+            response.data["counts"], {"total_files": 12, "active_files": 11, "archived_files": 1, "total_folders": 0}
+        )
@@ -1,8 +1,8 @@
-from django.core.files.base import ContentFile
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from .blobs import save_content
 from .models import DriveActivity
 
 
@@ -83,17 +83,15 @@ def update_file_content_action(self, request, pk=None):
         try:
             content = serializer.validated_data["content"]
 
-            file_obj.file.save(file_obj.name, ContentFile(content.encode("utf-8")), save=False)
-
-            file_obj.size = file_obj.file.size
-            file_obj.save()
+            old_size = file_obj.size
+            save_content(file_obj, [content.encode("utf-8")])
 
             DriveActivity.objects.create(
                 startup=file_obj.startup,
                 user=request.user,
                 file=file_obj,
                 action="edit",
-                details={"old_size": file_obj.size, "new_size": file_obj.file.size},
+                details={"old_size": old_size, "new_size": file_obj.size},
                 ip_address=request.META.get("REMOTE_ADDR"),
             )
 
@@ -0,0 +1,244 @@
+"""
+Resumable uploads of drive files sent in chunks.
+
+Starting an upload creates a session and reserves a file of the final size under
+drive_blobs/uploads/, named after the session. The file is then sent in chunks of
+DRIVE_UPLOAD_CHUNK_SIZE bytes (the last one may be shorter), PUT by index in any order and
+possibly in parallel: each chunk is streamed from the request body to its offset in the file,
+so that neither Django's upload handlers nor the memory ever hold more than a read buffer, and
+is only recorded once it matches the SHA-256 sent with it. A client resuming an interrupted
+upload asks the session which chunks were received and sends the others.
+
+Completing the session hashes the assembled file once, streaming it, and hands it over to the
+blob store (see drive/blobs.py), which moves it in place instead of copying it. Chunks are written
+under a shared lock of the file and completion takes it exclusively before renaming the file, so
+that a chunk still being written makes the completion fail instead of changing the bytes of a blob
+after they were hashed, and a chunk arriving during the completion is rejected. Sessions expire
+DRIVE_UPLOAD_SESSION_TTL seconds after their last chunk, and `expire_sessions` deletes them
+together with their files.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import mimetypes
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .blobs import BLOB_DIRECTORY, save_content_file
+from .models import DriveFile, DriveUploadChunk, DriveUploadSession
+
+UPLOAD_DIRECTORY = f"{BLOB_DIRECTORY}/uploads"
+READ_SIZE = 64 * 1024
+# Suffix of the file of a session while it is completed, which stops chunks and other completions
+COMPLETING_SUFFIX = ".complete"
+
+
+class UploadError(Exception):
+    """
+    A chunk or the completion of an upload was rejected, the message tells why.
+    """
+
+
+def upload_path(session):
+    """
+    Path of the file an upload is assembled in.
+    """
+    return default_storage.path(f"{UPLOAD_DIRECTORY}/{session.pk}")
+
+
+def _expiry():
+    return timezone.now() + timezone.timedelta(seconds=settings.DRIVE_UPLOAD_SESSION_TTL)
+
+
+def create_session(**fields):
+    """
+    Start an upload and reserve its file.
+
+    Args:
+        **fields: Fields of the session: startup, folder, name, size, created_by, description, sha256
+    """
+    session = DriveUploadSession.objects.create(
+        chunk_size=settings.DRIVE_UPLOAD_CHUNK_SIZE, expires_at=_expiry(), **fields
+    )
+    path = upload_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        # Sparse on most file systems, the chunks fill it in
+        file.truncate(session.size)
+    return session
+
+
+def _is_session_file(file, path):
+    """
+    Whether an open file is still the file of an upload, and not being completed or moved to the blob store.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(file.fileno())
+    return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+def discard_file(session):
+    """
+    Delete the file of an upload, if it was not completed.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(upload_path(session))
+
+
+def write_chunk(session, index, stream, sha256):
+    """
+    Write a chunk of an upload at its offset and record it, extending the session.
+
+    Args:
+        session: DriveUploadSession the chunk belongs to
+        index: Position of the chunk, from 0
+        stream: Binary stream holding exactly the bytes of the chunk, e.g. the request
+        sha256: SHA-256 hex digest of the chunk computed by the client
+
+    Returns:
+        DriveUploadChunk: The recorded chunk
+
+    Raises:
+        UploadError: When the index, the size or the checksum of the chunk is wrong, or the upload is
+            being completed
+    """
+    if not 0 <= index < session.chunk_count:
+        msg = f"Chunk index must be between 0 and {session.chunk_count - 1}"
+        raise UploadError(msg)
+
+    length = session.chunk_length(index)
+    digest = hashlib.sha256()
+    remaining = length
+    path = upload_path(session)
+    try:
+        file = open(path, "r+b")  # noqa: SIM115
+    except FileNotFoundError:
+        msg = "The upload is being completed"
+        raise UploadError(msg) from None
+    with file:
+        fcntl.flock(file, fcntl.LOCK_SH)
+        if not _is_session_file(file, path):
+            msg = "The upload is being completed"
+            raise UploadError(msg)
+        file.seek(index * session.chunk_size)
+        while remaining > 0:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            file.write(data)
+            remaining -= len(data)
+
+    # Whatever was received before for this index was overwritten
+    if remaining or stream.read(1):
+        DriveUploadChunk.objects.filter(session=session, index=index).delete()
+        msg = f"Chunk {index} must be {length} bytes"
+        raise UploadError(msg)
+    if digest.hexdigest() != sha256.strip().lower():
+        DriveUploadChunk.objects.filter(session=session, index=index).delete()
+        msg = f"Chunk {index} does not match its SHA-256"
+        raise UploadError(msg)
+
+    chunk, _ = DriveUploadChunk.objects.update_or_create(
+        session=session, index=index, defaults={"size": length, "sha256": digest.hexdigest()}
+    )
+    DriveUploadSession.objects.filter(pk=session.pk).update(expires_at=_expiry())
+    return chunk
+
+
+def complete_session(session, user):
+    """
+    Assemble the file of an upload whose chunks were all received into a new drive file, and delete the session.
+
+    Returns:
+        DriveFile: The uploaded file
+
+    Raises:
+        UploadError: When chunks are missing or still being written, the file does not match the expected
+            SHA-256 of the session, or the upload is already being completed
+    """
+    missing = session.chunk_count - session.chunks.count()
+    if missing:
+        msg = f"{missing} chunks of the file are missing"
+        raise UploadError(msg)
+
+    path = upload_path(session)
+    try:
+        file = open(path, "rb")  # noqa: SIM115
+    except FileNotFoundError:
+        msg = "The upload is already being completed"
+        raise UploadError(msg) from None
+    with file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            msg = "Chunks of the file are still being written"
+            raise UploadError(msg) from None
+        if not _is_session_file(file, path):
+            msg = "The upload is already being completed"
+            raise UploadError(msg)
+        # Held until the file is handed over, chunks waiting for it then find the file gone
+        return _complete_locked(session, user, path)
+
+
+def _complete_locked(session, user, path):
+    completing = f"{path}{COMPLETING_SUFFIX}"
+    os.rename(path, completing)
+    try:
+        with open(completing, "rb") as file:
+            sha256 = hashlib.file_digest(file, "sha256").hexdigest()
+        if session.sha256 and sha256 != session.sha256.lower():
+            msg = "The file does not match its SHA-256"
+            raise UploadError(msg)
+
+        drive_file = DriveFile(
+            startup_id=session.startup_id,
+            folder_id=session.folder_id,
+            name=session.name,
+            file_type=mimetypes.guess_type(session.name)[0] or "application/octet-stream",
+            uploaded_by=user,
+            description=session.description,
+        )
+        save_content_file(drive_file, completing, sha256)
+    except BaseException:
+        if os.path.exists(completing):
+            # Can be completed again once the wrong chunks are sent again
+            os.rename(completing, path)
+        else:
+            session.delete()
+        raise
+
+    session.delete()
+    return drive_file
+
+
+def expire_sessions():
+    """
+    Delete the uploads that received no chunk for DRIVE_UPLOAD_SESSION_TTL seconds, with their files,
+    and the files left without a session.
+
+    Returns:
+        int: Number of deleted sessions
+    """
+    deleted = 0
+    for session in DriveUploadSession.objects.filter(expires_at__lte=timezone.now()).iterator():
+        # The file is deleted with the session (see init/signals.py)
+        session.delete()
+        deleted += 1
+
+    directory = default_storage.path(UPLOAD_DIRECTORY)
+    if os.path.isdir(directory):
+        sessions = {str(pk) for pk in DriveUploadSession.objects.values_list("pk", flat=True)}
+        stale = time.time() - settings.DRIVE_UPLOAD_SESSION_TTL
+        for entry in os.scandir(directory):
+            if entry.name.removesuffix(COMPLETING_SUFFIX) not in sessions and entry.stat().st_mtime < stale:
+                os.remove(entry.path)
+    return deleted
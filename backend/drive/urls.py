@@ -3,9 +3,11 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     DriveActivityViewSet,
+    DriveBulkView,
     DriveFileViewSet,
     DriveFolderViewSet,
     DriveShareViewSet,
+    DriveUploadViewSet,
     SharedFileDownloadView,
     SharedItemView,
     StartupStorageStatsView,
@@ -16,9 +18,11 @@ router.register(r"folders", DriveFolderViewSet)
 router.register(r"files", DriveFileViewSet)
 router.register(r"shares", DriveShareViewSet)
 router.register(r"activities", DriveActivityViewSet)
+router.register(r"uploads", DriveUploadViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("bulk/", DriveBulkView.as_view(), name="drive-bulk"),
     path("stats/<int:startup_id>/", StartupStorageStatsView.as_view(), name="drive-stats"),
     path("share/<str:token>/", SharedItemView.as_view(), name="shared-item"),
     path("share/<str:token>/download/", SharedFileDownloadView.as_view(), name="download-shared-file"),
@@ -0,0 +1,68 @@
+"""
+Storage used by the startup drives.
+
+`DriveUsage` holds the number and the size of the files of every startup drive, with the
+archived files also counted apart. Triggers on the drive files, created by migration 0007,
+keep it up to date within the transaction of every write, bulk and queryset updates
+included, so that checking a quota is a primary key lookup instead of a sum over the files.
+
+`file_type_breakdown` computes the same figures per MIME major type in one grouped query.
+"""
+
+from django.conf import settings
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Left, StrIndex
+
+from .models import DriveUsage
+
+
+def get_usage(startup_id):
+    """
+    Storage used by the drive of a startup, empty when it has no file yet.
+    """
+    return DriveUsage.objects.filter(startup_id=startup_id).first() or DriveUsage(startup_id=startup_id)
+
+
+def exceeds_quota(startup_id, size):
+    """
+    Whether `size` more bytes in the drive of a startup exceed DRIVE_STORAGE_QUOTA, archived files included.
+    """
+    quota = settings.DRIVE_STORAGE_QUOTA
+    return bool(quota) and get_usage(startup_id).total_size + size > quota
+
+
+def file_type_breakdown(files):
+    """
+    Number and size of files per MIME major type ("image" for "image/png"), in one query.
+
+    Args:
+        files: DriveFile queryset
+
+    Returns:
+        dict: {major type: {"count", "size", "archived_count", "archived_size"}}
+    """
+    main_type = Case(
+        When(file_type__contains="/", then=Left("file_type", StrIndex("file_type", Value("/")) - 1)),
+        default=F("file_type"),
+        output_field=CharField(),
+    )
+    archived = Q(is_archived=True)
+    rows = (
+        files.order_by()
+        .values(main_type=main_type)
+        .annotate(
+            file_count=Count("pk"),
+            total_size=Sum("size"),
+            archived_file_count=Count("pk", filter=archived),
+            archived_total_size=Sum("size", filter=archived, default=0),
+        )
+    )
+    return {
+        row["main_type"]: {
+            "count": row["file_count"],
+            "size": row["total_size"],
+            "archived_count": row["archived_file_count"],
+            "archived_size": row["archived_total_size"],
+        }
+        for row in rows
+    }
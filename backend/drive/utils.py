@@ -193,3 +193,77 @@ def is_python_file(file_name, file_type):
 
     extension = file_name.split(".")[-1].lower() if "." in file_name else ""
     return extension in python_extensions
+
+
+def is_compressed_file(file_name, file_type):
+    """
+    Determine if a file is already compressed, so that compressing it again would only waste CPU.
+
+    Args:
+        file_name (str): The name of the file
+        file_type (str): The MIME type of the file
+
+    Returns:
+        bool: True if the file content is already compressed, False otherwise
+    """
+    # Bitmap, SVG and TIFF images are usually uncompressed or compress well
+    uncompressed_image_mime_types = ["image/svg+xml", "image/bmp", "image/tiff", "image/x-icon"]
+    if is_image_file(file_name, file_type) and file_type not in uncompressed_image_mime_types:
+        extension = file_name.split(".")[-1].lower() if "." in file_name else ""
+        if extension not in ["svg", "bmp", "tiff", "tif", "ico"]:
+            return True
+
+    if is_video_file(file_name, file_type) or is_pdf_file(file_name, file_type):
+        return True
+
+    # List of MIME types for archives, compressed audio and zip-based office documents
+    compressed_mime_types = [
+        "application/zip",
+        "application/x-zip-compressed",
+        "application/gzip",
+        "application/x-gzip",
+        "application/x-bzip2",
+        "application/x-xz",
+        "application/x-7z-compressed",
+        "application/x-rar-compressed",
+        "application/vnd.rar",
+        "application/zstd",
+        "audio/mpeg",
+        "audio/aac",
+        "audio/ogg",
+        "audio/webm",
+        "audio/mp4",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "application/epub+zip",
+    ]
+
+    # Check MIME type first
+    if file_type in compressed_mime_types:
+        return True
+
+    # List of extensions for archives, compressed audio and zip-based office documents
+    compressed_extensions = [
+        "zip",
+        "gz",
+        "tgz",
+        "bz2",
+        "xz",
+        "7z",
+        "rar",
+        "zst",
+        "mp3",
+        "aac",
+        "m4a",
+        "opus",
+        "docx",
+        "xlsx",
+        "pptx",
+        "epub",
+        "jar",
+    ]
+
+    # Check file extension
+    extension = file_name.split(".")[-1].lower() if "." in file_name else ""
+    return extension in compressed_extensions
@@ -1,19 +1,15 @@
 import mimetypes
-import os
 import secrets
 import uuid
-from io import BytesIO
-from wsgiref.util import FileWrapper
-from zipfile import ZipFile
 
 from authentication.permissions import IsFounder
 from django.conf import settings
-from django.core.files.base import ContentFile
-from django.db.models import Q, Sum
-from django.http import HttpResponse
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from rest_framework import filters, permissions, status, viewsets
+from rest_framework import filters, mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
@@ -21,7 +17,10 @@ from rest_framework.views import APIView
 
 from admin_panel.models import StartupDetail
 
-from .models import DriveActivity, DriveFile, DriveFolder, DriveShare
+from . import bulk
+from .blobs import save_content
+from .http import is_new_download, serve_file
+from .models import DriveActivity, DriveFile, DriveFolder, DriveShare, DriveUploadSession
 from .preview_serializers import (
     ImageFilePreviewSerializer,
     PDFFilePreviewSerializer,
@@ -35,15 +34,47 @@ from .python_serializers import (
     PythonExecutionResultSerializer,
 )
 from .serializers import (
+    BulkOperationSerializer,
     DriveActivitySerializer,
     DriveFileListSerializer,
     DriveFileSerializer,
     DriveFolderListSerializer,
     DriveFolderSerializer,
     DriveShareSerializer,
+    DriveUploadSessionSerializer,
     FileUploadSerializer,
+    UploadSessionCreateSerializer,
 )
-from .utils import is_image_file, is_pdf_file, is_python_file, is_text_file, is_video_file
+from .uploads import UploadError, complete_session, create_session, write_chunk
+from .usage import exceeds_quota, file_type_breakdown
+from .utils import (
+    is_compressed_file,
+    is_image_file,
+    is_pdf_file,
+    is_python_file,
+    is_text_file,
+    is_video_file,
+)
+from .zip_stream import stream_zip
+
+
+def count_related(queryset, field):
+    """
+    Subquery counting the rows of `queryset` whose `field` points to the outer folder.
+    """
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(count=Count("pk"))
+    return Coalesce(Subquery(counts.values("count")), 0)
+
+
+def accessible_by(queryset, user):
+    """
+    Restrict drive items to the startups a user can access: every startup for staff, their own for founders.
+    """
+    if user.is_staff or user.is_superuser:
+        return queryset
+    if user.role == "founder" and user.founder_id:
+        return queryset.filter(startup__founders__id=user.founder_id)
+    return queryset.none()
 
 
 class StartupDrivePermission(permissions.BasePermission):
@@ -103,6 +134,11 @@ class DriveFolderViewSet(viewsets.ModelViewSet):
         Filter folders based on user permissions and query parameters.
         """
         queryset = DriveFolder.objects.all()
+        if self.action != "list":
+            queryset = queryset.annotate(
+                subfolder_total=count_related(DriveFolder.objects.all(), "parent"),
+                file_total=count_related(DriveFile.objects.all(), "folder"),
+            )
 
         startup_id = self.request.query_params.get("startup", None)
         if startup_id:
@@ -206,50 +242,76 @@ class DriveFolderViewSet(viewsets.ModelViewSet):
             ip_address=request.META.get("REMOTE_ADDR"),
         )
 
-        files_count = self._count_files_in_folder(folder)
-        if files_count == 0:
+        skip_compressed = request.query_params.get("skip_compressed")
+        if skip_compressed is None:
+            skip_compressed = settings.DRIVE_ZIP_SKIP_COMPRESSED
+        else:
+            skip_compressed = skip_compressed.lower() == "true"
+
+        # Collect the entries up front so that no query runs while the archive is streamed
+        entries = self._zip_entries(folder, skip_compressed)
+        if not entries:
             return Response(
                 {"error": "The folder is empty and cannot be downloaded"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        zip_buffer = BytesIO()
-
-        with ZipFile(zip_buffer, "w") as zip_file:
-            self._add_folder_to_zip(zip_file, folder, folder.name)
-
-        zip_buffer.seek(0)
-        zip_data = zip_buffer.getvalue()
-
-        response = HttpResponse(zip_data, content_type="application/zip")
+        response = StreamingHttpResponse(stream_zip(entries), content_type="application/zip")
         response["Content-Disposition"] = f'attachment; filename="{folder.name}.zip"'
-        response["Content-Length"] = len(zip_data)
         response["Content-Transfer-Encoding"] = "binary"
 
         return response
 
-    def _count_files_in_folder(self, folder):
+    def _zip_entries(self, folder, skip_compressed):
         """
-        Count total files in a folder and its subfolders.
+        Return the (archive name, path on disk, compress) entries of a folder and its subfolders, in one query.
         """
-        count = DriveFile.objects.filter(folder=folder, is_archived=False).count()
-        subfolders = DriveFolder.objects.filter(parent=folder)
-        for subfolder in subfolders:
-            count += self._count_files_in_folder(subfolder)
-        return count
+        files = (
+            DriveFile.objects.filter(folder__tree_path__startswith=folder.tree_path, is_archived=False)
+            .select_related("folder")
+            .order_by("folder__full_path", "name")
+        )
+        entries = []
+        for file_obj in files:
+            # Paths in the archive are relative to the parent of the downloaded folder
+            folder_path = folder.name + file_obj.folder.full_path[len(folder.full_path) :]
+            compress = not (skip_compressed and is_compressed_file(file_obj.name, file_obj.file_type))
+            entries.append((f"{folder_path}/{file_obj.name}", file_obj.file.path, compress))
+        return entries
 
-    def _add_folder_to_zip(self, zip_file, folder, current_path):
+    @action(detail=True, methods=["get"])
+    def tree(self, request, pk=None):
         """
-        Recursively add all files from a folder to the zip file.
+        Get the whole subtree of a folder with the paths and the file counts of every folder.
         """
-        files = DriveFile.objects.filter(folder=folder, is_archived=False)
-        for file_obj in files:
-            file_path = file_obj.file.path
-            if os.path.exists(file_path):
-                zip_file.write(file_path, os.path.join(current_path, file_obj.name))
+        folder = self.get_object()
 
-        subfolders = DriveFolder.objects.filter(parent=folder)
-        for subfolder in subfolders:
-            self._add_folder_to_zip(zip_file, subfolder, os.path.join(current_path, subfolder.name))
+        subtree = list(
+            folder.get_descendants()
+            .annotate(file_total=count_related(DriveFile.objects.filter(is_archived=False), "folder"))
+            .order_by("full_path")
+            .values("id", "name", "parent", "tree_path", "full_path", "depth", "file_total")
+        )
+
+        # Add the files of each folder to the totals of its ancestors within the subtree
+        totals = {node["id"]: 0 for node in subtree}
+        for node in subtree:
+            for ancestor_id in node["tree_path"].strip("/").split("/")[folder.depth :]:
+                totals[int(ancestor_id)] += node["file_total"]
+
+        return Response(
+            [
+                {
+                    "id": node["id"],
+                    "name": node["name"],
+                    "parent": node["parent"],
+                    "path": node["full_path"],
+                    "depth": node["depth"] - folder.depth,
+                    "files_count": node["file_total"],
+                    "total_files_count": totals[node["id"]],
+                }
+                for node in subtree
+            ]
+        )
 
 
 class DriveFileViewSet(viewsets.ModelViewSet):
@@ -274,7 +336,7 @@ class DriveFileViewSet(viewsets.ModelViewSet):
         """
         Filter files based on user permissions and query parameters.
         """
-        queryset = DriveFile.objects.all()
+        queryset = DriveFile.objects.select_related("folder", "uploaded_by")
 
         show_archived = self.request.query_params.get("archived", "false").lower() == "true"
         if not show_archived:
@@ -310,27 +372,20 @@ class DriveFileViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"])
     def download(self, request, pk=None):
         """
-        Download a file.
+        Download a file, with support for conditional and Range requests.
         """
         file_obj = self.get_object()
 
-        DriveActivity.objects.create(
-            startup=file_obj.startup,
-            user=request.user,
-            file=file_obj,
-            action="download",
-            ip_address=request.META.get("REMOTE_ADDR"),
-        )
-
-        file_path = file_obj.file.path
-
-        content_type, _ = mimetypes.guess_type(file_path)
-        content_type = content_type or "application/octet-stream"
+        response = serve_file(request, file_obj)
 
-        with open(file_path, "rb") as file:
-            response = HttpResponse(FileWrapper(file), content_type=content_type)
-            response["Content-Disposition"] = f'attachment; filename="{file_obj.name}"'
-            response["Content-Length"] = os.path.getsize(file_path)
+        if is_new_download(response):
+            DriveActivity.objects.create(
+                startup=file_obj.startup,
+                user=request.user,
+                file=file_obj,
+                action="download",
+                ip_address=request.META.get("REMOTE_ADDR"),
+            )
 
         return response
 
@@ -369,19 +424,24 @@ class DriveFileViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
+            if exceeds_quota(startup.id, uploaded_file.size):
+                return Response(
+                    {"error": "The storage quota of this startup is exceeded"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
             content_type, _ = mimetypes.guess_type(uploaded_file.name)
             content_type = content_type or "application/octet-stream"
 
-            file_obj = DriveFile.objects.create(
+            file_obj = DriveFile(
                 startup_id=startup_id,
                 folder=folder,
                 name=uploaded_file.name,
-                file=uploaded_file,
-                size=uploaded_file.size,
                 file_type=content_type,
                 uploaded_by=request.user,
                 description=description,
             )
+            # Hashed while it is stored, and only stored if no drive file has the same content yet
+            save_content(file_obj, uploaded_file.chunks())
 
             DriveActivity.objects.create(
                 startup=file_obj.startup,
@@ -484,7 +544,9 @@ class DriveFileViewSet(viewsets.ModelViewSet):
             ip_address=self.request.META.get("REMOTE_ADDR"),
         )
 
-        instance.file.delete(save=False)
+        # Shared contents are released when the file is deleted (see init/signals.py)
+        if instance.blob_id is None:
+            instance.file.delete(save=False)
         instance.delete()
 
     @action(detail=True, methods=["get"])
@@ -586,17 +648,15 @@ class DriveFileViewSet(viewsets.ModelViewSet):
             try:
                 content = serializer.validated_data["content"]
 
-                file_obj.file.save(file_obj.name, ContentFile(content.encode("utf-8")), save=False)
-
-                file_obj.size = file_obj.file.size
-                file_obj.save()
+                old_size = file_obj.size
+                save_content(file_obj, [content.encode("utf-8")])
 
                 DriveActivity.objects.create(
                     startup=file_obj.startup,
                     user=request.user,
                     file=file_obj,
                     action="edit",
-                    details={"old_size": file_obj.size, "new_size": file_obj.file.size},
+                    details={"old_size": old_size, "new_size": file_obj.size},
                     ip_address=request.META.get("REMOTE_ADDR"),
                 )
 
@@ -648,6 +708,181 @@ class DriveFileViewSet(viewsets.ModelViewSet):
         return Response(result_serializer.data)
 
 
+class DriveUploadViewSet(
+    mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet
+):
+    """
+    API endpoint for resumable uploads: start an upload, PUT its chunks (in any order, possibly in parallel,
+    with their SHA-256 in an X-Chunk-SHA256 header), then complete it. Retrieving an upload lists the chunks
+    received so far, to resume it, and deleting it aborts it.
+    """
+
+    queryset = DriveUploadSession.objects.all()
+    serializer_class = DriveUploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Only the uploads of the user that have not expired.
+        """
+        return DriveUploadSession.objects.filter(
+            created_by=self.request.user, expires_at__gt=timezone.now()
+        ).prefetch_related("chunks")
+
+    def create(self, request, *args, **kwargs):
+        """
+        Start an upload.
+        """
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        name = serializer.validated_data["name"]
+        folder = serializer.validated_data.get("folder", None)
+
+        startup_id = request.query_params.get("startup")
+        if not startup_id and folder:
+            startup_id = folder.startup_id
+
+        if not startup_id:
+            return Response({"error": "Startup ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        startup = get_object_or_404(StartupDetail, id=startup_id)
+        if not StartupDrivePermission().has_object_permission(request, self, startup):
+            return Response(
+                {"error": "You do not have permission to upload files to this startup"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if DriveFile.objects.filter(startup=startup, folder=folder, name=name).exists():
+            return Response(
+                {"error": f'A file with the name "{name}" already exists in this folder'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if exceeds_quota(startup.id, serializer.validated_data["size"]):
+            return Response(
+                {"error": "The storage quota of this startup is exceeded"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        session = create_session(
+            startup=startup,
+            folder=folder,
+            name=name,
+            size=serializer.validated_data["size"],
+            description=serializer.validated_data.get("description", ""),
+            sha256=serializer.validated_data.get("sha256", ""),
+            created_by=request.user,
+        )
+        return Response(DriveUploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["put"], url_path=r"chunks/(?P<index>\d+)")
+    def chunk(self, request, pk=None, index=None):
+        """
+        Upload a chunk, sent as the raw request body.
+        """
+        session = self.get_object()
+        index = int(index)
+        sha256 = request.headers.get("X-Chunk-SHA256")
+        if not sha256:
+            return Response({"error": "The X-Chunk-SHA256 header is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rejected before reading a body of the wrong size
+        if index < session.chunk_count and request.headers.get("Content-Length") != str(session.chunk_length(index)):
+            return Response(
+                {"error": f"Chunk {index} must be {session.chunk_length(index)} bytes"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            # Streamed from the request, bypassing the parsers and upload handlers
+            chunk = write_chunk(session, index, request.stream, sha256)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"index": chunk.index, "size": chunk.size, "sha256": chunk.sha256})
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        """
+        Complete an upload whose chunks were all received, creating the file.
+        """
+        session = self.get_object()
+
+        if DriveFile.objects.filter(
+            startup_id=session.startup_id, folder_id=session.folder_id, name=session.name
+        ).exists():
+            return Response(
+                {"error": f'A file with the name "{session.name}" already exists in this folder'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Other files may have been uploaded in the meantime
+        if exceeds_quota(session.startup_id, session.size):
+            return Response(
+                {"error": "The storage quota of this startup is exceeded"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            file_obj = complete_session(session, request.user)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        DriveActivity.objects.create(
+            startup=file_obj.startup,
+            user=request.user,
+            file=file_obj,
+            action="upload",
+            details={"size": file_obj.size, "file_type": file_obj.file_type, "resumable": True},
+            ip_address=request.META.get("REMOTE_ADDR"),
+        )
+
+        return Response(
+            DriveFileSerializer(file_obj, context={"request": request}).data, status=status.HTTP_201_CREATED
+        )
+
+
+class DriveBulkView(APIView):
+    """
+    API endpoint applying an operation (move, archive, restore, delete or share) to several files and folders
+    at once, in one transaction, with a result per item.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkOperationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        options = {"expires_at": data.get("expires_at")}
+        if data.get("target_folder") is not None:
+            options["target"] = (
+                accessible_by(DriveFolder.objects.all(), request.user).filter(pk=data["target_folder"]).first()
+            )
+            if options["target"] is None:
+                return Response({"error": "Target folder not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        files = accessible_by(DriveFile.objects.all(), request.user).in_bulk(data["files"])
+        folders = accessible_by(DriveFolder.objects.all(), request.user).in_bulk(data["folders"])
+        results = bulk.apply(
+            data["operation"],
+            request.user,
+            [(file_id, files.get(file_id)) for file_id in data["files"]],
+            [(folder_id, folders.get(folder_id)) for folder_id in data["folders"]],
+            ip_address=request.META.get("REMOTE_ADDR"),
+            **options,
+        )
+
+        succeeded = sum(result["success"] for result in results)
+        return Response(
+            {
+                "operation": data["operation"],
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results,
+            }
+        )
+
+
 class DriveShareViewSet(viewsets.ModelViewSet):
     """
     API endpoint for managing file and folder shares.
@@ -875,23 +1110,16 @@ class SharedFileDownloadView(SharedItemView):
         if not file_obj:
             return Response({"error": "No file available for download"}, status=status.HTTP_400_BAD_REQUEST)
 
-        file_path = file_obj.file.path
-
-        content_type, _ = mimetypes.guess_type(file_path)
-        content_type = content_type or "application/octet-stream"
+        response = serve_file(request, file_obj)
 
-        with open(file_path, "rb") as file:
-            response = HttpResponse(FileWrapper(file), content_type=content_type)
-            response["Content-Disposition"] = f'attachment; filename="{file_obj.name}"'
-            response["Content-Length"] = os.path.getsize(file_path)
-
-        DriveActivity.objects.create(
-            startup=file_obj.startup,
-            file=file_obj,
-            action="download",
-            details={"shared": True},
-            ip_address=request.META.get("REMOTE_ADDR"),
-        )
+        if is_new_download(response):
+            DriveActivity.objects.create(
+                startup=file_obj.startup,
+                file=file_obj,
+                action="download",
+                details={"shared": True},
+                ip_address=request.META.get("REMOTE_ADDR"),
+            )
 
         return response
 
@@ -966,18 +1194,8 @@ class StartupStorageStatsView(APIView):
                 {"error": "You do not have permission to access this startup"}, status=status.HTTP_403_FORBIDDEN
             )
 
-        files = DriveFile.objects.filter(startup=startup)
-
-        total_size = files.aggregate(total=Sum("size"))["total"] or 0
-
-        file_types = {}
-        for file in files:
-            main_type = file.file_type.split("/")[0]
-            if main_type in file_types:
-                file_types[main_type]["count"] += 1
-                file_types[main_type]["size"] += file.size
-            else:
-                file_types[main_type] = {"count": 1, "size": file.size}
+        file_types = file_type_breakdown(DriveFile.objects.filter(startup=startup))
+        total_size = sum(entry["size"] for entry in file_types.values())
 
         human_size = total_size
         for unit in ["B", "KB", "MB", "GB", "TB"]:
@@ -986,18 +1204,27 @@ class StartupStorageStatsView(APIView):
                 break
             human_size /= 1024
 
-        total_files = files.count()
-        active_files = files.filter(is_archived=False).count()
-        archived_files = files.filter(is_archived=True).count()
+        total_files = sum(entry["count"] for entry in file_types.values())
+        archived_files = sum(entry["archived_count"] for entry in file_types.values())
+        active_files = total_files - archived_files
         total_folders = DriveFolder.objects.filter(startup=startup).count()
 
-        recent_activities = DriveActivity.objects.filter(startup=startup).order_by("-timestamp")[:10]
+        recent_activities = (
+            DriveActivity.objects.filter(startup=startup)
+            .select_related("user", "file", "folder")
+            .order_by("-timestamp")[:10]
+        )
 
         return Response(
             {
                 "startup_id": startup.id,
                 "startup_name": startup.name,
-                "storage": {"total_size": total_size, "human_size": human_size, "file_types": file_types},
+                "storage": {
+                    "total_size": total_size,
+                    "human_size": human_size,
+                    "quota": settings.DRIVE_STORAGE_QUOTA or None,
+                    "file_types": file_types,
+                },
                 "counts": {
                     "total_files": total_files,
                     "active_files": active_files,
@@ -0,0 +1,95 @@
+"""
+Streaming zip archives for drive downloads.
+
+`stream_zip` produces an archive as a sequence of byte chunks without ever holding more than
+a few chunks in memory. The standard `zipfile` writer is pointed at an unseekable buffer
+that the generator drains as entries are written. This makes `zipfile` write every local
+header with a data descriptor instead of seeking back. The central directory comes last,
+when the archive is closed. Entries and archives beyond 4 GiB use the ZIP64 extensions.
+"""
+
+import io
+import os
+import zipfile
+from collections import deque
+
+CHUNK_SIZE = 1024 * 1024
+
+# Entries whose size is close to the 4 GiB limit are written with ZIP64 headers up front, since
+# an unseekable archive cannot rewrite a local header once the data turns out to be larger
+ZIP64_THRESHOLD = zipfile.ZIP64_LIMIT // 2
+
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    Write-only, unseekable file collecting what `zipfile` writes until it is drained.
+    """
+
+    def __init__(self):
+        """Create an empty buffer."""
+        super().__init__()
+        self._chunks = deque()
+        self._pending = 0
+        self._position = 0
+
+    def writable(self):
+        """The buffer only supports writing."""
+        return True
+
+    def write(self, data):
+        """Queue a copy of `data`."""
+        self._chunks.append(bytes(data))
+        self._pending += len(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        """Return the number of bytes written since the start of the archive."""
+        return self._position
+
+    @property
+    def pending(self):
+        """Number of bytes written but not drained yet."""
+        return self._pending
+
+    def drain(self):
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self._pending = 0
+        return data
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    Generate a zip archive chunk by chunk.
+
+    Args:
+        entries: Iterable of (name in the archive, path on disk, whether to compress) tuples.
+            Files missing on disk are skipped.
+        chunk_size: Number of bytes read from disk at once, also the approximate size of the yielded chunks
+
+    Yields:
+        bytes: Consecutive parts of the archive
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", allowZip64=True) as archive:
+        for name, path, compress in entries:
+            try:
+                source = open(path, "rb")  # noqa: SIM115
+            except FileNotFoundError:
+                continue
+
+            with source:
+                info = zipfile.ZipInfo.from_file(path, name, strict_timestamps=False)
+                info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+                with archive.open(info, "w", force_zip64=info.file_size > ZIP64_THRESHOLD) as target:
+                    while data := source.read(chunk_size):
+                        target.write(data)
+                        if buffer.pending >= chunk_size:
+                            yield buffer.drain()
+
+            if buffer.pending:
+                yield buffer.drain()
+
+    yield buffer.drain()
@@ -1,6 +1,17 @@
 from django.contrib import admin
 
-from .models import ProjectDislike, ProjectLike, ProjectShare, ProjectView, SiteStatistics
+from .models import (
+    AIAnalysisJob,
+    AIScoreCache,
+    ProjectDislike,
+    ProjectEngagementRollup,
+    ProjectLike,
+    ProjectShare,
+    ProjectUniqueSketch,
+    ProjectView,
+    RollupWatermark,
+    SiteStatistics,
+)
 
 
 @admin.register(SiteStatistics)
@@ -56,3 +67,57 @@ class ProjectShareAdmin(admin.ModelAdmin):
 
     def has_change_permission(self, request, obj=None):
         return False
+
+
+@admin.register(ProjectEngagementRollup)
+class ProjectEngagementRollupAdmin(admin.ModelAdmin):
+    list_display = ["project", "granularity", "bucket_start", "views", "likes", "dislikes", "shares"]
+    list_filter = ["granularity", "project"]
+    search_fields = ["project__name"]
+    date_hierarchy = "bucket_start"
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ["name", "compacted_until"]
+
+
+@admin.register(ProjectUniqueSketch)
+class ProjectUniqueSketchAdmin(admin.ModelAdmin):
+    list_display = ["project", "day", "event", "dimension"]
+    list_filter = ["event", "dimension"]
+    search_fields = ["project__name"]
+    date_hierarchy = "day"
+    exclude = ["registers"]
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AIScoreCache)
+class AIScoreCacheAdmin(admin.ModelAdmin):
+    list_display = ["investor", "startup", "backend", "score", "created_at"]
+    list_filter = ["backend"]
+    search_fields = ["investor__name", "startup__name"]
+    date_hierarchy = "created_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AIAnalysisJob)
+class AIAnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ["id", "startup", "status", "progress", "worker", "created_at", "updated_at"]
+    list_filter = ["status"]
+    search_fields = ["startup__name", "worker"]
+    date_hierarchy = "created_at"
+    exclude = ["results"]
+
+    def has_add_permission(self, request):
+        return False
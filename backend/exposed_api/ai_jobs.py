@@ -0,0 +1,251 @@
+"""
+Persistent AI analysis jobs shared by every process.
+
+An analysis request creates an `AIAnalysisJob` row, or joins the job already pending or
+processing for the same startup (a partial unique constraint guarantees there is at most
+one). Workers claim pending jobs with a conditional update, so any number of worker threads
+in any number of processes can poll the same table without running a job twice. The
+`run_ai_analysis_workers` command starts a dedicated pool. Web processes also run
+AI_ANALYSIS_LOCAL_WORKERS worker threads themselves, started by the first submission or, for
+the jobs left pending or processing by a restart, when the scheduler starts (see
+`resume_local_workers`). With AI_ANALYSIS_LOCAL_WORKERS set to 0, the command must run for
+any job to be processed.
+
+A worker refreshes `updated_at` as it reports progress. A processing job whose heartbeat is
+older than AI_ANALYSIS_STALE_AFTER seconds is considered abandoned and is claimed again.
+Finished jobs are evicted AI_ANALYSIS_JOB_TTL seconds after they completed or failed.
+"""
+
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from admin_panel.models import Investor
+
+from .ai_scoring import score_investors
+from .matching import InvestorFeatureMatrix, score_startup
+from .models import AIAnalysisJob
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CANDIDATES = 10
+
+
+def submit(startup):
+    """
+    Queue an analysis of a startup, joining the one already in flight if any.
+
+    Returns:
+        tuple: (job, created)
+    """
+    job = AIAnalysisJob.objects.filter(startup=startup, status__in=AIAnalysisJob.ACTIVE_STATUSES).first()
+    if job is not None:
+        return job, False
+
+    try:
+        with transaction.atomic():
+            job = AIAnalysisJob.objects.create(startup=startup)
+    except IntegrityError:
+        # Another request queued the same analysis concurrently
+        return AIAnalysisJob.objects.get(startup=startup, status__in=AIAnalysisJob.ACTIVE_STATUSES), False
+
+    transaction.on_commit(wake_local_workers)
+    return job, True
+
+
+def get_job(job_id):
+    """
+    Return a job that has not expired, or None.
+    """
+    expired_before = timezone.now() - timedelta(seconds=settings.AI_ANALYSIS_JOB_TTL)
+    return (
+        AIAnalysisJob.objects.filter(pk=job_id)
+        .exclude(status__in=["completed", "error"], updated_at__lt=expired_before)
+        .first()
+    )
+
+
+def claim(worker):
+    """
+    Claim the oldest pending job, or an abandoned processing one, for a worker.
+
+    Returns:
+        AIAnalysisJob: The claimed job, or None when there is nothing to do
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.AI_ANALYSIS_STALE_AFTER)
+    candidates = (
+        AIAnalysisJob.objects.filter(Q(status="pending") | Q(status="processing", updated_at__lt=stale_before))
+        .order_by("created_at")
+        .values_list("pk", "status", "updated_at")[:CLAIM_CANDIDATES]
+    )
+    for pk, status, updated_at in candidates:
+        # Only succeeds if nobody claimed or touched the job since it was read
+        claimed = AIAnalysisJob.objects.filter(pk=pk, status=status, updated_at=updated_at).update(
+            status="processing", worker=worker, progress=0, updated_at=now
+        )
+        if claimed:
+            if status == "processing":
+                logger.warning(f"Reclaimed abandoned AI analysis {pk}")
+            return AIAnalysisJob.objects.get(pk=pk)
+    return None
+
+
+def _update(job, worker, **fields):
+    """
+    Update a job claimed by `worker`, unless another worker reclaimed it meanwhile.
+    """
+    return AIAnalysisJob.objects.filter(pk=job.pk, worker=worker, status="processing").update(
+        updated_at=timezone.now(), **fields
+    )
+
+
+def run_job(job, worker):
+    """
+    Score every investor against the startup of a claimed job and store the results.
+    """
+    try:
+        startup = job.startup
+        matrix = InvestorFeatureMatrix(Investor.objects.all())
+        rule_scores = score_startup(matrix, startup)
+
+        last_progress = [0]
+
+        def report_progress(done, total):
+            progress = int((done / total) * 100) if total else 100
+            if progress != last_progress[0]:
+                last_progress[0] = progress
+                _update(job, worker, progress=min(progress, 99))
+
+        ai_results = score_investors(startup, matrix.investors, progress=report_progress)
+
+        results = []
+        for inv, (rule_score, rule_reason) in zip(matrix.investors, rule_scores, strict=True):
+            ai_score, ai_reason = ai_results[inv.id]
+
+            total_score = rule_score
+            if ai_score > 0:
+                total_score = int((rule_score + ai_score) / 2)
+
+            final_reason = rule_reason
+            if ai_score > 0:
+                final_reason += f", AI: {ai_reason}"
+
+            results.append(
+                {
+                    "investor_id": inv.id,
+                    "name": inv.name,
+                    "score": total_score,
+                    "rule_score": rule_score,
+                    "ai_score": ai_score,
+                    "reason": final_reason,
+                    "investor_type": inv.investor_type,
+                    "investment_focus": inv.investment_focus,
+                    "description": inv.description,
+                    "location": inv.address,
+                }
+            )
+
+        results.sort(key=lambda x: x["score"], reverse=True)
+        results = [match for match in results if match["score"] >= 5]
+
+        _update(job, worker, status="completed", progress=100, results=results)
+    except Exception as e:
+        logger.exception(f"AI analysis {job.pk} failed")
+        _update(job, worker, status="error", progress=0, error=str(e), results=[])
+
+
+def evict_expired():
+    """
+    Delete the jobs that finished more than AI_ANALYSIS_JOB_TTL seconds ago.
+
+    Returns:
+        int: Number of deleted jobs
+    """
+    expired_before = timezone.now() - timedelta(seconds=settings.AI_ANALYSIS_JOB_TTL)
+    deleted, _ = AIAnalysisJob.objects.filter(
+        status__in=["completed", "error"], updated_at__lt=expired_before
+    ).delete()
+    return deleted
+
+
+class WorkerPool:
+    """
+    Threads claiming and running AI analysis jobs until stopped.
+    """
+
+    def __init__(self, size, poll_interval=None, name=None):
+        """Prepare `size` workers polling the job table every `poll_interval` seconds when idle."""
+        self.size = size
+        self.poll_interval = poll_interval or settings.AI_ANALYSIS_POLL_INTERVAL
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def start(self):
+        """Start the worker threads."""
+        for index in range(self.size):
+            thread = threading.Thread(target=self._work, args=(f"{self.name}:{index}",), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def wake(self):
+        """Make idle workers poll immediately."""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        """Ask the workers to stop once their current job is done and wait for them."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _work(self, worker):
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                job = claim(worker)
+                if job is not None:
+                    run_job(job, worker)
+                    continue
+            except Exception as e:
+                logger.error(f"AI analysis worker {worker} failed: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+        close_old_connections()
+
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+
+def wake_local_workers():
+    """
+    Start the worker threads of this process on first use and wake them up.
+    """
+    global _local_pool
+
+    if settings.AI_ANALYSIS_LOCAL_WORKERS <= 0:
+        return
+    if _local_pool is None:
+        with _local_pool_lock:
+            if _local_pool is None:
+                _local_pool = WorkerPool(settings.AI_ANALYSIS_LOCAL_WORKERS)
+                _local_pool.start()
+    _local_pool.wake()
+
+
+def resume_local_workers():
+    """
+    Start the worker threads of this process if jobs are waiting, e.g. left pending or abandoned by a restart.
+    """
+    if AIAnalysisJob.objects.filter(status__in=AIAnalysisJob.ACTIVE_STATUSES).exists():
+        wake_local_workers()
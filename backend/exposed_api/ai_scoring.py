@@ -0,0 +1,309 @@
+"""
+AI compatibility scoring of investors and startups.
+
+Completion requests go through a pluggable backend: "groq" sends the prompt to the Groq API
+with a single client shared by the process, "stub" answers locally with a deterministic score
+after an optional simulated latency and rate limiting. This lets the whole pipeline be
+load-tested offline. Transient failures (rate limits, timeouts, server errors) are retried
+with exponential backoff and jitter, honouring the Retry-After header when the API sends one.
+
+Requests run on a process-wide thread pool of AI_SCORING_CONCURRENCY workers, which bounds
+the number of calls in flight across every analysis. Scores are cached in `AIScoreCache` per
+investor, startup and backend along with the hash of the prompt. A cached score is reused
+until the investor or startup data used by the prompt changes.
+"""
+
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import groq
+from django.conf import settings
+
+from .models import AIScoreCache
+
+logger = logging.getLogger(__name__)
+
+UNAVAILABLE = (0, "AI unavailable")
+
+
+class TransientScoringError(Exception):
+    """
+    A completion request failed in a way that is worth retrying.
+    """
+
+    def __init__(self, message, retry_after=None):
+        """Keep the delay in seconds suggested by the API, if any."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GroqBackend:
+    """
+    Backend sending prompts to the Groq chat completion API.
+    """
+
+    def __init__(self, model):
+        """Create the backend, the client itself is created on first use."""
+        self.model = model
+        self.name = f"groq:{model}"
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Groq client shared by every request of the process."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Retries are handled by request_score so that every backend gets the same policy
+                    self._client = groq.Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+        return self._client
+
+    def complete(self, prompt):
+        """Return the completion of a prompt."""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model, messages=[{"role": "user", "content": prompt}], max_tokens=150, temperature=0.5
+            )
+        except groq.RateLimitError as e:
+            retry_after = e.response.headers.get("retry-after")
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise TransientScoringError(str(e), retry_after) from e
+        except (groq.APIConnectionError, groq.InternalServerError) as e:
+            raise TransientScoringError(str(e)) from e
+        return response.choices[0].message.content.strip()
+
+
+class StubBackend:
+    """
+    Local backend answering with a score derived from the prompt, for tests and load tests.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, rate_limit_ratio=0.0):
+        """Simulate `latency` seconds per request and rate limit a `rate_limit_ratio` share of them."""
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt):
+        """Return a deterministic completion of a prompt."""
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_ratio and random.random() < self.rate_limit_ratio:
+            raise TransientScoringError("Simulated rate limit", retry_after=self.latency)
+        score = int(hashlib.sha256(prompt.encode()).hexdigest()[:8], 16) % 101
+        return f"Score: {score}, Reason: Simulated analysis"
+
+
+_backend = None
+_executor = None
+_setup_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Return the scoring backend configured by AI_SCORING_BACKEND.
+    """
+    global _backend
+
+    if _backend is None:
+        with _setup_lock:
+            if _backend is None:
+                if settings.AI_SCORING_BACKEND == "stub":
+                    _backend = StubBackend(
+                        latency=settings.AI_SCORING_STUB_LATENCY, rate_limit_ratio=settings.AI_SCORING_STUB_RATE_LIMIT
+                    )
+                else:
+                    _backend = GroqBackend(settings.AI_SCORING_MODEL)
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the scoring backend of the process, mostly useful for tests and benchmarks.
+    """
+    global _backend
+    _backend = backend
+
+
+def reset():
+    """
+    Drop the backend and the thread pool of the process so they are recreated from the settings.
+    """
+    global _backend, _executor
+
+    with _setup_lock:
+        executor, _backend, _executor = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def get_executor():
+    """
+    Return the thread pool shared by every analysis of the process.
+    """
+    global _executor
+
+    if _executor is None:
+        with _setup_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.AI_SCORING_CONCURRENCY, thread_name_prefix="ai-scoring"
+                )
+    return _executor
+
+
+def build_prompt(investor, startup):
+    """
+    Prompt asking for the compatibility of an investor and a startup.
+    """
+    return f"""
+Analyze the compatibility between this investor and startup on a scale of 0-100.
+
+Investor:
+- Name: {investor.name}
+- Type: {investor.investor_type or 'N/A'}
+- Focus: {investor.investment_focus or 'N/A'}
+- Description: {investor.description or 'N/A'}
+- Location: {investor.address or 'N/A'}
+
+Startup:
+- Name: {startup.name}
+- Sector: {startup.sector or 'N/A'}
+- Maturity: {startup.maturity or 'N/A'}
+- Needs: {startup.needs or 'N/A'}
+- Description: {startup.description or 'N/A'}
+- Location: {startup.address or 'N/A'}
+
+Provide a score (0-100) and a brief reason for the match.
+Format: Score: X, Reason: explanation
+"""
+
+
+def parse_response(content):
+    """
+    Extract (score, reason) from a "Score: X, Reason: explanation" completion.
+    """
+    if "Score:" in content and "Reason:" in content:
+        score_part = content.split("Score:")[1].split(",")[0].strip()
+        reason_part = content.split("Reason:")[1].strip()
+        try:
+            return int(score_part), reason_part
+        except ValueError:
+            pass
+    return 50, "AI analysis: Moderate match"
+
+
+def prompt_hash(backend, prompt):
+    """
+    Cache key of a prompt for a backend.
+    """
+    return hashlib.sha256(f"{backend.name}\n{prompt}".encode()).hexdigest()
+
+
+def request_score(backend, prompt):
+    """
+    Score a prompt, retrying transient failures with exponential backoff.
+
+    Returns:
+        tuple: (score, reason), UNAVAILABLE when the backend keeps failing
+    """
+    retries = settings.AI_SCORING_MAX_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return parse_response(backend.complete(prompt))
+        except TransientScoringError as e:
+            if attempt == retries:
+                logger.warning(f"AI scoring failed after {attempt + 1} attempts: {e}")
+                return UNAVAILABLE
+            delay = settings.AI_SCORING_BACKOFF * 2**attempt
+            delay = max(delay, e.retry_after or 0) + random.uniform(0, delay)
+            time.sleep(min(delay, settings.AI_SCORING_MAX_BACKOFF))
+        except Exception as e:
+            logger.warning(f"AI scoring failed: {e}")
+            return UNAVAILABLE
+    return UNAVAILABLE
+
+
+def score_investors(startup, investors, progress=None):
+    """
+    AI scores of many investors for one startup, from the cache or computed concurrently.
+
+    Args:
+        startup: StartupDetail instance
+        investors: Iterable of Investor instances
+        progress: Optional callable receiving (scored investors, total investors) as results arrive
+
+    Returns:
+        dict: Mapping of investor id to (score, reason)
+    """
+    backend = get_backend()
+    investors = list(investors)
+    prompts = {investor.id: build_prompt(investor, startup) for investor in investors}
+    hashes = {investor_id: prompt_hash(backend, prompt) for investor_id, prompt in prompts.items()}
+
+    results = {}
+    for investor_id, hashed, score, reason in AIScoreCache.objects.filter(
+        startup=startup, backend=backend.name
+    ).values_list("investor_id", "prompt_hash", "score", "reason"):
+        if hashes.get(investor_id) == hashed:
+            results[investor_id] = (score, reason)
+
+    total = len(investors)
+    if progress:
+        progress(len(results), total)
+
+    missing = [investor_id for investor_id in prompts if investor_id not in results]
+    futures = {
+        get_executor().submit(request_score, backend, prompts[investor_id]): investor_id for investor_id in missing
+    }
+    computed = {}
+    for future in as_completed(futures):
+        investor_id = futures[future]
+        results[investor_id] = computed[investor_id] = future.result()
+        if progress:
+            progress(len(results), total)
+
+    cacheable = {investor_id: result for investor_id, result in computed.items() if result != UNAVAILABLE}
+    if cacheable:
+        AIScoreCache.objects.bulk_create(
+            [
+                AIScoreCache(
+                    investor_id=investor_id,
+                    startup=startup,
+                    backend=backend.name,
+                    prompt_hash=hashes[investor_id],
+                    score=score,
+                    reason=reason,
+                )
+                for investor_id, (score, reason) in cacheable.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["investor", "startup", "backend"],
+            update_fields=["prompt_hash", "score", "reason", "created_at"],
+        )
+
+    return results
+
+
+def score_pair(investor, startup):
+    """
+    AI score of one investor for one startup.
+
+    Returns:
+        tuple: (score, reason)
+    """
+    return score_investors(startup, [investor])[investor.id]
@@ -4,8 +4,8 @@ from datetime import timedelta
 from auditlog.models import AuditLog
 from authentication.models import CustomUser
 from authentication.permissions import IsAdmin, IsAdminOrFounder
-from django.db.models import Count, F, Q
-from django.db.models.functions import TruncDay, TruncMonth
+from django.conf import settings
+from django.db.models import Q
 from django.http import JsonResponse
 from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
@@ -15,7 +15,45 @@ from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, Ou
 from admin_panel.models import Event, StartupDetail
 
 from .models import ProjectDislike, ProjectLike, ProjectShare, ProjectView, SiteStatistics
+from .rollups import engagement_by_project, engagement_over_time, engagement_totals
 from .serializers import ProjectEngagementStatsSerializer, ProjectViewStatsSerializer
+from .sketches import covered_start, unique_counts
+from .view_buffer import get_view_buffer
+
+PERIOD_DELTAS = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+
+def _period_start(period, now):
+    """
+    Return the beginning of a named period ending at `now`, or None for "all" and unknown periods.
+    """
+    delta = PERIOD_DELTAS.get(period)
+    return now - delta if delta else None
+
+
+def _wants_exact(request):
+    """
+    Whether the caller asked for exact distinct counts (`?exact=true`) instead of sketch estimates.
+    """
+    return request.GET.get("exact", "").lower() in ("1", "true", "yes")
+
+
+def _stats_start(request, period, now):
+    """
+    Return the beginning of the period of a stats endpoint, or None for all time.
+
+    Sketch estimates cover whole local days, so unless exact figures are asked for, the period starts
+    at the local midnight of its first day and the totals reported with the estimates cover it too.
+    """
+    start = _period_start(period, now)
+    if start and not _wants_exact(request):
+        start = covered_start(start)
+    return start
 
 
 @api_view(["GET"])
@@ -73,18 +111,12 @@ def projects_visibility(request):
     now = timezone.now()
     last_6_months = now - timedelta(days=180)
 
-    monthly_views = (
-        ProjectView.objects.filter(timestamp__gte=last_6_months)
-        .annotate(month=TruncMonth("timestamp"))
-        .values("month")
-        .annotate(views=Count("id"))
-        .order_by("month")
-    )
+    monthly_views = engagement_over_time(["views"], "month", start=last_6_months)
 
     data = []
-    for item in monthly_views:
-        month_name = item["month"].strftime("%B")
-        data.append({"month": month_name, "views": item["views"]})
+    for month, counts in monthly_views:
+        month_name = month.strftime("%B")
+        data.append({"month": month_name, "views": counts["views"]})
 
     if len(data) < 6:
         all_months = []
@@ -161,11 +193,9 @@ def monthly_stats(request):
         ProjectView.objects.filter(timestamp__gte=first_day_of_month).values("session_key").distinct().count()
     )
 
-    total_views_this_month = ProjectView.objects.filter(timestamp__gte=first_day_of_month).count()
+    total_views_this_month = engagement_totals(["views"], start=first_day_of_month)["views"]
 
-    active_projects = (
-        ProjectView.objects.filter(timestamp__gte=first_day_of_month).values("project").distinct().count()
-    )
+    active_projects = len(engagement_by_project(["views"], start=first_day_of_month))
 
     avg_views_per_project = 0
     if active_projects > 0:
@@ -202,26 +232,24 @@ def project_view_stats(request, project_id=None):
     period = request.GET.get("period", "all")
 
     now = timezone.now()
-    date_filter = Q()
-
-    if period == "day":
-        date_filter = Q(timestamp__gte=now - timedelta(days=1))
-    elif period == "week":
-        date_filter = Q(timestamp__gte=now - timedelta(weeks=1))
-    elif period == "month":
-        date_filter = Q(timestamp__gte=now - timedelta(days=30))
-    elif period == "year":
-        date_filter = Q(timestamp__gte=now - timedelta(days=365))
+    start = _stats_start(request, period, now)
+    date_filter = Q(timestamp__gte=start) if start else Q()
 
     queryset = ProjectView.objects.filter(date_filter)
 
     if project_id:
         queryset = queryset.filter(project_id=project_id)
 
-    total_views = queryset.count()
-    unique_users = queryset.filter(user__isnull=False).values("user").distinct().count()
-    unique_ips = queryset.exclude(ip_address__isnull=True).values("ip_address").distinct().count()
-    unique_sessions = queryset.exclude(session_key__isnull=True).values("session_key").distinct().count()
+    total_views = engagement_totals(["views"], start=start, project_id=project_id)["views"]
+    if _wants_exact(request):
+        unique_users = queryset.filter(user__isnull=False).values("user").distinct().count()
+        unique_ips = queryset.exclude(ip_address__isnull=True).values("ip_address").distinct().count()
+        unique_sessions = queryset.exclude(session_key__isnull=True).values("session_key").distinct().count()
+    else:
+        estimates = unique_counts("views", ["user", "ip", "session"], start=start, project_id=project_id)
+        unique_users = estimates["user"]
+        unique_ips = estimates["ip"]
+        unique_sessions = estimates["session"]
 
     data = {
         "total_views": total_views,
@@ -230,10 +258,8 @@ def project_view_stats(request, project_id=None):
         "unique_sessions": unique_sessions,
     }
 
-    if period != "all":
-        data["period_start"] = (
-            now - timedelta(days=1 if period == "day" else 7 if period == "week" else 30 if period == "month" else 365)
-        ).isoformat()
+    if start:
+        data["period_start"] = start.isoformat()
         data["period_end"] = now.isoformat()
 
     serializer = ProjectViewStatsSerializer(data=data)
@@ -251,41 +277,20 @@ def most_viewed_projects(request):
     period = request.GET.get("period", "month")
     limit = int(request.GET.get("limit", 5))
 
-    now = timezone.now()
-    date_filter = Q()
-
-    if period == "day":
-        date_filter = Q(timestamp__gte=now - timedelta(days=1))
-    elif period == "week":
-        date_filter = Q(timestamp__gte=now - timedelta(weeks=1))
-    elif period == "month":
-        date_filter = Q(timestamp__gte=now - timedelta(days=30))
-    elif period == "year":
-        date_filter = Q(timestamp__gte=now - timedelta(days=365))
-    elif period == "all":
-        date_filter = Q()
-
-    most_viewed = (
-        ProjectView.objects.filter(date_filter)
-        .values("project")
-        .annotate(total_views=Count("id"))
-        .order_by("-total_views")[:limit]
+    start = _period_start(period, timezone.now())
+
+    views_per_project = engagement_by_project(["views"], start=start)
+    most_viewed = sorted(views_per_project.items(), key=lambda item: item[1]["views"], reverse=True)[:limit]
+
+    names = dict(
+        StartupDetail.objects.filter(id__in=[project_id for project_id, _ in most_viewed]).values_list("id", "name")
     )
 
-    result = []
-    for item in most_viewed:
-        project_id = item["project"]
-        try:
-            project = StartupDetail.objects.get(id=project_id)
-            result.append(
-                {
-                    "id": project.id,
-                    "name": project.name,
-                    "total_views": item["total_views"],
-                }
-            )
-        except StartupDetail.DoesNotExist:
-            continue
+    result = [
+        {"id": project_id, "name": names[project_id], "total_views": counts["views"]}
+        for project_id, counts in most_viewed
+        if project_id in names
+    ]
 
     return JsonResponse(result, safe=False)
 
@@ -302,39 +307,11 @@ def project_views_over_time(request, project_id=None):
     grouping = request.GET.get("grouping", "month")
     period = request.GET.get("period", "year")
 
-    now = timezone.now()
-    date_filter = Q()
-
-    if period == "month":
-        date_filter = Q(timestamp__gte=now - timedelta(days=30))
-    elif period == "year":
-        date_filter = Q(timestamp__gte=now - timedelta(days=365))
-    elif period == "all":
-        date_filter = Q()
-    elif period == "week":
-        date_filter = Q(timestamp__gte=now - timedelta(weeks=1))
+    start = _period_start(period, timezone.now())
 
-    queryset = ProjectView.objects.filter(date_filter)
-
-    if project_id:
-        queryset = queryset.filter(project_id=project_id)
-
-    if grouping == "day":
-        queryset = (
-            queryset.annotate(period=TruncDay("timestamp"))
-            .values("period")
-            .annotate(views=Count("id"))
-            .order_by("period")
-        )
-    else:
-        queryset = (
-            queryset.annotate(period=TruncMonth("timestamp"))
-            .values("period")
-            .annotate(views=Count("id"))
-            .order_by("period")
-        )
+    views_over_time = engagement_over_time(["views"], grouping, start=start, project_id=project_id)
 
-    result = [{"period": item["period"].isoformat(), "views": item["views"]} for item in queryset]
+    result = [{"period": period.isoformat(), "views": counts["views"]} for period, counts in views_over_time]
 
     return JsonResponse(result, safe=False)
 
@@ -351,9 +328,12 @@ def project_views_count(request, project_id):
     except StartupDetail.DoesNotExist:
         return JsonResponse({"error": f"Project with id {project_id} not found"}, status=404)
 
-    total_views = ProjectView.objects.filter(project_id=project_id).count()
+    total_views = engagement_totals(["views"], project_id=project_id)["views"]
 
-    unique_views = ProjectView.objects.filter(project_id=project_id).values("ip_address").distinct().count()
+    if _wants_exact(request):
+        unique_views = ProjectView.objects.filter(project_id=project_id).values("ip_address").distinct().count()
+    else:
+        unique_views = unique_counts("views", ["ip"], project_id=project_id)["ip"]
 
     return JsonResponse({"project_id": project_id, "total_views": total_views, "unique_views": unique_views})
 
@@ -370,28 +350,34 @@ def project_engagement_count(request, project_id):
     except StartupDetail.DoesNotExist:
         return JsonResponse({"error": f"Project with id {project_id} not found"}, status=404)
 
-    total_likes = ProjectLike.objects.filter(project_id=project_id).count()
-    total_dislikes = ProjectDislike.objects.filter(project_id=project_id).count()
-    total_shares = ProjectShare.objects.filter(project_id=project_id).count()
-
-    unique_likers = (
-        ProjectLike.objects.filter(project_id=project_id)
-        .values("user", "ip_address", "session_key")
-        .distinct()
-        .count()
-    )
-    unique_dislikers = (
-        ProjectDislike.objects.filter(project_id=project_id)
-        .values("user", "ip_address", "session_key")
-        .distinct()
-        .count()
-    )
-    unique_sharers = (
-        ProjectShare.objects.filter(project_id=project_id)
-        .values("user", "ip_address", "session_key")
-        .distinct()
-        .count()
-    )
+    totals = engagement_totals(["likes", "dislikes", "shares"], project_id=project_id)
+    total_likes = totals["likes"]
+    total_dislikes = totals["dislikes"]
+    total_shares = totals["shares"]
+
+    if _wants_exact(request):
+        unique_likers = (
+            ProjectLike.objects.filter(project_id=project_id)
+            .values("user", "ip_address", "session_key")
+            .distinct()
+            .count()
+        )
+        unique_dislikers = (
+            ProjectDislike.objects.filter(project_id=project_id)
+            .values("user", "ip_address", "session_key")
+            .distinct()
+            .count()
+        )
+        unique_sharers = (
+            ProjectShare.objects.filter(project_id=project_id)
+            .values("user", "ip_address", "session_key")
+            .distinct()
+            .count()
+        )
+    else:
+        unique_likers = unique_counts("likes", ["actor"], project_id=project_id)["actor"]
+        unique_dislikers = unique_counts("dislikes", ["actor"], project_id=project_id)["actor"]
+        unique_sharers = unique_counts("shares", ["actor"], project_id=project_id)["actor"]
 
     return JsonResponse(
         {
@@ -418,16 +404,8 @@ def project_engagement_stats(request, project_id=None):
     period = request.GET.get("period", "all")
 
     now = timezone.now()
-    date_filter = Q()
-
-    if period == "day":
-        date_filter = Q(timestamp__gte=now - timedelta(days=1))
-    elif period == "week":
-        date_filter = Q(timestamp__gte=now - timedelta(weeks=1))
-    elif period == "month":
-        date_filter = Q(timestamp__gte=now - timedelta(days=30))
-    elif period == "year":
-        date_filter = Q(timestamp__gte=now - timedelta(days=365))
+    start = _stats_start(request, period, now)
+    date_filter = Q(timestamp__gte=start) if start else Q()
 
     likes_queryset = ProjectLike.objects.filter(date_filter)
     dislikes_queryset = ProjectDislike.objects.filter(date_filter)
@@ -438,13 +416,19 @@ def project_engagement_stats(request, project_id=None):
         dislikes_queryset = dislikes_queryset.filter(project_id=project_id)
         shares_queryset = shares_queryset.filter(project_id=project_id)
 
-    total_likes = likes_queryset.count()
-    total_dislikes = dislikes_queryset.count()
-    total_shares = shares_queryset.count()
+    totals = engagement_totals(["likes", "dislikes", "shares"], start=start, project_id=project_id)
+    total_likes = totals["likes"]
+    total_dislikes = totals["dislikes"]
+    total_shares = totals["shares"]
 
-    unique_likers = likes_queryset.values("user", "ip_address", "session_key").distinct().count()
-    unique_dislikers = dislikes_queryset.values("user", "ip_address", "session_key").distinct().count()
-    unique_sharers = shares_queryset.values("user", "ip_address", "session_key").distinct().count()
+    if _wants_exact(request):
+        unique_likers = likes_queryset.values("user", "ip_address", "session_key").distinct().count()
+        unique_dislikers = dislikes_queryset.values("user", "ip_address", "session_key").distinct().count()
+        unique_sharers = shares_queryset.values("user", "ip_address", "session_key").distinct().count()
+    else:
+        unique_likers = unique_counts("likes", ["actor"], start=start, project_id=project_id)["actor"]
+        unique_dislikers = unique_counts("dislikes", ["actor"], start=start, project_id=project_id)["actor"]
+        unique_sharers = unique_counts("shares", ["actor"], start=start, project_id=project_id)["actor"]
 
     data = {
         "total_likes": total_likes,
@@ -455,10 +439,8 @@ def project_engagement_stats(request, project_id=None):
         "unique_sharers": unique_sharers,
     }
 
-    if period != "all":
-        data["period_start"] = (
-            now - timedelta(days=1 if period == "day" else 7 if period == "week" else 30 if period == "month" else 365)
-        ).isoformat()
+    if start:
+        data["period_start"] = start.isoformat()
         data["period_end"] = now.isoformat()
 
     serializer = ProjectEngagementStatsSerializer(data=data)
@@ -476,65 +458,27 @@ def most_engaged_projects(request):
     period = request.GET.get("period", "month")
     limit = int(request.GET.get("limit", 5))
 
-    now = timezone.now()
-    date_filter = Q()
-
-    if period == "day":
-        date_filter = Q(timestamp__gte=now - timedelta(days=1))
-    elif period == "week":
-        date_filter = Q(timestamp__gte=now - timedelta(weeks=1))
-    elif period == "month":
-        date_filter = Q(timestamp__gte=now - timedelta(days=30))
-    elif period == "year":
-        date_filter = Q(timestamp__gte=now - timedelta(days=365))
-    elif period == "all":
-        date_filter = Q()
-
-    likes_data = ProjectLike.objects.filter(date_filter).values("project").annotate(likes_count=Count("id"))
-
-    dislikes_data = ProjectDislike.objects.filter(date_filter).values("project").annotate(dislikes_count=Count("id"))
+    start = _period_start(period, timezone.now())
 
-    shares_data = ProjectShare.objects.filter(date_filter).values("project").annotate(shares_count=Count("id"))
+    project_engagement = engagement_by_project(["likes", "dislikes", "shares"], start=start)
 
-    project_engagement = {}
-
-    for item in likes_data:
-        project_id = item["project"]
-        project_engagement[project_id] = {
-            "likes": item["likes_count"],
-            "dislikes": 0,
-            "shares": 0,
-        }
-
-    for item in dislikes_data:
-        project_id = item["project"]
-        if project_id not in project_engagement:
-            project_engagement[project_id] = {"likes": 0, "dislikes": 0, "shares": 0}
-        project_engagement[project_id]["dislikes"] = item["dislikes_count"]
-
-    for item in shares_data:
-        project_id = item["project"]
-        if project_id not in project_engagement:
-            project_engagement[project_id] = {"likes": 0, "dislikes": 0, "shares": 0}
-        project_engagement[project_id]["shares"] = item["shares_count"]
+    names = dict(StartupDetail.objects.filter(id__in=list(project_engagement)).values_list("id", "name"))
 
     result = []
     for project_id, counts in project_engagement.items():
-        engagement_score = counts["likes"] + counts["shares"] - counts["dislikes"]
-        try:
-            project = StartupDetail.objects.get(id=project_id)
-            result.append(
-                {
-                    "id": project.id,
-                    "name": project.name,
-                    "likes": counts["likes"],
-                    "dislikes": counts["dislikes"],
-                    "shares": counts["shares"],
-                    "engagement_score": engagement_score,
-                }
-            )
-        except StartupDetail.DoesNotExist:
+        if project_id not in names:
             continue
+        engagement_score = counts["likes"] + counts["shares"] - counts["dislikes"]
+        result.append(
+            {
+                "id": project_id,
+                "name": names[project_id],
+                "likes": counts["likes"],
+                "dislikes": counts["dislikes"],
+                "shares": counts["shares"],
+                "engagement_score": engagement_score,
+            }
+        )
 
     result.sort(key=lambda x: x["engagement_score"], reverse=True)
     result = result[:limit]
@@ -554,95 +498,35 @@ def project_engagement_over_time(request, project_id=None):
     grouping = request.GET.get("grouping", "month")
     period = request.GET.get("period", "year")
 
-    now = timezone.now()
-    date_filter = Q()
-
-    if period == "month":
-        date_filter = Q(timestamp__gte=now - timedelta(days=30))
-    elif period == "year":
-        date_filter = Q(timestamp__gte=now - timedelta(days=365))
-    elif period == "all":
-        date_filter = Q()
-    elif period == "week":
-        date_filter = Q(timestamp__gte=now - timedelta(weeks=1))
-
-    likes_queryset = ProjectLike.objects.filter(date_filter)
-    dislikes_queryset = ProjectDislike.objects.filter(date_filter)
-    shares_queryset = ProjectShare.objects.filter(date_filter)
-
-    if project_id:
-        likes_queryset = likes_queryset.filter(project_id=project_id)
-        dislikes_queryset = dislikes_queryset.filter(project_id=project_id)
-        shares_queryset = shares_queryset.filter(project_id=project_id)
-
-    if grouping == "day":
-        likes_data = (
-            likes_queryset.annotate(period=TruncDay("timestamp"))
-            .values("period")
-            .annotate(likes=Count("id"))
-            .order_by("period")
-        )
-        dislikes_data = (
-            dislikes_queryset.annotate(period=TruncDay("timestamp"))
-            .values("period")
-            .annotate(dislikes=Count("id"))
-            .order_by("period")
-        )
-        shares_data = (
-            shares_queryset.annotate(period=TruncDay("timestamp"))
-            .values("period")
-            .annotate(shares=Count("id"))
-            .order_by("period")
-        )
-    else:
-        likes_data = (
-            likes_queryset.annotate(period=TruncMonth("timestamp"))
-            .values("period")
-            .annotate(likes=Count("id"))
-            .order_by("period")
-        )
-        dislikes_data = (
-            dislikes_queryset.annotate(period=TruncMonth("timestamp"))
-            .values("period")
-            .annotate(dislikes=Count("id"))
-            .order_by("period")
-        )
-        shares_data = (
-            shares_queryset.annotate(period=TruncMonth("timestamp"))
-            .values("period")
-            .annotate(shares=Count("id"))
-            .order_by("period")
-        )
-
-    engagement_data = {}
+    start = _period_start(period, timezone.now())
 
-    for item in likes_data:
-        period = item["period"].isoformat()
-        if period not in engagement_data:
-            engagement_data[period] = {"likes": 0, "dislikes": 0, "shares": 0}
-        engagement_data[period]["likes"] = item["likes"]
-
-    for item in dislikes_data:
-        period = item["period"].isoformat()
-        if period not in engagement_data:
-            engagement_data[period] = {"likes": 0, "dislikes": 0, "shares": 0}
-        engagement_data[period]["dislikes"] = item["dislikes"]
-
-    for item in shares_data:
-        period = item["period"].isoformat()
-        if period not in engagement_data:
-            engagement_data[period] = {"likes": 0, "dislikes": 0, "shares": 0}
-        engagement_data[period]["shares"] = item["shares"]
+    engagement_data = engagement_over_time(
+        ["likes", "dislikes", "shares"], grouping, start=start, project_id=project_id
+    )
 
     result = [
         {
-            "period": period,
+            "period": period.isoformat(),
             "likes": data["likes"],
             "dislikes": data["dislikes"],
             "shares": data["shares"],
             "engagement_score": data["likes"] + data["shares"] - data["dislikes"],
         }
-        for period, data in engagement_data.items()
+        for period, data in engagement_data
     ]
 
     return JsonResponse(result, safe=False)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def view_buffer_stats(request):
+    """
+    API endpoint that returns the counters of the project view buffer of the worker serving the request
+    (buffer depth, flush counts and flush latency).
+    This endpoint requires admin privileges.
+    """
+    if not settings.VIEW_BUFFER_ENABLED:
+        return JsonResponse({"enabled": False})
+
+    return JsonResponse({"enabled": True, **get_view_buffer().stats()})
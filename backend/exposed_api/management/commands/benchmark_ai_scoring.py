@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from admin_panel.models import Investor, StartupDetail
+from backend.benchmarking import isolated_database, time_call
+from exposed_api import ai_scoring
+from exposed_api.ai_scoring import StubBackend, score_investors
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the AI scoring pipeline offline with the stub backend: cold analyses at several concurrency "
+        "levels, then a cached analysis. Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--investors", type=int, default=200, help="Number of synthetic investors")
+        parser.add_argument("--latency", type=float, default=0.2, help="Simulated latency of a request in seconds")
+        parser.add_argument(
+            "--rate-limit", type=float, default=0.05, help="Share of requests answered with a rate limit error"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Numbers of concurrent requests to test"
+        )
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            Investor.objects.bulk_create(
+                [
+                    Investor(
+                        id=index,
+                        name=f"Investor {index}",
+                        email=f"investor{index}@example.com",
+                        investment_focus=f"focus {index % 17}",
+                    )
+                    for index in range(1, options["investors"] + 1)
+                ]
+            )
+            investors = list(Investor.objects.all())
+
+            for concurrency in options["concurrency"]:
+                startup = StartupDetail.objects.create(
+                    id=concurrency, name=f"Startup {concurrency}", email=f"startup{concurrency}@example.com"
+                )
+                backend = StubBackend(latency=options["latency"], rate_limit_ratio=options["rate_limit"])
+                ai_scoring.reset()
+                ai_scoring.set_backend(backend)
+                with override_settings(AI_SCORING_CONCURRENCY=concurrency, AI_SCORING_BACKOFF=options["latency"]):
+                    _, cold_ms = time_call(score_investors, startup, investors)
+                    _, warm_ms = time_call(score_investors, startup, investors)
+                self.stdout.write(
+                    f"concurrency={concurrency:<3} cold={cold_ms:9.0f}ms ({backend.calls} requests)  "
+                    f"cached={warm_ms:7.1f}ms"
+                )
+
+            ai_scoring.reset()
+        self.stdout.write(self.style.SUCCESS("Benchmark done"))
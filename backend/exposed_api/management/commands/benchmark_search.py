@@ -0,0 +1,113 @@
+import random
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from admin_panel.models import Event, Founder, NewsDetail, StartupDetail
+from backend.benchmarking import format_summary, isolated_database, time_call
+from exposed_api.search_index import rebuild_index
+from exposed_api.search_views import AdvancedSearchView
+
+SECTORS = ["Tech", "Healthcare", "Energy", "Finance", "Education", "Retail", "Mobility", "Food", "Media", "Space"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the advanced search on synthetic data, comparing the full scan path with the inverted index. "
+        "Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[10000, 100000], help="Numbers of synthetic documents to test"
+        )
+        parser.add_argument("--queries", type=int, default=20, help="Number of queries per path and size")
+        parser.add_argument("--vocabulary", type=int, default=5000, help="Number of distinct synthetic words")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        vocabulary = [f"word{index}" for index in range(options["vocabulary"])]
+        # Zipf-like weights so that a few words are frequent and most are rare
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+        for size in options["sizes"]:
+            with isolated_database():
+                self.populate(rng, vocabulary, weights, size)
+                indexed, build_ms = time_call(rebuild_index)
+                self.stdout.write(f"\n{size} documents, index of {indexed} documents built in {build_ms:.0f}ms")
+
+                queries = [
+                    " ".join(rng.choices(vocabulary[50:1000], k=rng.randint(1, 2))) for _ in range(options["queries"])
+                ]
+                view = AdvancedSearchView()
+                factory = APIRequestFactory()
+                for label, method in (("scan", view.search_with_scan), ("index", view.search_with_index)):
+                    samples = []
+                    for query in queries:
+                        request = Request(factory.get("/api/search/", {"search": query, "page_size": 10}))
+                        _, elapsed = time_call(self.first_page, view, method, request, query)
+                        samples.append(elapsed)
+                    self.stdout.write(format_summary(f"{label} ({size} docs)", samples))
+
+    @staticmethod
+    def first_page(view, method, request, query):
+        results = method(request, query, None)
+        return view.pagination_class().paginate_queryset(results, request)
+
+    def populate(self, rng, vocabulary, weights, size):
+        """
+        Insert `size` synthetic projects, events and news plus founders for a tenth of the projects.
+        """
+
+        def words(count):
+            return " ".join(rng.choices(vocabulary, weights=weights, k=count))
+
+        projects = size // 2
+        events = size // 4
+        news = size - projects - events
+
+        StartupDetail.objects.bulk_create(
+            [
+                StartupDetail(
+                    id=index,
+                    name=words(3),
+                    email=f"project{index}@example.com",
+                    description=words(30),
+                    sector=rng.choice(SECTORS),
+                    needs=words(8),
+                )
+                for index in range(1, projects + 1)
+            ],
+            batch_size=2000,
+        )
+        Event.objects.bulk_create(
+            [
+                Event(id=index, name=words(3), description=words(30), event_type=rng.choice(SECTORS), location="Paris")
+                for index in range(1, events + 1)
+            ],
+            batch_size=2000,
+        )
+        NewsDetail.objects.bulk_create(
+            [
+                NewsDetail(id=index, title=words(5), description=words(30), category=rng.choice(SECTORS))
+                for index in range(1, news + 1)
+            ],
+            batch_size=2000,
+        )
+
+        founders = Founder.objects.bulk_create(
+            [
+                Founder(id=index, name=f"{words(1)} {words(1)}", startup_id=index * 10)
+                for index in range(1, projects // 10 + 1)
+            ],
+            batch_size=2000,
+        )
+        StartupDetail.founders.through.objects.bulk_create(
+            [
+                StartupDetail.founders.through(startupdetail_id=founder.startup_id, founder_id=founder.id)
+                for founder in founders
+            ],
+            batch_size=2000,
+        )
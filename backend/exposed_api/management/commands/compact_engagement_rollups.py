@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from exposed_api.rollups import compact_rollups, get_watermark, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Compact raw project engagement events into the hourly/daily rollups used by the KPI endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop every existing rollup and recompute them from the raw event tables",
+        )
+
+    def handle(self, *args, **options):
+        buckets = rebuild_rollups() if options["rebuild"] else compact_rollups()
+        watermark = get_watermark()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {buckets} hourly buckets, rollups now cover events before "
+                f"{watermark.isoformat() if watermark else 'nothing'}"
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from exposed_api.search_index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the inverted index used by the advanced search endpoint from projects, events, news and founders"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000, help="Number of objects analyzed and inserted per batch"
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} documents"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from exposed_api.sketches import rebuild_sketches
+
+
+class Command(BaseCommand):
+    help = "Recompute the HyperLogLog unique visitor sketches used by the KPI endpoints from the raw event tables"
+
+    def handle(self, *args, **options):
+        replayed = rebuild_sketches()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt unique visitor sketches from {replayed} events"))
@@ -0,0 +1,31 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from exposed_api.ai_jobs import WorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run a pool of workers claiming and running queued AI analyses until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Number of worker threads")
+        parser.add_argument(
+            "--poll-interval", type=float, default=None, help="Seconds between two polls of the job table when idle"
+        )
+
+    def handle(self, *args, **options):
+        pool = WorkerPool(options["workers"], poll_interval=options["poll_interval"])
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+
+        pool.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {options['workers']} AI analysis workers as {pool.name}"))
+        try:
+            stopped.wait()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write("Stopping, waiting for running analyses to finish")
+        pool.stop()
@@ -0,0 +1,308 @@
+"""
+Vectorized rule-based investor matching.
+
+The rules of `OpportunitiesMatchesView` are substring tests between a startup attribute (sector,
+needs, country, maturity) or a filter value and an investor attribute (investment focus,
+address, type). `InvestorFeatureMatrix` loads every investor once and keeps, for each probe
+string, a boolean column telling which investors contain it, so scoring a startup against all
+investors, or many startups at once, is a handful of NumPy operations over cached columns. The
+scores and reasons are identical to the per-pair rules.
+
+The matrix is rebuilt when an investor is saved or deleted in this process (see
+`init.signals`) and after INVESTOR_MATRIX_TTL seconds so other workers pick up changes too.
+"""
+
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from admin_panel.models import Investor
+
+TECH_SECTOR_KEYWORDS = {
+    "deeptech": ["tech", "innovation", "research", "ai", "artificial intelligence"],
+    "fintech": ["finance", "financial", "banking", "payment", "blockchain"],
+    "biotech": ["health", "medical", "life science", "pharma", "biotechnology"],
+    "greentech": ["green", "sustainability", "environment", "clean energy", "renewable"],
+    "healthtech": ["health", "medical", "wellness", "fitness", "telemedicine"],
+}
+
+PLACEHOLDER_VALUES = ["string", ""]
+
+FALLBACK_SUGGESTIONS = 8
+MIN_MATCH_SCORE = 5
+# Probes come from startups and query filters, so bound the number of cached columns
+MAX_CACHED_COLUMNS = 4096
+
+
+def _usable(value):
+    value = (value or "").lower()
+    return value if value not in PLACEHOLDER_VALUES else ""
+
+
+class InvestorFeatureMatrix:
+    """
+    Investor attributes plus lazily computed, cached substring-match columns.
+    """
+
+    def __init__(self, investors):
+        """
+        Build the matrix from an iterable of Investor instances (in the order results are reported).
+        """
+        self.investors = list(investors)
+        self.ids = np.array([investor.id for investor in self.investors], dtype=np.int64)
+        self.texts = {
+            "focus": [(investor.investment_focus or "").lower() for investor in self.investors],
+            "address": [(investor.address or "").lower() for investor in self.investors],
+            "type": [(investor.investor_type or "").lower() for investor in self.investors],
+        }
+        self.present = {field: np.array([bool(text) for text in texts]) for field, texts in self.texts.items()}
+        self._columns = {}
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+        for keywords in TECH_SECTOR_KEYWORDS.values():
+            for keyword in keywords:
+                self.column("focus", keyword)
+
+    def __len__(self):
+        """Return the number of investors."""
+        return len(self.investors)
+
+    def column(self, field, probe):
+        """
+        Boolean array telling which investors contain `probe` in `field`.
+        """
+        key = (field, probe)
+        column = self._columns.get(key)
+        if column is None:
+            column = np.fromiter((probe in text for text in self.texts[field]), dtype=bool, count=len(self))
+            with self._lock:
+                if len(self._columns) < MAX_CACHED_COLUMNS:
+                    self._columns[key] = column
+        return column
+
+    def _any_column(self, field, probes):
+        probes = [probe for probe in probes if probe]
+        if not probes:
+            return np.zeros(len(self), dtype=bool)
+        return np.logical_or.reduce([self.column(field, probe) for probe in probes])
+
+    def startup_features(self, startup):
+        """
+        Per-rule points awarded to every investor for one startup.
+
+        Returns:
+            dict: Mapping of rule name to an int array of points over investors
+        """
+        size = len(self)
+        focus_present = self.present["focus"]
+        sector_points = np.zeros(size, dtype=np.int64)
+
+        sector = _usable(startup.sector)
+        if sector:
+            tech_match = self._any_column("focus", TECH_SECTOR_KEYWORDS.get(sector, []))
+            technology = self.column("focus", "tech") if sector in TECH_SECTOR_KEYWORDS else np.zeros(size, bool)
+            sector_points = (
+                np.select([self.column("focus", sector), tech_match, technology], [50, 40, 35], default=0)
+                * focus_present
+            )
+
+        needs = _usable(startup.needs)
+        needs_match = self._any_column("focus", [need.strip() for need in needs.split(",")]) if needs else None
+        needs_points = needs_match * focus_present * 30 if needs_match is not None else np.zeros(size, np.int64)
+
+        location = _usable(startup.address)
+        country = location.split()[-1] if location.split() else ""
+        location_points = (
+            self.column("address", country) * self.present["address"] * 10 if country else np.zeros(size, np.int64)
+        )
+
+        maturity = _usable(startup.maturity)
+        maturity_points = (
+            self.column("type", maturity) * self.present["type"] * 10 if maturity else np.zeros(size, np.int64)
+        )
+
+        return {
+            "sector": sector_points.astype(np.int64),
+            "needs": np.asarray(needs_points, dtype=np.int64),
+            "location": np.asarray(location_points, dtype=np.int64),
+            "maturity": np.asarray(maturity_points, dtype=np.int64),
+        }
+
+    def filter_features(self, filters):
+        """
+        Per-rule points awarded to every investor for a set of filters (sectors, tags, location, stage).
+        """
+        size = len(self)
+        zeros = np.zeros(size, dtype=np.int64)
+
+        sectors = filters.get("sectors")
+        tags = filters.get("tags")
+        location = (filters.get("location") or "").lower()
+        stage = (filters.get("stage") or "").lower()
+
+        return {
+            "sector": (
+                self._any_column("focus", [s.strip().lower() for s in sectors.split(",")]) * 50 if sectors else zeros
+            ),
+            "tags": self._any_column("focus", [t.strip().lower() for t in tags.split(",")]) * 30 if tags else zeros,
+            "location": self.column("address", location) * self.present["address"] * 10 if location else zeros,
+            "stage": self.column("type", stage) * self.present["type"] * 10 if stage else zeros,
+        }
+
+
+STARTUP_REASONS = {
+    "sector": {50: "sector match", 40: "tech sector match", 35: "technology sector"},
+    "needs": {30: "needs match"},
+    "location": {10: "location match"},
+    "maturity": {10: "maturity fit"},
+}
+
+FILTER_REASONS = {
+    "sector": {50: "sector match"},
+    "tags": {30: "tags match"},
+    "location": {10: "location match"},
+    "stage": {10: "stage fit"},
+}
+
+
+def combine(features):
+    """
+    Sum the per-rule points of investors (or startups x investors) and add the multiple matches bonus.
+    """
+    points = np.stack(list(features.values()))
+    matched = np.count_nonzero(points, axis=0)
+    return points.sum(axis=0) + np.where(matched > 1, matched * 5, 0)
+
+
+def describe(features, reasons, index):
+    """
+    Rebuild the human readable reason of one investor from the per-rule points.
+    """
+    parts = [reasons[rule][int(points[index])] for rule, points in features.items() if points[index]]
+    if len(parts) > 1:
+        parts.append(f"multiple matches bonus (+{len(parts) * 5})")
+    return ", ".join(parts) if parts else "no strong signal"
+
+
+def rank(scores, limit=None):
+    """
+    Indexes of the investors scoring at least MIN_MATCH_SCORE, best first, ties in investor order.
+    """
+    candidates = np.flatnonzero(scores >= MIN_MATCH_SCORE)
+    if limit is not None and limit < len(candidates):
+        # Keep every investor tied with the limit-th score so the stable order below stays exact
+        threshold = np.partition(scores[candidates], len(candidates) - limit)[len(candidates) - limit]
+        candidates = candidates[scores[candidates] >= threshold]
+    ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return ordered[:limit] if limit is not None else ordered
+
+
+def fallback_suggestions(matrix):
+    """
+    Generic suggestions (investor index, score, reason) used when no investor matches a startup.
+    """
+    suggestions = []
+    for index, investor_type in enumerate(matrix.texts["type"][:FALLBACK_SUGGESTIONS]):
+        if "venture" in investor_type:
+            suggestions.append((index, 25, "venture capitalist"))
+        elif "angel" in investor_type:
+            suggestions.append((index, 22, "angel investor"))
+        else:
+            suggestions.append((index, 20, "general suggestion"))
+    return sorted(suggestions, key=lambda suggestion: -suggestion[1])
+
+
+def match_startups(matrix, startups, limit=None):
+    """
+    Score many startups against every investor at once.
+
+    Args:
+        matrix: InvestorFeatureMatrix
+        startups: List of StartupDetail instances
+        limit: Optional maximum number of matches per startup
+
+    Returns:
+        list: One list of (investor index, score, reason) per startup, best match first
+    """
+    if not startups or not len(matrix):
+        return [[] for _ in startups]
+
+    per_startup = [matrix.startup_features(startup) for startup in startups]
+    features = {rule: np.stack([points[rule] for points in per_startup]) for rule in STARTUP_REASONS}
+    scores = combine(features)
+
+    results = []
+    for row, startup_scores in enumerate(scores):
+        if not startup_scores.any():
+            results.append(fallback_suggestions(matrix)[:limit])
+            continue
+        row_features = {rule: points[row] for rule, points in features.items()}
+        results.append(
+            [
+                (int(index), int(startup_scores[index]), describe(row_features, STARTUP_REASONS, index))
+                for index in rank(startup_scores, limit)
+            ]
+        )
+    return results
+
+
+def score_startup(matrix, startup):
+    """
+    Rule score of every investor for one startup, unranked.
+
+    Returns:
+        list: (score, reason) per investor, in matrix order
+    """
+    if not len(matrix):
+        return []
+    features = matrix.startup_features(startup)
+    scores = combine(features)
+    return [(int(score), describe(features, STARTUP_REASONS, index)) for index, score in enumerate(scores)]
+
+
+def match_filters(matrix, filters, limit=None):
+    """
+    Score every investor against a set of filters.
+
+    Returns:
+        list: (investor index, score, reason) tuples, best match first
+    """
+    if not len(matrix):
+        return []
+    features = matrix.filter_features(filters)
+    scores = combine(features)
+    return [
+        (int(index), int(scores[index]), describe(features, FILTER_REASONS, index)) for index in rank(scores, limit)
+    ]
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_investor_matrix():
+    """
+    Return the investor feature matrix of this process, rebuilding it when invalidated or expired.
+    """
+    global _matrix
+
+    ttl = getattr(settings, "INVESTOR_MATRIX_TTL", 300)
+    matrix = _matrix
+    if matrix is not None and time.monotonic() - matrix.built_at < ttl:
+        return matrix
+
+    with _matrix_lock:
+        if _matrix is None or time.monotonic() - _matrix.built_at >= ttl:
+            _matrix = InvestorFeatureMatrix(Investor.objects.all())
+        return _matrix
+
+
+def invalidate_investor_matrix():
+    """
+    Drop the cached investor feature matrix so the next request rebuilds it.
+    """
+    global _matrix
+    _matrix = None
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin_panel", "0001_initial"),
+        ("exposed_api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Name of the rollup this watermark belongs to", max_length=50, unique=True
+                    ),
+                ),
+                (
+                    "compacted_until",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Raw events strictly before this instant are included in the rollups",
+                        null=True,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Rollup Watermark",
+                "verbose_name_plural": "Rollup Watermarks",
+            },
+        ),
+        migrations.CreateModel(
+            name="ProjectEngagementRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], help_text="Size of the time bucket", max_length=4
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField(help_text="Start of the time bucket (inclusive)")),
+                ("views", models.PositiveIntegerField(default=0, help_text="Number of views recorded in the bucket")),
+                ("likes", models.PositiveIntegerField(default=0, help_text="Number of likes recorded in the bucket")),
+                (
+                    "dislikes",
+                    models.PositiveIntegerField(default=0, help_text="Number of dislikes recorded in the bucket"),
+                ),
+                (
+                    "shares",
+                    models.PositiveIntegerField(default=0, help_text="Number of shares recorded in the bucket"),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        help_text="The project these counters belong to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="engagement_rollups",
+                        to="admin_panel.startupdetail",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Project Engagement Rollup",
+                "verbose_name_plural": "Project Engagement Rollups",
+                "ordering": ["-bucket_start"],
+                "indexes": [
+                    models.Index(fields=["granularity", "bucket_start"], name="exposed_api_granula_80b2f5_idx")
+                ],
+                "unique_together": {("project", "granularity", "bucket_start")},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin_panel", "0001_initial"),
+        ("exposed_api", "0002_engagement_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectUniqueSketch",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField(help_text="Local day covered by the sketch")),
+                (
+                    "event",
+                    models.CharField(
+                        choices=[
+                            ("views", "Views"),
+                            ("likes", "Likes"),
+                            ("dislikes", "Dislikes"),
+                            ("shares", "Shares"),
+                        ],
+                        help_text="Kind of engagement event observed",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("user", "User"),
+                            ("ip", "IP address"),
+                            ("session", "Session"),
+                            ("actor", "User, IP address and session"),
+                        ],
+                        help_text="What makes a visitor distinct",
+                        max_length=10,
+                    ),
+                ),
+                ("registers", models.BinaryField(help_text="Serialized HyperLogLog registers")),
+                (
+                    "project",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="The project this sketch belongs to, empty for the sketch covering every project",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unique_sketches",
+                        to="admin_panel.startupdetail",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Project Unique Sketch",
+                "verbose_name_plural": "Project Unique Sketches",
+                "ordering": ["-day"],
+                "indexes": [models.Index(fields=["event", "dimension", "day"], name="exposed_api_event_c9286f_idx")],
+                "unique_together": {("project", "day", "event", "dimension")},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exposed_api", "0003_project_unique_sketches"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="projectview",
+            name="timestamp",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False, help_text="When the project was viewed"
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exposed_api", "0004_project_view_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "doc_type",
+                    models.CharField(
+                        choices=[("project", "Project"), ("event", "Event"), ("news", "News"), ("founder", "Founder")],
+                        help_text="Kind of indexed entity",
+                        max_length=10,
+                    ),
+                ),
+                ("object_id", models.IntegerField(help_text="Primary key of the indexed entity")),
+                ("title", models.CharField(help_text="Title of the entity, used to break score ties", max_length=255)),
+                ("field_lengths", models.JSONField(default=dict, help_text="Number of tokens in each indexed field")),
+            ],
+            options={
+                "verbose_name": "Search Document",
+                "verbose_name_plural": "Search Documents",
+                "unique_together": {("doc_type", "object_id")},
+            },
+        ),
+        migrations.CreateModel(
+            name="SearchFieldStatistic",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("doc_type", models.CharField(help_text="Kind of indexed entity", max_length=10)),
+                ("field", models.CharField(help_text="Indexed field", max_length=30)),
+                (
+                    "document_count",
+                    models.PositiveIntegerField(default=0, help_text="Number of indexed documents of this kind"),
+                ),
+                (
+                    "total_length",
+                    models.PositiveBigIntegerField(default=0, help_text="Sum of the field lengths of these documents"),
+                ),
+            ],
+            options={
+                "verbose_name": "Search Field Statistic",
+                "verbose_name_plural": "Search Field Statistics",
+                "unique_together": {("doc_type", "field")},
+            },
+        ),
+        migrations.CreateModel(
+            name="SearchPosting",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("term", models.CharField(help_text="Normalized token", max_length=100)),
+                ("field", models.CharField(help_text="Field of the document containing the term", max_length=30)),
+                (
+                    "term_frequency",
+                    models.PositiveIntegerField(help_text="Number of occurrences of the term in the field"),
+                ),
+                ("field_length", models.PositiveIntegerField(help_text="Number of tokens in the field")),
+                (
+                    "document",
+                    models.ForeignKey(
+                        help_text="Document containing the term",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="postings",
+                        to="exposed_api.searchdocument",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Search Posting",
+                "verbose_name_plural": "Search Postings",
+                "indexes": [models.Index(fields=["term"], name="exposed_api_term_2e3694_idx")],
+            },
+        ),
+    ]
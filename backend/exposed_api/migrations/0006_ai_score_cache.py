@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin_panel", "0001_initial"),
+        ("exposed_api", "0005_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AIScoreCache",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "backend",
+                    models.CharField(help_text="Scoring backend and model that produced the score", max_length=50),
+                ),
+                (
+                    "prompt_hash",
+                    models.CharField(
+                        help_text="SHA-256 of the backend and prompt, which changes with the investor or startup data",
+                        max_length=64,
+                    ),
+                ),
+                ("score", models.IntegerField(help_text="Compatibility score between 0 and 100")),
+                ("reason", models.TextField(help_text="Explanation returned with the score")),
+                ("created_at", models.DateTimeField(auto_now=True, help_text="When the score was computed")),
+                (
+                    "investor",
+                    models.ForeignKey(
+                        help_text="The scored investor",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ai_scores",
+                        to="admin_panel.investor",
+                    ),
+                ),
+                (
+                    "startup",
+                    models.ForeignKey(
+                        help_text="The scored startup",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ai_scores",
+                        to="admin_panel.startupdetail",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "AI Score Cache",
+                "verbose_name_plural": "AI Score Cache",
+                "indexes": [models.Index(fields=["startup", "backend"], name="exposed_api_startup_6fb386_idx")],
+                "unique_together": {("investor", "startup", "backend")},
+            },
+        ),
+    ]
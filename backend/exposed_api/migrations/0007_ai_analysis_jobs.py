@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:00
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin_panel", "0001_initial"),
+        ("exposed_api", "0006_ai_score_cache"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AIAnalysisJob",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("completed", "Completed"),
+                            ("error", "Error"),
+                        ],
+                        default="pending",
+                        help_text="Job state",
+                        max_length=10,
+                    ),
+                ),
+                ("progress", models.PositiveSmallIntegerField(default=0, help_text="Completion percentage")),
+                ("results", models.JSONField(blank=True, default=list, help_text="Scored matches once completed")),
+                ("error", models.TextField(blank=True, default="", help_text="Error message if the job failed")),
+                (
+                    "worker",
+                    models.CharField(blank=True, default="", help_text="Worker that claimed the job", max_length=100),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, help_text="When the job was submitted")),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Last state change, used as heartbeat by the worker running the job",
+                    ),
+                ),
+                (
+                    "startup",
+                    models.ForeignKey(
+                        help_text="The analyzed startup",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ai_analyses",
+                        to="admin_panel.startupdetail",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "AI Analysis Job",
+                "verbose_name_plural": "AI Analysis Jobs",
+                "ordering": ["created_at"],
+                "indexes": [models.Index(fields=["status", "updated_at"], name="exposed_api_status_e45e6e_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status__in", ["pending", "processing"])),
+                        fields=("startup",),
+                        name="unique_active_ai_analysis_per_startup",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+def index_suffixes(apps, schema_editor):
+    """Index the suffixes of the terms already in the search index"""
+    SearchPosting = apps.get_model("exposed_api", "SearchPosting")
+    SearchTermSuffix = apps.get_model("exposed_api", "SearchTermSuffix")
+
+    terms = SearchPosting.objects.values_list("term", flat=True).distinct().iterator()
+    SearchTermSuffix.objects.bulk_create(
+        (SearchTermSuffix(suffix=term[start:], term=term) for term in terms for start in range(len(term))),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exposed_api", "0007_ai_analysis_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchTermSuffix",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("suffix", models.CharField(help_text="Suffix of the term", max_length=100)),
+                ("term", models.CharField(help_text="Indexed term", max_length=100)),
+            ],
+            options={
+                "verbose_name": "Search Term Suffix",
+                "verbose_name_plural": "Search Term Suffixes",
+                "unique_together": {("suffix", "term")},
+            },
+        ),
+        migrations.RunPython(index_suffixes, migrations.RunPython.noop),
+    ]
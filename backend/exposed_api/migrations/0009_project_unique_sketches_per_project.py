@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def delete_global_sketches(apps, schema_editor):
+    """Delete the sketches covering every project, now merged from the project sketches at read time"""
+    ProjectUniqueSketch = apps.get_model("exposed_api", "ProjectUniqueSketch")
+    ProjectUniqueSketch.objects.filter(project__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin_panel", "0001_initial"),
+        ("exposed_api", "0008_search_term_suffixes"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_global_sketches, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="projectuniquesketch",
+            name="project",
+            field=models.ForeignKey(
+                help_text="The project this sketch belongs to",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="unique_sketches",
+                to="admin_panel.startupdetail",
+            ),
+        ),
+    ]
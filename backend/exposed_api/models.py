@@ -1,8 +1,10 @@
+import uuid
+
 from authentication.models import CustomUser
 from django.db import models
 from django.utils import timezone
 
-from admin_panel.models import StartupDetail
+from admin_panel.models import Investor, StartupDetail
 
 
 class SiteStatistics(models.Model):
@@ -27,7 +29,7 @@ class ProjectView(models.Model):
     project = models.ForeignKey(
         StartupDetail, on_delete=models.CASCADE, related_name="views", help_text="The project that was viewed"
     )
-    timestamp = models.DateTimeField(auto_now_add=True, help_text="When the project was viewed")
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, help_text="When the project was viewed")
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.SET_NULL,
@@ -231,3 +233,275 @@ class ProjectShare(models.Model):
         user_info = self.user.email if self.user else f"Anonymous ({self.ip_address})"
         platform_info = f" on {self.platform}" if self.platform else ""
         return f"{self.project.name} shared by {user_info}{platform_info} at {self.timestamp}"
+
+
+class ProjectEngagementRollup(models.Model):
+    """
+    Model holding pre-aggregated engagement counters for a project over a time bucket
+    """
+
+    GRANULARITY_CHOICES = [
+        ("hour", "Hour"),
+        ("day", "Day"),
+    ]
+
+    project = models.ForeignKey(
+        StartupDetail,
+        on_delete=models.CASCADE,
+        related_name="engagement_rollups",
+        help_text="The project these counters belong to",
+    )
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES, help_text="Size of the time bucket")
+    bucket_start = models.DateTimeField(help_text="Start of the time bucket (inclusive)")
+    views = models.PositiveIntegerField(default=0, help_text="Number of views recorded in the bucket")
+    likes = models.PositiveIntegerField(default=0, help_text="Number of likes recorded in the bucket")
+    dislikes = models.PositiveIntegerField(default=0, help_text="Number of dislikes recorded in the bucket")
+    shares = models.PositiveIntegerField(default=0, help_text="Number of shares recorded in the bucket")
+
+    class Meta:
+        verbose_name = "Project Engagement Rollup"
+        verbose_name_plural = "Project Engagement Rollups"
+        ordering = ["-bucket_start"]
+        unique_together = [("project", "granularity", "bucket_start")]
+        indexes = [
+            models.Index(fields=["granularity", "bucket_start"]),
+        ]
+
+    def __str__(self):
+        """Return a human-readable representation of this rollup bucket."""
+        return f"{self.project_id} {self.granularity} bucket starting at {self.bucket_start}"
+
+
+class RollupWatermark(models.Model):
+    """
+    Model tracking up to which point raw events have been compacted into rollups
+    """
+
+    name = models.CharField(max_length=50, unique=True, help_text="Name of the rollup this watermark belongs to")
+    compacted_until = models.DateTimeField(
+        null=True, blank=True, help_text="Raw events strictly before this instant are included in the rollups"
+    )
+
+    class Meta:
+        verbose_name = "Rollup Watermark"
+        verbose_name_plural = "Rollup Watermarks"
+
+    def __str__(self):
+        """Return a human-readable representation of this watermark."""
+        return f"{self.name} compacted until {self.compacted_until}"
+
+
+class ProjectUniqueSketch(models.Model):
+    """
+    Model holding a HyperLogLog sketch of the distinct visitors of a project for one day
+    """
+
+    EVENT_CHOICES = [
+        ("views", "Views"),
+        ("likes", "Likes"),
+        ("dislikes", "Dislikes"),
+        ("shares", "Shares"),
+    ]
+
+    DIMENSION_CHOICES = [
+        ("user", "User"),
+        ("ip", "IP address"),
+        ("session", "Session"),
+        ("actor", "User, IP address and session"),
+    ]
+
+    project = models.ForeignKey(
+        StartupDetail,
+        on_delete=models.CASCADE,
+        related_name="unique_sketches",
+        help_text="The project this sketch belongs to",
+    )
+    day = models.DateField(help_text="Local day covered by the sketch")
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES, help_text="Kind of engagement event observed")
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES, help_text="What makes a visitor distinct")
+    registers = models.BinaryField(help_text="Serialized HyperLogLog registers")
+
+    class Meta:
+        verbose_name = "Project Unique Sketch"
+        verbose_name_plural = "Project Unique Sketches"
+        ordering = ["-day"]
+        unique_together = [("project", "day", "event", "dimension")]
+        indexes = [
+            models.Index(fields=["event", "dimension", "day"]),
+        ]
+
+    def __str__(self):
+        """Return a human-readable representation of this sketch."""
+        scope = self.project_id or "all projects"
+        return f"{self.event}/{self.dimension} sketch for {scope} on {self.day}"
+
+
+class SearchDocument(models.Model):
+    """
+    Model representing an entity indexed by the search engine
+    """
+
+    DOC_TYPE_CHOICES = [
+        ("project", "Project"),
+        ("event", "Event"),
+        ("news", "News"),
+        ("founder", "Founder"),
+    ]
+
+    doc_type = models.CharField(max_length=10, choices=DOC_TYPE_CHOICES, help_text="Kind of indexed entity")
+    object_id = models.IntegerField(help_text="Primary key of the indexed entity")
+    title = models.CharField(max_length=255, help_text="Title of the entity, used to break score ties")
+    field_lengths = models.JSONField(default=dict, help_text="Number of tokens in each indexed field")
+
+    class Meta:
+        verbose_name = "Search Document"
+        verbose_name_plural = "Search Documents"
+        unique_together = [("doc_type", "object_id")]
+
+    def __str__(self):
+        """Return a human-readable representation of this document."""
+        return f"{self.doc_type} {self.object_id}: {self.title}"
+
+
+class SearchPosting(models.Model):
+    """
+    Model representing the occurrences of a term in one field of an indexed document
+    """
+
+    term = models.CharField(max_length=100, help_text="Normalized token")
+    document = models.ForeignKey(
+        SearchDocument, on_delete=models.CASCADE, related_name="postings", help_text="Document containing the term"
+    )
+    field = models.CharField(max_length=30, help_text="Field of the document containing the term")
+    term_frequency = models.PositiveIntegerField(help_text="Number of occurrences of the term in the field")
+    field_length = models.PositiveIntegerField(help_text="Number of tokens in the field")
+
+    class Meta:
+        verbose_name = "Search Posting"
+        verbose_name_plural = "Search Postings"
+        indexes = [
+            models.Index(fields=["term"]),
+        ]
+
+    def __str__(self):
+        """Return a human-readable representation of this posting."""
+        return f"{self.term} x{self.term_frequency} in {self.field} of document {self.document_id}"
+
+
+class SearchTermSuffix(models.Model):
+    """
+    Model mapping every suffix of an indexed term to the term, to find the terms containing a string
+    """
+
+    suffix = models.CharField(max_length=100, help_text="Suffix of the term")
+    term = models.CharField(max_length=100, help_text="Indexed term")
+
+    class Meta:
+        verbose_name = "Search Term Suffix"
+        verbose_name_plural = "Search Term Suffixes"
+        unique_together = [("suffix", "term")]
+
+    def __str__(self):
+        """Return a human-readable representation of this suffix."""
+        return f"{self.suffix} of {self.term}"
+
+
+class SearchFieldStatistic(models.Model):
+    """
+    Model holding the running totals used to compute average field lengths for BM25
+    """
+
+    doc_type = models.CharField(max_length=10, help_text="Kind of indexed entity")
+    field = models.CharField(max_length=30, help_text="Indexed field")
+    document_count = models.PositiveIntegerField(default=0, help_text="Number of indexed documents of this kind")
+    total_length = models.PositiveBigIntegerField(default=0, help_text="Sum of the field lengths of these documents")
+
+    class Meta:
+        verbose_name = "Search Field Statistic"
+        verbose_name_plural = "Search Field Statistics"
+        unique_together = [("doc_type", "field")]
+
+    def __str__(self):
+        """Return a human-readable representation of this statistic."""
+        return f"{self.doc_type}.{self.field}: {self.total_length} tokens over {self.document_count} documents"
+
+
+class AIScoreCache(models.Model):
+    """
+    Model caching the AI compatibility score of an investor and a startup for one prompt
+    """
+
+    investor = models.ForeignKey(
+        Investor, on_delete=models.CASCADE, related_name="ai_scores", help_text="The scored investor"
+    )
+    startup = models.ForeignKey(
+        StartupDetail, on_delete=models.CASCADE, related_name="ai_scores", help_text="The scored startup"
+    )
+    backend = models.CharField(max_length=50, help_text="Scoring backend and model that produced the score")
+    prompt_hash = models.CharField(
+        max_length=64, help_text="SHA-256 of the backend and prompt, which changes with the investor or startup data"
+    )
+    score = models.IntegerField(help_text="Compatibility score between 0 and 100")
+    reason = models.TextField(help_text="Explanation returned with the score")
+    created_at = models.DateTimeField(auto_now=True, help_text="When the score was computed")
+
+    class Meta:
+        verbose_name = "AI Score Cache"
+        verbose_name_plural = "AI Score Cache"
+        unique_together = [("investor", "startup", "backend")]
+        indexes = [
+            models.Index(fields=["startup", "backend"]),
+        ]
+
+    def __str__(self):
+        """Return a human-readable representation of this cached score."""
+        return f"{self.backend} score {self.score} for investor {self.investor_id} and startup {self.startup_id}"
+
+
+class AIAnalysisJob(models.Model):
+    """
+    Model representing an asynchronous AI analysis of the investors matching a startup
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("completed", "Completed"),
+        ("error", "Error"),
+    ]
+
+    ACTIVE_STATUSES = ["pending", "processing"]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    startup = models.ForeignKey(
+        StartupDetail, on_delete=models.CASCADE, related_name="ai_analyses", help_text="The analyzed startup"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending", help_text="Job state")
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Completion percentage")
+    results = models.JSONField(default=list, blank=True, help_text="Scored matches once completed")
+    error = models.TextField(blank=True, default="", help_text="Error message if the job failed")
+    worker = models.CharField(max_length=100, blank=True, default="", help_text="Worker that claimed the job")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the job was submitted")
+    updated_at = models.DateTimeField(
+        default=timezone.now, help_text="Last state change, used as heartbeat by the worker running the job"
+    )
+
+    class Meta:
+        verbose_name = "AI Analysis Job"
+        verbose_name_plural = "AI Analysis Jobs"
+        ordering = ["created_at"]
+        constraints = [
+            # At most one analysis in flight per startup, identical requests join it
+            models.UniqueConstraint(
+                fields=["startup"],
+                condition=models.Q(status__in=["pending", "processing"]),
+                name="unique_active_ai_analysis_per_startup",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    def __str__(self):
+        """Return a human-readable representation of this job."""
+        return f"AI analysis {self.id} of startup {self.startup_id} ({self.status})"
@@ -1,16 +1,13 @@
-import os
-import time
-import uuid
-from threading import Thread
-
-from groq import Groq
+from django.core.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from admin_panel.models import Investor, StartupDetail
 
-ai_analysis_status = {}
+from .ai_jobs import get_job, submit
+from .ai_scoring import get_backend, request_score, score_investors, score_pair
+from .matching import TECH_SECTOR_KEYWORDS, get_investor_matrix, match_filters, match_startups
 
 
 class OpportunitiesMatchesView(APIView):
@@ -27,48 +24,10 @@ class OpportunitiesMatchesView(APIView):
     permission_classes = [AllowAny]
 
     def _get_ai_score(self, investor, startup):
-        """Use Groq AI to analyze the match and provide a score and reason."""
-        try:
-            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            prompt = f"""
-Analyze the compatibility between this investor and startup on a scale of 0-100.
-
-Investor:
-- Name: {investor.name}
-- Type: {investor.investor_type or 'N/A'}
-- Focus: {investor.investment_focus or 'N/A'}
-- Description: {investor.description or 'N/A'}
-- Location: {investor.address or 'N/A'}
-
-Startup:
-- Name: {startup.name}
-- Sector: {startup.sector or 'N/A'}
-- Maturity: {startup.maturity or 'N/A'}
-- Needs: {startup.needs or 'N/A'}
-- Description: {startup.description or 'N/A'}
-- Location: {startup.address or 'N/A'}
-
-Provide a score (0-100) and a brief reason for the match.
-Format: Score: X, Reason: explanation
-"""
-            response = client.chat.completions.create(
-                model="llama3-8b-8192", messages=[{"role": "user", "content": prompt}], max_tokens=150, temperature=0.5
-            )
-            content = response.choices[0].message.content.strip()
-            if "Score:" in content and "Reason:" in content:
-                score_part = content.split("Score:")[1].split(",")[0].strip()
-                reason_part = content.split("Reason:")[1].strip()
-                try:
-                    ai_score = int(score_part)
-                    return ai_score, reason_part
-                except ValueError:
-                    pass
-            return 50, "AI analysis: Moderate match"
-        except Exception as e:
-            print(f"AI scoring failed: {e}")
-            return 0, "AI unavailable"
+        """Use the AI scoring backend to analyze the match and provide a score and reason."""
+        return score_pair(investor, startup)
 
-    def _score_investor_against_startup(self, investor, startup, include_ai=False):
+    def _score_investor_against_startup(self, investor, startup, include_ai=False, ai_result=None):
         rule_score = 0
         reasons = []
 
@@ -82,13 +41,7 @@ Format: Score: X, Reason: explanation
             elif self._is_tech_sector_match(startup_sector, inv_focus):
                 rule_score += 40
                 reasons.append("tech sector match")
-            elif "tech" in inv_focus and startup_sector in [
-                "deeptech",
-                "fintech",
-                "biotech",
-                "greentech",
-                "healthtech",
-            ]:
+            elif "tech" in inv_focus and startup_sector in TECH_SECTOR_KEYWORDS:
                 rule_score += 35
                 reasons.append("technology sector")
 
@@ -123,7 +76,7 @@ Format: Score: X, Reason: explanation
         ai_reason = ""
 
         if include_ai:
-            ai_score, ai_reason = self._get_ai_score(investor, startup)
+            ai_score, ai_reason = ai_result or self._get_ai_score(investor, startup)
             if ai_score > 0:
                 total_score = int((rule_score + ai_score) / 2)
                 reasons.append(f"AI: {ai_reason}")
@@ -131,21 +84,8 @@ Format: Score: X, Reason: explanation
         return total_score, rule_score, ai_score, ", ".join(reasons) if reasons else "no strong signal"
 
     def _is_tech_sector_match(self, startup_sector, investor_focus):
-        """Check for broader tech sector matches"""
-        tech_mappings = {
-            "deeptech": ["tech", "innovation", "research", "ai", "artificial intelligence"],
-            "fintech": ["finance", "financial", "banking", "payment", "blockchain"],
-            "biotech": ["health", "medical", "life science", "pharma", "biotechnology"],
-            "greentech": ["green", "sustainability", "environment", "clean energy", "renewable"],
-            "healthtech": ["health", "medical", "wellness", "fitness", "telemedicine"],
-        }
-
-        startup_lower = startup_sector.lower()
-        if startup_lower in tech_mappings:
-            for keyword in tech_mappings[startup_lower]:
-                if keyword in investor_focus:
-                    return True
-        return False
+        """Check for broader tech sector matches, with the keywords of the investor feature matrix"""
+        return any(keyword in investor_focus for keyword in TECH_SECTOR_KEYWORDS.get(startup_sector.lower(), []))
 
     def _score_investor_against_filters(self, investor, filters, include_ai=False):
         rule_score = 0
@@ -192,7 +132,6 @@ Format: Score: X, Reason: explanation
     def _get_ai_score_filters(self, investor, filters):
         """Use Groq AI to analyze the match based on filters."""
         try:
-            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
             filter_text = []
             if filters.get("sectors"):
                 filter_text.append(f"Sectors: {filters['sectors']}")
@@ -218,19 +157,7 @@ Filters:
 Provide a score (0-100) and a brief reason for the match.
 Format: Score: X, Reason: explanation
 """
-            response = client.chat.completions.create(
-                model="llama3-8b-8192", messages=[{"role": "user", "content": prompt}], max_tokens=150, temperature=0.5
-            )
-            content = response.choices[0].message.content.strip()
-            if "Score:" in content and "Reason:" in content:
-                score_part = content.split("Score:")[1].split(",")[0].strip()
-                reason_part = content.split("Reason:")[1].strip()
-                try:
-                    ai_score = int(score_part)
-                    return ai_score, reason_part
-                except ValueError:
-                    pass
-            return 50, "AI analysis: Moderate match"
+            return request_score(get_backend(), prompt)
         except Exception as e:
             print(f"AI scoring failed: {e}")
             return 0, "AI unavailable"
@@ -248,6 +175,32 @@ Format: Score: X, Reason: explanation
             or startup.address.lower() in ["string", ""]
         )
 
+    @staticmethod
+    def _serialize_matches(matrix, matches, detailed=True):
+        """Render (investor index, score, reason) matches from the investor feature matrix."""
+        results = []
+        for index, score, reason in matches:
+            inv = matrix.investors[index]
+            match = {
+                "investor_id": inv.id,
+                "name": inv.name,
+                "score": score,
+                "rule_score": score,
+                "ai_score": 0,
+                "reason": reason,
+            }
+            if detailed:
+                match.update(
+                    {
+                        "investor_type": inv.investor_type,
+                        "investment_focus": inv.investment_focus,
+                        "description": inv.description,
+                        "location": inv.address,
+                    }
+                )
+            results.append(match)
+        return results
+
     def get(self, request):
         startup_id = request.GET.get("startup_id")
         include_ai = request.GET.get("include_ai", "false").lower() == "true"
@@ -258,11 +211,17 @@ Format: Score: X, Reason: explanation
             except (StartupDetail.DoesNotExist, ValueError):
                 return Response({"error": "startup not found"}, status=400)
 
-            investors = Investor.objects.all()
+            if not include_ai:
+                matrix = get_investor_matrix()
+                (matches,) = match_startups(matrix, [startup])
+                return Response({"matches": self._serialize_matches(matrix, matches)})
+
+            investors = list(Investor.objects.all())
+            ai_results = score_investors(startup, investors)
             scored = []
             for inv in investors:
                 total_score, rule_score, ai_score, reason = self._score_investor_against_startup(
-                    inv, startup, include_ai
+                    inv, startup, include_ai, ai_results.get(inv.id)
                 )
                 if total_score > 0:
                     scored.append(
@@ -319,6 +278,12 @@ Format: Score: X, Reason: explanation
             "stage": request.GET.get("stage"),
         }
 
+        if not include_ai:
+            matrix = get_investor_matrix()
+            return Response(
+                {"matches": self._serialize_matches(matrix, match_filters(matrix, filters), detailed=False)}
+            )
+
         investors = Investor.objects.all()
         scored = []
         for inv in investors:
@@ -339,177 +304,51 @@ Format: Score: X, Reason: explanation
         return Response({"matches": scored})
 
 
-class AIAnalysisView(APIView):
-    """Handle asynchronous AI analysis for investor matches."""
-
-    permission_classes = [AllowAny]
-
-    def _score_investor_against_startup(self, investor, startup, include_ai=False):
-        """Calculate rule-based score for investor-startup match."""
-        rule_score = 0
-        reasons = []
-
-        inv_focus = (investor.investment_focus or "").lower()
-        startup_sector = (startup.sector or "").lower()
-
-        if startup_sector and startup_sector not in ["string", ""] and inv_focus:
-            if startup_sector in inv_focus:
-                rule_score += 50
-                reasons.append("sector match")
-            elif self._is_tech_sector_match(startup_sector, inv_focus):
-                rule_score += 40
-                reasons.append("tech sector match")
-            elif "tech" in inv_focus and startup_sector in [
-                "deeptech",
-                "fintech",
-                "biotech",
-                "greentech",
-                "healthtech",
-            ]:
-                rule_score += 35
-                reasons.append("technology sector")
-
-        inv_focus_lower = inv_focus
-        startup_needs = (startup.needs or "").lower()
-        if startup_needs and startup_needs not in ["string", ""] and inv_focus_lower:
-            if any(need.strip() and need.strip().lower() in inv_focus_lower for need in startup_needs.split(",")):
-                rule_score += 30
-                reasons.append("needs match")
-
-        inv_location = (investor.address or "").lower()
-        startup_location = (startup.address or "").lower()
-        if startup_location and startup_location not in ["string", ""] and inv_location:
-            startup_country = startup_location.split()[-1] if startup_location.split() else ""
-            if startup_country and startup_country.lower() in inv_location:
-                rule_score += 10
-                reasons.append("location match")
-
-        inv_type = (investor.investor_type or "").lower()
-        startup_maturity = (startup.maturity or "").lower()
-        if startup_maturity and startup_maturity not in ["string", ""] and inv_type:
-            if startup_maturity in inv_type:
-                rule_score += 10
-                reasons.append("maturity fit")
-
-        if len(reasons) > 1:
-            rule_score += len(reasons) * 5
-            reasons.append(f"multiple matches bonus (+{len(reasons) * 5})")
-
-        return rule_score, ", ".join(reasons) if reasons else "no strong signal"
-
-    def _is_tech_sector_match(self, startup_sector, investor_focus):
-        """Check for broader tech sector matches"""
-        tech_mappings = {
-            "deeptech": ["tech", "innovation", "research", "ai", "artificial intelligence"],
-            "fintech": ["finance", "financial", "banking", "payment", "blockchain"],
-            "biotech": ["health", "medical", "life science", "pharma", "biotechnology"],
-            "greentech": ["green", "sustainability", "environment", "clean energy", "renewable"],
-            "healthtech": ["health", "medical", "wellness", "fitness", "telemedicine"],
-        }
+class OpportunitiesBatchMatchesView(APIView):
+    """Return the best matching investors of many startups at once.
 
-        startup_lower = startup_sector.lower()
-        if startup_lower in tech_mappings:
-            for keyword in tech_mappings[startup_lower]:
-                if keyword in investor_focus:
-                    return True
-        return False
+    Supports:
+    - ?startup_ids=1,2,3 (optional, defaults to every startup)
+    - ?limit=<n> (optional, number of matches per startup, defaults to 10)
 
-    def _get_ai_score(self, investor, startup):
-        """Use Groq AI to analyze the match and provide a score and reason."""
-        try:
-            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            prompt = f"""
-Analyze the compatibility between this investor and startup on a scale of 0-100.
+    Response: {"results": [{"startup_id": id, "matches": [...]}, ...]} with the match items of
+    OpportunitiesMatchesView, without AI analysis.
+    """
 
-Investor:
-- Name: {investor.name}
-- Type: {investor.investor_type or 'N/A'}
-- Focus: {investor.investment_focus or 'N/A'}
-- Description: {investor.description or 'N/A'}
-- Location: {investor.address or 'N/A'}
+    permission_classes = [AllowAny]
 
-Startup:
-- Name: {startup.name}
-- Sector: {startup.sector or 'N/A'}
-- Maturity: {startup.maturity or 'N/A'}
-- Needs: {startup.needs or 'N/A'}
-- Description: {startup.description or 'N/A'}
-- Location: {startup.address or 'N/A'}
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 100
 
-Provide a score (0-100) and a brief reason for the match.
-Format: Score: X, Reason: explanation
-"""
-            response = client.chat.completions.create(
-                model="llama3-8b-8192", messages=[{"role": "user", "content": prompt}], max_tokens=150, temperature=0.5
-            )
-            content = response.choices[0].message.content.strip()
-            if "Score:" in content and "Reason:" in content:
-                score_part = content.split("Score:")[1].split(",")[0].strip()
-                reason_part = content.split("Reason:")[1].strip()
-                try:
-                    ai_score = int(score_part)
-                    return ai_score, reason_part
-                except ValueError:
-                    pass
-            return 50, "AI analysis: Moderate match"
-        except Exception as e:
-            print(f"AI scoring failed: {e}")
-            return 0, "AI unavailable"
-
-    def _run_ai_analysis(self, analysis_id, startup_id):
-        """Run AI analysis in background thread."""
+    def get(self, request):
         try:
-            ai_analysis_status[analysis_id] = {"status": "processing", "progress": 0, "results": []}
-
-            startup = StartupDetail.objects.get(id=int(startup_id))
-            investors = Investor.objects.all()
-
-            results = []
-            total_investors = len(list(investors))
-
-            for i, inv in enumerate(investors):
-                ai_analysis_status[analysis_id]["progress"] = int((i / total_investors) * 100)
-
-                rule_score, rule_reason = self._score_investor_against_startup(inv, startup, include_ai=False)
+            limit = min(int(request.GET.get("limit", self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+            startup_ids = [int(_id) for _id in request.GET.get("startup_ids", "").split(",") if _id.strip()]
+        except ValueError:
+            return Response({"error": "startup_ids and limit must be integers"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+
+        startups = StartupDetail.objects.order_by("id")
+        if startup_ids:
+            startups = startups.filter(id__in=startup_ids)
+        startups = list(startups.only("id", "sector", "needs", "address", "maturity"))
+
+        matrix = get_investor_matrix()
+        results = [
+            {"startup_id": startup.id, "matches": OpportunitiesMatchesView._serialize_matches(matrix, matches)}
+            for startup, matches in zip(startups, match_startups(matrix, startups, limit), strict=True)
+        ]
+        return Response({"results": results})
 
-                ai_score, ai_reason = self._get_ai_score(inv, startup)
 
-                total_score = rule_score
-                if ai_score > 0:
-                    total_score = int((rule_score + ai_score) / 2)
-
-                final_reason = rule_reason
-                if ai_score > 0:
-                    final_reason += f", AI: {ai_reason}"
-
-                results.append(
-                    {
-                        "investor_id": inv.id,
-                        "name": inv.name,
-                        "score": total_score,
-                        "rule_score": rule_score,
-                        "ai_score": ai_score,
-                        "reason": final_reason,
-                        "investor_type": inv.investor_type,
-                        "investment_focus": inv.investment_focus,
-                        "description": inv.description,
-                        "location": inv.address,
-                    }
-                )
-
-                time.sleep(0.1)
-
-            results.sort(key=lambda x: x["score"], reverse=True)
-
-            results = [match for match in results if match["score"] >= 5]
-
-            ai_analysis_status[analysis_id] = {"status": "completed", "progress": 100, "results": results}
+class AIAnalysisView(APIView):
+    """Handle asynchronous AI analysis for investor matches."""
 
-        except Exception as e:
-            ai_analysis_status[analysis_id] = {"status": "error", "progress": 0, "error": str(e), "results": []}
+    permission_classes = [AllowAny]
 
     def post(self, request):
-        """Start AI analysis for a startup."""
+        """Start AI analysis for a startup, or join the one already running for it."""
         startup_id = request.data.get("startup_id")
         if not startup_id:
             return Response({"error": "startup_id is required"}, status=400)
@@ -519,16 +358,12 @@ Format: Score: X, Reason: explanation
         except (StartupDetail.DoesNotExist, ValueError):
             return Response({"error": "startup not found"}, status=400)
 
-        analysis_id = str(uuid.uuid4())
-
-        thread = Thread(target=self._run_ai_analysis, args=(analysis_id, startup_id))
-        thread.daemon = True
-        thread.start()
+        job, created = submit(startup)
 
         return Response(
             {
-                "analysis_id": analysis_id,
-                "status": "started",
+                "analysis_id": str(job.id),
+                "status": "started" if created else job.status,
                 "message": "AI analysis started. Use GET /api/opportunities/ai-analysis/{analysis_id}/ to check status.",
             }
         )
@@ -538,8 +373,14 @@ Format: Score: X, Reason: explanation
         if not analysis_id:
             return Response({"error": "analysis_id is required"}, status=400)
 
-        if analysis_id not in ai_analysis_status:
+        try:
+            job = get_job(analysis_id)
+        except ValidationError:
+            job = None
+        if job is None:
             return Response({"error": "analysis not found"}, status=404)
 
-        status_data = ai_analysis_status[analysis_id]
+        status_data = {"status": job.status, "progress": job.progress, "results": job.results}
+        if job.status == "error":
+            status_data["error"] = job.error
         return Response(status_data)
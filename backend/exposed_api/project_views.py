@@ -58,7 +58,7 @@ def projects_by_founder(request, founder_id):
         serializer = ProjectDetailGetSerializer(projects, many=True)
 
         if len(projects) == 1:
-            record_project_view(request, projects[0].id)
+            record_project_view(request, projects[0].id, project=projects[0])
 
         return JsonResponse(serializer.data, safe=False)
     except Founder.DoesNotExist:
@@ -136,7 +136,7 @@ class ProjectDetailView(APIView):
             startup = StartupDetail.objects.get(id=_id)
             serializer = ProjectDetailGetSerializer(startup)
 
-            record_project_view(request, _id)
+            record_project_view(request, _id, project=startup)
 
             return JsonResponse(serializer.data)
         except StartupDetail.DoesNotExist:
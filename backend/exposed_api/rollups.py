@@ -0,0 +1,376 @@
+"""
+Engagement rollups for the KPI endpoints.
+
+Raw engagement events (views, likes, dislikes, shares) are periodically compacted into
+hourly and daily per-project buckets. KPI queries then read the buckets for the compacted
+part of the requested period and only scan the raw tables for the edges that are not
+covered by whole buckets (the partial hour at the start of the period and the tail of
+events newer than the watermark).
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    ProjectDislike,
+    ProjectEngagementRollup,
+    ProjectLike,
+    ProjectShare,
+    ProjectView,
+    RollupWatermark,
+)
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "project_engagement"
+
+EVENT_MODELS = {
+    "views": ProjectView,
+    "likes": ProjectLike,
+    "dislikes": ProjectDislike,
+    "shares": ProjectShare,
+}
+
+TRUNC_FUNCTIONS = {
+    "day": TruncDay,
+    "month": TruncMonth,
+}
+
+
+def _floor_hour(value):
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(value):
+    floored = _floor_hour(value)
+    return floored if floored == value else floored + timedelta(hours=1)
+
+
+def _floor_day(value):
+    return timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil_day(value):
+    floored = _floor_day(value)
+    return floored if floored == value else floored + timedelta(days=1)
+
+
+def get_watermark():
+    """
+    Return the instant up to which raw events have been compacted, or None if never compacted.
+    """
+    return (
+        RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list("compacted_until", flat=True).first() or None
+    )
+
+
+def _split_period(start, watermark):
+    """
+    Split the period [start, now] into a part answered by rollups and a part scanned raw.
+
+    Returns:
+        tuple: (rollup_q, raw_q) where rollup_q filters ProjectEngagementRollup rows (or is None
+        when no bucket can be used) and raw_q filters the raw event tables.
+    """
+    if watermark is None:
+        return None, Q(timestamp__gte=start) if start else Q()
+
+    first_bucket = _ceil_hour(start) if start else None
+    if first_bucket is not None and first_bucket >= watermark:
+        return None, Q(timestamp__gte=start)
+
+    raw_q = Q(timestamp__gte=watermark)
+    if start and start < first_bucket:
+        raw_q |= Q(timestamp__gte=start, timestamp__lt=first_bucket)
+
+    last_full_day = _floor_day(watermark)
+    first_full_day = _ceil_day(first_bucket) if first_bucket else None
+
+    if first_full_day is None or first_full_day < last_full_day:
+        day_q = Q(granularity="day", bucket_start__lt=last_full_day)
+        hour_q = Q(granularity="hour", bucket_start__gte=last_full_day, bucket_start__lt=watermark)
+        if first_full_day is not None:
+            day_q &= Q(bucket_start__gte=first_full_day)
+            hour_q |= Q(granularity="hour", bucket_start__gte=first_bucket, bucket_start__lt=first_full_day)
+        rollup_q = day_q | hour_q
+    else:
+        rollup_q = Q(granularity="hour", bucket_start__gte=first_bucket, bucket_start__lt=watermark)
+
+    return rollup_q, raw_q
+
+
+def engagement_totals(metrics, start=None, project_id=None):
+    """
+    Count engagement events since `start` (or ever), optionally for a single project.
+
+    Args:
+        metrics: Iterable of metric names among "views", "likes", "dislikes" and "shares"
+        start: Aware datetime marking the beginning of the period, or None for all time
+        project_id: Restrict the counts to this project if provided
+
+    Returns:
+        dict: Mapping of metric name to event count
+    """
+    rollup_q, raw_q = _split_period(start, get_watermark())
+    if project_id:
+        raw_q &= Q(project_id=project_id)
+
+    totals = dict.fromkeys(metrics, 0)
+
+    if rollup_q is not None:
+        rollups = ProjectEngagementRollup.objects.filter(rollup_q)
+        if project_id:
+            rollups = rollups.filter(project_id=project_id)
+        aggregated = rollups.aggregate(**{metric: Sum(metric) for metric in metrics})
+        for metric in metrics:
+            totals[metric] += aggregated[metric] or 0
+
+    for metric in metrics:
+        totals[metric] += EVENT_MODELS[metric].objects.filter(raw_q).count()
+
+    return totals
+
+
+def engagement_by_project(metrics, start=None):
+    """
+    Count engagement events since `start` (or ever) grouped by project.
+
+    Returns:
+        dict: Mapping of project id to a dict of metric name to event count
+    """
+    rollup_q, raw_q = _split_period(start, get_watermark())
+    per_project = {}
+
+    def add(project_id, metric, count):
+        if not count:
+            return
+        counts = per_project.setdefault(project_id, dict.fromkeys(metrics, 0))
+        counts[metric] += count
+
+    if rollup_q is not None:
+        rows = (
+            ProjectEngagementRollup.objects.filter(rollup_q)
+            .values("project")
+            .annotate(**{f"total_{metric}": Sum(metric) for metric in metrics})
+            .order_by()
+        )
+        for row in rows:
+            for metric in metrics:
+                add(row["project"], metric, row[f"total_{metric}"])
+
+    for metric in metrics:
+        rows = EVENT_MODELS[metric].objects.filter(raw_q).values("project").annotate(total=Count("id")).order_by()
+        for row in rows:
+            add(row["project"], metric, row["total"])
+
+    return per_project
+
+
+def engagement_over_time(metrics, grouping, start=None, project_id=None):
+    """
+    Count engagement events since `start` (or ever) grouped by day or month.
+
+    Args:
+        metrics: Iterable of metric names among "views", "likes", "dislikes" and "shares"
+        grouping: Either "day" or "month"
+        start: Aware datetime marking the beginning of the period, or None for all time
+        project_id: Restrict the counts to this project if provided
+
+    Returns:
+        list: (period, counts) tuples sorted by period, where counts maps metric name to event count
+    """
+    trunc = TRUNC_FUNCTIONS.get(grouping, TruncMonth)
+    rollup_q, raw_q = _split_period(start, get_watermark())
+    if project_id:
+        raw_q &= Q(project_id=project_id)
+
+    per_period = {}
+
+    def add(period, metric, count):
+        if not count:
+            return
+        counts = per_period.setdefault(period, dict.fromkeys(metrics, 0))
+        counts[metric] += count
+
+    if rollup_q is not None:
+        rollups = ProjectEngagementRollup.objects.filter(rollup_q)
+        if project_id:
+            rollups = rollups.filter(project_id=project_id)
+        rows = (
+            rollups.annotate(period=trunc("bucket_start"))
+            .values("period")
+            .annotate(**{f"total_{metric}": Sum(metric) for metric in metrics})
+            .order_by()
+        )
+        for row in rows:
+            for metric in metrics:
+                add(row["period"], metric, row[f"total_{metric}"])
+
+    for metric in metrics:
+        rows = (
+            EVENT_MODELS[metric]
+            .objects.filter(raw_q)
+            .annotate(period=trunc("timestamp"))
+            .values("period")
+            .annotate(total=Count("id"))
+            .order_by()
+        )
+        for row in rows:
+            add(row["period"], metric, row["total"])
+
+    return sorted(per_period.items())
+
+
+def compact_rollups(until=None):
+    """
+    Compact raw engagement events older than `until` into hourly and daily rollups.
+
+    Only the events newer than the current watermark are read, so this is cheap to run often.
+
+    Args:
+        until: Aware datetime, floored to the hour; defaults to now
+
+    Returns:
+        int: Number of hourly buckets written
+    """
+    until = _floor_hour(until or timezone.now())
+
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        since = watermark.compacted_until
+        if since is not None and since >= until:
+            return 0
+
+        window = Q(timestamp__lt=until)
+        if since is not None:
+            window &= Q(timestamp__gte=since)
+
+        hourly = {}
+        for metric, model in EVENT_MODELS.items():
+            rows = (
+                model.objects.filter(window)
+                .annotate(bucket=TruncHour("timestamp"))
+                .values("project", "bucket")
+                .annotate(total=Count("id"))
+                .order_by()
+            )
+            for row in rows:
+                counts = hourly.setdefault((row["project"], row["bucket"]), dict.fromkeys(EVENT_MODELS, 0))
+                counts[metric] = row["total"]
+
+        if hourly:
+            ProjectEngagementRollup.objects.bulk_create(
+                [
+                    ProjectEngagementRollup(project_id=project_id, granularity="hour", bucket_start=bucket, **counts)
+                    for (project_id, bucket), counts in hourly.items()
+                ],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["project", "granularity", "bucket_start"],
+                update_fields=list(EVENT_MODELS),
+            )
+
+            first_day = _floor_day(min(bucket for _, bucket in hourly))
+            daily = (
+                ProjectEngagementRollup.objects.filter(
+                    granularity="hour", bucket_start__gte=first_day, bucket_start__lt=until
+                )
+                .annotate(day=TruncDay("bucket_start"))
+                .values("project", "day")
+                .annotate(**{f"total_{metric}": Sum(metric) for metric in EVENT_MODELS})
+                .order_by()
+            )
+            ProjectEngagementRollup.objects.bulk_create(
+                [
+                    ProjectEngagementRollup(
+                        project_id=row["project"],
+                        granularity="day",
+                        bucket_start=row["day"],
+                        **{metric: row[f"total_{metric}"] for metric in EVENT_MODELS},
+                    )
+                    for row in daily
+                ],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["project", "granularity", "bucket_start"],
+                update_fields=list(EVENT_MODELS),
+            )
+
+        watermark.compacted_until = until
+        watermark.save(update_fields=["compacted_until"])
+
+    logger.info(f"Compacted {len(hourly)} hourly engagement buckets up to {until.isoformat()}")
+    return len(hourly)
+
+
+def rebuild_rollups(until=None):
+    """
+    Drop every rollup and recompute them from the raw event tables.
+    """
+    with transaction.atomic():
+        ProjectEngagementRollup.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK_NAME).delete()
+        return compact_rollups(until)
+
+
+def discount_event(metric, event):
+    """
+    Remove a deleted raw event from the rollups if it had already been compacted.
+
+    Args:
+        metric: Metric name of the event ("views", "likes", "dislikes" or "shares")
+        event: The deleted ProjectView/ProjectLike/ProjectDislike/ProjectShare instance
+    """
+    watermark = get_watermark()
+    if watermark is None or event.timestamp is None or event.timestamp >= watermark:
+        return
+
+    buckets = Q(granularity="hour", bucket_start=_floor_hour(event.timestamp)) | Q(
+        granularity="day", bucket_start=_floor_day(event.timestamp)
+    )
+    ProjectEngagementRollup.objects.filter(buckets, project_id=event.project_id, **{f"{metric}__gt": 0}).update(
+        **{metric: F(metric) - 1}
+    )
+
+
+def count_late_events(metric, events):
+    """
+    Add raw events written after their period was compacted to the rollups, like buffered views flushed
+    late or replayed after a crash (the reverse of `discount_event`).
+
+    Must run in the transaction writing the events, so that a concurrent compaction either counts them
+    from the raw table or leaves them to this function.
+
+    Args:
+        metric: Metric name of the events ("views", "likes", "dislikes" or "shares")
+        events: The created ProjectView/ProjectLike/ProjectDislike/ProjectShare instances
+    """
+    watermark = (
+        RollupWatermark.objects.select_for_update()
+        .filter(name=WATERMARK_NAME)
+        .values_list("compacted_until", flat=True)
+        .first()
+    )
+    if watermark is None:
+        return
+
+    late = Counter()
+    for event in events:
+        if event.timestamp < watermark:
+            late[(event.project_id, "hour", _floor_hour(event.timestamp))] += 1
+            late[(event.project_id, "day", _floor_day(event.timestamp))] += 1
+
+    for (project_id, granularity, bucket_start), count in late.items():
+        bucket = ProjectEngagementRollup.objects.filter(
+            project_id=project_id, granularity=granularity, bucket_start=bucket_start
+        )
+        if not bucket.update(**{metric: F(metric) + count}):
+            ProjectEngagementRollup.objects.create(
+                project_id=project_id, granularity=granularity, bucket_start=bucket_start, **{metric: count}
+            )
@@ -0,0 +1,382 @@
+"""
+Inverted index backing the advanced search endpoint.
+
+Projects, events, news and founders are tokenized into postings (term, document, field,
+term frequency, field length) stored in the database and kept up to date by the save/delete
+signals in `init.signals`. A query only reads the postings of its own terms, scores the
+matching documents with BM25 (per-field weights, IDF over the searched document types,
+average field lengths from running statistics) and returns lightweight hits; the caller
+then selects and hydrates only the requested page.
+
+A document matches when every query term is found in its words, anywhere in a word: "solar"
+matches "Solarwind" and "tech" matches "Fintech", whole words counting fully and parts of words
+PARTIAL_MATCH_WEIGHT. The terms containing a query term are read from the suffixes of the
+indexed terms (`SearchTermSuffix`) as a range of their index, so a query never scans the
+documents. A founder whose name contains every term adds FOUNDER_MATCH_BONUS to the score of
+each of their startups, whether or not the startup itself matches.
+
+Suffixes are added with the first posting of a term and only dropped by a rebuild; suffixes of
+terms no longer used by any document just match no posting.
+"""
+
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import F, Q, Subquery
+
+from admin_panel.models import Event, Founder, NewsDetail, StartupDetail
+
+from .models import SearchDocument, SearchFieldStatistic, SearchPosting, SearchTermSuffix
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TERM_LENGTH = 100
+
+K1 = 1.2
+B = 0.75
+FOUNDER_MATCH_BONUS = 2.0
+# Weight of a term found inside a longer word, like the substring matches of the scan
+PARTIAL_MATCH_WEIGHT = 0.5
+# Upper bound of the suffixes starting with a term
+PREFIX_END = "\U0010ffff"
+
+# doc_type -> (model, title field, {indexed field: weight})
+INDEXED_MODELS = {
+    "project": (StartupDetail, "name", {"name": 2.0, "description": 1.0, "sector": 1.5, "needs": 1.0}),
+    "event": (Event, "name", {"name": 2.0, "description": 1.0, "event_type": 1.5, "location": 1.0}),
+    "news": (NewsDetail, "title", {"title": 2.0, "description": 1.0, "category": 1.5, "location": 1.0}),
+    "founder": (Founder, "name", {"name": 1.0}),
+}
+
+MODEL_DOC_TYPES = {model: doc_type for doc_type, (model, _, _) in INDEXED_MODELS.items()}
+
+
+def tokenize(text):
+    """
+    Split a text into lowercase word tokens.
+    """
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_PATTERN.findall(text.lower())] if text else []
+
+
+def is_index_ready():
+    """
+    Whether the index has been built at least once.
+    """
+    return SearchDocument.objects.exists()
+
+
+def _analyze(doc_type, instance):
+    """
+    Return the title, per-field term counters and per-field lengths of an instance.
+    """
+    _, title_field, fields = INDEXED_MODELS[doc_type]
+    counters = {}
+    lengths = {}
+    for field in fields:
+        value = getattr(instance, field, None)
+        tokens = tokenize(value) if isinstance(value, str) else []
+        counters[field] = Counter(tokens)
+        lengths[field] = len(tokens)
+    title = (getattr(instance, title_field, None) or "")[:255]
+    return title, counters, lengths
+
+
+def _build_postings(document, counters, lengths):
+    return [
+        SearchPosting(
+            term=term,
+            document=document,
+            field=field,
+            term_frequency=frequency,
+            field_length=lengths[field],
+        )
+        for field, counter in counters.items()
+        for term, frequency in counter.items()
+    ]
+
+
+def _suffix_rows(terms):
+    return [(term[start:], term) for term in terms for start in range(len(term))]
+
+
+def _index_suffixes(terms):
+    """
+    Add the suffixes of the terms that are not indexed yet.
+    """
+    terms = set(terms)
+    known = SearchTermSuffix.objects.filter(suffix__in=terms, term=F("suffix")).values_list("term", flat=True)
+    terms.difference_update(known)
+    SearchTermSuffix.objects.bulk_create(
+        [SearchTermSuffix(suffix=suffix, term=term) for suffix, term in _suffix_rows(terms)],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def _adjust_statistics(doc_type, lengths, sign):
+    for field in INDEXED_MODELS[doc_type][2]:
+        statistic, _ = SearchFieldStatistic.objects.get_or_create(doc_type=doc_type, field=field)
+        SearchFieldStatistic.objects.filter(pk=statistic.pk).update(
+            document_count=F("document_count") + sign,
+            total_length=F("total_length") + sign * lengths.get(field, 0),
+        )
+
+
+def index_instance(instance):
+    """
+    Add or refresh a StartupDetail, Event, NewsDetail or Founder in the index.
+    """
+    doc_type = MODEL_DOC_TYPES[type(instance)]
+    title, counters, lengths = _analyze(doc_type, instance)
+
+    with transaction.atomic():
+        document = SearchDocument.objects.select_for_update().filter(doc_type=doc_type, object_id=instance.pk).first()
+        if document is None:
+            document = SearchDocument.objects.create(
+                doc_type=doc_type, object_id=instance.pk, title=title, field_lengths=lengths
+            )
+        else:
+            _adjust_statistics(doc_type, document.field_lengths, -1)
+            document.postings.all().delete()
+            document.title = title
+            document.field_lengths = lengths
+            document.save(update_fields=["title", "field_lengths"])
+
+        SearchPosting.objects.bulk_create(_build_postings(document, counters, lengths), batch_size=500)
+        _index_suffixes(term for counter in counters.values() for term in counter)
+        _adjust_statistics(doc_type, lengths, 1)
+
+
+def unindex_instance(instance):
+    """
+    Remove a StartupDetail, Event, NewsDetail or Founder from the index.
+    """
+    doc_type = MODEL_DOC_TYPES[type(instance)]
+    with transaction.atomic():
+        document = SearchDocument.objects.select_for_update().filter(doc_type=doc_type, object_id=instance.pk).first()
+        if document is None:
+            return
+        _adjust_statistics(doc_type, document.field_lengths, -1)
+        document.delete()
+
+
+def _insert_rows(model, fields, rows):
+    """
+    Insert rows of values of `fields` with a plain executemany, bypassing model instantiation which
+    dominates the cost of a full rebuild.
+    """
+    if not rows:
+        return
+    meta = model._meta
+    columns = [meta.get_field(name).column for name in fields]
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(meta.db_table)} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def rebuild_index(chunk_size=1000):
+    """
+    Drop the index and rebuild it from every indexed model.
+
+    Returns:
+        int: Number of documents indexed
+    """
+    indexed = 0
+    with transaction.atomic():
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+        SearchFieldStatistic.objects.all().delete()
+        SearchTermSuffix.objects.all().delete()
+
+        statistics = []
+        vocabulary = set()
+        for doc_type, (model, _, fields) in INDEXED_MODELS.items():
+            totals = dict.fromkeys(fields, 0)
+            document_count = 0
+            instances = model.objects.order_by("pk").iterator(chunk_size=chunk_size)
+
+            while True:
+                chunk = list(islice(instances, chunk_size))
+                if not chunk:
+                    break
+                analyzed = [(instance.pk, *_analyze(doc_type, instance)) for instance in chunk]
+                documents = SearchDocument.objects.bulk_create(
+                    [
+                        SearchDocument(doc_type=doc_type, object_id=pk, title=title, field_lengths=lengths)
+                        for pk, title, _, lengths in analyzed
+                    ]
+                )
+                rows = []
+                for document, (_, _, counters, lengths) in zip(documents, analyzed, strict=True):
+                    rows.extend(
+                        (term, document.pk, field, frequency, lengths[field])
+                        for field, counter in counters.items()
+                        for term, frequency in counter.items()
+                    )
+                    for field, length in lengths.items():
+                        totals[field] += length
+                _insert_rows(SearchPosting, ("term", "document", "field", "term_frequency", "field_length"), rows)
+                vocabulary.update(row[0] for row in rows)
+                document_count += len(chunk)
+
+            statistics.extend(
+                SearchFieldStatistic(doc_type=doc_type, field=field, document_count=document_count, total_length=total)
+                for field, total in totals.items()
+            )
+            indexed += document_count
+
+        SearchFieldStatistic.objects.bulk_create(statistics)
+        _insert_rows(SearchTermSuffix, ("suffix", "term"), _suffix_rows(vocabulary))
+
+    logger.info(f"Rebuilt search index with {indexed} documents")
+    return indexed
+
+
+def _bm25(doc_type, matches, idf, average_lengths):
+    """
+    BM25 score of a document given its postings for the query terms.
+    """
+    weights = INDEXED_MODELS[doc_type][2]
+    score = 0.0
+    for term, field, frequency, length, weight in matches:
+        average = average_lengths.get((doc_type, field)) or 1.0
+        normalization = K1 * (1 - B + B * length / average)
+        score += weight * weights.get(field, 1.0) * idf[term] * frequency * (K1 + 1) / (frequency + normalization)
+    return score
+
+
+def _containing_filter(terms):
+    """
+    Filter of the postings whose token contains one of the terms: the tokens with a suffix starting
+    with a term, read as range lookups on the suffix index.
+    """
+    prefixes = Q()
+    for term in terms:
+        prefixes |= Q(suffix__gte=term, suffix__lt=term + PREFIX_END)
+    return Q(term__in=Subquery(SearchTermSuffix.objects.filter(prefixes).values("term")))
+
+
+def _matched_terms(token, terms):
+    """
+    Yield the query terms an indexed token contains, with the weight of the match.
+    """
+    for term in terms:
+        if term in token:
+            yield term, 1.0 if token == term else PARTIAL_MATCH_WEIGHT
+
+
+def _founder_startups(terms):
+    """
+    Return the ids of the startups of every founder whose indexed name contains all the terms.
+    """
+    matched_terms = defaultdict(set)
+    postings = SearchPosting.objects.filter(_containing_filter(terms), document__doc_type="founder").values_list(
+        "document__object_id", "term"
+    )
+    for founder_id, token in postings:
+        matched_terms[founder_id].update(term for term, _ in _matched_terms(token, terms))
+
+    founder_ids = [founder_id for founder_id, found in matched_terms.items() if len(found) == len(terms)]
+    if not founder_ids:
+        return set()
+
+    return set(
+        StartupDetail.founders.through.objects.filter(founder_id__in=founder_ids).values_list(
+            "startupdetail_id", flat=True
+        )
+    )
+
+
+def search(query, doc_types, allowed_ids=None):
+    """
+    Score the indexed documents whose words contain every term of `query`.
+
+    Args:
+        query: Raw search string
+        doc_types: Iterable of document types to search among "project", "event" and "news"
+        allowed_ids: Optional mapping of document type to the set of object ids allowed by other filters
+
+    Returns:
+        list: (score, title, doc_type, object_id) tuples in no particular order
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+
+    doc_types = list(doc_types)
+    allowed_ids = allowed_ids or {}
+
+    corpus_size = SearchDocument.objects.filter(doc_type__in=doc_types).count()
+    average_lengths = {
+        (doc_type, field): total / count
+        for doc_type, field, count, total in SearchFieldStatistic.objects.filter(doc_type__in=doc_types).values_list(
+            "doc_type", "field", "document_count", "total_length"
+        )
+        if count
+    }
+
+    documents = {}
+    postings = SearchPosting.objects.filter(_containing_filter(terms), document__doc_type__in=doc_types).values_list(
+        "document__doc_type",
+        "document__object_id",
+        "document__title",
+        "term",
+        "field",
+        "term_frequency",
+        "field_length",
+    )
+    for doc_type, object_id, title, token, field, frequency, length in postings.iterator(chunk_size=5000):
+        entry = documents.get((doc_type, object_id))
+        if entry is None:
+            entry = documents[(doc_type, object_id)] = (title, [])
+        for term, weight in _matched_terms(token, terms):
+            entry[1].append((term, field, frequency, length, weight))
+
+    document_frequencies = Counter()
+    for _, matches in documents.values():
+        document_frequencies.update({match[0] for match in matches})
+    idf = {
+        term: math.log(1 + (corpus_size - frequency + 0.5) / (frequency + 0.5))
+        for term, frequency in document_frequencies.items()
+    }
+
+    def allowed(doc_type, object_id):
+        ids = allowed_ids.get(doc_type)
+        return ids is None or object_id in ids
+
+    hits = {}
+    for (doc_type, object_id), (title, matches) in documents.items():
+        if len({match[0] for match in matches}) == len(terms) and allowed(doc_type, object_id):
+            hits[(doc_type, object_id)] = (_bm25(doc_type, matches, idf, average_lengths), title)
+
+    if "project" in doc_types:
+        startup_ids = {startup_id for startup_id in _founder_startups(terms) if allowed("project", startup_id)}
+        missing_titles = {startup_id for startup_id in startup_ids if ("project", startup_id) not in documents}
+        titles = dict(
+            SearchDocument.objects.filter(doc_type="project", object_id__in=missing_titles).values_list(
+                "object_id", "title"
+            )
+        )
+        for startup_id in startup_ids:
+            entry = documents.get(("project", startup_id))
+            if entry is not None:
+                title, matches = entry
+                score = _bm25("project", matches, idf, average_lengths) + FOUNDER_MATCH_BONUS
+            elif startup_id in titles:
+                title, score = titles[startup_id], FOUNDER_MATCH_BONUS
+            else:
+                continue
+            previous = hits.get(("project", startup_id))
+            if previous is None or previous[0] < score:
+                hits[("project", startup_id)] = (score, title)
+
+    return [(score, title, doc_type, object_id) for (doc_type, object_id), (score, title) in hits.items()]
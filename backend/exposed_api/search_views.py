@@ -3,7 +3,9 @@ Advanced search views for the Survivor project.
 These views provide the API endpoints for searching across different entity types.
 """
 
+import heapq
 import re
+from collections.abc import Sequence
 
 from django.db.models import Q
 from drf_spectacular.utils import OpenApiExample, OpenApiParameter, OpenApiResponse, extend_schema
@@ -15,6 +17,8 @@ from rest_framework.response import Response
 from admin_panel.models import Event, Founder, NewsDetail, StartupDetail
 
 from .search_filters import EventFilter, FounderFilter, NewsFilter, StartupDetailFilter
+from .search_index import FOUNDER_MATCH_BONUS, is_index_ready
+from .search_index import search as search_index
 from .search_serializers import (
     EventSearchResultSerializer,
     FounderSearchSerializer,
@@ -36,6 +40,99 @@ class CustomSearchPagination(PageNumberPagination):
     max_page_size = 50
 
 
+# result type -> (model, filter, serializer, title field)
+SEARCH_RESULT_SOURCES = {
+    "project": (StartupDetail, StartupDetailFilter, StartupSearchResultSerializer, "name"),
+    "event": (Event, EventFilter, EventSearchResultSerializer, "name"),
+    "news": (NewsDetail, NewsFilter, NewsSearchResultSerializer, "title"),
+}
+
+
+# result type -> fields scored by the scan path
+SCAN_FIELDS = {
+    "project": ["name", "description", "sector", "needs"],
+    "event": ["name", "description", "event_type", "location"],
+    "news": ["title", "description", "category", "location"],
+}
+
+# fields scored for startups matched through one of their founders
+FOUNDER_STARTUP_FIELDS = ["name", "description", "sector"]
+
+
+def _rank_key(hit):
+    score, title, _, _ = hit
+    return -score, title
+
+
+def hydrate_hits(hits):
+    """
+    Fetch and serialize the objects of a page of (score, title, type, id) hits in bulk.
+
+    Hits whose object no longer exists are skipped.
+    """
+    ids_by_type = {}
+    for _, _, result_type, object_id in hits:
+        ids_by_type.setdefault(result_type, []).append(object_id)
+
+    objects = {}
+    for result_type, ids in ids_by_type.items():
+        model = SEARCH_RESULT_SOURCES[result_type][0]
+        queryset = model.objects.filter(id__in=ids)
+        if result_type == "project":
+            queryset = queryset.prefetch_related("founders")
+        objects.update({(result_type, obj.id): obj for obj in queryset})
+
+    results = []
+    for score, _, result_type, object_id in hits:
+        obj = objects.get((result_type, object_id))
+        if obj is None:
+            continue
+        _, _, serializer_class, title_field = SEARCH_RESULT_SOURCES[result_type]
+        results.append(
+            {
+                "id": obj.id,
+                "title": getattr(obj, title_field),
+                "description": obj.description or "",
+                "type": result_type,
+                "score": score,
+                "entity": serializer_class(obj).data,
+            }
+        )
+    return results
+
+
+class RankedResults(Sequence):
+    """
+    Lazily ranked search hits.
+
+    The paginator only needs the number of hits and one slice of them, so slicing selects the
+    top of the ranking with a bounded heap and hydrates just that slice.
+    """
+
+    def __init__(self, hits):
+        """
+        Wrap a list of (score, title, type, id) hits.
+        """
+        self.hits = hits
+
+    def __len__(self):
+        """Return the total number of hits."""
+        return len(self.hits)
+
+    def __getitem__(self, index):
+        """Return the hydrated result(s) at a rank or slice of ranks."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.hits))
+            if start >= stop:
+                return []
+            return hydrate_hits(heapq.nsmallest(stop, self.hits, key=_rank_key)[start:stop:step])
+        if index < 0:
+            index += len(self.hits)
+        if not 0 <= index < len(self.hits):
+            raise IndexError("search result index out of range")
+        return self[index : index + 1][0]
+
+
 class AdvancedSearchView(views.APIView):
     """
     Advanced search view combining filters with text search.
@@ -98,7 +195,10 @@ class AdvancedSearchView(views.APIView):
     @extend_schema(
         parameters=[
             OpenApiParameter(
-                name="search", description="Global search term to find across all entities", required=False, type=str
+                name="search",
+                description="Global search terms to find across all entities, each of them inside a word of the result",
+                required=False,
+                type=str,
             ),
             OpenApiParameter(name="sector", description="Filter projects by sector", required=False, type=str),
             OpenApiParameter(
@@ -136,6 +236,9 @@ class AdvancedSearchView(views.APIView):
         Advanced search endpoint that combines filters with text search across
         different entity types (projects, events, news).
 
+        A result contains every word of the search term, anywhere in its words ("tech" finds
+        "Fintech"), or has a founder whose name contains every word.
+
         Results are scored based on relevance to the search term and sorted
         by score (descending) and then title for deterministic ordering.
 
@@ -148,108 +251,83 @@ class AdvancedSearchView(views.APIView):
 
         Processes search parameters, applies filters, calculates relevance scores,
         and returns paginated normalized results.
+        Text searches are answered from the inverted index once it has been built.
         """
         search_term = request.query_params.get("search", "")
         result_type = request.query_params.get("type", None)
 
-        all_results = []
+        if search_term and is_index_ready():
+            results = self.search_with_index(request, search_term, result_type)
+        else:
+            results = self.search_with_scan(request, search_term, result_type)
 
-        if not result_type or result_type == "project":
-            project_filter = StartupDetailFilter(
-                request.query_params, queryset=StartupDetail.objects.all().prefetch_related("founders")
-            )
-            filtered_projects = project_filter.qs
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(results, request)
 
-            for project in filtered_projects:
-                score = self.get_bm25_score(project, search_term, ["name", "description", "sector", "needs"])
-                if score > 0 or not search_term:
-                    serialized_project = StartupSearchResultSerializer(project).data
-                    all_results.append(
-                        {
-                            "id": project.id,
-                            "title": project.name,
-                            "description": project.description or "",
-                            "type": "project",
-                            "score": score,
-                            "entity": serialized_project,
-                        }
-                    )
-
-        if not result_type or result_type == "event":
-            event_filter = EventFilter(request.query_params, queryset=Event.objects.all())
-            filtered_events = event_filter.qs
-
-            for event in filtered_events:
-                score = self.get_bm25_score(event, search_term, ["name", "description", "event_type", "location"])
-                if score > 0 or not search_term:
-                    serialized_event = EventSearchResultSerializer(event).data
-                    all_results.append(
-                        {
-                            "id": event.id,
-                            "title": event.name,
-                            "description": event.description or "",
-                            "type": "event",
-                            "score": score,
-                            "entity": serialized_event,
-                        }
-                    )
-
-        if not result_type or result_type == "news":
-            news_filter = NewsFilter(request.query_params, queryset=NewsDetail.objects.all())
-            filtered_news = news_filter.qs
-
-            for news in filtered_news:
-                score = self.get_bm25_score(news, search_term, ["title", "description", "category", "location"])
+        if page is not None:
+            return paginator.get_paginated_response(page)
+
+        return Response(list(results))
+
+    def get_filtered_ids(self, request, result_type):
+        """
+        Return the ids allowed by the non-text filters of a result type, or None if none is set.
+        """
+        model, filterset_class, _, _ = SEARCH_RESULT_SOURCES[result_type]
+        params = request.query_params.copy()
+        params.pop("search", None)
+        if not any(params.get(name) for name in filterset_class.base_filters if name != "search"):
+            return None
+        return set(filterset_class(params, queryset=model.objects.all()).qs.values_list("id", flat=True))
+
+    def search_with_index(self, request, search_term, result_type):
+        """
+        Answer a text search from the inverted index.
+
+        Returns:
+            RankedResults: Hits ranked by score then title, hydrated page by page
+        """
+        result_types = [name for name in SEARCH_RESULT_SOURCES if not result_type or name == result_type]
+        allowed_ids = {name: self.get_filtered_ids(request, name) for name in result_types}
+        return RankedResults(search_index(search_term, result_types, allowed_ids))
+
+    def search_with_scan(self, request, search_term, result_type):
+        """
+        Answer a search by scanning and scoring every filtered object.
+
+        Scoring only loads the scored fields and produces lightweight hits; founder matches are
+        merged through a dict keyed by (type, id), and objects are serialized page by page.
+
+        Returns:
+            RankedResults: Hits ranked by score then title, hydrated page by page
+        """
+        hits = {}
+
+        for name, (model, filterset_class, _, title_field) in SEARCH_RESULT_SOURCES.items():
+            if result_type and result_type != name:
+                continue
+
+            fields = SCAN_FIELDS[name]
+            filtered = filterset_class(request.query_params, queryset=model.objects.all()).qs
+            for obj in filtered.only("id", title_field, *fields).iterator():
+                score = self.get_bm25_score(obj, search_term, fields)
                 if score > 0 or not search_term:
-                    serialized_news = NewsSearchResultSerializer(news).data
-                    all_results.append(
-                        {
-                            "id": news.id,
-                            "title": news.title,
-                            "description": news.description or "",
-                            "type": "news",
-                            "score": score,
-                            "entity": serialized_news,
-                        }
-                    )
+                    hits[(name, obj.id)] = (score, getattr(obj, title_field) or "")
 
         if (not result_type or result_type == "project") and search_term:
-            founder_filter = FounderFilter(
-                {"search": search_term}, queryset=Founder.objects.all().prefetch_related("startups")
+            founder_filter = FounderFilter({"search": search_term}, queryset=Founder.objects.all())
+            startups = StartupDetail.objects.filter(founders__in=founder_filter.qs).only(
+                "id", "name", *FOUNDER_STARTUP_FIELDS
             )
-            filtered_founders = founder_filter.qs
-
-            for founder in filtered_founders:
-                for startup in founder.startups.all():
-                    score = self.get_bm25_score(startup, search_term, ["name", "description", "sector"])
-                    founder_match_score = 2.0
-                    total_score = score + founder_match_score
-
-                    existing_entry = next(
-                        (item for item in all_results if item["type"] == "project" and item["id"] == startup.id), None
-                    )
-
-                    if existing_entry:
-                        existing_entry["score"] = max(existing_entry["score"], total_score)
-                    else:
-                        serialized_project = StartupSearchResultSerializer(startup).data
-                        all_results.append(
-                            {
-                                "id": startup.id,
-                                "title": startup.name,
-                                "description": startup.description or "",
-                                "type": "project",
-                                "score": total_score,
-                                "entity": serialized_project,
-                            }
-                        )
-
-        sorted_results = sorted(all_results, key=lambda x: (-x["score"], x.get("title", "")))
 
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(sorted_results, request)
+            for startup in startups.iterator():
+                score = self.get_bm25_score(startup, search_term, FOUNDER_STARTUP_FIELDS)
+                total_score = score + FOUNDER_MATCH_BONUS
 
-        if page is not None:
-            return paginator.get_paginated_response(page)
+                existing = hits.get(("project", startup.id))
+                if existing is None or existing[0] < total_score:
+                    hits[("project", startup.id)] = (total_score, startup.name or "")
 
-        return Response(sorted_results)
+        return RankedResults(
+            [(score, title, hit_type, object_id) for (hit_type, object_id), (score, title) in hits.items()]
+        )
@@ -0,0 +1,140 @@
+"""
+Tests for the persistent AI analysis jobs.
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from admin_panel.models import Investor, StartupDetail
+from exposed_api import ai_scoring
+from exposed_api.ai_jobs import claim, evict_expired, get_job, resume_local_workers, run_job, submit
+from exposed_api.ai_scoring import StubBackend, score_investors
+from exposed_api.models import AIAnalysisJob
+
+
+@override_settings(AI_ANALYSIS_LOCAL_WORKERS=0, AI_ANALYSIS_STALE_AFTER=60, AI_ANALYSIS_JOB_TTL=600)
+class AIAnalysisJobTests(TestCase):
+    """Test suite for job submission, claiming, execution and eviction."""
+
+    def setUp(self):
+        """Create a startup, a few investors and use a local scoring backend."""
+        self.client = APIClient()
+        ai_scoring.set_backend(StubBackend())
+        self.addCleanup(ai_scoring.reset)
+        self.startup = StartupDetail.objects.create(
+            id=1, name="Solar", email="solar@example.com", sector="greentech", address="Lyon France"
+        )
+        for index in range(1, 5):
+            Investor.objects.create(
+                id=index,
+                name=f"Investor {index}",
+                email=f"i{index}@example.com",
+                investment_focus="clean energy" if index % 2 else "retail",
+                address="Paris, France",
+            )
+
+    def test_identical_requests_join_the_job_in_flight(self):
+        """A startup has at most one active job, and a new one can start once it finished."""
+        job, created = submit(self.startup)
+        self.assertTrue(created)
+        self.assertEqual(submit(self.startup), (job, False))
+
+        claimed = claim("worker-1")
+        self.assertEqual(claimed, job)
+        self.assertIsNone(claim("worker-2"))
+        self.assertEqual(submit(self.startup), (job, False))
+
+        run_job(claimed, "worker-1")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress), ("completed", 100))
+        self.assertTrue(submit(self.startup)[1])
+
+    def test_results_combine_rule_and_ai_scores(self):
+        """Completed jobs hold every investor scoring at least 5, best first."""
+        job, _ = submit(self.startup)
+        run_job(claim("worker-1"), "worker-1")
+        job.refresh_from_db()
+
+        ai_results = score_investors(self.startup, Investor.objects.all())
+        self.assertEqual(
+            [match["score"] for match in job.results], sorted((m["score"] for m in job.results), reverse=True)
+        )
+        for match in job.results:
+            ai_score = ai_results[match["investor_id"]][0]
+            self.assertEqual(match["ai_score"], ai_score)
+            self.assertEqual(
+                match["score"], int((match["rule_score"] + ai_score) / 2) if ai_score else match["rule_score"]
+            )
+        self.assertEqual(next(match for match in job.results if match["investor_id"] == 1)["rule_score"], 40 + 10 + 10)
+
+    def test_abandoned_jobs_are_reclaimed(self):
+        """A processing job without heartbeat goes to another worker and the first one cannot overwrite it."""
+        job, _ = submit(self.startup)
+        claim("worker-1")
+        self.assertIsNone(claim("worker-2"))
+
+        AIAnalysisJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=120))
+        reclaimed = claim("worker-2")
+        self.assertEqual((reclaimed.pk, reclaimed.worker), (job.pk, "worker-2"))
+
+        run_job(job, "worker-1")
+        job.refresh_from_db()
+        self.assertEqual(job.status, "processing")
+
+        run_job(reclaimed, "worker-2")
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+
+    def test_finished_jobs_expire(self):
+        """Finished jobs are hidden then deleted after their TTL, active ones are kept."""
+        finished, _ = submit(self.startup)
+        AIAnalysisJob.objects.filter(pk=finished.pk).update(
+            status="completed", updated_at=timezone.now() - timedelta(seconds=601)
+        )
+        active, _ = submit(self.startup)
+        AIAnalysisJob.objects.filter(pk=active.pk).update(updated_at=timezone.now() - timedelta(seconds=601))
+
+        self.assertIsNone(get_job(finished.pk))
+        self.assertEqual(evict_expired(), 1)
+        self.assertEqual(list(AIAnalysisJob.objects.all()), [active])
+
+    def test_waiting_jobs_are_resumed_at_startup(self):
+        """The local workers are started at startup only when jobs are pending or processing."""
+        with mock.patch("exposed_api.ai_jobs.wake_local_workers") as wake:
+            resume_local_workers()
+            wake.assert_not_called()
+
+            job, _ = submit(self.startup)
+            resume_local_workers()
+            wake.assert_called_once_with()
+
+            AIAnalysisJob.objects.filter(pk=job.pk).update(status="completed")
+            resume_local_workers()
+            wake.assert_called_once_with()
+
+    def test_endpoints(self):
+        """The endpoints queue a job and report its state."""
+        response = self.client.post(reverse("exposed_api:ai_analysis_start"), {"startup_id": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "started")
+        analysis_id = response.data["analysis_id"]
+        url = reverse("exposed_api:ai_analysis_status", args=[analysis_id])
+
+        response = self.client.post(reverse("exposed_api:ai_analysis_start"), {"startup_id": 1}, format="json")
+        self.assertEqual((response.data["analysis_id"], response.data["status"]), (analysis_id, "pending"))
+
+        self.assertEqual(self.client.get(url).data, {"status": "pending", "progress": 0, "results": []})
+
+        run_job(claim("worker-1"), "worker-1")
+        response = self.client.get(url)
+        self.assertEqual(response.data["status"], "completed")
+        self.assertTrue(response.data["results"])
+
+        response = self.client.get(reverse("exposed_api:ai_analysis_status", args=["not-a-uuid"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
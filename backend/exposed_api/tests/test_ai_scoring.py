@@ -0,0 +1,78 @@
+"""
+Tests for the concurrent and cached AI scoring pipeline.
+"""
+
+from django.test import TestCase, override_settings
+
+from admin_panel.models import Investor, StartupDetail
+from exposed_api import ai_scoring
+from exposed_api.ai_scoring import StubBackend, TransientScoringError, parse_response, score_investors
+from exposed_api.models import AIScoreCache
+
+
+class FlakyBackend(StubBackend):
+    """Stub backend rate limiting the first requests."""
+
+    def __init__(self, failures):
+        """Fail the first `failures` requests."""
+        super().__init__()
+        self.failures = failures
+
+    def complete(self, prompt):
+        """Raise a rate limit error until the failures are exhausted."""
+        with self._lock:
+            self.failures -= 1
+            failing = self.failures >= 0
+        if failing:
+            raise TransientScoringError("rate limited", retry_after=0)
+        return super().complete(prompt)
+
+
+@override_settings(AI_SCORING_BACKOFF=0, AI_SCORING_MAX_RETRIES=2)
+class AIScoringTests(TestCase):
+    """Test suite for the AI scoring backends, retries and cache."""
+
+    def setUp(self):
+        """Create a startup and a few investors and use a local backend."""
+        self.backend = StubBackend()
+        ai_scoring.set_backend(self.backend)
+        self.addCleanup(ai_scoring.reset)
+        self.startup = StartupDetail.objects.create(id=1, name="Solar", email="solar@example.com", sector="Energy")
+        self.investors = [
+            Investor.objects.create(id=index, name=f"Investor {index}", email=f"i{index}@example.com")
+            for index in range(1, 6)
+        ]
+
+    def test_parse_response(self):
+        """Scores are read from the completion, with a neutral default."""
+        self.assertEqual(parse_response("Score: 80, Reason: Great fit"), (80, "Great fit"))
+        self.assertEqual(parse_response("I cannot tell"), (50, "AI analysis: Moderate match"))
+
+    def test_scores_are_cached_until_data_changes(self):
+        """Repeat analyses come from the cache, and editing an investor only rescores that investor."""
+        first = score_investors(self.startup, self.investors)
+        self.assertEqual(set(first), {investor.id for investor in self.investors})
+        self.assertEqual(self.backend.calls, 5)
+        self.assertEqual(AIScoreCache.objects.count(), 5)
+
+        progress = []
+        self.assertEqual(score_investors(self.startup, self.investors, progress=lambda *p: progress.append(p)), first)
+        self.assertEqual(self.backend.calls, 5)
+        self.assertEqual(progress, [(5, 5)])
+
+        self.investors[0].investment_focus = "Energy"
+        self.investors[0].save()
+        score_investors(self.startup, self.investors)
+        self.assertEqual(self.backend.calls, 6)
+        self.assertEqual(AIScoreCache.objects.count(), 5)
+
+    def test_transient_failures_are_retried(self):
+        """Rate limited requests are retried, and requests still failing are not cached."""
+        ai_scoring.set_backend(FlakyBackend(failures=2))
+        result = score_investors(self.startup, self.investors[:1])
+        self.assertNotEqual(result[1], ai_scoring.UNAVAILABLE)
+
+        ai_scoring.set_backend(FlakyBackend(failures=3))
+        result = score_investors(self.startup, self.investors[1:2])
+        self.assertEqual(result[2], ai_scoring.UNAVAILABLE)
+        self.assertFalse(AIScoreCache.objects.filter(investor_id=2).exists())
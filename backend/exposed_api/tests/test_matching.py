@@ -0,0 +1,160 @@
+"""
+Tests for the vectorized investor matching engine.
+"""
+
+import itertools
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from admin_panel.models import Investor, StartupDetail
+from exposed_api.matching import TECH_SECTOR_KEYWORDS, get_investor_matrix, invalidate_investor_matrix
+from exposed_api.opportunity_views import OpportunitiesMatchesView
+
+INVESTORS = [
+    ("Deep Capital", "Venture Capital", "DeepTech, AI research", "12 rue de Paris, France"),
+    ("Health Angels", "Angel network", "Healthcare, medical devices, wellness", "Berlin Germany"),
+    ("Green Fund", "Seed fund", "clean energy and sustainability", "Lyon, France"),
+    ("Generalist", "Family office", "", ""),
+    ("Tech Ventures", "venture capital, seed", "Tech, payment, logistics", "London UK"),
+    ("Placeholder", "string", "string", "string"),
+]
+
+STARTUPS = [
+    ("Neuro", "DeepTech", "Funding, research", "Paris France", "Seed"),
+    ("Pay", "FinTech", "payment, ", "London UK", "Series A"),
+    ("Heal", "HealthTech", "string", "string", "string"),
+    ("Sun", "GreenTech", "clean energy", "Marseille France", "seed"),
+    ("Bakery", "Food", "distribution", "Rome Italy", ""),
+    ("Empty", "", "", "", ""),
+]
+
+
+class MatchingEngineTests(TestCase):
+    """Test suite for the investor feature matrix and the match endpoints."""
+
+    def setUp(self):
+        """Create investors and startups covering every scoring rule."""
+        self.client = APIClient()
+        invalidate_investor_matrix()
+        for index, (name, investor_type, focus, address) in enumerate(INVESTORS, start=1):
+            Investor.objects.create(
+                id=index,
+                name=name,
+                email=f"investor{index}@example.com",
+                investor_type=investor_type,
+                investment_focus=focus,
+                address=address,
+            )
+        for index, (name, sector, needs, address, maturity) in enumerate(STARTUPS, start=1):
+            StartupDetail.objects.create(
+                id=index,
+                name=name,
+                email=f"startup{index}@example.com",
+                sector=sector,
+                needs=needs,
+                address=address,
+                maturity=maturity,
+            )
+
+    def legacy_matches(self, **params):
+        """Scores and reasons of the per-investor loop, as returned with include_ai disabled."""
+        view = OpportunitiesMatchesView()
+        if "startup_id" in params:
+            startup = StartupDetail.objects.get(id=params["startup_id"])
+            scored = [(inv.id, *view._score_investor_against_startup(inv, startup)) for inv in Investor.objects.all()]
+        else:
+            scored = [(inv.id, *view._score_investor_against_filters(inv, params)) for inv in Investor.objects.all()]
+        scored = [(inv_id, score, reason) for inv_id, score, _, _, reason in scored if score > 0]
+        return sorted(scored, key=lambda match: -match[1])
+
+    def test_startup_matches_equal_legacy_scoring(self):
+        """Every startup gets the same matches, scores, reasons and order as the per-investor loop."""
+        url = reverse("exposed_api:opportunities_matches")
+        for startup_id in range(1, len(STARTUPS) + 1):
+            response = self.client.get(url, {"startup_id": startup_id})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected = self.legacy_matches(startup_id=startup_id)
+            if expected:
+                self.assertEqual(
+                    [(match["investor_id"], match["score"], match["reason"]) for match in response.data["matches"]],
+                    expected,
+                )
+                self.assertEqual(
+                    response.data["matches"][0]["location"], Investor.objects.get(id=expected[0][0]).address
+                )
+
+    def test_filter_matches_equal_legacy_scoring(self):
+        """Filter queries give the same results as the per-investor loop."""
+        url = reverse("exposed_api:opportunities_matches")
+        values = {
+            "sectors": [None, "deeptech,health", "energy"],
+            "tags": [None, "payment, ai"],
+            "location": [None, "France"],
+            "stage": [None, "venture"],
+        }
+        for combination in itertools.product(*values.values()):
+            filters = dict(zip(values, combination, strict=True))
+            response = self.client.get(url, {key: value for key, value in filters.items() if value})
+            self.assertEqual(
+                [(match["investor_id"], match["score"], match["reason"]) for match in response.data["matches"]],
+                self.legacy_matches(**filters),
+                filters,
+            )
+
+    def test_fallback_suggestions_without_any_match(self):
+        """A startup matching no investor gets the generic suggestions."""
+        response = self.client.get(reverse("exposed_api:opportunities_matches"), {"startup_id": 6})
+        self.assertEqual(
+            [(match["investor_id"], match["score"], match["reason"]) for match in response.data["matches"]],
+            [
+                (1, 25, "venture capitalist"),
+                (5, 25, "venture capitalist"),
+                (2, 22, "angel investor"),
+                (3, 20, "general suggestion"),
+                (4, 20, "general suggestion"),
+                (6, 20, "general suggestion"),
+            ],
+        )
+
+    def test_legacy_scoring_uses_the_matrix_sector_keywords(self):
+        """The per-investor rules read the sector keywords of the matrix, so both paths change together."""
+        view = OpportunitiesMatchesView()
+        self.assertFalse(view._is_tech_sector_match("fintech", "crypto funds"))
+        with mock.patch.dict(TECH_SECTOR_KEYWORDS, {"fintech": [*TECH_SECTOR_KEYWORDS["fintech"], "crypto"]}):
+            self.assertTrue(view._is_tech_sector_match("FinTech", "crypto funds"))
+            invalidate_investor_matrix()
+            self.test_startup_matches_equal_legacy_scoring()
+        invalidate_investor_matrix()
+
+    def test_matrix_is_rebuilt_when_investors_change(self):
+        """Saving or deleting an investor invalidates the cached matrix."""
+        matrix = get_investor_matrix()
+        self.assertIs(get_investor_matrix(), matrix)
+
+        Investor.objects.get(id=6).delete()
+        rebuilt = get_investor_matrix()
+        self.assertIsNot(rebuilt, matrix)
+        self.assertEqual(len(rebuilt), len(INVESTORS) - 1)
+
+    def test_batch_endpoint(self):
+        """The batch endpoint returns the top matches of the requested startups."""
+        url = reverse("exposed_api:opportunities_matches_batch")
+
+        response = self.client.get(url, {"startup_ids": "2,1", "limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result["startup_id"] for result in response.data["results"]], [1, 2])
+        for result in response.data["results"]:
+            expected = self.legacy_matches(startup_id=result["startup_id"])[:2]
+            self.assertEqual(
+                [(match["investor_id"], match["score"], match["reason"]) for match in result["matches"]], expected
+            )
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), len(STARTUPS))
+
+        response = self.client.get(url, {"startup_ids": "one"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
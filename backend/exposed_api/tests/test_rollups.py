@@ -0,0 +1,101 @@
+"""
+Tests for the engagement rollups backing the KPI endpoints.
+"""
+
+from datetime import timedelta
+
+from authentication.models import CustomUser
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from admin_panel.models import StartupDetail
+from exposed_api.models import ProjectEngagementRollup, ProjectLike, ProjectView
+from exposed_api.rollups import compact_rollups, engagement_by_project, engagement_over_time, engagement_totals
+
+
+class EngagementRollupTests(TestCase):
+    """Test suite checking that rollup-backed counts match the raw event tables."""
+
+    def setUp(self):
+        """Create two projects with views and likes spread over the last weeks."""
+        self.now = timezone.now()
+        self.project = StartupDetail.objects.create(id=201, name="Rollup Project", email="rollup@example.com")
+        self.other_project = StartupDetail.objects.create(id=202, name="Other Project", email="other@example.com")
+
+        offsets = [timedelta(days=20), timedelta(days=3, hours=5), timedelta(hours=30), timedelta(minutes=90)]
+        for offset in offsets:
+            self._create_event(ProjectView, self.project, self.now - offset)
+            self._create_event(ProjectView, self.project, self.now - offset - timedelta(minutes=7))
+            self._create_event(ProjectView, self.other_project, self.now - offset)
+        self.like = self._create_event(ProjectLike, self.project, self.now - timedelta(days=2), ip_address="10.0.0.1")
+
+    def _create_event(self, model, project, timestamp, **kwargs):
+        event = model.objects.create(project=project, **kwargs)
+        model.objects.filter(id=event.id).update(timestamp=timestamp)
+        event.refresh_from_db()
+        return event
+
+    def _raw_views(self, start=None, project=None):
+        queryset = ProjectView.objects.all()
+        if start:
+            queryset = queryset.filter(timestamp__gte=start)
+        if project:
+            queryset = queryset.filter(project=project)
+        return queryset.count()
+
+    def test_totals_match_raw_counts_after_compaction(self):
+        """Totals combine rollups, the partial first hour and the raw tail exactly."""
+        compact_rollups(self.now - timedelta(hours=1))
+        self.assertTrue(ProjectEngagementRollup.objects.filter(granularity="day").exists())
+
+        self._create_event(ProjectView, self.project, self.now)
+
+        for start in [
+            None,
+            self.now - timedelta(days=30),
+            self.now - timedelta(days=3),
+            self.now - timedelta(hours=2),
+        ]:
+            totals = engagement_totals(["views"], start=start, project_id=self.project.id)
+            self.assertEqual(totals["views"], self._raw_views(start, self.project))
+            self.assertEqual(engagement_totals(["views"], start=start)["views"], self._raw_views(start))
+
+    def test_grouped_counts_match_raw_counts(self):
+        """Per-project and per-day counts are the same before and after compaction."""
+        start = self.now - timedelta(days=7)
+        by_project = engagement_by_project(["views", "likes"], start=start)
+        over_time = engagement_over_time(["views"], "day", start=start)
+
+        compact_rollups()
+
+        self.assertEqual(engagement_by_project(["views", "likes"], start=start), by_project)
+        self.assertEqual(engagement_over_time(["views"], "day", start=start), over_time)
+        self.assertEqual(by_project[self.project.id]["likes"], 1)
+
+    def test_deleted_event_is_discounted_from_rollups(self):
+        """Removing an already compacted like decrements its buckets."""
+        compact_rollups()
+        self.assertEqual(engagement_totals(["likes"])["likes"], 1)
+
+        ProjectLike.objects.filter(id=self.like.id).delete()
+
+        self.assertEqual(engagement_totals(["likes"])["likes"], 0)
+
+    def test_most_viewed_projects_endpoint_uses_rollups(self):
+        """The KPI endpoint returns the same ranking once events are compacted."""
+        admin = CustomUser.objects.create_user(
+            email="kpi-admin@example.com", password="test_password", name="KPI Admin", role="admin"
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+        compact_rollups()
+        response = client.get(reverse("exposed_api:kpi_most_viewed_projects"), {"period": "all"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0], {"id": self.project.id, "name": "Rollup Project", "total_views": 8})
+        self.assertEqual(response.json()[1]["total_views"], 4)
@@ -10,6 +10,7 @@ from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from admin_panel.models import Event, Founder, NewsDetail, StartupDetail
+from exposed_api.models import SearchDocument
 
 
 class AdvancedSearchTests(TestCase):
@@ -199,3 +200,28 @@ class AdvancedSearchTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Should respect max page size (50)
         self.assertTrue(len(response.data["results"]) <= 50)
+
+    def test_scan_path_merges_founder_matches(self):
+        """Without an index, a project matched both directly and through a founder appears once."""
+        SearchDocument.objects.all().delete()
+        url = reverse("exposed_api:advanced_search")
+
+        response = self.client.get(url, {"search": "AI", "type": "project"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result["id"] for result in response.data["results"]], [101])
+        self.assertEqual(response.data["results"][0]["entity"]["founders"], [{"id": 101, "name": "John AI Expert"}])
+
+    def test_scan_path_serializes_only_the_requested_page(self):
+        """Without an index, pages are ranked by score then title and hydrated independently."""
+        SearchDocument.objects.all().delete()
+        url = reverse("exposed_api:advanced_search")
+
+        titles = []
+        for page in (1, 2, 3):
+            response = self.client.get(url, {"page_size": 2, "page": page})
+            self.assertEqual(len(response.data["results"]), 2)
+            titles.extend(result["title"] for result in response.data["results"])
+
+        self.assertEqual(titles, sorted(titles))
+        self.assertEqual(response.data["count"], 6)
@@ -0,0 +1,143 @@
+"""
+Tests for the inverted index behind the advanced search.
+"""
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from admin_panel.models import Event, Founder, NewsDetail, StartupDetail
+from exposed_api.models import SearchDocument, SearchFieldStatistic, SearchPosting, SearchTermSuffix
+from exposed_api.search_index import rebuild_index, search, tokenize
+
+
+class SearchIndexTests(TestCase):
+    """Test suite for the search index maintenance and ranking."""
+
+    def setUp(self):
+        """Create a few indexed projects, events and news."""
+        self.client = APIClient()
+        self.solar = StartupDetail.objects.create(
+            id=501,
+            name="Solar Grid",
+            email="solar@example.com",
+            description="Storage batteries for solar farms",
+            sector="Energy",
+        )
+        self.storage = StartupDetail.objects.create(
+            id=502,
+            name="Cold Storage",
+            email="cold@example.com",
+            description="Refrigerated storage warehouses powered by solar panels and solar roofs",
+            sector="Logistics",
+        )
+        self.founder = Founder.objects.create(id=501, name="Marie Curie", startup_id=502)
+        self.storage.founders.add(self.founder)
+        Event.objects.create(id=501, name="Solar Summit", description="Yearly solar energy meetup", location="Lyon")
+        NewsDetail.objects.create(id=501, title="Grid storage news", description="Batteries everywhere")
+
+    def test_tokenize(self):
+        """Tokens are lowercase words."""
+        self.assertEqual(tokenize("AI-driven, Solar Grid!"), ["ai", "driven", "solar", "grid"])
+
+    def test_index_follows_saves_and_deletes(self):
+        """Saving and deleting objects keeps documents, postings and statistics in sync."""
+        self.assertEqual(SearchDocument.objects.filter(doc_type="project").count(), 2)
+
+        self.solar.name = "Wind Grid"
+        self.solar.save()
+        hits = {hit[3] for hit in search("wind", ["project"])}
+        self.assertEqual(hits, {501})
+        self.assertFalse(
+            SearchPosting.objects.filter(
+                document__object_id=501, document__doc_type="project", field="name", term="solar"
+            )
+        )
+
+        self.solar.delete()
+        self.assertFalse(SearchDocument.objects.filter(doc_type="project", object_id=501).exists())
+        statistic = SearchFieldStatistic.objects.get(doc_type="project", field="name")
+        self.assertEqual((statistic.document_count, statistic.total_length), (1, 2))
+
+    def test_every_term_must_match_and_name_matches_rank_first(self):
+        """Documents need every term, and a match in the weighted name field ranks higher."""
+        hits = sorted(search("solar", ["project", "event", "news"]), key=lambda hit: (-hit[0], hit[1]))
+        self.assertEqual([(hit[2], hit[3]) for hit in hits], [("project", 501), ("event", 501), ("project", 502)])
+
+        hits = search("storage batteries", ["project", "event", "news"])
+        self.assertEqual({(hit[2], hit[3]) for hit in hits}, {("project", 501), ("news", 501)})
+
+    def test_founder_match_boosts_startup(self):
+        """A founder matching every term brings in their startup with the founder bonus."""
+        hits = search("marie curie", ["project", "event", "news"])
+        self.assertEqual([(hit[2], hit[3], hit[0]) for hit in hits], [("project", 502, 2.0)])
+
+        self.assertEqual(search("marie curie", ["event"]), [])
+
+    def test_rebuild_matches_incremental_index(self):
+        """A full rebuild produces the same postings and statistics as the signals."""
+        postings = set(
+            SearchPosting.objects.values_list(
+                "term", "document__doc_type", "document__object_id", "field", "term_frequency"
+            )
+        )
+        statistics = set(
+            SearchFieldStatistic.objects.values_list("doc_type", "field", "document_count", "total_length")
+        )
+        suffixes = set(SearchTermSuffix.objects.values_list("suffix", "term"))
+        self.assertIn(("urie", "curie"), suffixes)
+
+        self.assertEqual(rebuild_index(), 5)
+
+        self.assertEqual(set(SearchTermSuffix.objects.values_list("suffix", "term")), suffixes)
+
+        self.assertEqual(
+            set(
+                SearchPosting.objects.values_list(
+                    "term", "document__doc_type", "document__object_id", "field", "term_frequency"
+                )
+            ),
+            postings,
+        )
+        self.assertEqual(
+            set(SearchFieldStatistic.objects.values_list("doc_type", "field", "document_count", "total_length")),
+            statistics,
+        )
+
+    def test_search_endpoint_uses_index_with_filters_and_pagination(self):
+        """The endpoint ranks index hits, applies the other filters and paginates lazily."""
+        url = reverse("exposed_api:advanced_search")
+
+        response = self.client.get(url, {"search": "solar", "page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual([result["title"] for result in response.data["results"]], ["Solar Grid", "Solar Summit"])
+        self.assertEqual(response.data["results"][0]["entity"]["sector"], "Energy")
+
+        response = self.client.get(url, {"search": "solar", "page_size": 2, "page": 2})
+        self.assertEqual([result["title"] for result in response.data["results"]], ["Cold Storage"])
+
+        response = self.client.get(url, {"search": "solar", "sector": "Logistics", "type": "project"})
+        self.assertEqual([result["id"] for result in response.data["results"]], [502])
+
+    def test_terms_match_inside_words(self):
+        """Terms match anywhere in a word from the index, whole words ranking first, and more terms narrow the hits."""
+        StartupDetail.objects.create(id=503, name="Solarwind Energy", email="wind@example.com")
+        StartupDetail.objects.create(id=504, name="Ledger", email="ledger@example.com", description="Fintech platform")
+        Founder.objects.create(id=502, name="Techno Ledgerman", startup_id=501)
+
+        hits = sorted(search("solar", ["project"]), key=lambda hit: -hit[0])
+        self.assertEqual({hit[3] for hit in hits}, {501, 502, 503})
+        self.assertEqual(hits[-1][3], 503)
+        self.assertEqual({hit[3] for hit in search("tech", ["project"])}, {504})
+        self.assertEqual({hit[3] for hit in search("wind olar", ["project"])}, {503})
+        self.assertEqual(search("tech solar", ["project"]), [])
+        self.assertEqual(search("olarz", ["project"]), [])
+
+        url = reverse("exposed_api:advanced_search")
+        with self.assertNumQueries(7):
+            response = self.client.get(url, {"search": "intech", "type": "project"})
+        self.assertEqual([result["id"] for result in response.data["results"]], [504])
+        response = self.client.get(url, {"search": "GRI", "type": "project"})
+        self.assertEqual([result["id"] for result in response.data["results"]], [501])
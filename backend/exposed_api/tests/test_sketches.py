@@ -0,0 +1,143 @@
+"""
+Tests for the HyperLogLog unique visitor sketches.
+"""
+
+from datetime import timedelta
+
+from authentication.models import CustomUser
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from admin_panel.models import StartupDetail
+from exposed_api.hyperloglog import HyperLogLog
+from exposed_api.models import ProjectLike, ProjectUniqueSketch, ProjectView
+from exposed_api.sketches import covered_start, rebuild_sketches, unique_counts
+
+
+class HyperLogLogTests(TestCase):
+    """Test suite for the HyperLogLog sketch itself."""
+
+    def test_estimate_within_error_bound(self):
+        """A large cardinality is estimated within three standard errors."""
+        sketch = HyperLogLog()
+        for value in range(50000):
+            sketch.add(f"visitor-{value}")
+
+        self.assertLess(abs(sketch.count() - 50000) / 50000, 0.05)
+
+    def test_small_cardinalities_are_close(self):
+        """Linear counting keeps small sets within a unit or two and duplicates are ignored."""
+        sketch = HyperLogLog()
+        for value in range(100):
+            sketch.add(value)
+            sketch.add(value)
+
+        self.assertAlmostEqual(sketch.count(), 100, delta=2)
+
+    def test_merge_is_a_union(self):
+        """Merging sketches estimates the union and round-trips through bytes."""
+        first = HyperLogLog()
+        second = HyperLogLog()
+        for value in range(300):
+            first.add(value)
+        for value in range(200, 500):
+            second.add(value)
+
+        union = HyperLogLog()
+        for value in range(500):
+            union.add(value)
+
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+
+        self.assertEqual(merged.registers, union.registers)
+        self.assertEqual(merged.merge(second).count(), union.count())
+        self.assertAlmostEqual(union.count(), 500, delta=10)
+
+
+class UniqueSketchTests(TestCase):
+    """Test suite checking the sketch-backed KPI figures against the exact SQL path."""
+
+    def setUp(self):
+        """Create a project with views from several visitors over several days."""
+        self.project = StartupDetail.objects.create(id=301, name="Sketch Project", email="sketch@example.com")
+        self.other_project = StartupDetail.objects.create(id=302, name="Other Sketch", email="other@example.com")
+        self.now = timezone.now()
+
+        for day in range(5):
+            for visitor in range(10):
+                view = ProjectView.objects.create(
+                    project=self.project, ip_address=f"10.0.{day % 2}.{visitor}", session_key=f"s{day}-{visitor}"
+                )
+                ProjectView.objects.filter(id=view.id).update(timestamp=self.now - timedelta(days=day * 3))
+        ProjectView.objects.create(project=self.other_project, ip_address="10.9.9.9")
+        ProjectLike.objects.create(project=self.project, ip_address="10.0.0.1", session_key="s0-1")
+        ProjectLike.objects.create(project=self.project, ip_address="10.0.0.2", session_key="s0-2")
+
+        admin = CustomUser.objects.create_user(
+            email="sketch-admin@example.com", password="test_password", name="Sketch Admin", role="admin"
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+    def test_sketches_are_maintained_on_create(self):
+        """Recording events only writes the sketches of their project, merged for all projects at read time."""
+        self.assertTrue(ProjectUniqueSketch.objects.filter(project=self.project, event="views").exists())
+        self.assertEqual(
+            set(ProjectUniqueSketch.objects.filter(event="likes").values_list("project", "dimension")),
+            {(self.project.id, "actor")},
+        )
+
+        self.assertEqual(unique_counts("views", ["ip"], project_id=self.project.id), {"ip": 20})
+        self.assertEqual(unique_counts("views", ["ip"]), {"ip": 21})
+        self.assertEqual(unique_counts("likes", ["actor"], project_id=self.project.id), {"actor": 2})
+        self.assertEqual(unique_counts("likes", ["actor"]), {"actor": 2})
+
+    def test_rebuild_uses_event_days(self):
+        """Rebuilding from the raw tables places events on their own day."""
+        rebuild_sketches()
+
+        counts = unique_counts("views", ["session"], start=self.now - timedelta(days=4), project_id=self.project.id)
+        self.assertEqual(counts, {"session": 20})
+
+    def test_views_count_estimate_matches_exact(self):
+        """The public views count gives the same unique figure with and without exact=true."""
+        url = reverse("exposed_api:project_views_count", args=[self.project.id])
+
+        estimated = self.client.get(url).json()
+        exact = self.client.get(url, {"exact": "true"}).json()
+
+        self.assertEqual(estimated, exact)
+        self.assertEqual(estimated["unique_views"], 20)
+
+    def test_view_stats_estimate_matches_exact(self):
+        """The view stats endpoint agrees with the exact SQL path on small data."""
+        rebuild_sketches()
+        url = reverse("exposed_api:kpi_project_views_detail", args=[self.project.id])
+
+        estimated = self.client.get(url, {"period": "week"})
+        exact = self.client.get(url, {"period": "week", "exact": "true"})
+
+        self.assertEqual(estimated.status_code, status.HTTP_200_OK)
+        self.assertEqual(estimated.json()["unique_sessions"], exact.json()["unique_sessions"])
+        self.assertEqual(estimated.json()["unique_ips"], exact.json()["unique_ips"])
+
+    def test_view_stats_totals_cover_the_estimated_period(self):
+        """Estimated stats start their period at local midnight, for the totals as well as the unique figures."""
+        start = covered_start(self.now - timedelta(days=1))
+        view = ProjectView.objects.create(project=self.project, ip_address="10.8.8.8")
+        ProjectView.objects.filter(id=view.id).update(timestamp=start)
+        rebuild_sketches()
+        url = reverse("exposed_api:kpi_project_views_detail", args=[self.project.id])
+
+        estimated = self.client.get(url, {"period": "day"}).json()
+        self.assertEqual((estimated["total_views"], estimated["unique_ips"]), (11, 11))
+        self.assertEqual(parse_datetime(estimated["period_start"]), start)
+
+        exact = self.client.get(url, {"period": "day", "exact": "true"}).json()
+        self.assertEqual(exact["total_views"], exact["unique_ips"])
+        self.assertGreaterEqual(parse_datetime(exact["period_start"]), start)
@@ -0,0 +1,147 @@
+"""
+Tests for the buffered project view ingestion.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from authentication.models import CustomUser
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from admin_panel.models import StartupDetail
+from exposed_api import view_buffer
+from exposed_api.models import ProjectView
+from exposed_api.rollups import compact_rollups, engagement_by_project, engagement_totals
+from exposed_api.sketches import unique_counts
+from exposed_api.view_buffer import ViewEventBuffer
+
+
+class ViewEventBufferTests(TestCase):
+    """Test suite for the per-process view event buffer."""
+
+    def setUp(self):
+        """Create a project and an isolated spill directory."""
+        self.project = StartupDetail.objects.create(id=401, name="Buffered Project", email="buffer@example.com")
+        self.spill_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.spill_dir, ignore_errors=True)
+
+    def test_events_are_written_in_batches(self):
+        """Events stay in memory until the size threshold triggers a single flush."""
+        buffer = ViewEventBuffer(self.spill_dir, max_size=5, max_age=3600)
+        for visitor in range(4):
+            buffer.add(self.project.id, ip_address=f"10.1.0.{visitor}", session_key=f"buffer-{visitor}")
+
+        self.assertEqual(ProjectView.objects.count(), 0)
+        self.assertEqual(buffer.stats()["depth"], 4)
+
+        buffer.add(self.project.id, ip_address="10.1.0.9")
+
+        self.assertEqual(ProjectView.objects.filter(project=self.project).count(), 5)
+        stats = buffer.stats()
+        self.assertEqual((stats["depth"], stats["flushed"], stats["flushes"]), (0, 5, 1))
+        self.assertEqual(list(self.spill_dir.iterdir()), [])
+        self.assertEqual(unique_counts("views", ["ip"], project_id=self.project.id), {"ip": 5})
+
+    def test_original_timestamps_are_kept(self):
+        """Flushed views keep the time at which they were recorded."""
+        buffer = ViewEventBuffer(self.spill_dir, max_size=10, max_age=3600)
+        viewed_at = timezone.now() - timedelta(minutes=3)
+        buffer.add(self.project.id, ip_address="10.1.1.1", timestamp=viewed_at)
+
+        buffer.flush()
+
+        self.assertEqual(ProjectView.objects.get().timestamp, viewed_at)
+
+    def test_spill_file_of_crashed_process_is_replayed(self):
+        """A new buffer claims and persists the spill file of a dead process."""
+        orphan = self.spill_dir / "views-999999999.jsonl"
+        events = [
+            {
+                "project_id": project_id,
+                "user_id": None,
+                "ip_address": "10.1.2.3",
+                "session_key": None,
+                "timestamp": timezone.now().isoformat(),
+            }
+            for project_id in (self.project.id, self.project.id, 999)
+        ]
+        orphan.write_text("".join(json.dumps(event) + "\n" for event in events) + '{"project_id": 4')
+
+        buffer = ViewEventBuffer(self.spill_dir, max_size=10, max_age=3600)
+        self.assertEqual(buffer.stats()["ready_segments"], 1)
+
+        buffer.flush_if_due()
+
+        self.assertEqual(ProjectView.objects.filter(project=self.project).count(), 2)
+        self.assertEqual(buffer.stats()["replayed_segments"], 1)
+        self.assertEqual(list(self.spill_dir.iterdir()), [])
+
+    def test_spill_file_of_crashed_process_with_same_pid_is_replayed(self):
+        """The active spill file left by a crashed process whose PID is reused is persisted with the new events."""
+        event = {
+            "project_id": self.project.id,
+            "user_id": None,
+            "ip_address": "10.1.4.1",
+            "session_key": None,
+            "timestamp": timezone.now().isoformat(),
+        }
+        (self.spill_dir / f"views-{os.getpid()}.jsonl").write_text(json.dumps(event) + "\n" + json.dumps(event) + "\n")
+
+        buffer = ViewEventBuffer(self.spill_dir, max_size=10, max_age=3600)
+        buffer.add(self.project.id, ip_address="10.1.4.2")
+        buffer.flush()
+
+        self.assertEqual(ProjectView.objects.filter(project=self.project).count(), 3)
+        self.assertEqual(list(self.spill_dir.iterdir()), [])
+
+    def test_views_flushed_behind_the_rollup_watermark_are_counted(self):
+        """Views recorded before the last compaction but flushed after it are added to the rollups."""
+        viewed_at = timezone.now() - timedelta(hours=3)
+        buffer = ViewEventBuffer(self.spill_dir, max_size=10, max_age=3600)
+        buffer.add(self.project.id, ip_address="10.1.5.1", timestamp=viewed_at)
+        buffer.add(self.project.id, ip_address="10.1.5.2", timestamp=viewed_at)
+        compact_rollups()
+
+        buffer.flush()
+
+        self.assertEqual(engagement_totals(["views"]), {"views": 2})
+        self.assertEqual(engagement_totals(["views"], start=viewed_at - timedelta(hours=1)), {"views": 2})
+        self.assertEqual(engagement_by_project(["views"]), {self.project.id: {"views": 2}})
+
+        # Replaying a segment is counted the same way
+        compact_rollups()
+        self.assertEqual(engagement_totals(["views"], project_id=self.project.id), {"views": 2})
+
+    def test_project_detail_view_uses_buffer(self):
+        """Viewing a project queues the view and the admin endpoint exposes the buffer counters."""
+        buffer = ViewEventBuffer(self.spill_dir, max_size=100, max_age=3600)
+        admin = CustomUser.objects.create_user(
+            email="buffer-admin@example.com", password="test_password", name="Buffer Admin", role="admin"
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+        original_buffer = view_buffer._buffer
+        view_buffer._buffer = buffer
+        self.addCleanup(setattr, view_buffer, "_buffer", original_buffer)
+
+        with override_settings(VIEW_BUFFER_ENABLED=True):
+            response = client.get(reverse("exposed_api:project_detail_or_crud", args=[self.project.id]))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(ProjectView.objects.count(), 0)
+
+            stats = client.get(reverse("exposed_api:kpi_view_buffer")).json()
+            self.assertTrue(stats["enabled"])
+            self.assertEqual((stats["depth"], stats["recorded"]), (1, 1))
+
+        buffer.flush()
+        self.assertEqual(ProjectView.objects.get().user, admin)
@@ -21,9 +21,10 @@ from .kpi_views import (
     total_startups,
     total_users,
     users_connected_ratio,
+    view_buffer_stats,
 )
 from .news_views import NewsDetailView, NewsListView
-from .opportunity_views import AIAnalysisView, OpportunitiesMatchesView
+from .opportunity_views import AIAnalysisView, OpportunitiesBatchMatchesView, OpportunitiesMatchesView
 from .partner_views import PartnerDetailView
 from .search_views import AdvancedSearchView
 from .user_views import AdminUserView, FounderUsersView, InvestorUsersView
@@ -62,6 +63,7 @@ urlpatterns = [
     path("partners/<int:_id>/", PartnerDetailView.as_view(), name="partner_detail_or_crud"),
     # Opportunities / matches
     path("opportunities/matches/", OpportunitiesMatchesView.as_view(), name="opportunities_matches"),
+    path("opportunities/matches/batch/", OpportunitiesBatchMatchesView.as_view(), name="opportunities_matches_batch"),
     path("opportunities/ai-analysis/", AIAnalysisView.as_view(), name="ai_analysis_start"),
     path("opportunities/ai-analysis/<str:analysis_id>/", AIAnalysisView.as_view(), name="ai_analysis_status"),
     # User endpoints
@@ -112,4 +114,5 @@ urlpatterns = [
         name="kpi_project_engagement_over_time_detail",
     ),
     path("projects/<int:project_id>/engagement-count/", project_engagement_count, name="project_engagement_count"),
+    path("kpi/view-buffer/", view_buffer_stats, name="kpi_view_buffer"),
 ]
@@ -0,0 +1,306 @@
+"""
+Buffered ingestion of project view events.
+
+Recording a view on every project page hit means one single-row INSERT per request, which
+serializes on SQLite's write lock under traffic spikes. Instead each worker process keeps
+an in-memory buffer of view events that is written with a single `bulk_create` once it
+holds VIEW_BUFFER_MAX_SIZE events or its oldest event is VIEW_BUFFER_MAX_AGE seconds old
+(the scheduler also flushes it on that interval so quiet workers drain).
+
+Every buffered event is first appended to a per-process spill file (one JSON object per
+line). A flush rotates that file into a "ready" segment, persists the segment and only then
+deletes it, so events survive a worker crash: segments left behind by a dead process are
+claimed and persisted by the next buffer created in the same spill directory. Delivery is
+at-least-once; a crash between the INSERT commit and the segment deletion replays that
+segment. Spill lines are flushed to the OS but not fsync'ed, which protects against process
+crashes rather than power loss.
+
+Views are written with the time they were recorded at, so a lagging flush or a replayed
+segment can land behind the rollup watermark: they are then also added to their rollup
+buckets in the same transaction (see `rollups.count_late_events`).
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from admin_panel.models import StartupDetail
+
+from .models import ProjectView
+from .rollups import count_late_events
+from .sketches import observe_events
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SUFFIX = ".jsonl"
+READY_SUFFIX = ".ready"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner_pid(path):
+    try:
+        return int(path.name.split("-", 1)[1].split(".", 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+
+class ViewEventBuffer:
+    """
+    Per-process buffer of ProjectView events flushed in batches.
+    """
+
+    def __init__(self, spill_dir, max_size=200, max_age=5.0):
+        """
+        Create a buffer spilling to `spill_dir` and claim segments left behind by dead processes.
+        """
+        self.spill_dir = Path(spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.pid = os.getpid()
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._oldest = None
+        self._spill_file = None
+        self._sequence = 0
+
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.replayed_segments = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+        self._claim_orphans()
+
+    @property
+    def active_path(self):
+        return self.spill_dir / f"views-{self.pid}{ACTIVE_SUFFIX}"
+
+    def _next_ready_path(self):
+        self._sequence += 1
+        return self.spill_dir / f"views-{self.pid}.{time.time_ns()}-{self._sequence:06d}{READY_SUFFIX}"
+
+    def _ready_paths(self):
+        return sorted(self.spill_dir.glob(f"views-{self.pid}.*{READY_SUFFIX}"))
+
+    def _claim_orphans(self):
+        """
+        Take ownership of spill files written by processes that are no longer running, including the active
+        file of a crashed process whose PID this process reuses (as is common in containers), which would
+        otherwise be rotated with the events of this process and only those persisted.
+        """
+        for path in sorted(self.spill_dir.glob("views-*")):
+            owner = _owner_pid(path)
+            if owner is None:
+                continue
+            if owner == self.pid:
+                if path != self.active_path:
+                    continue  # Ready segments of this PID are persisted by the next flush
+            elif _process_alive(owner):
+                continue
+            try:
+                path.rename(self._next_ready_path())
+            except FileNotFoundError:
+                continue  # Another worker claimed it first
+            self.replayed_segments += 1
+            logger.info(f"Claimed view buffer spill file {path.name} left by process {owner}")
+
+    def add(self, project_id, user_id=None, ip_address=None, session_key=None, timestamp=None):
+        """
+        Buffer a view event, flushing the buffer if it reached its size or age threshold.
+        """
+        event = {
+            "project_id": project_id,
+            "user_id": user_id,
+            "ip_address": ip_address,
+            "session_key": session_key,
+            "timestamp": (timestamp or timezone.now()).isoformat(),
+        }
+        line = json.dumps(event) + "\n"
+
+        with self._lock:
+            if self._spill_file is None:
+                self._spill_file = open(self.active_path, "a", encoding="utf-8")  # noqa: SIM115
+            self._spill_file.write(line)
+            self._spill_file.flush()
+            self._pending.append(event)
+            self.recorded += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = len(self._pending) >= self.max_size or time.monotonic() - self._oldest >= self.max_age
+
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        """
+        Flush the buffer if its oldest event is older than the age threshold, or if segments are waiting.
+        """
+        with self._lock:
+            due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_age
+        if due or self._ready_paths():
+            self.flush()
+
+    def _rotate(self):
+        """
+        Detach the in-memory events and turn the active spill file into a ready segment.
+        """
+        with self._lock:
+            events, self._pending, self._oldest = self._pending, [], None
+            if self._spill_file is None:
+                return events, None
+            self._spill_file.close()
+            self._spill_file = None
+            segment = self._next_ready_path()
+            self.active_path.rename(segment)
+            return events, segment
+
+    def flush(self):
+        """
+        Persist every buffered event and every ready segment.
+
+        Returns:
+            int: Number of view events written
+        """
+        with self._flush_lock:
+            events, segment = self._rotate()
+            written = 0
+            for path in self._ready_paths():
+                batch = events if path == segment else self._read_segment(path)
+                started = time.perf_counter()
+                try:
+                    written += self._persist(batch)
+                except Exception:
+                    self.failed_flushes += 1
+                    logger.exception(f"Error flushing view buffer segment {path.name}, keeping it for a retry")
+                    break
+                path.unlink()
+                self._record_latency((time.perf_counter() - started) * 1000)
+            return written
+
+    def _record_latency(self, elapsed_ms):
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+
+    @staticmethod
+    def _read_segment(path):
+        events = []
+        with open(path, encoding="utf-8") as segment:
+            for line in segment:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping truncated line in view buffer segment {path.name}")
+        return events
+
+    def _persist(self, events):
+        """
+        Write a batch of buffered events, dropping those whose project no longer exists.
+        """
+        if not events:
+            return 0
+
+        project_ids = set(
+            StartupDetail.objects.filter(id__in={event["project_id"] for event in events}).values_list("id", flat=True)
+        )
+        views = [
+            ProjectView(
+                project_id=event["project_id"],
+                user_id=event["user_id"],
+                ip_address=event["ip_address"],
+                session_key=event["session_key"],
+                timestamp=datetime.fromisoformat(event["timestamp"]),
+            )
+            for event in events
+            if event["project_id"] in project_ids
+        ]
+
+        with transaction.atomic():
+            created = ProjectView.objects.bulk_create(views, batch_size=500)
+            observe_events("views", created)
+            # Views older than the rollup watermark would otherwise never be counted by the KPI endpoints
+            count_late_events("views", created)
+
+        self.flushed += len(created)
+        return len(created)
+
+    def stats(self):
+        """
+        Return the buffer counters exposed on the KPI endpoint.
+        """
+        with self._lock:
+            depth = len(self._pending)
+            oldest_age = time.monotonic() - self._oldest if self._oldest is not None else 0.0
+        return {
+            "pid": self.pid,
+            "depth": depth,
+            "oldest_event_age_seconds": round(oldest_age, 3),
+            "ready_segments": len(self._ready_paths()),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "replayed_segments": self.replayed_segments,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            "max_size": self.max_size,
+            "max_age_seconds": self.max_age,
+        }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_buffer():
+    """
+    Return the view buffer of the current process, creating it on first use.
+    """
+    global _buffer
+
+    if _buffer is not None and _buffer.pid == os.getpid():
+        return _buffer
+
+    with _buffer_lock:
+        if _buffer is None or _buffer.pid != os.getpid():
+            _buffer = ViewEventBuffer(
+                spill_dir=settings.VIEW_BUFFER_SPILL_DIR,
+                max_size=settings.VIEW_BUFFER_MAX_SIZE,
+                max_age=settings.VIEW_BUFFER_MAX_AGE,
+            )
+            atexit.register(_buffer.flush)
+    return _buffer
+
+
+def flush_view_buffer():
+    """
+    Flush the view buffer of the current process if it holds aged events or claimed segments.
+    """
+    if settings.VIEW_BUFFER_ENABLED:
+        get_view_buffer().flush_if_due()
@@ -1,4 +1,5 @@
 from authentication.permissions import IsAdmin, IsFounder, IsInvestor, IsNotRegularUser
+from django.conf import settings
 from django.db.models import F
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
@@ -18,24 +19,29 @@ from .serializers import (
     ProjectShareSerializer,
     ProjectViewsSerializer,
 )
+from .view_buffer import get_view_buffer
 
 
-def record_project_view(request, project_id):
+def record_project_view(request, project_id, project=None):
     """
     Utility function to record a view for a project.
     This handles both authenticated and anonymous users.
 
     Views are NOT counted when a founder views their own project.
+    When VIEW_BUFFER_ENABLED is set the view is queued in the per-process view buffer
+    and written later in a batch instead of being inserted right away.
 
     Args:
         request: The HTTP request object
         project_id: The ID of the project being viewed
+        project: The already fetched StartupDetail, to avoid loading it again
 
     Returns:
         bool: True if the view was recorded, False otherwise
     """
     try:
-        project = StartupDetail.objects.get(id=project_id)
+        if project is None:
+            project = StartupDetail.objects.get(id=project_id)
         user = request.user if request.user.is_authenticated else None
         if (
             user
@@ -53,7 +59,10 @@ def record_project_view(request, project_id):
             request.session.save()
             session_key = request.session.session_key
 
-        ProjectView.objects.create(project=project, user=user, ip_address=ip_address, session_key=session_key)
+        if settings.VIEW_BUFFER_ENABLED:
+            get_view_buffer().add(project.id, user.id if user else None, ip_address, session_key)
+        else:
+            ProjectView.objects.create(project=project, user=user, ip_address=ip_address, session_key=session_key)
 
         return True
     except StartupDetail.DoesNotExist:
@@ -8,6 +8,12 @@ import threading
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from django.conf import settings
+from drive.blobs import collect_garbage
+from drive.uploads import expire_sessions
+
+from exposed_api.ai_jobs import evict_expired, resume_local_workers
+from exposed_api.rollups import compact_rollups
+from exposed_api.view_buffer import flush_view_buffer
 
 from .utils import (
     fetch_and_create_events,
@@ -61,6 +67,66 @@ def fetch_all_data():
     logger.info("=== API Data Sync Job Completed ===")
 
 
+def compact_engagement_rollups():
+    """
+    Compact raw project engagement events into the hourly/daily rollups used by the KPI endpoints
+    """
+    try:
+        compact_rollups()
+    except Exception as e:
+        logger.error(f"Error compacting engagement rollups: {e}")
+
+
+def flush_project_view_buffer():
+    """
+    Flush buffered project views that reached the age threshold
+    """
+    try:
+        flush_view_buffer()
+    except Exception as e:
+        logger.error(f"Error flushing project view buffer: {e}")
+
+
+def evict_ai_analysis_jobs():
+    """
+    Delete AI analysis jobs whose results expired
+    """
+    try:
+        evict_expired()
+    except Exception as e:
+        logger.error(f"Error evicting AI analysis jobs: {e}")
+
+
+def resume_ai_analysis_jobs():
+    """
+    Start the AI analysis workers of this process if jobs were left pending or processing by a restart
+    """
+    try:
+        resume_local_workers()
+    except Exception as e:
+        logger.error(f"Error resuming AI analysis jobs: {e}")
+
+
+def collect_drive_blobs():
+    """
+    Delete the drive contents no file has used for the grace period
+    """
+    try:
+        collect_garbage()
+    except Exception as e:
+        logger.error(f"Error collecting drive blobs: {e}")
+
+
+def expire_drive_uploads():
+    """
+    Delete the resumable drive uploads abandoned for the session lifetime
+    """
+    try:
+        expire_sessions()
+    except Exception as e:
+        logger.error(f"Error expiring drive uploads: {e}")
+
+
 def start_scheduler():
     """
     Start the background scheduler to fetch data periodically
@@ -74,10 +140,49 @@ def start_scheduler():
     scheduler = BackgroundScheduler()
     interval_minutes = getattr(settings, "API_DATA_REFRESH_INTERVAL", 60)  # Default to 60 minutes if not set
     fetch_on_startup = getattr(settings, "API_DATA_FETCH_ON_STARTUP", False)  # Default to False
+    rollup_interval_minutes = getattr(settings, "ENGAGEMENT_ROLLUP_INTERVAL", 15)
 
     scheduler.add_job(
         fetch_all_data, "interval", minutes=interval_minutes, id="fetch_all_data_job", replace_existing=True
     )
+    scheduler.add_job(
+        compact_engagement_rollups,
+        "interval",
+        minutes=rollup_interval_minutes,
+        id="compact_engagement_rollups_job",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        evict_ai_analysis_jobs,
+        "interval",
+        minutes=10,
+        id="evict_ai_analysis_jobs_job",
+        replace_existing=True,
+    )
+    # Once, at startup
+    scheduler.add_job(resume_ai_analysis_jobs, id="resume_ai_analysis_jobs_job", replace_existing=True)
+    scheduler.add_job(
+        collect_drive_blobs,
+        "interval",
+        minutes=60,
+        id="collect_drive_blobs_job",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        expire_drive_uploads,
+        "interval",
+        minutes=60,
+        id="expire_drive_uploads_job",
+        replace_existing=True,
+    )
+    if getattr(settings, "VIEW_BUFFER_ENABLED", False):
+        scheduler.add_job(
+            flush_project_view_buffer,
+            "interval",
+            seconds=getattr(settings, "VIEW_BUFFER_MAX_AGE", 5),
+            id="flush_project_view_buffer_job",
+            replace_existing=True,
+        )
 
     # Start the scheduler in a daemon thread
     scheduler.start()
@@ -225,71 +225,277 @@ def fetch_partners(sender, **kwargs):
 
 
 # Thread and Message signals for Socket.IO notifications
-import socketio  # noqa: E402
-from django.conf import settings  # noqa: E402
-from django.db.models.signals import post_delete, post_save  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.db.models.signals import m2m_changed, post_delete, post_save  # noqa: E402
 from messaging.models import Message, Thread  # noqa: E402
+from messaging.outbox import get_outbox  # noqa: E402
+from messaging.participants import invalidate as invalidate_participants  # noqa: E402
+from messaging.unread import add_members, message_added, remove_members  # noqa: E402
 
 
-@receiver(post_save, sender=Thread)
-def thread_created_or_updated(sender, instance, created, **kwargs):
-    if DISABLE_SIGNALS:
-        return
-
-    try:
-        from backend.asgi import sio
-    except ImportError:
-        return
+def _thread_participants(thread_id):
+    """
+    Participants of a thread as sent in thread events, in one query
+    """
+    return list(get_user_model().objects.filter(threads=thread_id).order_by("id").values("id", "name", "email"))
 
-    participants = []
-    for participant in instance.participants.all():
-        participants.append({"id": participant.id, "name": participant.name, "email": participant.email})
 
+def _enqueue_thread_event(thread_id, participants, last_message_at, created_at=None):
+    """
+    Queue a "thread_created" event, or a "thread_updated" one without `created_at`, for the participants of a thread
+    """
     event_data = {
-        "thread_id": instance.id,
+        "thread_id": thread_id,
         "participants": participants,
-        "created_at": instance.created_at.isoformat() if created else None,
-        "last_message_at": instance.last_message_at.isoformat(),
+        "created_at": created_at.isoformat() if created_at else None,
+        "last_message_at": last_message_at.isoformat(),
     }
+    get_outbox().enqueue(
+        "thread_created" if created_at else "thread_updated",
+        event_data,
+        [f"user_{participant['id']}_threads" for participant in participants],
+        key=None if created_at else ("thread_updated", thread_id),
+    )
 
-    for participant in instance.participants.all():
-        room_name = f"user_{participant.id}_threads"
-        try:
-            from asgiref.sync import async_to_sync
 
-            async_to_sync(sio.emit)("thread_created" if created else "thread_updated", event_data, room=room_name)
-        except Exception:
-            pass
+@receiver(post_save, sender=Thread)
+def thread_created_or_updated(sender, instance, created, **kwargs):
+    if DISABLE_SIGNALS:
+        return
+
+    participants = _thread_participants(instance.id)
+    created_at = instance.created_at if created else None
+    transaction.on_commit(
+        lambda: _enqueue_thread_event(instance.id, participants, instance.last_message_at, created_at)
+    )
+
+
+@receiver(m2m_changed, sender=Thread.participants.through)
+def thread_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep one unread counter per participant of a thread, and drop the cached participants
+    """
+    if action in ["post_add", "post_remove", "post_clear"]:
+        invalidate_participants(pk_set if reverse else [instance.pk])
+
+    if reverse:
+        # Threads added to or removed from a user
+        threads, user_ids = Thread.objects.filter(pk__in=pk_set or ()), [instance.pk]
+    else:
+        threads, user_ids = [instance], pk_set or ()
+
+    if action == "post_add":
+        for thread in threads:
+            add_members(thread, user_ids)
+    elif action == "post_remove":
+        for thread in threads:
+            remove_members(thread, user_ids)
+    elif action == "pre_clear":
+        if reverse:
+            instance.thread_memberships.all().delete()
+        else:
+            instance.memberships.all().delete()
+
+
+@receiver(post_delete, sender=Thread)
+def thread_deleted(sender, instance, **kwargs):
+    """
+    Drop the cached participants of deleted threads
+    """
+    invalidate_participants([instance.pk])
 
 
 @receiver(post_save, sender=Message)
-def message_created(sender, instance, created, **kwargs):
-    if DISABLE_SIGNALS or not created:
+def message_created(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
         return
 
-    try:
-        from backend.asgi import sio
-    except ImportError:
+    # Unread counters are data, not notifications, so they are kept even when signals are disabled
+    message_added(instance)
+
+    # Single UPDATE, so the thread signal is not fired again
+    Thread.objects.filter(pk=instance.thread_id).update(last_message_at=instance.created_at)
+
+    if DISABLE_SIGNALS:
         return
 
+    participants = _thread_participants(instance.thread_id)
     event_data = {
-        "thread_id": instance.thread.id,
+        "thread_id": instance.thread_id,
         "message_id": instance.id,
-        "sender_id": instance.sender.id,
+        "sender_id": instance.sender_id,
         "body": instance.body,
         "created_at": instance.created_at.isoformat(),
     }
+    rooms = [
+        f"user_{participant['id']}_threads" for participant in participants if participant["id"] != instance.sender_id
+    ]
+
+    def enqueue():
+        get_outbox().enqueue("message_received", event_data, rooms)
+        _enqueue_thread_event(instance.thread_id, participants, instance.created_at)
+
+    transaction.on_commit(enqueue)
+
+
+# Engagement rollup maintenance
+from exposed_api.models import ProjectDislike, ProjectLike, ProjectShare, ProjectView  # noqa: E402
+from exposed_api.rollups import discount_event  # noqa: E402
+
+_ROLLUP_METRICS = {
+    ProjectView: "views",
+    ProjectLike: "likes",
+    ProjectDislike: "dislikes",
+    ProjectShare: "shares",
+}
+
+
+@receiver(post_delete, sender=ProjectView)
+@receiver(post_delete, sender=ProjectLike)
+@receiver(post_delete, sender=ProjectDislike)
+@receiver(post_delete, sender=ProjectShare)
+def engagement_event_deleted(sender, instance, **kwargs):
+    """
+    Keep the engagement rollups consistent when an already compacted event is removed
+    (e.g. a user un-liking a project)
+    """
+    discount_event(_ROLLUP_METRICS[sender], instance)
+
+
+# Unique visitor sketch maintenance
+from exposed_api.sketches import observe_events  # noqa: E402
+
+
+@receiver(post_save, sender=ProjectView)
+@receiver(post_save, sender=ProjectLike)
+@receiver(post_save, sender=ProjectDislike)
+@receiver(post_save, sender=ProjectShare)
+def engagement_event_created(sender, instance, created, raw=False, **kwargs):
+    """
+    Fold every newly recorded engagement event into the unique visitor sketches
+    """
+    if not created or raw:
+        return
+
+    observe_events(_ROLLUP_METRICS[sender], [instance])
+
+
+# Search index maintenance
+from admin_panel.models import Event, Founder, NewsDetail, StartupDetail  # noqa: E402
+from exposed_api.models import SearchDocument  # noqa: E402
+from exposed_api.search_index import INDEXED_MODELS, index_instance, rebuild_index, unindex_instance  # noqa: E402
+
 
-    participants = list(instance.thread.participants.exclude(id=instance.sender.id))
+@receiver(post_migrate)
+def build_search_index(sender, **kwargs):
+    """
+    Build the search index after migrations when it is empty but searchable data already exists
+    (e.g. a database created before the index was introduced)
+    """
+    if DISABLE_SIGNALS:
+        return
+
+    if sender.name != "exposed_api":
+        return
 
-    for participant in participants:
-        room_name = f"user_{participant.id}_threads"
+    if SearchDocument.objects.exists():
+        return
+
+    if any(model.objects.exists() for model, _, _ in INDEXED_MODELS.values()):
         try:
-            from asgiref.sync import async_to_sync
+            rebuild_index()
+        except Exception as e:
+            print(f"Error while building the search index: {e}")
+
+
+@receiver(post_save, sender=StartupDetail)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=NewsDetail)
+@receiver(post_save, sender=Founder)
+def searchable_saved(sender, instance, raw=False, **kwargs):
+    """
+    Keep the search index in sync when a project, event, news or founder is saved
+    """
+    if raw:
+        return
+
+    index_instance(instance)
+
+
+@receiver(post_delete, sender=StartupDetail)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=NewsDetail)
+@receiver(post_delete, sender=Founder)
+def searchable_deleted(sender, instance, **kwargs):
+    """
+    Remove deleted projects, events, news and founders from the search index
+    """
+    unindex_instance(instance)
+
+
+# Investor feature matrix invalidation
+from admin_panel.models import Investor  # noqa: E402
+from exposed_api.matching import invalidate_investor_matrix  # noqa: E402
+
+
+@receiver(post_save, sender=Investor)
+@receiver(post_delete, sender=Investor)
+def investor_changed(sender, instance, **kwargs):
+    """
+    Rebuild the investor feature matrix of the matching engine on the next request
+    """
+    invalidate_investor_matrix()
 
-            async_to_sync(sio.emit)("message_received", event_data, room=room_name)
-        except Exception:
-            pass
 
-    instance.thread.last_message_at = instance.created_at
-    instance.thread.save(update_fields=["last_message_at"])
+# Thread server-sent events
+from messaging.broker import publish_message, publish_read_receipt  # noqa: E402
+from messaging.models import ReadReceipt  # noqa: E402
+
+
+@receiver(post_save, sender=Message)
+def message_event(sender, instance, created, raw=False, **kwargs):
+    """
+    Push new messages to the event streams of their thread once they are committed
+    """
+    if not created or raw:
+        return
+
+    transaction.on_commit(lambda: publish_message(instance))
+
+
+@receiver(post_save, sender=ReadReceipt)
+def read_receipt_event(sender, instance, raw=False, **kwargs):
+    """
+    Push updated read receipts to the event streams of their thread
+    """
+    if raw:
+        return
+
+    transaction.on_commit(lambda: publish_read_receipt(instance))
+
+
+# Drive content reference counting
+from drive.blobs import release_blob  # noqa: E402
+from drive.models import DriveFile  # noqa: E402
+
+
+@receiver(post_delete, sender=DriveFile)
+def drive_file_deleted(sender, instance, **kwargs):
+    """
+    Release the shared content of a deleted drive file, including files deleted with their startup
+    """
+    if instance.blob_id is not None:
+        release_blob(instance.blob_id)
+
+
+# Files of resumable drive uploads
+from drive.models import DriveUploadSession  # noqa: E402
+from drive.uploads import discard_file  # noqa: E402
+
+
+@receiver(post_delete, sender=DriveUploadSession)
+def drive_upload_deleted(sender, instance, **kwargs):
+    """
+    Delete the file of an aborted, expired or completed upload, including uploads deleted with their startup
+    """
+    discard_file(instance)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Message, ReadReceipt, Thread, TypingIndicator
+from .models import Message, ReadReceipt, Thread, ThreadMembership, TypingIndicator
 
 
 @admin.register(Thread)
@@ -29,3 +29,9 @@ class TypingIndicatorAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "thread", "started_at", "is_typing")
     list_filter = ("is_typing", "started_at")
     search_fields = ("user__email",)
+
+
+@admin.register(ThreadMembership)
+class ThreadMembershipAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "thread", "unread_count", "last_read_message")
+    search_fields = ("user__email",)
@@ -0,0 +1,214 @@
+"""
+In-process publish/subscribe of thread events for the server-sent event streams.
+
+Message and read receipt writes publish an event once their transaction commits (see
+init/signals.py), and typing updates as soon as they reach the presence store (see
+messaging/presence.py). Every open `thread_events` stream subscribes to its thread
+and awaits its own `asyncio.Queue`, so an idle stream costs no query at all. Publishers run
+in synchronous code, possibly in another thread, and hand events over to the event loop of
+each subscriber with `call_soon_threadsafe`.
+
+The last MESSAGING_EVENT_BUFFER events of each thread are kept in a ring buffer. A client
+reconnecting with a Last-Event-ID gets the newer events replayed. Event ids increase
+monotonically and start from the current time in milliseconds, so ids issued before a
+restart stay lower than the new ones. A subscriber that falls more than
+MESSAGING_SUBSCRIBER_QUEUE events behind is dropped; its client reconnects and resumes
+from the buffer.
+
+The broker only reaches the streams served by the process that performed the write.
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Threads whose recent events are kept, the least recently active ones are forgotten first
+MAX_BUFFERED_THREADS = 1024
+
+Event = namedtuple("Event", ["id", "thread_id", "name", "data", "actor_id"])
+
+
+class Subscriber:
+    """
+    Queue of the events of one thread delivered to one stream.
+    """
+
+    def __init__(self, thread_id, user_id, loop, queue_size):
+        """Create a subscriber whose queue belongs to `loop`."""
+        self.thread_id = thread_id
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Queue an event, must run in the event loop of the subscriber."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventBroker:
+    """
+    Fan-out of thread events to the subscribed streams, with a bounded replay buffer per thread.
+    """
+
+    def __init__(self, buffer_size, queue_size):
+        """Keep `buffer_size` events per thread and queue at most `queue_size` events per subscriber."""
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._ids = itertools.count(int(time.time() * 1000))
+        self._last_id = 0
+        self._buffers = OrderedDict()
+        self._subscribers = {}
+
+    @property
+    def last_event_id(self):
+        """Id of the most recent event published to any thread."""
+        return self._last_id
+
+    def publish(self, thread_id, name, data, actor_id=None):
+        """
+        Record an event of a thread and deliver it to its subscribers.
+
+        Args:
+            thread_id: Thread the event belongs to
+            name: SSE event name
+            data: JSON serializable payload
+            actor_id: User who caused the event, if any
+
+        Returns:
+            Event: The published event
+        """
+        with self._lock:
+            event = Event(next(self._ids), thread_id, name, data, actor_id)
+            self._last_id = event.id
+
+            buffer = self._buffers.get(thread_id)
+            if buffer is None:
+                buffer = self._buffers[thread_id] = deque(maxlen=self.buffer_size)
+                if len(self._buffers) > MAX_BUFFERED_THREADS:
+                    self._buffers.popitem(last=False)
+            else:
+                self._buffers.move_to_end(thread_id)
+            buffer.append(event)
+
+            subscribers = list(self._subscribers.get(thread_id, ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+            except RuntimeError:
+                # The event loop of the stream is closed
+                self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self, thread_id, user_id, after=None):
+        """
+        Subscribe the calling event loop to the events of a thread.
+
+        Args:
+            thread_id: Thread to follow
+            user_id: User reading the stream
+            after: Id of the last event already seen, to replay the buffered events after it
+
+        Returns:
+            tuple: (Subscriber, list of buffered events to replay)
+        """
+        subscriber = Subscriber(thread_id, user_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            # Registered under the lock so no event falls between the replay and the queue
+            self._subscribers.setdefault(thread_id, set()).add(subscriber)
+            replay = []
+            if after is not None:
+                replay = [event for event in self._buffers.get(thread_id, ()) if event.id > after]
+        return subscriber, replay
+
+    def unsubscribe(self, subscriber):
+        """Stop delivering events to a subscriber."""
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.thread_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.thread_id]
+
+    def subscriber_count(self, thread_id=None):
+        """Number of subscribers of a thread, or of every thread."""
+        with self._lock:
+            if thread_id is not None:
+                return len(self._subscribers.get(thread_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Return the event broker of the process.
+    """
+    global _broker
+
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = EventBroker(settings.MESSAGING_EVENT_BUFFER, settings.MESSAGING_SUBSCRIBER_QUEUE)
+    return _broker
+
+
+def reset():
+    """
+    Drop the broker of the process so it is recreated from the settings, mostly useful for tests.
+    """
+    global _broker
+    _broker = None
+
+
+def message_payload(message):
+    """
+    Payload of a "message" event.
+    """
+    return {
+        "type": "message",
+        "id": message.id,
+        "sender_id": message.sender_id,
+        "sender_name": message.sender.name,
+        "body": message.body,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+def publish_message(message):
+    """
+    Publish a new message to the streams of its thread.
+    """
+    return get_broker().publish(message.thread_id, "message", message_payload(message), message.sender_id)
+
+
+def publish_read_receipt(receipt):
+    """
+    Publish an updated read receipt to the streams of its thread.
+    """
+    data = {
+        "type": "read_receipt",
+        "receipts": [
+            {
+                "user_id": receipt.user_id,
+                "name": receipt.user.name,
+                "last_read_message_id": receipt.last_read_message_id,
+                "read_at": receipt.read_at.isoformat(),
+            }
+        ],
+    }
+    return get_broker().publish(receipt.thread_id, "read_receipt", data, receipt.user_id)
@@ -0,0 +1,51 @@
+"""
+Thread inbox of a user in a constant number of queries.
+
+`inbox_threads` annotates every thread of a user with the id of its last message and the
+number of messages the user has not read, read from their `ThreadMembership` counter (see
+messaging/unread.py). Participants are prefetched. `attach_last_messages` then loads the last
+messages of a page of threads with their senders in a single query. `ThreadSerializer` uses
+these annotations when they are present instead of querying each thread.
+"""
+
+from django.db.models import IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Message, Thread, ThreadMembership
+
+
+def inbox_threads(user):
+    """
+    Threads of a user, most recently active first, annotated for the inbox.
+
+    Annotations:
+        last_message_id: Id of the most recent message of the thread, None if it has no message
+        unread: Number of messages from other participants after the last one read by the user
+    """
+    last_message = Message.objects.filter(thread=OuterRef("pk")).order_by("-created_at", "-id").values("id")[:1]
+    unread = ThreadMembership.objects.filter(thread=OuterRef("pk"), user=user).values("unread_count")[:1]
+
+    return (
+        Thread.objects.filter(participants=user)
+        .annotate(
+            last_message_id=Subquery(last_message),
+            unread=Coalesce(Subquery(unread), Value(0), output_field=IntegerField()),
+        )
+        .prefetch_related("participants")
+        .order_by("-last_message_at", "-id")
+    )
+
+
+def attach_last_messages(threads):
+    """
+    Load the last messages of annotated threads in one query and attach them as `last_message`.
+
+    Returns:
+        list: The threads
+    """
+    threads = list(threads)
+    ids = [thread.last_message_id for thread in threads if thread.last_message_id is not None]
+    messages = Message.objects.select_related("sender").in_bulk(ids)
+    for thread in threads:
+        thread.last_message = messages.get(thread.last_message_id)
+    return threads
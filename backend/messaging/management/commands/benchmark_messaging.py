@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+from authentication.models import CustomUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.benchmarking import format_summary, isolated_database, time_call
+from init import signals
+from messaging.broker import get_broker
+from messaging.models import Thread
+from messaging.outbox import get_outbox
+from messaging.views import MessageListView, render_event
+
+WORDS = ["hello", "deal", "round", "seed", "pitch", "deck", "meeting", "term", "sheet", "valuation", "call", "team"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark message ingestion: messages posted through the REST API and delivered to simulated "
+        "server-sent event streams and Socket.IO connections, all in process. Runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100, help="Number of simulated users")
+        parser.add_argument("--threads", type=int, default=50, help="Number of threads")
+        parser.add_argument("--participants", type=int, default=2, help="Participants per thread")
+        parser.add_argument("--messages", type=int, default=2000, help="Number of messages to post")
+        parser.add_argument("--sse", type=int, default=100, help="Number of concurrent server-sent event streams")
+        parser.add_argument("--socketio", type=int, default=100, help="Number of concurrent Socket.IO connections")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        # One log line per message would dominate the measurements
+        logging.disable(logging.INFO)
+        try:
+            with isolated_database():
+                threads = self.populate(rng, options["users"], options["threads"], options["participants"])
+                self.run(rng, threads, options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def populate(self, rng, users, threads, participants):
+        """
+        Create the users and threads, returning (thread id, participants) pairs.
+        """
+        people = CustomUser.objects.bulk_create(
+            [
+                CustomUser(email=f"user{index}@example.com", name=f"User {index}", role="investor")
+                for index in range(users)
+            ]
+        )
+        pairs = []
+        for _ in range(threads):
+            thread = Thread.objects.create()
+            members = rng.sample(people, min(participants, len(people)))
+            thread.participants.add(*members)
+            pairs.append((thread.id, members))
+        return pairs
+
+    def run(self, rng, threads, options):
+        loop = asyncio.new_event_loop()
+        runner = threading.Thread(target=loop.run_forever, name="benchmark-subscribers", daemon=True)
+        runner.start()
+
+        sent_at = {}
+        sse_samples = []
+        socketio_samples = []
+
+        def latency(body):
+            return (time.perf_counter() - sent_at[int(body.split(" ", 1)[0][1:])]) * 1000
+
+        # Socket.IO connections are simulated by the rooms they joined, the emit is recorded per connection
+        connections = defaultdict(int)
+        for _ in range(options["socketio"]):
+            connections[f"user_{rng.choice(rng.choice(threads)[1]).id}_threads"] += 1
+
+        async def emit(name, data, room):
+            # Encoded once per emit, like a Socket.IO packet sent to a room
+            json.dumps(data)
+            if name == "message_received":
+                socketio_samples.extend([latency(data["body"])] * connections.get(room, 0))
+
+        subscribers = []
+
+        async def stream(thread_id, user_id, ready):
+            subscriber, _ = get_broker().subscribe(thread_id, user_id)
+            subscribers.append(subscriber)
+            ready.set()
+            while True:
+                event = await subscriber.queue.get()
+                if render_event(event, user_id) is not None and event.name == "message":
+                    sse_samples.append(latency(event.data["body"]))
+
+        async def open_streams():
+            tasks = []
+            for index in range(options["sse"]):
+                thread_id, members = threads[index % len(threads)]
+                ready = asyncio.Event()
+                tasks.append(loop.create_task(stream(thread_id, rng.choice(members).id, ready)))
+                await ready.wait()
+            return tasks
+
+        async def drain():
+            await outbox.join()
+            while any(not subscriber.queue.empty() for subscriber in subscribers):
+                await asyncio.sleep(0.001)
+
+        outbox = get_outbox()
+        outbox.emit = emit
+        outbox.start(loop)
+        streams = asyncio.run_coroutine_threadsafe(open_streams(), loop).result()
+
+        view = MessageListView.as_view()
+        factory = APIRequestFactory()
+        # Rotate over every (thread, sender) pair so the per sender rate limit is rarely hit
+        senders = [(thread_id, member) for thread_id, members in threads for member in members]
+        rng.shuffle(senders)
+
+        post_samples = []
+        queries = []
+        statuses = defaultdict(int)
+        # The Socket.IO notifications are only queued when signals are enabled
+        disabled, signals.DISABLE_SIGNALS = signals.DISABLE_SIGNALS, False
+        started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            for seq in range(options["messages"]):
+                thread_id, sender = senders[seq % len(senders)]
+                request = factory.post(
+                    f"/api/threads/{thread_id}/messages/",
+                    {"body": f"m{seq} {' '.join(rng.choices(WORDS, k=8))}"},
+                    format="json",
+                )
+                force_authenticate(request, user=sender)
+                sent_at[seq] = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    response, elapsed = time_call(view, request, thread_id=thread_id)
+                statuses[response.status_code] += 1
+                if response.status_code == 201:
+                    post_samples.append(elapsed)
+                    queries.append(len(captured))
+            asyncio.run_coroutine_threadsafe(drain(), loop).result()
+        finally:
+            signals.DISABLE_SIGNALS = disabled
+        wall, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+
+        for task in streams:
+            loop.call_soon_threadsafe(task.cancel)
+        loop.call_soon_threadsafe(loop.stop)
+        runner.join()
+
+        accepted = statuses.pop(201, 0)
+        self.stdout.write(
+            f"\n{options['messages']} messages from {options['users']} users in {len(threads)} threads, "
+            f"{options['sse']} SSE streams, {options['socketio']} Socket.IO connections"
+        )
+        self.stdout.write(
+            f"accepted={accepted} rejected={dict(statuses)} throughput={accepted / wall:.0f} msg/s "
+            f"cpu/message={cpu / max(accepted, 1) * 1000:.2f}ms"
+        )
+        if queries:
+            self.stdout.write(
+                f"queries/message mean={sum(queries) / len(queries):.1f} max={max(queries)} "
+                f"sse_overflows={sum(subscriber.overflowed for subscriber in subscribers)} "
+                f"socketio_dropped={outbox.dropped}"
+            )
+        self.stdout.write(format_summary("post (request)", post_samples))
+        self.stdout.write(format_summary("SSE delivery", sse_samples))
+        self.stdout.write(format_summary("Socket.IO delivery", socketio_samples))
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_memberships(apps, schema_editor):
+    """Create the unread counters of the existing participants from their read receipts"""
+    Thread = apps.get_model("messaging", "Thread")
+    ThreadMembership = apps.get_model("messaging", "ThreadMembership")
+    ReadReceipt = apps.get_model("messaging", "ReadReceipt")
+
+    receipts = {
+        (receipt.thread_id, receipt.user_id): receipt.last_read_message
+        for receipt in ReadReceipt.objects.select_related("last_read_message")
+    }
+    memberships = []
+    for thread in Thread.objects.prefetch_related("participants", "messages"):
+        for user in thread.participants.all():
+            last_read = receipts.get((thread.pk, user.pk))
+            unread = sum(
+                1
+                for message in thread.messages.all()
+                if message.sender_id != user.pk and (last_read is None or message.created_at > last_read.created_at)
+            )
+            memberships.append(
+                ThreadMembership(thread=thread, user=user, unread_count=unread, last_read_message=last_read)
+            )
+    ThreadMembership.objects.bulk_create(memberships, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("messaging", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThreadMembership",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("unread_count", models.PositiveIntegerField(default=0)),
+                (
+                    "last_read_message",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="messaging.message",
+                    ),
+                ),
+                (
+                    "thread",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="memberships", to="messaging.thread"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="thread_memberships",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["user", "unread_count"], name="membership_user_unread_idx")],
+                "unique_together": {("thread", "user")},
+            },
+        ),
+        migrations.RunPython(create_memberships, migrations.RunPython.noop),
+    ]
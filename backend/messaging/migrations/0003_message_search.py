@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:40
+
+from django.db import migrations
+
+FTS_TABLE = "messaging_message_fts"
+
+CREATE_SQL = [
+    # External content table, the bodies are only stored once in messaging_message
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "body, content='messaging_message', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON messaging_message BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END",
+    f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON messaging_message BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); END",
+    f"CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF body ON messaging_message BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); "
+    f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END",
+    # Index the existing messages
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("messaging", "0002_thread_membership"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
@@ -80,3 +80,25 @@ class TypingIndicator(models.Model):
         String representation of the TypingIndicator model.
         """
         return f"Typing indicator for {self.user} in Thread {self.thread.id}"
+
+
+class ThreadMembership(models.Model):
+    """
+    Unread counter of a participant of a thread, kept up to date as messages are sent and read.
+    """
+
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="thread_memberships")
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    class Meta:
+        unique_together = ["thread", "user"]
+        # Covers the total unread lookup of a user
+        indexes = [models.Index(fields=["user", "unread_count"], name="membership_user_unread_idx")]
+
+    def __str__(self):
+        """
+        String representation of the ThreadMembership model.
+        """
+        return f"Membership of {self.user} in Thread {self.thread_id}"
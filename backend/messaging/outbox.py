@@ -0,0 +1,170 @@
+"""
+Outbound queue of the Socket.IO events emitted by model signals.
+
+Signal handlers run inside the request that saved the model. Instead of emitting there, once
+per room and through `async_to_sync`, they enqueue a single `OutboundEvent` listing its rooms
+and return. A background task on the event loop of the Socket.IO server consumes the queue in
+batches. It fans every event out to its rooms with concurrent emits. Events sharing a
+coalescing key within a batch (e.g. successive "thread_updated" of the same thread) are only
+sent once, with the latest data.
+
+The ASGI application binds the queue to its event loop at startup (see backend/asgi.py) and
+emits through its Socket.IO server. Processes without a Socket.IO server, such as management
+commands, consume it on a private event loop running in a background thread and emit through a
+write-only client manager (see backend/socketio_manager.py), which reaches the clients of the
+servers through the pub/sub channel. With the in-memory manager, their events reach nobody.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUED_EVENTS = 10000
+BATCH_SIZE = 100
+
+OutboundEvent = namedtuple("OutboundEvent", ["name", "data", "rooms", "key"])
+
+
+async def _emit_with_sio(name, data, room):
+    from backend.asgi import sio
+
+    await sio.emit(name, data, room=room)
+
+
+def _manager_emitter():
+    """
+    Return an emit coroutine function publishing through a write-only client manager.
+    """
+    from backend.socketio_manager import create_manager
+
+    manager = create_manager(write_only=True)
+
+    async def emit(name, data, room):
+        await manager.emit(name, data, namespace="/", room=room)
+
+    return emit
+
+
+class Outbox:
+    """
+    Queue of events consumed by a task of an event loop that emits them.
+    """
+
+    def __init__(self, emit=None, max_size=MAX_QUEUED_EVENTS, batch_size=BATCH_SIZE):
+        """
+        Send events with the `emit(name, data, room)` coroutine function, by default through the Socket.IO
+        server of the process when started on its loop, or through a write-only client manager otherwise.
+        """
+        self.emit = emit
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.loop = None
+        self.sent = 0
+        self.dropped = 0
+        self._queue = None
+        self._task = None
+        self._lock = threading.Lock()
+
+    def start(self, loop=None):
+        """
+        Consume the queue on `loop`, or on a private event loop running in a background thread.
+        Does nothing when the queue is already consumed.
+        """
+        with self._lock:
+            if self.loop is not None:
+                return
+            if self.emit is None:
+                self.emit = _emit_with_sio if loop is not None else _manager_emitter()
+            if loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="socketio-outbox", daemon=True).start()
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self.loop = loop
+        loop.call_soon_threadsafe(self._start_task)
+
+    def _start_task(self):
+        self._task = self.loop.create_task(self._run())
+
+    def enqueue(self, name, data, rooms, key=None):
+        """
+        Queue an event for some rooms, from any thread.
+
+        Args:
+            name: Socket.IO event name
+            data: Event payload
+            rooms: Rooms to emit the event to
+            key: Optional coalescing key, only the latest of the events sharing a key in a batch is sent
+        """
+        rooms = list(rooms)
+        if not rooms:
+            return
+        if self.loop is None:
+            self.start()
+        try:
+            self.loop.call_soon_threadsafe(self._put, OutboundEvent(name, data, rooms, key))
+        except RuntimeError:
+            logger.warning(f"Dropped {name} event, the Socket.IO event loop is closed")
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Dropped {event.name} event, {self.max_size} events are already queued")
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._send(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send(self, batch):
+        latest = {event.key: index for index, event in enumerate(batch) if event.key is not None}
+        emits = [
+            (event.name, event.data, room)
+            for index, event in enumerate(batch)
+            if event.key is None or latest[event.key] == index
+            for room in event.rooms
+        ]
+        results = await asyncio.gather(*(self.emit(*emit) for emit in emits), return_exceptions=True)
+        for (name, _, room), result in zip(emits, results, strict=True):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to emit {name} to {room}: {result}")
+            else:
+                self.sent += 1
+
+    async def join(self):
+        """Wait until every queued event is sent, must run on the event loop of the queue."""
+        await self._queue.join()
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """
+    Return the outbound queue of the process.
+    """
+    global _outbox
+
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = Outbox()
+    return _outbox
+
+
+def start_outbox():
+    """
+    Consume the outbound queue on the running event loop, called at the startup of the ASGI application.
+    """
+    get_outbox().start(asyncio.get_running_loop())
@@ -0,0 +1,90 @@
+"""
+Process-wide cache of the participant ids of threads.
+
+The Socket.IO server checks that a user takes part in a thread on every event. The participant
+ids of the most recently used threads are kept in a least recently used cache instead of being
+queried each time. Entries are dropped when the participants of a thread change in this
+process (see init/signals.py) and expire after PARTICIPANTS_CACHE_TTL seconds, which bounds
+how long a change made by another process can go unnoticed by the checks of short-lived events
+such as typing. Joining a thread reads its participants again and writing a message checks
+the membership in its transaction (see backend/asgi.py), so a removed user cannot read or post
+through another process meanwhile.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .models import Thread
+
+MAX_CACHED_THREADS = 4096
+PARTICIPANTS_CACHE_TTL = 60
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_generation = 0
+
+
+def cached_participant_ids(thread_id):
+    """
+    Participant ids of a thread if they are cached, without touching the database.
+
+    Returns:
+        frozenset: The user ids, or None when the thread is not cached
+    """
+    with _lock:
+        entry = _cache.get(thread_id)
+        if entry is None:
+            return None
+        ids, expires_at = entry
+        if expires_at < time.monotonic():
+            del _cache[thread_id]
+            return None
+        _cache.move_to_end(thread_id)
+        return ids
+
+
+def participant_ids(thread_id, refresh=False):
+    """
+    Participant ids of a thread, from the cache or the database.
+
+    Args:
+        thread_id: Id of the thread
+        refresh: Read them from the database even if they are cached, and cache them again
+
+    Returns:
+        frozenset: The user ids, or None when the thread does not exist
+    """
+    ids = None if refresh else cached_participant_ids(thread_id)
+    if ids is not None:
+        return ids
+
+    generation = _generation
+    rows = list(Thread.objects.filter(pk=thread_id).values_list("participants", flat=True))
+    if not rows:
+        return None
+    ids = frozenset(user_id for user_id in rows if user_id is not None)
+
+    with _lock:
+        # Not cached if the participants changed while they were read
+        if generation == _generation:
+            _cache[thread_id] = (ids, time.monotonic() + PARTICIPANTS_CACHE_TTL)
+            _cache.move_to_end(thread_id)
+            if len(_cache) > MAX_CACHED_THREADS:
+                _cache.popitem(last=False)
+    return ids
+
+
+def invalidate(thread_ids=None):
+    """
+    Forget the participants of some threads, or of every thread.
+    """
+    global _generation
+
+    with _lock:
+        _generation += 1
+        if thread_ids is None:
+            _cache.clear()
+        else:
+            for thread_id in thread_ids:
+                _cache.pop(thread_id, None)
@@ -0,0 +1,113 @@
+"""
+Ephemeral typing and online status of messaging users.
+
+Presence is kept in the Django cache selected by MESSAGING_PRESENCE_CACHE and never touches the
+database. Typing users are stored per thread, and the Socket.IO connections of online users
+are stored per user. Each entry carries its own expiry: typing stops after MESSAGING_TYPING_TTL
+seconds without a new keystroke burst, and a connection counts as online for
+MESSAGING_ONLINE_TTL seconds after its last event. The cache keys expire with their last
+entry. With the default local memory cache, presence is only shared by the threads of a
+process. A shared cache such as Redis makes it shared by every process.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .broker import get_broker
+
+
+def _cache():
+    return caches[settings.MESSAGING_PRESENCE_CACHE]
+
+
+def _typing_key(thread_id):
+    return f"messaging:typing:{thread_id}"
+
+
+def _online_key(user_id):
+    return f"messaging:online:{user_id}"
+
+
+def _live(entries, now):
+    return {key: value for key, value in (entries or {}).items() if value[0] > now}
+
+
+def _update(key, entry_key, value, ttl):
+    """
+    Set or remove (when `value` is None) an entry of a cached dictionary and drop its expired entries.
+
+    Returns:
+        dict: The live entries
+    """
+    cache = _cache()
+    now = time.time()
+    entries = _live(cache.get(key), now)
+    if value is None:
+        entries.pop(entry_key, None)
+    else:
+        entries[entry_key] = (now + ttl, value)
+    if entries:
+        cache.set(key, entries, timeout=max(expires_at for expires_at, _ in entries.values()) - now)
+    else:
+        cache.delete(key)
+    return entries
+
+
+def _typing_list(entries):
+    return [{"id": user_id, "name": name} for user_id, (_, name) in sorted(entries.items())]
+
+
+def set_typing(thread_id, user, is_typing):
+    """
+    Record that a user started or stopped typing in a thread.
+
+    Returns:
+        list: The users typing in the thread, as {"id", "name"} dictionaries
+    """
+    entries = _update(_typing_key(thread_id), user.id, user.name if is_typing else None, settings.MESSAGING_TYPING_TTL)
+    return _typing_list(entries)
+
+
+def typing_users(thread_id):
+    """
+    Users typing in a thread, as {"id", "name"} dictionaries.
+    """
+    return _typing_list(_live(_cache().get(_typing_key(thread_id)), time.time()))
+
+
+def update_typing(thread_id, user, is_typing):
+    """
+    Record the typing status of a user and push the typing users to the event streams of the thread.
+
+    Returns:
+        list: The users typing in the thread
+    """
+    users = set_typing(thread_id, user, is_typing)
+    get_broker().publish(thread_id, "typing", {"type": "typing", "users": users}, user.id)
+    return users
+
+
+def mark_online(user_id, connection_id):
+    """
+    Record or refresh a connection of a user.
+    """
+    _update(_online_key(user_id), connection_id, True, settings.MESSAGING_ONLINE_TTL)
+
+
+def mark_offline(user_id, connection_id):
+    """
+    Forget a closed connection of a user, who stays online while they have other connections.
+    """
+    _update(_online_key(user_id), connection_id, None, settings.MESSAGING_ONLINE_TTL)
+
+
+def online_user_ids(user_ids):
+    """
+    Subset of `user_ids` that have at least one live connection.
+    """
+    user_ids = list(user_ids)
+    now = time.time()
+    cached = _cache().get_many([_online_key(user_id) for user_id in user_ids])
+    return {user_id for user_id in user_ids if _live(cached.get(_online_key(user_id)), now)}
@@ -0,0 +1,99 @@
+"""
+Full-text search over the messages of the threads a user takes part in.
+
+Message bodies are indexed by the SQLite FTS5 table `messaging_message_fts`, created by
+migration 0003 and kept in sync by triggers on `messaging_message`, so every write path
+(including bulk and raw ones) updates the index within its own transaction. A query is
+turned into a conjunction of quoted terms, the last one matching as a prefix for
+search-as-you-type. Matches are read newest first by rowid, which FTS5 walks in order
+without sorting, and restricted to the threads of the user with a join on the
+participants table. Pages are keyed by message id.
+"""
+
+import html
+import re
+
+from django.db import connection
+
+from .models import Message, Thread
+
+FTS_TABLE = "messaging_message_fts"
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_QUERY_TERMS = 10
+# Tokens of context around the matches in a snippet, at most 64
+SNIPPET_TOKENS = 16
+
+# Control characters marking the matches in snippets, replaced once the snippet is escaped
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
+
+
+def match_expression(query):
+    """
+    FTS5 expression matching every word of a free-text query, None when it has no word.
+    """
+    terms = TOKEN_PATTERN.findall(query.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def highlight(snippet):
+    """
+    Escape a snippet for HTML and wrap its matches in <mark> tags.
+    """
+    return html.escape(snippet).replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>")
+
+
+def search_messages(user, query, thread_id=None, before_id=None, page_size=20):
+    """
+    One page of the messages matching a query in the threads of a user, newest first.
+
+    Args:
+        user: User searching, only their threads are searched
+        query: Free-text query
+        thread_id: Optional thread to search in
+        before_id: Only return messages older than this message id
+        page_size: Maximum number of messages
+
+    Returns:
+        tuple: (list of messages with a `snippet` attribute, whether older matches exist)
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return [], False
+
+    through = Thread.participants.through._meta
+    sql = (
+        f"SELECT m.id, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) "
+        f"FROM {FTS_TABLE} "
+        f"JOIN {Message._meta.db_table} m ON m.id = {FTS_TABLE}.rowid "
+        f"JOIN {through.db_table} p ON p.thread_id = m.thread_id AND p.{through.get_field('customuser').column} = %s "
+        f"WHERE {FTS_TABLE} MATCH %s"
+    )
+    params = [_MATCH_START, _MATCH_END, "…", SNIPPET_TOKENS, user.pk, expression]
+    if before_id is not None:
+        sql += f" AND {FTS_TABLE}.rowid < %s"
+        params.append(before_id)
+    if thread_id is not None:
+        sql += " AND m.thread_id = %s"
+        params.append(thread_id)
+    sql += f" ORDER BY {FTS_TABLE}.rowid DESC LIMIT %s"
+    params.append(page_size + 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    messages = Message.objects.select_related("sender").in_bulk([message_id for message_id, _ in rows])
+    page = []
+    for message_id, snippet in rows:
+        message = messages.get(message_id)
+        if message is None:
+            # Deleted since the query
+            continue
+        message.snippet = highlight(snippet)
+        page.append(message)
+    return page, has_more
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 from .models import Message, ReadReceipt, Thread, TypingIndicator
+from .unread import unread_count
 
 User = get_user_model()
 
@@ -21,6 +22,27 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ["thread", "sender"]
 
 
+class CompactMessageSerializer(serializers.ModelSerializer):
+    """Message with the id of its sender only, the senders being listed once in the thread."""
+
+    class Meta:
+        model = Message
+        fields = ["id", "sender", "body", "created_at"]
+        read_only_fields = ["sender"]
+
+
+class MessageSearchResultSerializer(serializers.ModelSerializer):
+    """Message matching a search, with an HTML snippet of its body where the matches are marked."""
+
+    sender = UserSerializer(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = ["id", "thread", "sender", "snippet", "created_at"]
+        read_only_fields = ["thread"]
+
+
 class ThreadCreateSerializer(serializers.Serializer):
     participants = serializers.ListField(child=serializers.IntegerField(), min_length=1)
     message = serializers.CharField(required=True)
@@ -67,25 +89,30 @@ class ThreadSerializer(serializers.ModelSerializer):
         fields = ["id", "participants", "created_at", "last_message_at", "last_message", "unread_count"]
 
     def get_last_message(self, thread):
-        last_message = thread.messages.order_by("-created_at").first()
+        if hasattr(thread, "last_message"):
+            # Loaded by messaging.inbox.attach_last_messages
+            last_message = thread.last_message
+        else:
+            last_message = thread.messages.order_by("-created_at").first()
         return MessageSerializer(last_message).data if last_message else None
 
     def get_unread_count(self, thread):
-        user = self.context["request"].user
+        if hasattr(thread, "unread"):
+            # Annotated by messaging.inbox.inbox_threads
+            return thread.unread
 
-        read_receipt = ReadReceipt.objects.filter(thread=thread, user=user).first()
+        return unread_count(thread, self.context["request"].user)
 
-        if not read_receipt or not read_receipt.last_read_message:
-            return thread.messages.exclude(sender=user).count()
 
-        return (
-            thread.messages.filter(created_at__gt=read_receipt.last_read_message.created_at)
-            .exclude(sender=user)
-            .count()
-        )
+class ThreadDetailSerializer(ThreadSerializer):
+    """
+    Thread with its messages, newest first.
 
+    The view may pass a page of messages as the "messages" context entry. With the "compact"
+    context flag, messages only hold the id of their sender and `participants` becomes a
+    dictionary of the users by id, including senders who left the thread.
+    """
 
-class ThreadDetailSerializer(ThreadSerializer):
     messages = serializers.SerializerMethodField()
 
     class Meta:
@@ -93,5 +120,21 @@ class ThreadDetailSerializer(ThreadSerializer):
         fields = ["id", "participants", "created_at", "last_message_at", "messages", "unread_count"]
 
     def get_messages(self, thread):
-        messages = thread.messages.order_by("-created_at")
+        messages = self.context.get("messages")
+        if messages is None:
+            messages = thread.messages.select_related("sender").order_by("-created_at")
+        if self.context.get("compact"):
+            return CompactMessageSerializer(messages, many=True).data
         return MessageSerializer(messages, many=True).data
+
+    def to_representation(self, thread):
+        data = super().to_representation(thread)
+        if self.context.get("compact"):
+            users = {user["id"]: user for user in data["participants"]}
+            missing = {message["sender"] for message in data["messages"]} - users.keys()
+            if missing:
+                users.update(
+                    (user["id"], user) for user in UserSerializer(User.objects.filter(id__in=missing), many=True).data
+                )
+            data["participants"] = users
+        return data
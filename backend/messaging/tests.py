@@ -0,0 +1,723 @@
+"""
+Tests for the messaging module.
+"""
+
+import asyncio
+import contextlib
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+
+import socketio
+from asgiref.sync import async_to_sync, sync_to_async
+from authentication.models import CustomUser
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.socketio_manager import SQLitePubSubManager, create_manager
+from init import signals
+
+from . import broker, participants, presence
+from .broker import EventBroker
+from .models import Message, ReadReceipt, Thread
+from .outbox import Outbox
+from .serializers import ThreadSerializer
+from .unread import mark_read
+
+
+class EventBrokerTests(TestCase):
+    """Test suite for the in-process event broker."""
+
+    def test_publish_from_another_thread(self):
+        """Events published by synchronous code in any thread reach the subscribed event loop."""
+        event_broker = EventBroker(buffer_size=10, queue_size=10)
+
+        async def scenario():
+            subscriber, replay = event_broker.subscribe(1, user_id=7)
+            self.assertEqual(replay, [])
+            publisher = threading.Thread(target=event_broker.publish, args=(1, "message", {"id": 1}, 3))
+            publisher.start()
+            event = await asyncio.wait_for(subscriber.queue.get(), 5)
+            publisher.join()
+            event_broker.publish(2, "message", {"id": 2})
+            self.assertTrue(subscriber.queue.empty())
+            event_broker.unsubscribe(subscriber)
+            return event
+
+        event = asyncio.run(scenario())
+        self.assertEqual((event.thread_id, event.name, event.data, event.actor_id), (1, "message", {"id": 1}, 3))
+        self.assertEqual(event_broker.subscriber_count(), 0)
+
+    def test_replay_from_bounded_buffer(self):
+        """Resuming subscribers get the buffered events after their last one, within the buffer size."""
+        event_broker = EventBroker(buffer_size=3, queue_size=1)
+        events = [event_broker.publish(1, "message", {"id": index}) for index in range(5)]
+        self.assertEqual(event_broker.last_event_id, events[-1].id)
+
+        async def scenario():
+            subscriber, replay = event_broker.subscribe(1, user_id=7, after=events[3].id)
+            self.assertEqual(replay, events[4:])
+            _, replay = event_broker.subscribe(1, user_id=7, after=events[0].id)
+            self.assertEqual(replay, events[2:])
+
+            # A subscriber falling behind is flagged so its stream can be closed
+            event_broker.publish(1, "message", {"id": 5})
+            event_broker.publish(1, "message", {"id": 6})
+            await asyncio.sleep(0)
+            return subscriber.overflowed
+
+        self.assertTrue(asyncio.run(scenario()))
+
+
+@override_settings(MESSAGING_SSE_KEEPALIVE=0.2)
+class ThreadEventsTests(TestCase):
+    """Test suite for the thread server-sent event stream."""
+
+    def setUp(self):
+        """Create two investors sharing a thread with a few messages."""
+        broker.reset()
+        self.addCleanup(broker.reset)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch("messaging.views.get_outbox")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = CustomUser.objects.create_user(email="alice@example.com", name="Alice", role="investor")
+        self.bob = CustomUser.objects.create_user(email="bob@example.com", name="Bob", role="investor")
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.alice, self.bob)
+        for index in range(7):
+            Message.objects.create(thread=self.thread, sender=self.alice, body=f"Hello {index}")
+        self.client = APIClient()
+        self.bob_client = APIClient()
+        self.bob_client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.bob).access_token}")
+
+    def open_stream(self, **headers):
+        """Open the event stream of the thread as Alice."""
+        token = RefreshToken.for_user(self.alice).access_token
+        response = self.client.get(f"/api/threads/{self.thread.id}/events/", {"token": str(token)}, **headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return response.streaming_content
+
+    def post(self, path, data):
+        """Post as Bob, running the commit hooks that publish events."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.bob_client.post(f"/api/threads/{self.thread.id}/{path}/", data, format="json")
+
+    def test_writes_are_pushed_to_open_streams(self):
+        """The stream starts with the recent messages, then receives the writes as they are committed."""
+        stream = self.open_stream()
+
+        async def scenario():
+            chunks = [await anext(stream) for _ in range(6)]
+            heartbeat = await anext(stream)
+            await sync_to_async(self.post)("messages", {"body": "Live"})
+            await sync_to_async(self.post)("typing", {"is_typing": True})
+            chunks += [heartbeat, await anext(stream), await anext(stream)]
+            await stream.aclose()
+            return [chunk.decode() for chunk in chunks]
+
+        chunks = async_to_sync(scenario)()
+        self.assertEqual(chunks[0], "retry: 1000\n\n")
+        self.assertIn('"body":"Hello 2"', chunks[1])
+        self.assertIn('"body":"Hello 6"', chunks[5])
+        self.assertEqual(chunks[6], ": heartbeat\n\n")
+        self.assertIn('event: message\ndata:{"type":"message"', chunks[7])
+        self.assertIn('"body":"Live"', chunks[7])
+        self.assertIn(f'"users":[{{"id":{self.bob.id},"name":"Bob"}}]', chunks[8])
+        self.assertEqual(broker.get_broker().subscriber_count(), 0)
+
+    def test_resume_from_last_event_id(self):
+        """Reconnecting clients get the events published after their Last-Event-ID and skip their own."""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Message.objects.create(thread=self.thread, sender=self.bob, body="First")
+        last_event_id = broker.get_broker().last_event_id
+        self.post("messages", {"body": "Missed"})
+        with self.captureOnCommitCallbacks(execute=True):
+            # Alice's own receipt is not sent back to her
+            self.client.force_authenticate(self.alice)
+            self.client.post(f"/api/threads/{self.thread.id}/read/", {"message_id": first.id}, format="json")
+            self.client.force_authenticate(None)
+        self.post("read", {})
+
+        stream = self.open_stream(HTTP_LAST_EVENT_ID=str(last_event_id))
+
+        async def scenario():
+            chunks = [await anext(stream) for _ in range(4)]
+            await stream.aclose()
+            return [chunk.decode() for chunk in chunks]
+
+        chunks = async_to_sync(scenario)()
+        self.assertIn('"body":"Missed"', chunks[1])
+        self.assertIn("event: read_receipt", chunks[2])
+        self.assertIn(f'"user_id":{self.bob.id}', chunks[2])
+        self.assertEqual(chunks[3], ": heartbeat\n\n")
+
+
+class InboxTests(TestCase):
+    """Test suite for the annotated thread inbox."""
+
+    def setUp(self):
+        """Create an investor with threads of various activity and read states."""
+        self.alice = CustomUser.objects.create_user(email="alice@example.com", name="Alice", role="investor")
+        self.others = [
+            CustomUser.objects.create_user(email=f"user{index}@example.com", name=f"User {index}", role="founder")
+            for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.add_threads(3)
+
+    def add_threads(self, count):
+        """Create threads where the other participant sent three messages and Alice read the first."""
+        for index in range(count):
+            other = self.others[index % len(self.others)]
+            thread = Thread.objects.create()
+            thread.participants.add(self.alice, other)
+            messages = [
+                Message.objects.create(thread=thread, sender=sender, body=f"Message {position}")
+                for position, sender in enumerate([other, self.alice, other, other])
+            ]
+            if index % 2:
+                ReadReceipt.objects.create(thread=thread, user=self.alice, last_read_message=messages[0])
+                mark_read(thread, self.alice, messages[0])
+        Thread.objects.create().participants.add(self.alice)
+
+    def legacy_inbox(self):
+        """The inbox as serialized one thread at a time."""
+        request = APIRequestFactory().get("/api/threads/")
+        request.user = self.alice
+        threads = Thread.objects.filter(participants=self.alice).order_by("-last_message_at", "-id")
+        return ThreadSerializer(threads, many=True, context={"request": request}).data
+
+    def test_inbox_matches_per_thread_serialization(self):
+        """The annotated inbox returns the same threads, last messages and unread counts."""
+        response = self.client.get("/api/threads/")
+        self.assertEqual(response.data, self.legacy_inbox())
+        self.assertEqual(sorted(thread["unread_count"] for thread in response.data), [0, 2, 3, 3])
+        self.assertEqual([thread["last_message"] is None for thread in response.data].count(True), 1)
+
+    def test_inbox_in_constant_queries(self):
+        """The number of queries does not depend on the number of threads."""
+        with self.assertNumQueries(3):
+            self.client.get("/api/threads/")
+        self.add_threads(20)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/threads/")
+        self.assertEqual(len(response.data), 25)
+
+    def test_cursor_pagination(self):
+        """Pages follow the inbox order when a page size or cursor is given."""
+        expected = [thread["id"] for thread in self.client.get("/api/threads/").data]
+
+        response = self.client.get("/api/threads/", {"page_size": 3})
+        ids = [thread["id"] for thread in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        ids += [thread["id"] for thread in response.data["results"]]
+
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(ids, expected)
+
+
+class UnreadCounterTests(TestCase):
+    """Test suite for the denormalized unread counters."""
+
+    def setUp(self):
+        """Create a thread between three investors."""
+        self.alice, self.bob, self.carol = (
+            CustomUser.objects.create_user(email=f"{name.lower()}@example.com", name=name, role="investor")
+            for name in ["Alice", "Bob", "Carol"]
+        )
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.alice, self.bob)
+        self.client = APIClient()
+
+    def total_unread(self, user):
+        """Total unread count of a user as polled by the navigation badge."""
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(1):
+            return self.client.get("/api/threads/unread/").data["total_unread"]
+
+    def test_counters_follow_messages_and_reads(self):
+        """Messages count as unread for the other participants until they read the thread."""
+        messages = [Message.objects.create(thread=self.thread, sender=self.bob, body=str(i)) for i in range(3)]
+        Message.objects.create(thread=self.thread, sender=self.alice, body="Reply")
+        self.assertEqual((self.total_unread(self.alice), self.total_unread(self.bob)), (3, 1))
+
+        other = Thread.objects.create()
+        other.participants.add(self.alice, self.carol)
+        Message.objects.create(thread=other, sender=self.carol, body="Hi")
+        self.assertEqual(self.total_unread(self.alice), 4)
+
+        self.client.force_authenticate(self.alice)
+        self.client.post(f"/api/threads/{self.thread.id}/read/", {"message_id": messages[0].id}, format="json")
+        self.assertEqual(self.total_unread(self.alice), 3)
+        self.client.post(f"/api/threads/{self.thread.id}/read/", {}, format="json")
+        self.assertEqual(self.total_unread(self.alice), 1)
+        self.assertEqual(self.client.get(f"/api/threads/{other.id}/").data["unread_count"], 1)
+
+    def test_membership_follows_participants(self):
+        """Users joining a thread start with every message from others unread, and leaving drops their counter."""
+        Message.objects.create(thread=self.thread, sender=self.bob, body="Hello")
+        Message.objects.create(thread=self.thread, sender=self.alice, body="Hi")
+        self.carol.threads.add(self.thread)
+        self.assertEqual(self.total_unread(self.carol), 2)
+
+        self.thread.participants.remove(self.carol)
+        self.assertEqual(self.total_unread(self.carol), 0)
+        self.assertEqual(self.thread.memberships.count(), 2)
+        self.thread.participants.clear()
+        self.assertFalse(self.thread.memberships.exists())
+
+
+class MessageHistoryTests(TestCase):
+    """Test suite for the message history of a thread."""
+
+    def setUp(self):
+        """Create a thread with ten messages from two participants."""
+        self.alice = CustomUser.objects.create_user(email="alice@example.com", name="Alice", role="investor")
+        self.bob = CustomUser.objects.create_user(email="bob@example.com", name="Bob", role="founder")
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.alice, self.bob)
+        self.messages = [
+            Message.objects.create(thread=self.thread, sender=self.alice if index % 2 else self.bob, body=str(index))
+            for index in range(10)
+        ]
+        self.ids = [message.id for message in self.messages]
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.url = f"/api/threads/{self.thread.id}/"
+
+    def test_full_history_without_per_message_queries(self):
+        """Without pagination parameters every message is returned with its sender, in a constant number of queries."""
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual([message["id"] for message in response.data["messages"]], self.ids[::-1])
+        self.assertEqual(response.data["messages"][0]["sender"]["name"], "Alice")
+        self.assertNotIn("has_more", response.data)
+
+    def test_keyset_pages(self):
+        """Pages walk back with before_id and forward with after_id, newest first."""
+        response = self.client.get(self.url, {"page_size": 4})
+        self.assertEqual([message["id"] for message in response.data["messages"]], self.ids[:5:-1])
+        self.assertTrue(response.data["has_more"])
+
+        response = self.client.get(self.url, {"page_size": 4, "before_id": self.ids[6]})
+        self.assertEqual([message["id"] for message in response.data["messages"]], self.ids[5:1:-1])
+        response = self.client.get(self.url, {"page_size": 4, "before_id": self.ids[2]})
+        self.assertEqual([message["id"] for message in response.data["messages"]], self.ids[1::-1])
+        self.assertFalse(response.data["has_more"])
+
+        response = self.client.get(self.url, {"page_size": 3, "after_id": self.ids[2]})
+        self.assertEqual([message["id"] for message in response.data["messages"]], self.ids[5:2:-1])
+        self.assertTrue(response.data["has_more"])
+        response = self.client.get(self.url, {"after_id": self.ids[2], "before_id": self.ids[5]})
+        self.assertEqual([message["id"] for message in response.data["messages"]], self.ids[4:2:-1])
+
+        for params in [{"page_size": 0}, {"page_size": 1000}, {"before_id": "latest"}]:
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_compact_format(self):
+        """Compact messages only carry their sender id, the senders being listed once by id."""
+        carol = CustomUser.objects.create_user(email="carol@example.com", name="Carol", role="investor")
+        self.thread.participants.add(carol)
+        Message.objects.create(thread=self.thread, sender=carol, body="Bye")
+        self.thread.participants.remove(carol)
+
+        data = self.client.get(self.url, {"compact": "true", "page_size": 2}).json()
+        self.assertEqual(
+            [(message["sender"], message["body"]) for message in data["messages"]],
+            [(carol.id, "Bye"), (self.alice.id, "9")],
+        )
+        self.assertEqual(set(data["participants"]), {str(self.alice.id), str(self.bob.id), str(carol.id)})
+        self.assertEqual(data["participants"][str(carol.id)]["name"], "Carol")
+
+
+class MessageSearchTests(TestCase):
+    """Test suite for the full-text message search."""
+
+    def setUp(self):
+        """Create two threads of Alice, one of them with Bob, and a thread Alice is not part of."""
+        self.alice = CustomUser.objects.create_user(email="alice@example.com", name="Alice", role="investor")
+        self.bob = CustomUser.objects.create_user(email="bob@example.com", name="Bob", role="investor")
+        self.carol = CustomUser.objects.create_user(email="carol@example.com", name="Carol", role="investor")
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.alice, self.bob)
+        self.other = Thread.objects.create()
+        self.other.participants.add(self.alice, self.carol)
+        self.private = Thread.objects.create()
+        self.private.participants.add(self.bob, self.carol)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def search(self, **params):
+        """Search as Alice."""
+        return self.client.get("/api/threads/search/", params)
+
+    def test_only_the_threads_of_the_user_are_searched(self):
+        """Every word must match, the last one as a prefix, and newest matches come first."""
+        first = Message.objects.create(thread=self.thread, sender=self.bob, body="The term sheet is ready")
+        second = Message.objects.create(thread=self.other, sender=self.carol, body="Send the <b>terms</b> please")
+        Message.objects.create(thread=self.private, sender=self.bob, body="Secret term sheet")
+        Message.objects.create(thread=self.thread, sender=self.bob, body="Unrelated")
+
+        response = self.search(q="TERM")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["id"] for result in response.data["results"]], [second.id, first.id])
+        self.assertEqual(
+            response.data["results"][0]["snippet"], "Send the &lt;b&gt;<mark>terms</mark>&lt;/b&gt; please"
+        )
+        self.assertEqual(response.data["results"][1]["sender"]["name"], "Bob")
+
+        response = self.search(q="sheet term")
+        self.assertEqual([result["id"] for result in response.data["results"]], [first.id])
+        response = self.search(q="term", thread_id=self.other.id)
+        self.assertEqual([result["id"] for result in response.data["results"]], [second.id])
+
+    def test_pages_and_index_updates(self):
+        """Pages are keyed by message id, and edited or deleted messages are reindexed by the triggers."""
+        messages = [
+            Message.objects.create(thread=self.thread, sender=self.bob, body=f"Pitch deck v{index}")
+            for index in range(5)
+        ]
+        response = self.search(q="deck", page_size=3)
+        self.assertEqual([result["id"] for result in response.data["results"]], [m.id for m in messages[:1:-1]])
+        self.assertTrue(response.data["has_more"])
+        response = self.search(q="deck", page_size=3, before_id=messages[2].id)
+        self.assertEqual([result["id"] for result in response.data["results"]], [messages[1].id, messages[0].id])
+        self.assertFalse(response.data["has_more"])
+
+        Message.objects.filter(pk=messages[0].pk).update(body="Valuation")
+        messages[1].delete()
+        response = self.search(q="deck", before_id=messages[2].id)
+        self.assertEqual(response.data["results"], [])
+        response = self.search(q="valu")
+        self.assertEqual([result["id"] for result in response.data["results"]], [messages[0].id])
+
+        self.assertEqual(self.search(q="   ").status_code, 400)
+        self.assertEqual(self.search(q="deck", page_size=0).status_code, 400)
+        self.assertEqual(self.search(q='" OR *').data, {"results": [], "has_more": False})
+
+
+class SocketIOTests(TestCase):
+    """Test suite for the Socket.IO event handlers."""
+
+    def setUp(self):
+        """Create a thread between two investors and replace the Socket.IO transport with mocks."""
+        from backend import asgi
+
+        self.asgi = asgi
+        participants.invalidate()
+        self.addCleanup(participants.invalidate)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.alice = CustomUser.objects.create_user(email="alice@example.com", name="Alice", role="investor")
+        self.bob = CustomUser.objects.create_user(email="bob@example.com", name="Bob", role="investor")
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.alice, self.bob)
+
+        sessions = {}
+
+        async def get_session(sid, namespace=None):
+            return sessions.setdefault(sid, {})
+
+        async def save_session(sid, session, namespace=None):
+            sessions[sid] = session
+
+        for name, replacement in [
+            ("get_session", get_session),
+            ("save_session", save_session),
+            ("emit", mock.AsyncMock()),
+            ("enter_room", mock.AsyncMock()),
+        ]:
+            patcher = mock.patch.object(asgi.sio, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.emit = asgi.sio.emit
+
+    def call(self, handler, *args):
+        """Run an event handler."""
+        return async_to_sync(handler)(*args)
+
+    def emitted(self, event):
+        """Payloads emitted for an event."""
+        return [call.args[1] for call in self.emit.call_args_list if call.args[0] == event]
+
+    def test_connection_is_authenticated_once(self):
+        """The token given at connect authenticates every later event, and participants are read once."""
+        token = str(RefreshToken.for_user(self.alice).access_token)
+        with mock.patch.object(self.asgi, "participant_ids", wraps=participants.participant_ids) as load:
+            self.call(self.asgi.connect, "sid-1", {"QUERY_STRING": f"token={token}"})
+            with mock.patch.object(self.asgi, "authenticate_user", side_effect=AssertionError):
+                self.call(self.asgi.join_thread, "sid-1", {"thread_id": self.thread.id})
+                self.call(
+                    self.asgi.post_message, "sid-1", {"thread_id": self.thread.id, "body": "Hi", "client_id": "c1"}
+                )
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(self.emitted("joined_thread"), [{"thread_id": self.thread.id}])
+
+        message = Message.objects.get()
+        (sent,) = self.emitted("message_sent")
+        self.assertEqual((sent["id"], sent["client_id"], sent["body"]), (message.id, "c1", "Hi"))
+        self.assertEqual(self.emitted("new_message"), [{k: v for k, v in sent.items() if k != "client_id"}])
+
+        self.call(self.asgi.typing_start, "sid-1", {})
+        self.assertEqual(self.emitted("typing"), [{"user_id": self.alice.id, "user_name": "Alice", "is_typing": True}])
+        self.assertEqual(presence.typing_users(self.thread.id), [{"id": self.alice.id, "name": "Alice"}])
+
+    def test_connections_are_tracked_in_presence(self):
+        """A user is online while any of their authenticated connections is open."""
+        token = str(RefreshToken.for_user(self.alice).access_token)
+        self.call(self.asgi.connect, "sid-1", {}, {"token": token})
+        self.call(self.asgi.connect, "sid-2", {}, {"token": token})
+        self.call(self.asgi.connect, "sid-3", {}, None)
+        self.assertEqual(presence.online_user_ids([self.alice.id, self.bob.id]), {self.alice.id})
+
+        self.call(self.asgi.disconnect, "sid-1")
+        self.call(self.asgi.disconnect, "sid-3")
+        self.assertEqual(presence.online_user_ids([self.alice.id]), {self.alice.id})
+        self.call(self.asgi.disconnect, "sid-2")
+        self.assertEqual(presence.online_user_ids([self.alice.id]), set())
+
+    def test_participant_changes_invalidate_the_cache(self):
+        """Removing a participant is seen immediately, and tokens sent with events still work."""
+        self.call(self.asgi.connect, "sid-1", {}, None)
+        token = str(RefreshToken.for_user(self.bob).access_token)
+        self.call(self.asgi.join_thread, "sid-1", {"thread_id": self.thread.id, "token": token})
+        self.assertEqual(participants.cached_participant_ids(self.thread.id), {self.alice.id, self.bob.id})
+
+        self.thread.participants.remove(self.bob)
+        self.assertIsNone(participants.cached_participant_ids(self.thread.id))
+        self.call(self.asgi.post_message, "sid-1", {"thread_id": self.thread.id, "body": "Hi"})
+        self.call(self.asgi.join_thread, "sid-1", {"thread_id": 999})
+        self.assertEqual(self.emitted("error"), [{"message": "Not a participant"}, {"message": "Thread not found"}])
+        self.assertFalse(Message.objects.exists())
+
+    def test_removals_by_other_processes_are_checked_on_join_and_post(self):
+        """A user removed while their thread is cached can neither join it nor post to it."""
+        token = str(RefreshToken.for_user(self.bob).access_token)
+        self.call(self.asgi.connect, "sid-1", {}, {"token": token})
+        self.call(self.asgi.join_thread, "sid-1", {"thread_id": self.thread.id})
+        # Removed by another process, without invalidating the cache of this one
+        Thread.participants.through.objects.filter(thread=self.thread, customuser=self.bob).delete()
+        self.assertIn(self.bob.id, participants.cached_participant_ids(self.thread.id))
+
+        self.call(self.asgi.post_message, "sid-1", {"thread_id": self.thread.id, "body": "Hi"})
+        self.call(self.asgi.join_thread, "sid-1", {"thread_id": self.thread.id})
+        self.assertEqual(
+            self.emitted("error"), [{"message": "Not a participant"}, {"message": "Not a participant in this thread"}]
+        )
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(participants.cached_participant_ids(self.thread.id), {self.alice.id})
+
+
+class PresenceTests(TestCase):
+    """Test suite for the typing and online status store."""
+
+    def setUp(self):
+        """Create a thread between two investors with an empty presence store."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.alice = CustomUser.objects.create_user(email="alice@example.com", name="Alice", role="investor")
+        self.bob = CustomUser.objects.create_user(email="bob@example.com", name="Bob", role="investor")
+        self.thread = Thread.objects.create()
+        self.thread.participants.add(self.alice, self.bob)
+
+    @override_settings(MESSAGING_TYPING_TTL=5)
+    def test_typing_expires(self):
+        """Typing users are dropped when they stop typing or after the TTL without update."""
+        clock = mock.Mock()
+        clock.time.return_value = 1000.0
+        with mock.patch.object(presence, "time", clock):
+            presence.set_typing(self.thread.id, self.alice, True)
+            clock.time.return_value = 1003.0
+            self.assertEqual(
+                presence.set_typing(self.thread.id, self.bob, True),
+                [{"id": self.alice.id, "name": "Alice"}, {"id": self.bob.id, "name": "Bob"}],
+            )
+            clock.time.return_value = 1006.0
+            self.assertEqual(presence.typing_users(self.thread.id), [{"id": self.bob.id, "name": "Bob"}])
+            presence.set_typing(self.thread.id, self.bob, False)
+            self.assertEqual(presence.typing_users(self.thread.id), [])
+
+    def test_rest_typing_never_touches_the_database(self):
+        """Typing updates are broadcast from the store, which the presence endpoint reads without any query."""
+        bob_client = APIClient()
+        bob_client.force_authenticate(self.bob)
+        alice_client = APIClient()
+        alice_client.force_authenticate(self.alice)
+        presence.mark_online(self.bob.id, "sid-1")
+        bob_client.get(f"/api/threads/{self.thread.id}/presence/")
+
+        with mock.patch("messaging.views.get_outbox") as get_outbox, self.assertNumQueries(0):
+            response = bob_client.post(f"/api/threads/{self.thread.id}/typing/", {"is_typing": True}, format="json")
+        self.assertEqual(response.data, {"status": "ok", "is_typing": True})
+        get_outbox.return_value.enqueue.assert_called_once_with(
+            "typing", {"user_id": self.bob.id, "user_name": "Bob", "is_typing": True}, [f"thread_{self.thread.id}"]
+        )
+
+        response = alice_client.get(f"/api/threads/{self.thread.id}/presence/")
+        self.assertEqual(response.data, {"typing": [{"id": self.bob.id, "name": "Bob"}], "online": [self.bob.id]})
+
+        # Form data is parsed as booleans too
+        url = f"/api/threads/{self.thread.id}/typing/"
+        with mock.patch("messaging.views.get_outbox"):
+            response = bob_client.post(url, {"is_typing": "false"})
+            self.assertEqual(response.data, {"status": "ok", "is_typing": False})
+            self.assertEqual(alice_client.get(f"/api/threads/{self.thread.id}/presence/").data["typing"], [])
+            self.assertEqual(bob_client.post(url, {"is_typing": "maybe"}).status_code, 400)
+        # Users do not see themselves typing
+        response = bob_client.get(f"/api/threads/{self.thread.id}/presence/")
+        self.assertEqual(response.data["typing"], [])
+
+        carol = CustomUser.objects.create_user(email="carol@example.com", name="Carol", role="investor")
+        carol_client = APIClient()
+        carol_client.force_authenticate(carol)
+        self.assertEqual(carol_client.get(f"/api/threads/{self.thread.id}/presence/").status_code, 403)
+        self.assertEqual(bob_client.get("/api/threads/999/presence/").status_code, 404)
+
+
+class SocketIOManagerTests(TestCase):
+    """Test suite for the cross-process Socket.IO client managers."""
+
+    def test_emits_reach_other_processes(self):
+        """An emit on one server is delivered by every server sharing the SQLite channel, once each."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "socketio.sqlite3")
+
+        async def scenario():
+            managers = [SQLitePubSubManager(path, poll_interval=0.01) for _ in range(2)]
+            for manager in managers:
+                socketio.AsyncServer(async_mode="asgi", client_manager=manager)
+                manager.initialize()
+            await asyncio.sleep(0.1)
+
+            with mock.patch.object(socketio.AsyncManager, "emit", autospec=True) as deliver:
+                await managers[0].emit("new_message", {"id": 1}, room="thread_1")
+                for _ in range(100):
+                    if deliver.call_count >= 2:
+                        break
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.05)
+
+            for manager in managers:
+                manager.thread.cancel()
+            return managers, deliver.call_args_list
+
+        managers, calls = asyncio.run(scenario())
+        self.assertEqual([call.args[0] for call in calls], managers)
+        for call in calls:
+            self.assertEqual(call.args[1:3], ("new_message", {"id": 1}))
+            self.assertEqual(call.kwargs["room"], "thread_1")
+
+    def test_manager_selection(self):
+        """SOCKETIO_MANAGER selects the client manager."""
+        self.assertIs(type(create_manager()), socketio.AsyncManager)
+        with override_settings(SOCKETIO_MANAGER="redis", SOCKETIO_REDIS_URL="redis://localhost:6399/0"):
+            manager = create_manager(write_only=True)
+            self.assertIsInstance(manager, socketio.AsyncRedisManager)
+            self.assertTrue(manager.write_only)
+
+
+class OutboxTests(TestCase):
+    """Test suite for the outbound Socket.IO event queue."""
+
+    def test_batches_are_coalesced_and_fanned_out(self):
+        """Events queued from any thread are emitted once per room, keeping the latest of a coalescing key."""
+        emit = mock.AsyncMock()
+        outbox = Outbox(emit=emit)
+
+        async def scenario():
+            outbox.start(asyncio.get_running_loop())
+            publisher = threading.Thread(
+                target=lambda: [
+                    outbox.enqueue("message_received", {"id": 1}, ["user_1_threads", "user_2_threads"]),
+                    outbox.enqueue("thread_updated", {"version": 1}, ["user_1_threads"], key=("thread", 1)),
+                    outbox.enqueue("thread_updated", {"version": 2}, ["user_1_threads"], key=("thread", 1)),
+                    outbox.enqueue("ignored", {}, []),
+                ]
+            )
+            publisher.start()
+            publisher.join()
+            await asyncio.sleep(0)
+            await outbox.join()
+
+        asyncio.run(scenario())
+        self.assertEqual(
+            [call.args for call in emit.call_args_list],
+            [
+                ("message_received", {"id": 1}, "user_1_threads"),
+                ("message_received", {"id": 1}, "user_2_threads"),
+                ("thread_updated", {"version": 2}, "user_1_threads"),
+            ],
+        )
+        self.assertEqual(outbox.sent, 3)
+
+    def test_processes_without_server_emit_through_a_write_only_manager(self):
+        """An outbox consumed on a private loop publishes its events on the channel of the servers."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "socketio.sqlite3")
+
+        outbox = Outbox()
+        with override_settings(SOCKETIO_MANAGER="sqlite", SOCKETIO_SQLITE_PATH=path):
+            outbox.enqueue("thread_updated", {"id": 1}, ["user_1_threads"])
+
+        async def drain():
+            await outbox.join()
+            outbox._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await outbox._task
+
+        asyncio.run_coroutine_threadsafe(drain(), outbox.loop).result(timeout=5)
+        outbox.loop.call_soon_threadsafe(outbox.loop.stop)
+
+        with contextlib.closing(sqlite3.connect(path)) as connection:
+            payloads = [pickle.loads(row[0]) for row in connection.execute("SELECT payload FROM socketio_messages")]
+        self.assertEqual(
+            [(payload["event"], payload["data"], payload["room"]) for payload in payloads],
+            [("thread_updated", {"id": 1}, "user_1_threads")],
+        )
+        self.assertEqual(outbox.sent, 1)
+
+    def test_message_signal_enqueues_once(self):
+        """A new message queues one event per kind after commit and moves its thread without saving it."""
+        alice = CustomUser.objects.create_user(email="alice@example.com", name="Alice", role="investor")
+        bob = CustomUser.objects.create_user(email="bob@example.com", name="Bob", role="investor")
+        thread = Thread.objects.create()
+        thread.participants.add(alice, bob)
+        client = APIClient()
+        client.force_authenticate(bob)
+
+        outbox = mock.Mock()
+        thread_saved = mock.Mock()
+        post_save.connect(thread_saved, sender=Thread)
+        self.addCleanup(post_save.disconnect, thread_saved, sender=Thread)
+        with (
+            mock.patch.object(signals, "DISABLE_SIGNALS", False),
+            mock.patch.object(signals, "get_outbox", return_value=outbox),
+        ):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = client.post(f"/api/threads/{thread.id}/messages/", {"body": "Hi"}, format="json")
+            outbox.enqueue.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        thread_saved.assert_not_called()
+        thread.refresh_from_db()
+        self.assertEqual(thread.last_message_at, Message.objects.get(pk=response.data["id"]).created_at)
+        self.assertEqual(
+            [(call.args[0], call.args[2]) for call in outbox.enqueue.call_args_list],
+            [
+                ("message_received", [f"user_{alice.id}_threads"]),
+                ("thread_updated", [f"user_{alice.id}_threads", f"user_{bob.id}_threads"]),
+            ],
+        )
@@ -0,0 +1,85 @@
+"""
+Denormalized unread counters of thread participants.
+
+Every participant of a thread has a `ThreadMembership` row holding the number of messages from
+other participants they have not read yet. Sending a message increments the counters of the
+other participants with a single UPDATE. Reading a thread recomputes the counter of the reader
+relative to the message read, in the same statement that records it. The total unread count of
+a user is then a sum over their memberships, served by the (user, unread_count) index.
+"""
+
+from django.db.models import Count, F, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Message, ThreadMembership
+
+
+def _unread_after(thread_id, user_id, created_at):
+    """
+    Subquery counting the messages of a thread from other users sent after `created_at`.
+    """
+    messages = Message.objects.filter(thread_id=thread_id, created_at__gt=created_at).exclude(sender_id=user_id)
+    return Coalesce(
+        Subquery(messages.order_by().values("thread").annotate(count=Count("id")).values("count")), Value(0)
+    )
+
+
+def add_members(thread, user_ids):
+    """
+    Create the memberships of users joining a thread, every message from others being unread.
+    """
+    counts = dict(thread.messages.order_by().values_list("sender").annotate(count=Count("id")))
+    total = sum(counts.values())
+    ThreadMembership.objects.bulk_create(
+        [
+            ThreadMembership(thread=thread, user_id=user_id, unread_count=total - counts.get(user_id, 0))
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_members(thread, user_ids):
+    """
+    Delete the memberships of users leaving a thread.
+    """
+    ThreadMembership.objects.filter(thread=thread, user_id__in=user_ids).delete()
+
+
+def message_added(message):
+    """
+    Count a new message as unread for every other participant of its thread.
+    """
+    ThreadMembership.objects.filter(thread_id=message.thread_id).exclude(user_id=message.sender_id).update(
+        unread_count=F("unread_count") + 1
+    )
+
+
+def mark_read(thread, user, message):
+    """
+    Record that a user read a thread up to a message and recount what is left unread after it.
+    """
+    unread = _unread_after(thread.id, user.id, message.created_at)
+    updated = ThreadMembership.objects.filter(thread=thread, user=user).update(
+        unread_count=unread, last_read_message=message
+    )
+    if not updated:
+        ThreadMembership.objects.get_or_create(thread=thread, user=user)
+        ThreadMembership.objects.filter(thread=thread, user=user).update(
+            unread_count=unread, last_read_message=message
+        )
+
+
+def unread_count(thread, user):
+    """
+    Number of messages of a thread the user has not read.
+    """
+    membership = ThreadMembership.objects.filter(thread=thread, user=user).values_list("unread_count", flat=True)
+    return membership.first() or 0
+
+
+def total_unread(user):
+    """
+    Number of unread messages of a user across all their threads.
+    """
+    return ThreadMembership.objects.filter(user=user).aggregate(total=Sum("unread_count"))["total"] or 0
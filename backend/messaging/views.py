@@ -1,9 +1,9 @@
 import asyncio
 import json
 import logging
-import time
 from datetime import datetime
 
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Max, Q
 from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
@@ -12,10 +12,10 @@ from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_http_methods, require_POST
 from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema, extend_schema_view
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.decorators import api_view, parser_classes, permission_classes
 from rest_framework.exceptions import NotFound, PermissionDenied
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -23,9 +23,16 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import AccessToken
 
-from .models import Message, ReadReceipt, Thread, TypingIndicator
+from .broker import get_broker, message_payload
+from .inbox import attach_last_messages, inbox_threads
+from .models import Message, ReadReceipt, Thread
+from .outbox import get_outbox
+from .participants import participant_ids
 from .permissions import IsMessagingEligibleUser
+from .presence import online_user_ids, typing_users, update_typing
+from .search import search_messages
 from .serializers import (
+    MessageSearchResultSerializer,
     MessageSerializer,
     ReadReceiptSerializer,
     ThreadCreateSerializer,
@@ -33,6 +40,7 @@ from .serializers import (
     ThreadSerializer,
     TypingIndicatorSerializer,
 )
+from .unread import mark_read, total_unread
 
 logger = logging.getLogger(__name__)
 
@@ -78,11 +86,30 @@ def authenticate_user_from_jwt(request):
         return None
 
 
+class ThreadInboxPagination(CursorPagination):
+    """
+    Cursor pagination of the inbox, most recently active threads first.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-last_message_at", "-id")
+
+
 @extend_schema_view(
     get=extend_schema(
         tags=["messages"],
         summary="List user threads",
-        description="Retrieves all conversation threads for the current user",
+        description=(
+            "Retrieves the conversation threads of the current user, most recently active first. "
+            "All threads are returned unless `cursor` or `page_size` is given, in which case the threads "
+            "are paginated by last activity with `next` and `previous` cursors."
+        ),
+        parameters=[
+            OpenApiParameter(name="cursor", description="Pagination cursor", required=False, type=str),
+            OpenApiParameter(name="page_size", description="Threads per page (max 100)", required=False, type=int),
+        ],
         responses={
             200: ThreadSerializer(many=True),
             403: OpenApiResponse(description="Not eligible to use messaging"),
@@ -108,10 +135,16 @@ class ThreadListView(APIView):
     permission_classes = [IsMessagingEligibleUser]
 
     def get(self, request):
-        """Get all threads for the current user."""
-        threads = Thread.objects.filter(participants=request.user)
+        """Get the threads of the current user."""
+        threads = inbox_threads(request.user)
+
+        if "cursor" in request.query_params or "page_size" in request.query_params:
+            paginator = ThreadInboxPagination()
+            page = attach_last_messages(paginator.paginate_queryset(threads, request, view=self))
+            serializer = ThreadSerializer(page, many=True, context={"request": request})
+            return paginator.get_paginated_response(serializer.data)
 
-        serializer = ThreadSerializer(threads, many=True, context={"request": request})
+        serializer = ThreadSerializer(attach_last_messages(threads), many=True, context={"request": request})
 
         return Response(serializer.data)
 
@@ -129,10 +162,9 @@ class ThreadListView(APIView):
         for thread in user_threads:
             thread_participants = set(thread.participants.values_list("id", flat=True))
             if thread_participants == set(participants_ids):
+                # The message_created signal moves the thread to the top of the inbox
                 message = Message.objects.create(thread=thread, sender=request.user, body=message_body)
-
-                thread.last_message_at = timezone.now()
-                thread.save()
+                thread.refresh_from_db(fields=["last_message_at"])
 
                 return Response(
                     {
@@ -161,13 +193,59 @@ class ThreadListView(APIView):
         )
 
 
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+
+def message_page(thread, before_id=None, after_id=None, page_size=MESSAGE_PAGE_SIZE):
+    """
+    One page of the messages of a thread between two message ids, newest first, with their senders.
+
+    Without `before_id`, a page after `after_id` holds the messages right after it, so that a
+    client catching up can walk forward. Otherwise the page holds the newest messages before
+    `before_id`, so that a client can walk back through the history.
+
+    Returns:
+        tuple: (list of messages, whether more messages follow in the walked direction)
+    """
+    messages = thread.messages.select_related("sender")
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    if after_id is not None:
+        messages = messages.filter(id__gt=after_id)
+
+    forward = after_id is not None and before_id is None
+    page = list(messages.order_by("id" if forward else "-id")[: page_size + 1])
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    return (page[::-1] if forward else page), has_more
+
+
 @extend_schema_view(
     get=extend_schema(
         tags=["messages"],
         summary="Get thread details",
-        description="Retrieves a specific thread with all messages",
+        description=(
+            "Retrieves a specific thread with its messages, newest first. All messages are returned unless "
+            "`before_id`, `after_id` or `page_size` is given, in which case one page of messages is returned "
+            "along with `has_more`. With `compact`, messages only hold their sender id and `participants` "
+            "is a dictionary of the users by id."
+        ),
         parameters=[
             OpenApiParameter(name="thread_id", description="Thread ID", required=True, type=int),
+            OpenApiParameter(
+                name="before_id", description="Only messages older than this message", required=False, type=int
+            ),
+            OpenApiParameter(
+                name="after_id", description="Only messages newer than this message", required=False, type=int
+            ),
+            OpenApiParameter(
+                name="page_size",
+                description=f"Messages per page (default {MESSAGE_PAGE_SIZE}, max {MAX_MESSAGE_PAGE_SIZE})",
+                required=False,
+                type=int,
+            ),
+            OpenApiParameter(name="compact", description="Compact message format", required=False, type=bool),
         ],
         responses={
             200: ThreadDetailSerializer,
@@ -199,7 +277,7 @@ class ThreadDetailView(APIView):
 
     def get_object(self, thread_id, user):
         """Get thread object and check if user is a participant"""
-        thread = get_object_or_404(Thread, id=thread_id)
+        thread = get_object_or_404(Thread.objects.prefetch_related("participants"), id=thread_id)
 
         if user not in thread.participants.all():
             raise PermissionDenied("You are not a participant in this thread.")
@@ -207,12 +285,34 @@ class ThreadDetailView(APIView):
         return thread
 
     def get(self, request, thread_id):
-        """Get a specific thread with all messages"""
+        """Get a specific thread with all its messages, or a page of them"""
         thread = self.get_object(thread_id, request.user)
 
-        serializer = ThreadDetailSerializer(thread, context={"request": request})
+        params = request.query_params
+        context = {"request": request, "compact": params.get("compact", "").lower() in ["1", "true", "yes"]}
 
-        return Response(serializer.data)
+        if not any(param in params for param in ["before_id", "after_id", "page_size"]):
+            return Response(ThreadDetailSerializer(thread, context=context).data)
+
+        try:
+            before_id = int(params["before_id"]) if params.get("before_id") else None
+            after_id = int(params["after_id"]) if params.get("after_id") else None
+            page_size = int(params.get("page_size") or MESSAGE_PAGE_SIZE)
+        except ValueError:
+            return Response(
+                {"detail": "before_id, after_id and page_size must be integers."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= page_size <= MAX_MESSAGE_PAGE_SIZE:
+            return Response(
+                {"detail": f"page_size must be between 1 and {MAX_MESSAGE_PAGE_SIZE}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        context["messages"], has_more = message_page(thread, before_id, after_id, page_size)
+        data = ThreadDetailSerializer(thread, context=context).data
+        data["has_more"] = has_more
+
+        return Response(data)
 
     def delete(self, request, thread_id):
         """Delete a thread (only works if all messages are deleted)"""
@@ -275,11 +375,9 @@ class MessageListView(APIView):
 
         serializer = MessageSerializer(data=request.data)
         if serializer.is_valid():
+            # The message_created signal updates last_message_at and notifies the participants
             message = serializer.save(thread=thread, sender=request.user)
 
-            thread.last_message_at = timezone.now()
-            thread.save()
-
             logger.info(f"Message created: ID={message.id}, Thread={thread_id}, Sender={request.user.id}")
 
             return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
@@ -331,10 +429,96 @@ def mark_thread_read(request, thread_id):
     read_receipt, _ = ReadReceipt.objects.update_or_create(
         thread=thread, user=request.user, defaults={"last_read_message": message}
     )
+    mark_read(thread, request.user, message)
 
     return Response(ReadReceiptSerializer(read_receipt).data, status=status.HTTP_200_OK)
 
 
+@extend_schema(
+    tags=["messages"],
+    summary="Total unread messages",
+    description="Returns the number of unread messages of the current user across all their threads",
+    responses={
+        200: OpenApiResponse(
+            description="Total unread count",
+            response={"type": "object", "properties": {"total_unread": {"type": "integer"}}},
+        ),
+        403: OpenApiResponse(description="Not eligible to use messaging"),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsMessagingEligibleUser])
+def unread_total(request):
+    """
+    Total number of unread messages of the current user, polled by the navigation badge.
+    """
+    return Response({"total_unread": total_unread(request.user)}, status=status.HTTP_200_OK)
+
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+@extend_schema(
+    tags=["messages"],
+    summary="Search messages",
+    description=(
+        "Full-text search over the messages of the threads of the current user, newest first. Every word of the "
+        "query must match, the last one as a prefix. Results hold an HTML snippet of the body with the matches "
+        "wrapped in <mark> tags. Pass the id of the last result as `before_id` to get the next page."
+    ),
+    parameters=[
+        OpenApiParameter(name="q", description="Search query", required=True, type=str),
+        OpenApiParameter(name="thread_id", description="Only search this thread", required=False, type=int),
+        OpenApiParameter(name="before_id", description="Only return messages older than this id", type=int),
+        OpenApiParameter(
+            name="page_size",
+            description=f"Results per page (default {SEARCH_PAGE_SIZE}, max {MAX_SEARCH_PAGE_SIZE})",
+            type=int,
+        ),
+    ],
+    responses={
+        200: OpenApiResponse(
+            description="One page of matching messages",
+            response={
+                "type": "object",
+                "properties": {
+                    "results": {"type": "array", "items": {"type": "object"}},
+                    "has_more": {"type": "boolean"},
+                },
+            },
+        ),
+        400: OpenApiResponse(description="Missing query or invalid parameters"),
+        403: OpenApiResponse(description="Not eligible to use messaging"),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsMessagingEligibleUser])
+def search_thread_messages(request):
+    """
+    Search the messages of the threads of the current user.
+    """
+    params = request.query_params
+    query = params.get("q", "").strip()
+    if not query:
+        return Response({"detail": "The q parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        thread_id = int(params["thread_id"]) if params.get("thread_id") else None
+        before_id = int(params["before_id"]) if params.get("before_id") else None
+        page_size = int(params.get("page_size", SEARCH_PAGE_SIZE))
+    except ValueError:
+        return Response(
+            {"detail": "thread_id, before_id and page_size must be integers."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 1 <= page_size <= MAX_SEARCH_PAGE_SIZE:
+        return Response(
+            {"detail": f"page_size must be between 1 and {MAX_SEARCH_PAGE_SIZE}."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    messages, has_more = search_messages(request.user, query, thread_id, before_id, page_size)
+    return Response({"results": MessageSearchResultSerializer(messages, many=True).data, "has_more": has_more})
+
+
 @extend_schema(
     tags=["messages"],
     summary="Update typing status",
@@ -356,6 +540,7 @@ def mark_thread_read(request, thread_id):
                 "properties": {"status": {"type": "string", "example": "ok"}, "is_typing": {"type": "boolean"}},
             },
         ),
+        400: OpenApiResponse(description="is_typing is not a boolean"),
         403: OpenApiResponse(description="Not a participant in this thread"),
         404: OpenApiResponse(description="Thread not found"),
     },
@@ -365,20 +550,97 @@ def mark_thread_read(request, thread_id):
 def update_typing_status(request, thread_id):
     """
     Update the typing status for a user in a thread.
-    This endpoint is optimized for frequent calls (e.g., during typing).
+    This endpoint is optimized for frequent calls (e.g., during typing): the status is kept in the
+    presence store, pushed to the event streams and Socket.IO room of the thread, and never written to the database.
     """
-    thread = get_object_or_404(Thread, id=thread_id)
-    if request.user not in thread.participants.all():
+    participants = participant_ids(thread_id)
+    if participants is None:
+        raise NotFound("No Thread matches the given query.")
+    if request.user.id not in participants:
         return Response({"detail": "You are not a participant in this thread."}, status=status.HTTP_403_FORBIDDEN)
 
-    is_typing = request.data.get("is_typing", True)
-    _, _ = TypingIndicator.objects.update_or_create(
-        thread=thread, user=request.user, defaults={"is_typing": is_typing}
+    try:
+        # Form data sends "false" as a non-empty string
+        is_typing = serializers.BooleanField().to_internal_value(request.data.get("is_typing", True))
+    except serializers.ValidationError:
+        return Response({"detail": "is_typing must be a boolean."}, status=status.HTTP_400_BAD_REQUEST)
+    update_typing(thread_id, request.user, is_typing)
+    get_outbox().enqueue(
+        "typing",
+        {"user_id": request.user.id, "user_name": request.user.name, "is_typing": is_typing},
+        [f"thread_{thread_id}"],
     )
 
     return Response({"status": "ok", "is_typing": is_typing}, status=status.HTTP_200_OK)
 
 
+@extend_schema(
+    tags=["messages"],
+    summary="Thread presence",
+    description="Returns the other participants typing in a thread and the participants currently online",
+    parameters=[
+        OpenApiParameter(name="thread_id", description="Thread ID", required=True, type=int),
+    ],
+    responses={
+        200: OpenApiResponse(
+            description="Typing users and online participant ids",
+            response={
+                "type": "object",
+                "properties": {
+                    "typing": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {"id": {"type": "integer"}, "name": {"type": "string"}},
+                        },
+                    },
+                    "online": {"type": "array", "items": {"type": "integer"}},
+                },
+            },
+        ),
+        403: OpenApiResponse(description="Not a participant in this thread"),
+        404: OpenApiResponse(description="Thread not found"),
+    },
+)
+@api_view(["GET"])
+@permission_classes([IsMessagingEligibleUser])
+def thread_presence(request, thread_id):
+    """
+    Typing and online status of the participants of a thread, read from the presence store without any query.
+    """
+    participants = participant_ids(thread_id)
+    if participants is None:
+        raise NotFound("No Thread matches the given query.")
+    if request.user.id not in participants:
+        return Response({"detail": "You are not a participant in this thread."}, status=status.HTTP_403_FORBIDDEN)
+
+    typing = [user for user in typing_users(thread_id) if user["id"] != request.user.id]
+    online = sorted(online_user_ids(participants))
+    return Response({"typing": typing, "online": online}, status=status.HTTP_200_OK)
+
+
+def format_sse(event_id, name, data):
+    """
+    Format one server-sent event.
+    """
+    return f"id:{event_id}\nevent: {name}\ndata:{json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def render_event(event, user_id):
+    """
+    Format a broker event for the stream of a user, or return None when it is not meant for them.
+    The user's own messages are sent back, but not their own typing indicators and read receipts.
+    """
+    if event.name == "message":
+        return format_sse(event.id, event.name, event.data)
+    if event.actor_id == user_id:
+        return None
+    data = event.data
+    if event.name == "typing":
+        data = {**data, "users": [typing for typing in data["users"] if typing["id"] != user_id]}
+    return format_sse(event.id, event.name, data)
+
+
 @extend_schema(
     tags=["messages"],
     summary="Thread real-time events",
@@ -435,106 +697,54 @@ def thread_events(request, thread_id):
     last_event_id = request.META.get("HTTP_LAST_EVENT_ID") or request.GET.get("last_event_id")
     logger.info(f"Thread events: Starting SSE stream for thread {thread_id}, last_event_id={last_event_id}")
 
-    async def event_stream(thread, user):
+    broker = get_broker()
+    after = broker.last_event_id
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+        initial = []
+    elif last_event_id and last_event_id.startswith("message:") and last_event_id[8:].isdigit():
+        # Event id sent by the former polling stream
+        initial = list(thread.messages.filter(id__gt=int(last_event_id[8:])).select_related("sender").order_by("id"))
+    else:
+        initial = list(reversed(thread.messages.select_related("sender").order_by("-id")[:5]))
+
+    async def event_stream(thread_id, user_id):
         """
-        SSE event stream for a thread.
+        SSE event stream for a thread, fed by the event broker.
         Events: message, typing, read_receipt
         """
-        last_message_id = None
-        last_read_check = None
-        cycle_count = 0
-
-        yield "retry: 1000\n\n"
-
-        while True:
-            try:
-                messages_found = False
-
-                if last_message_id:
-                    new_messages = thread.messages.filter(id__gt=last_message_id).order_by("id")
-                else:
-                    new_messages = thread.messages.order_by("-id")[:5]
-                    new_messages = list(reversed(new_messages))
-
-                if new_messages:
-                    logger.info(f"Thread {thread.id}: Found {len(new_messages)} new messages to send")
-                for message in new_messages:
-                    messages_found = True
-                    last_message_id = message.id
-
-                    data = {
-                        "type": "message",
-                        "id": message.id,
-                        "sender_id": message.sender.id,
-                        "sender_name": message.sender.name,
-                        "body": message.body,
-                        "created_at": message.created_at.isoformat(),
-                    }
-
-                    event_data = (
-                        f"id:message:{message.id}\n"
-                        f"event: message\n"
-                        f"data:{json.dumps(data, separators=(',', ':'))}\n\n"
-                    )
-                    yield event_data
-
-                typing_indicators = TypingIndicator.objects.filter(
-                    thread=thread,
-                    is_typing=True,
-                    started_at__gte=timezone.now() - timezone.timedelta(seconds=5),
-                ).exclude(user=user)
-
-                if typing_indicators.exists():
-                    typing_users = [{"id": t.user.id, "name": t.user.name} for t in typing_indicators]
-                    data = {"type": "typing", "users": typing_users}
-                    event_data = (
-                        f"id:typing:{int(time.time())}\n"
-                        f"event: typing\n"
-                        f"data:{json.dumps(data, separators=(',', ':'))}\n\n"
-                    )
-                    yield event_data
-
-                if not last_read_check or cycle_count % 10 == 0:
-                    read_receipts = ReadReceipt.objects.filter(
-                        thread=thread,
-                        read_at__gte=timezone.now() - timezone.timedelta(seconds=10),
-                    ).exclude(user=user)
-
-                    if read_receipts.exists():
-                        receipt_data = [
-                            {
-                                "user_id": r.user.id,
-                                "name": r.user.name,
-                                "last_read_message_id": r.last_read_message.id,
-                                "read_at": r.read_at.isoformat(),
-                            }
-                            for r in read_receipts
-                        ]
-                        data = {"type": "read_receipt", "receipts": receipt_data}
-                        event_data = (
-                            f"id:read_receipt:{int(time.time())}\n"
-                            f"event: read_receipt\n"
-                            f"data:{json.dumps(data, separators=(',', ':'))}\n\n"
-                        )
-                        yield event_data
-
-                    last_read_check = timezone.now()
-
-                if not messages_found and cycle_count % 150 == 0:
+        subscriber, replay = broker.subscribe(thread_id, user_id, after=after)
+        try:
+            yield "retry: 1000\n\n"
+
+            last_message_id = 0
+            for message in initial:
+                last_message_id = message.id
+                yield format_sse(f"message:{message.id}", "message", message_payload(message))
+
+            for event in replay:
+                # Messages published while the initial ones were loaded are already sent
+                if event.name != "message" or event.data["id"] > last_message_id:
+                    chunk = render_event(event, user_id)
+                    if chunk:
+                        yield chunk
+
+            while not (subscriber.overflowed and subscriber.queue.empty()):
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), settings.MESSAGING_SSE_KEEPALIVE)
+                except TimeoutError:
                     yield ": heartbeat\n\n"
+                    continue
+                chunk = render_event(event, user_id)
+                if chunk:
+                    yield chunk
 
-                cycle_count = (cycle_count + 1) % 1000
-                time.sleep(0.1)
-
-            except Exception as e:
-                logger.error(f"Error in SSE loop: {e}")
-                data = {"type": "error", "message": str(e)}
-                yield f"event: error\ndata:{json.dumps(data, separators=(',', ':'))}\n\n"
-                break
-        await asyncio.sleep(1)
+            logger.info(f"Thread events: Closing lagging stream of user {user_id} in thread {thread_id}")
+        finally:
+            broker.unsubscribe(subscriber)
 
     logger.info(f"🎬 Starting event_stream for thread {thread_id}, user {user.id}")
-    response = StreamingHttpResponse(event_stream(thread, user.id), content_type="text/event-stream")
+    response = StreamingHttpResponse(event_stream(thread.id, user.id), content_type="text/event-stream")
     response["Cache-Control"] = "no-cache, no-transform"
     response["Connection"] = "keep-alive"
     response["X-Accel-Buffering"] = "no"